@@ -20,6 +20,7 @@ from fjarrsyn.core.api import (
     Mutation,
     MultiMutation,
     Compulsion,
+    TauLeapCompulsion,
     Buzz,
     Direction,
     Feature,
@@ -33,9 +34,15 @@ from fjarrsyn.core.api import (
     Agent,
     Socket,
     AgentManagementSystem,
+    ActivityTracker,
     Node,
     node_maker,
+    graph_to_csr,
+    graph_from_csr,
     Mover,
+    RandomStreams,
+    BufferedRandom,
+    set_random_buffer,
     Plan,
     Clause,
     Heartbeat)
@@ -45,7 +52,34 @@ from fjarrsyn.core.api import (
 from fjarrsyn.simulation.api import (
     AgentSampler,
     EnvSampler,
+    AggregateSampler,
     GraphSampler,
     SystemIO,
-    FiniteSystemRunner)
+    reconstruct_agent_state,
+    reconstruct_graph,
+    SQLiteSink,
+    RingBufferSink,
+    ArrowSink,
+    CSRGraphSink,
+    write_csr_graph,
+    load_csr_graph,
+    FiniteSystemRunner,
+    ConditionalSystemRunner,
+    latest_checkpoint,
+    StopCondition,
+    PopulationSize,
+    InertFraction,
+    MovingVariance,
+    EnsembleRunner,
+    ParameterSweep,
+    config_key,
+    PartitionedSystemRunner,
+    partition_graph,
+    halo_nodes,
+    SnapshotPublisher,
+    SnapshotReader,
+    WorldSnapshot,
+    AgentEvent,
+    EventDrivenRunner,
+    IndexedHeap)
 
@@ -1,8 +1,6 @@
 '''Agent unit
 
 '''
-import numpy as np
-
 from fjarrsyn.core.agent import Agent
 
 from fjarrsyn.core.instructor import Cortex, Interpreter, Moulder
@@ -10,6 +8,7 @@ from fjarrsyn.core.message import Essence, Resource, Belief, Feature, \
                          Buzz, Direction, MessageOperator
 from fjarrsyn.core.scaffold_map import universal_map_maker, MapCollection
 from fjarrsyn.core.helper_funcs import sigmoid_10
+from fjarrsyn.core.rng import draw_uniform
 
 STRICT_ENGINE = True
 
@@ -46,7 +45,7 @@ class Unit(Agent):
 
         '''
         ff = self._cmp_frac_share(1.0)
-        rando = np.random.uniform()
+        rando = draw_uniform(self.agent_id_system)
         ff = self.essence['truthful_reveal'] * ff + \
              (1.0 - self.essence['truthful_reveal']) * rando
 
@@ -58,7 +57,7 @@ class Unit(Agent):
         '''
         f1 = self._cmp_frac_share(1.0)
         f2 = min(1.0, max(0.0, 1.0 - self.essence['midpoint_share']))
-        rando = np.random.uniform()
+        rando = draw_uniform(self.agent_id_system)
 
         pheno = self.essence['truthful_reveal'] * f1 * f2 + \
                 (1.0 - self.essence['truthful_reveal']) * rando
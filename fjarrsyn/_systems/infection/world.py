@@ -3,13 +3,13 @@
 '''
 from fjarrsyn.core.agent_ms import AgentManagementSystem
 
-from fjarrsyn.core.instructor import Sensor, Actuator, MultiMutation, Compulsion
+from fjarrsyn.core.instructor import Sensor, Actuator, MultiMutation, \
+                                     TauLeapCompulsion
 from fjarrsyn.core.message import MessageOperator
 from fjarrsyn.core.scaffold_map import EssenceMap, ResourceMap, MapCollection, universal_map_maker
+from fjarrsyn.core.rng import draw_choice
 from fjarrsyn.core.sampler import AgentSampler, EnvSampler, GraphSampler, SystemIO
 
-import numpy as np
-
 STRICT_ENGINE = True
 
 class World(AgentManagementSystem):
@@ -19,7 +19,7 @@ class World(AgentManagementSystem):
 
         '''
         neighbour_nodes = self.neighbours_to(calling_agent_id, agents_only=False)
-        node = np.random.choice(list(neighbour_nodes))
+        node = draw_choice(list(neighbour_nodes), agent_id=calling_agent_id)
         if node.agent_content is None:
             return 0.0 
 
@@ -40,9 +40,13 @@ class World(AgentManagementSystem):
         n_neighbours = len(neighbour_nodes)
 
         for node in neighbour_nodes:
-            node.aux_content.container['info_a'] += da / n_neighbours
-            node.aux_content.container['info_b'] += db / n_neighbours
-            node.aux_content.container['info_c'] += dc / n_neighbours
+            container = node.aux_content.container
+            self.stage_write(container, 'info_a', container['info_a'] + da / n_neighbours,
+                             node=node)
+            self.stage_write(container, 'info_b', container['info_b'] + db / n_neighbours,
+                             node=node)
+            self.stage_write(container, 'info_c', container['info_c'] + dc / n_neighbours,
+                             node=node)
 
         return -da, -db, -dc
 
@@ -54,7 +58,10 @@ class World(AgentManagementSystem):
         n_neighbours = len(neighbour_nodes)
 
         for node in neighbour_nodes:
-            node.aux_content.container['bad_info'] += a_lies / n_neighbours
+            container = node.aux_content.container
+            self.stage_write(container, 'bad_info',
+                             container['bad_info'] + a_lies / n_neighbours,
+                             node=node)
 
         return 3 * [-a_lies / 3.0]
 
@@ -62,17 +69,21 @@ class World(AgentManagementSystem):
         '''Bla bla
 
         '''
-        env = self.get(calling_agent_id, get_aux=True)
+        node, env = self.get(calling_agent_id, get_node=True, get_aux=True)
         
         da = env.container['info_a'] * f_gulp
         db = env.container['info_b'] * f_gulp
         dc = env.container['info_c'] * f_gulp
         d_tox = env.container['bad_info'] * f_gulp
 
-        env.container['info_a'] -= da
-        env.container['info_b'] -= db
-        env.container['info_c'] -= dc
-        env.container['bad_info'] -= d_tox
+        self.stage_write(env.container, 'info_a', env.container['info_a'] - da,
+                         node=node)
+        self.stage_write(env.container, 'info_b', env.container['info_b'] - db,
+                         node=node)
+        self.stage_write(env.container, 'info_c', env.container['info_c'] - dc,
+                         node=node)
+        self.stage_write(env.container, 'bad_info', env.container['bad_info'] - d_tox,
+                         node=node)
 
         return da, db, dc, d_tox
 
@@ -84,25 +95,20 @@ class World(AgentManagementSystem):
 
         node_empty = [node for node in neighbour_nodes if node.agent_content is None]
         if len(node_empty) > 0:
-            node_to_populate = np.random.choice(node_empty)
+            node_to_populate = draw_choice(node_empty, agent_id=calling_agent_id)
 
         else:
-            node_to_populate = np.random.choice(neighbour_nodes)
+            node_to_populate = draw_choice(neighbour_nodes, agent_id=calling_agent_id)
             self.terminate_agent(node_to_populate.agent_content.agent_id_system)
 
         self.situate(offspring_agent, node_to_populate)
 
-    def _cmp_resource_jump(self):
-        '''Bla bla
+    def _cmp_resource_jump(self, n_a, n_b, n_c):
+        '''Increase of the resources for a number of random jumps of each
 
         '''
-        ret_ = 3 * [0.0]
-
-        for k_resource in range(0, 3):
-            if np.random.rand() < self.resource_jump_prob:
-                ret_[k_resource] = self.resource_jump_magnitude
-
-        return tuple(ret_)
+        return tuple([n_jump * self.resource_jump_magnitude \
+                      for n_jump in (n_a, n_b, n_c)])
 
     def _midpoint_move(self):
 
@@ -240,6 +246,8 @@ class World(AgentManagementSystem):
         b_jump = ResourceMap('Jump Increase B', 'delta', 'info_b', ('add',))
         c_jump = ResourceMap('Jump Increase C', 'delta', 'info_c', ('add',))
         jump_resources = MapCollection([a_jump, b_jump, c_jump])
-        resource_jump = Compulsion('Random Jump of Resources',
-                                   self._cmp_resource_jump, jump_resources)
+        resource_jump = TauLeapCompulsion('Random Jump of Resources',
+                                          3 * (resource_jump_prob,),
+                                          jump_resources,
+                                          event_func=self._cmp_resource_jump)
         self.set_law(resource_jump)
@@ -1,12 +1,10 @@
 '''Basic Tragedy of Commons 
 
 '''
-import numpy as np
-import numpy.random
-
 from fjarrsyn.core.agent_ms import AgentManagementSystem
 from fjarrsyn.core.instructor import Actuator, Compulsion
 from fjarrsyn.core.scaffold_map import ResourceMap, MapCollection
+from fjarrsyn.core.rng import draw_binomial
 
 BIRTH_PROB = 0.10
 BIRTH_PROB_CAUTION = BIRTH_PROB * 0.5
@@ -19,22 +17,20 @@ class World(AgentManagementSystem):
         if fish_current <= people_current:
             n_starving = people_current - fish_current
 
-            starve_test = [np.random.ranf() < STARVE_PROB for x in range(n_starving)]
-            breed_test = [np.random.ranf() < BIRTH_PROB_CAUTION for x in range(fish_current)]
+            n_starved = draw_binomial(n_starving, STARVE_PROB)
+            n_born = draw_binomial(fish_current, BIRTH_PROB_CAUTION)
 
-            delta_people = -1 * sum(starve_test) + sum(breed_test)
+            delta_people = -1 * n_starved + n_born
             delta_fish = -1 * fish_current
 
         elif fish_current >= people_current * 2:
-            breed_test = [np.random.ranf() < BIRTH_PROB for x in range(people_current)]
-            delta_people = sum(breed_test)
+            delta_people = draw_binomial(people_current, BIRTH_PROB)
             delta_fish = -2 * people_current
 
         else:
             n_full = fish_current - people_current
-            breed_test_1 = [np.random.ranf() < BIRTH_PROB for x in range(n_full)]
-            breed_test_2 = [np.random.ranf() < BIRTH_PROB_CAUTION for x in range(people_current - n_full)]
-            delta_people = sum(breed_test_1) + sum(breed_test_2)
+            delta_people = draw_binomial(n_full, BIRTH_PROB) + \
+                           draw_binomial(people_current - n_full, BIRTH_PROB_CAUTION)
             delta_fish = -1 * fish_current
 
         print (fish_current, delta_fish, people_current, delta_people)
@@ -0,0 +1,167 @@
+'''Tracking of the activity of the agents of a system, such that the iteration
+over the system in a step can be restricted to the agents that are active,
+rather than agents that are idle being executed to no effect
+
+'''
+from fjarrsyn.core.rng import draw_choice, draw_uniform
+
+class ActivityTracker(object):
+    '''Tracker of the active agents of a system, see
+    `AgentManagementSystem.set_activity_tracker`
+
+    Parameters
+    ----------
+    refresh_fraction : float, optional
+        The fraction of the idle agents that are drawn at random to be active
+        in a step, such that idle agents are executed now and then, for
+        example to respond to laws that depend on time rather than on state
+    linger : int, optional
+        The number of steps an agent remains active after its last activity
+    wake_neighbours : bool, optional
+        If True, the agents of the neighbour nodes of an agent with changed
+        imprints are active as well, since they may sense the change
+
+    Raises
+    ------
+    ValueError
+        If the refresh fraction is not between zero and one, or the linger is
+        less than one step
+
+    Notes
+    -----
+    An agent is active in a step if, since the previous step, any of its
+    imprints changed value, such as by the maps of a law or of its own organs,
+    or it was marked active, see `mark`. An imprint that changes value adds
+    its agent to the set of changed agents of the tracker, which the agent
+    management system attaches to its agents, hence no agent needs to report
+    changes. Agents new to the system are marked active. The step advances
+    with each call of `advance`, which the agent management system makes once
+    per step as the active nodes are requested, and which only considers the
+    changed, marked and lingering agents, rather than all agents of the
+    system.
+
+    '''
+    def mark(self, agent_id):
+        '''Mark an agent as active in the next step
+
+        Parameters
+        ----------
+        agent_id : str
+            The agent ID
+
+        '''
+        self._marked.add(agent_id)
+
+    def rename_agents(self, id_map):
+        '''Replace the agent IDs of the tracked activity, as when the agents
+        of the system are given new IDs
+
+        Parameters
+        ----------
+        id_map : dict
+            The new agent ID keyed on the old agent ID
+
+        '''
+        self._last_activity = dict([(id_map.get(agent_id, agent_id), last) \
+                                    for agent_id, last in self._last_activity.items()])
+        self._marked = set([id_map.get(agent_id, agent_id) for agent_id in self._marked])
+        self.active = set([id_map.get(agent_id, agent_id) for agent_id in self.active])
+
+        #
+        # The set of changed agents is attached to the agents, hence it is
+        # changed in place
+        #
+        changed = [id_map.get(agent_id, agent_id) for agent_id in self._changed]
+        self._changed.clear()
+        self._changed.update(changed)
+
+    def advance(self, ams):
+        '''Advance to the next step and determine its active agents
+
+        Parameters
+        ----------
+        ams : AgentManagementSystem
+            The system of the agents
+
+        Returns
+        -------
+        active : set
+            The agent IDs of the active agents of the step
+
+        Notes
+        -----
+        The agents of the step are the agents that changed or were marked
+        since the previous step, and the agents that still linger, hence the
+        cost of a step does not grow with the number of idle agents. If a
+        fraction of the idle agents is refreshed, the agents of the system are
+        listed to draw from.
+
+        '''
+        self.step += 1
+        agents = ams.agents_in_scope
+
+        #
+        # Agents that were removed from the system are no longer tracked
+        #
+        last_activity = dict([(agent_id, last) \
+                              for agent_id, last in self._last_activity.items() \
+                              if self.step - last < self.linger and \
+                                 agent_id in agents])
+
+        changed = [agent_id for agent_id in self._changed if agent_id in agents]
+        for agent_id in changed:
+            last_activity[agent_id] = self.step
+        for agent_id in self._marked:
+            if agent_id in agents:
+                last_activity[agent_id] = self.step
+
+        if self.wake_neighbours:
+            for agent_id in changed:
+                for other in ams.neighbours_to(agent_id):
+                    if not other is None:
+                        last_activity[other.agent_id_system] = self.step
+
+        self._last_activity = last_activity
+        self._marked = set()
+        self._changed.clear()
+
+        active = set(last_activity)
+
+        self.n_refreshed = 0
+        if self.refresh_fraction > 0.0:
+            idle = [agent_id for agent_id in agents \
+                    if not agent_id in active]
+            n_expected = self.refresh_fraction * len(idle)
+            n_refresh = int(n_expected)
+            if draw_uniform() < n_expected - n_refresh:
+                n_refresh += 1
+
+            if n_refresh > 0:
+                for k in draw_choice(len(idle), size=n_refresh, replace=False):
+                    active.add(idle[k])
+            self.n_refreshed = n_refresh
+
+        self.active = active
+
+        return active
+
+    def __init__(self, refresh_fraction=0.0, linger=1, wake_neighbours=True):
+
+        if not 0.0 <= refresh_fraction <= 1.0:
+            raise ValueError('The refresh fraction must be between zero and ' + \
+                             'one, not %s' %(str(refresh_fraction)))
+        if linger < 1:
+            raise ValueError('Agents must linger at least one step, not %s' \
+                             %(str(linger)))
+
+        self.refresh_fraction = refresh_fraction
+        self.linger = linger
+        self.wake_neighbours = wake_neighbours
+
+        self.step = 0
+        self.active = set()
+        self.n_refreshed = 0
+
+        self._last_activity = {}
+        self._marked = set()
+        self._changed = set()
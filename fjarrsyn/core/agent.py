@@ -4,13 +4,11 @@
 from collections import namedtuple
 import copy
 
-import numpy
-import numpy.random
-
 from fjarrsyn.core.instructor import Sensor, Actuator, Interpreter, Moulder, Cortex
 from fjarrsyn.core.policy import Plan, Clause, Heartbeat
 from fjarrsyn.core.message import Resource, Essence, Feature, Buzz, Belief, Direction
 from fjarrsyn.core.constants import AGENT_IMPRINTS
+from fjarrsyn.core.rng import draw_integer
 
 from fjarrsyn.simulation.sampler import AgentSampler
 
@@ -75,10 +73,47 @@ class Agent(object):
             A resource or essence map, which was created by an Instructor, like
             an organ or an external law
 
+        Notes
+        -----
+        If the agent defers maps, see `defer_maps`, the values of the map are
+        detached and applied once the deferred maps are committed.
+
         '''
         if not _map is None:
             if not _map.is_empty():
-                _map.apply_to(self)
+                if self.pending_maps is None:
+                    _map.apply_to(self)
+
+                else:
+                    self.pending_maps.extend(_map.detach())
+
+    def defer_maps(self):
+        '''Defer the application of maps to the agent until `commit_maps`, such
+        that the imprints of the agent remain as they are while its organs and
+        the laws of the system execute
+
+        '''
+        self.pending_maps = []
+
+    def commit_maps(self):
+        '''Apply the maps deferred since `defer_maps` in the order they were
+        created, and return to immediate application of maps
+
+        Returns
+        -------
+        n_maps : int
+            The number of maps applied
+
+        '''
+        pending = self.pending_maps
+        self.pending_maps = None
+        if pending is None:
+            return 0
+
+        for _map, items in pending:
+            _map.apply_detached(self, items)
+
+        return len(pending)
 
     def _set(self, object_type, key, value, key_check=False):
         '''Common function to add agent organ or imprint to the appropriate
@@ -148,6 +183,7 @@ class Agent(object):
                                    'changed after first assignement')
             else:
                 self.resource = scaffold
+                scaffold._owner = self
 
         elif isinstance(scaffold, Essence):
             if (not allow_overwrite) and (not self.essence is None):
@@ -155,6 +191,7 @@ class Agent(object):
                                    'changed after first assignement')
             else:
                 self.essence = scaffold
+                scaffold._owner = self
 
         else:
             raise TypeError('Agent scaffold should be instance of ' + \
@@ -199,6 +236,7 @@ class Agent(object):
 
         elif isinstance(message, Belief):
             self._set('belief', message.name, message)
+            message._owner = self
 
         elif isinstance(message, Direction):
             self._set('direction', message.name, message)
@@ -683,7 +721,7 @@ class Agent(object):
             token = None
 
         else:
-            token = numpy.random.randint(10**12) 
+            token = draw_integer(10**12, self.agent_id_system)
 
         socket = Socket(name, func, verb, phrase, token)
         self.socket_offered[name] = socket
@@ -749,6 +787,25 @@ class Agent(object):
         '''
         return (not self.agent_id_system is None)
 
+    @property
+    def inert(self):
+        '''True if the agent has been declared inert, which renders its verbs
+        inactive
+
+        '''
+        return self._inert
+
+    @inert.setter
+    def inert(self, value):
+        '''Declare the agent inert or not, and update the count of inert
+        agents of the agent management system the agent is part of
+
+        '''
+        if not self._inert_count is None and bool(value) != bool(self._inert):
+            self._inert_count.n_inert += 1 if value else -1
+
+        self._inert = value
+
     def revive(self):
         '''Revive an agent that has been inert for some reason
 
@@ -783,6 +840,8 @@ class Agent(object):
 
         copy_agent.name = ''
         copy_agent.agent_id_system = None
+        copy_agent._inert_count = None
+        copy_agent._changed_agents = None
         copy_agent.inert = False
         copy_agent.ticks = 0
 
@@ -868,10 +927,15 @@ class Agent(object):
         self.socket_offered = {}
 
         #
-        # Variables for the dynamics of the agent
+        # Variables for the dynamics of the agent. The count of inert agents,
+        # and the changed agents of an activity tracker, are attached by the
+        # agent management system the agent is part of
         #
-        self.inert = False
+        self._inert = False
+        self._inert_count = None
+        self._changed_agents = None
         self.ticks = 0
+        self.pending_maps = None
         self.clause = {}
         self.plan = {}
         self.heartbeat = {} 
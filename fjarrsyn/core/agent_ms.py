@@ -3,7 +3,7 @@
 '''
 from collections.abc import Iterable
 from collections import OrderedDict
-from uuid import uuid4
+from uuid import uuid4, UUID
 
 import numpy as np
 import numpy.random
@@ -11,10 +11,25 @@ import itertools
 import networkx as nx
 
 from fjarrsyn.core.agent import Agent
-from fjarrsyn.core.graph import Node
-from fjarrsyn.core.instructor import Compulsion, Mutation
+from fjarrsyn.core.graph import Node, TopologyLog
+from fjarrsyn.core.checkpoint import write_checkpoint, read_checkpoint
+from fjarrsyn.core.sync import get_resolver
+from fjarrsyn.core.instructor import Compulsion, Mutation, TauLeapCompulsion
+from fjarrsyn.core.rng import RandomStreams, set_random_streams, \
+                               get_random_streams, set_acting_agent, \
+                               draw_choice, draw_integer
 
 from fjarrsyn.simulation.sampler import AgentSampler, EnvSampler, GraphSampler, SystemIO
+from fjarrsyn.simulation.sampler import AggregateSampler
+
+class _InertCount(object):
+    '''Count of the inert agents of a system, which the agents of the system
+    update as they are declared inert or revived
+
+    '''
+    def __init__(self):
+
+        self.n_inert = 0
 
 class AgentManagementSystem(object):
     '''Base class for the medium in which agents interacts with other agents or
@@ -69,10 +84,20 @@ class AgentManagementSystem(object):
         agents_hood : list 
             Agents (or Nodes) directly adjacent to the given agent
 
+        Notes
+        -----
+        If the system is a partition, see `set_owned_nodes`, only the
+        neighbours among the owned nodes and the nodes of the halo are
+        returned, since the state of other nodes is not kept current
+
         '''
         node_with_agent = self.node_from_agent_id_[agent_index]
         node_neighbours = self.agents_graph.neighbors(node_with_agent)
-        node_neighbours = list(node_neighbours)
+        if self._visible_set is None:
+            node_neighbours = list(node_neighbours)
+        else:
+            node_neighbours = [node for node in node_neighbours \
+                               if node in self._visible_set]
         if agents_only:
             ret_neighbours = [x.agent_content for x in node_neighbours]
 
@@ -142,9 +167,11 @@ class AgentManagementSystem(object):
 
         if delete:
             self.agents_graph.remove_edge(node_agent_1, node_agent_2)
+            self.topology_log.record('edge_remove', node_agent_1, node_agent_2)
 
         if add:
             self.agents_graph.add_edge(node_agent_1, node_agent_2)
+            self.topology_log.record('edge_add', node_agent_1, node_agent_2)
 
         if not weight is None:
             raise NotImplementedError('Weighted graphs not fully implemented')
@@ -193,9 +220,9 @@ class AgentManagementSystem(object):
             counter += 1
 
             if len(shuffled) == 0:
-                shuffled = list(np.array(items)[np.random.choice(len(items),
-                                                                 size=len(items), 
-                                                                 replace=replace)])
+                shuffled = list(np.array(items)[draw_choice(len(items),
+                                                            size=len(items), 
+                                                            replace=replace)])
             entry = shuffled.pop(0)
 
             yield entry
@@ -249,7 +276,7 @@ class AgentManagementSystem(object):
             One random item of the input items, that is a Node or Agent
 
         '''
-        return items[np.random.randint(len(items))]
+        return items[draw_integer(len(items))]
 
     def _strip_node_agent(self, agents_only, subset):
         '''Retrieve node graph items
@@ -259,7 +286,9 @@ class AgentManagementSystem(object):
         agents_only : bool
             If True, extract Agents from graph. If False, extract Nodes
         subset : Iterable
-            A subset of the graph to extract items from. If None, entire graph
+            A subset of the graph to extract items from. If None, the nodes
+            owned by the system, which is the entire graph unless the system
+            is a partition, see `set_owned_nodes`
 
         Returns
         -------
@@ -268,16 +297,17 @@ class AgentManagementSystem(object):
 
         '''
         if subset is None:
-            items = list(self.agents_graph.nodes)
+            if self.owned_nodes is None:
+                items = list(self.agents_graph.nodes)
+            else:
+                items = list(self.owned_nodes)
 
         else:
             items = list(subset)
 
         if agents_only:
-            items = []
-            for x in map(lambda x: x.agent_content, self.agents_graph.nodes):
-                if not x is None:
-                    items.append(x)
+            items = [node.agent_content for node in items \
+                     if not node.agent_content is None]
 
         return items
 
@@ -290,7 +320,9 @@ class AgentManagementSystem(object):
             If True, extract Agent-Agent edge pairs from graph. If False,
             extract Node-Node edge pairs
         subset : Iterable
-            A subset of the graph to extract items from. If None, entire graph
+            A subset of the graph to extract items from. If None, the edges
+            owned by the system, which is the entire graph unless the system
+            is a partition, in which case the edges with the first node owned
 
         Returns
         -------
@@ -299,20 +331,187 @@ class AgentManagementSystem(object):
 
         '''
         if subset is None:
-            items = list(self.agents_graph.edges)
+            if self.owned_nodes is None:
+                items = list(self.agents_graph.edges)
+            else:
+                items = [edge for edge in self.agents_graph.edges \
+                         if edge[0] in self._owned_set]
 
         else:
             items = list(subset)
 
         if agents_only:
-            items = []
-            for x in map(lambda x: (x[0].agent_content, x[1].agent_content),
-                         self.agents_graph.edges):
-                if not None in x:
-                    items.append(x)
+            items = [(edge[0].agent_content, edge[1].agent_content) \
+                     for edge in items \
+                     if not edge[0].agent_content is None and \
+                        not edge[1].agent_content is None]
 
         return items
 
+    def set_owned_nodes(self, nodes, halo=None):
+        '''Restrict the iterators, random selections, counts and neighbours
+        of the system to a subset of nodes owned by the system, as for a
+        partition of a system propagated by a worker process
+
+        Parameters
+        ----------
+        nodes : Iterable
+            The owned nodes, in the order of iteration. If None, the entire
+            graph is owned
+        halo : Iterable, optional
+            The nodes not owned by the system, the state of which is kept
+            current, such that they are returned as neighbours. If None, the
+            neighbour nodes of the owned nodes
+
+        '''
+        if nodes is None:
+            self.owned_nodes = None
+            self._owned_set = None
+            self._visible_set = None
+
+        else:
+            self.owned_nodes = list(nodes)
+            self._owned_set = set(self.owned_nodes)
+            if halo is None:
+                halo = [other for node in self.owned_nodes \
+                        for other in self.agents_graph.neighbors(node)]
+            self._visible_set = self._owned_set.union(halo)
+
+    def owned_agents(self):
+        '''Return the agents of the nodes owned by the system, which are all
+        agents of the system unless the system is a partition, see
+        `set_owned_nodes`
+
+        Returns
+        -------
+        agents : list
+            The agents, in the order of the owned nodes, or the order the
+            agents were added to the system if the entire graph is owned
+
+        '''
+        if self.owned_nodes is None:
+            return list(self.agents_in_scope.values())
+
+        return self._strip_node_agent(True, None)
+
+    def set_activity_tracker(self, tracker):
+        '''Track the activity of the agents of the system, such that the
+        iteration of a step can be restricted to the active agents
+
+        Parameters
+        ----------
+        tracker : ActivityTracker
+            The tracker of the activity, or None to stop tracking
+
+        Notes
+        -----
+        The active nodes of a step are returned by `active_nodes`, which is
+        given as the subset of an iterator, for example::
+
+            active = ams.active_nodes()
+            for agent in ams.shuffle_nodes(True, len(active), False,
+                                           subset=active):
+
+        '''
+        self.activity = tracker
+        for agent in self.agents_in_scope.values():
+            self._attach_activity(agent)
+
+    def mark_active(self, agent_id=None, node=None, neighbours=False):
+        '''Mark agents as active in the next step, if activity is tracked
+
+        Parameters
+        ----------
+        agent_id : str, optional
+            The agent ID of an agent to mark
+        node : Node, optional
+            A node, the agent of which is marked
+        neighbours : bool, optional
+            If True, the agents of the neighbour nodes of the node, or of the
+            node of the agent, are marked as well
+
+        '''
+        if self.activity is None:
+            return
+
+        if node is None and not agent_id is None:
+            node = self.node_from_agent_id_[agent_id]
+        if node is None:
+            return
+
+        nodes = [node]
+        if neighbours:
+            nodes.extend(self.agents_graph[node])
+
+        for node_mark in nodes:
+            if not node_mark.agent_content is None:
+                self.activity.mark(node_mark.agent_content.agent_id_system)
+
+    def active_nodes(self, advance=True):
+        '''Return the nodes of the active agents of the step
+
+        Parameters
+        ----------
+        advance : bool, optional
+            If True, the activity tracker advances to the next step, which
+            should be done once per step. If False, the nodes of the active
+            agents of the current step are returned
+
+        Returns
+        -------
+        nodes : list
+            The nodes of the active agents, in the order of the nodes owned by
+            the system
+
+        Raises
+        ------
+        RuntimeError
+            If the activity of the system is not tracked
+
+        Notes
+        -----
+        The nodes are looked up from the agent IDs of the active agents, and
+        ordered by the positions of the nodes, which are cached, hence the
+        cost does not grow with the number of idle agents
+
+        '''
+        if self.activity is None:
+            raise RuntimeError('Activity of system %s is not tracked' %(self.name))
+
+        if advance:
+            active = self.activity.advance(self)
+        else:
+            active = self.activity.active
+
+        nodes = []
+        for agent_id in active:
+            node = self.node_from_agent_id_.get(agent_id)
+            if node is None:
+                continue
+            if not self._owned_set is None and not node in self._owned_set:
+                continue
+            nodes.append(node)
+
+        positions = self._node_positions(False)
+        if not all([node in positions for node in nodes]):
+            positions = self._node_positions(True)
+
+        return sorted(nodes, key=positions.__getitem__)
+
+    def _node_positions(self, rebuild):
+        '''Return the positions of the owned nodes in the order of iteration.
+        The positions are cached until the graph or the owned nodes are
+        replaced, or are rebuilt if so set, as when a node is missing
+
+        '''
+        source = self.agents_graph if self.owned_nodes is None \
+                 else self.owned_nodes
+        if rebuild or not self._node_position_of is source:
+            self._node_position = dict([(node, k) for k, node in enumerate(source)])
+            self._node_position_of = source
+
+        return self._node_position
+
     def shuffle_nodes(self, agents_only, max_iter, replace, subset=None):
         '''Shuffled iterator over agent graph nodes
 
@@ -509,7 +708,7 @@ class AgentManagementSystem(object):
             Nodes of the agent graph in deterministic order
 
         '''
-        return self.cycle_nodes(False, len(self.agents_graph))
+        return self.cycle_nodes(False, self.get_n_nodes())
 
     def get(self, key, get_node=False, get_agent=False, get_aux=False):
         '''Get a selection of objects associated with a given key
@@ -603,11 +802,17 @@ class AgentManagementSystem(object):
         node = self.node_from_agent_id_[key]
         node.agent_content = None
         del self.node_from_agent_id_[key]
+        self.topology_log.record('content', node)
 
         agent = self.agents_in_scope[key]
         agent.agent_id_system = None
+        agent._changed_agents = None
         del self.agents_in_scope[key]
 
+        if agent.inert:
+            self._inert_count.n_inert -= 1
+        agent._inert_count = None
+
     def cleanse_inert(self):
         '''Cleanse inert agents from the system, where inertness is defined as
         an agent attribute that typically is set by some automatic terminal
@@ -671,7 +876,8 @@ class AgentManagementSystem(object):
             Instance of a sampler to be added to the agent management system.
 
         '''
-        if isinstance(sampler, (AgentSampler, GraphSampler, EnvSampler)):
+        if isinstance(sampler, (AgentSampler, GraphSampler, EnvSampler,
+                                AggregateSampler)):
             self.sampler[sampler.name] = sampler
 
         else:
@@ -703,13 +909,59 @@ class AgentManagementSystem(object):
                             'in Agent System book keeping')
 
         if agent.agent_id_system is None:
-            agent.agent_id_system = str(uuid4())
+            agent.agent_id_system = self._new_agent_id()
 
         if agent.agent_id_system in self.agents_in_scope:
             raise KeyError('Duplicate agent ID encountered: ' + \
                            '%s' %(agent.agent_id_system))
 
         self.agents_in_scope[agent.agent_id_system] = agent
+        self._attach_inert_count(agent)
+        self._attach_activity(agent)
+
+    def _attach_inert_count(self, agent):
+        '''Attach the count of inert agents of the system to an agent, and
+        count the agent if inert
+
+        '''
+        agent._inert_count = self._inert_count
+        if agent.inert:
+            self._inert_count.n_inert += 1
+
+    def _attach_activity(self, agent):
+        '''Attach the changed agents of the activity tracker of the system to
+        an agent, if activity is tracked, and mark the agent active, since it
+        is new to the tracker
+
+        '''
+        if self.activity is None:
+            agent._changed_agents = None
+
+        else:
+            agent._changed_agents = self.activity._changed
+            self.activity.mark(agent.agent_id_system)
+
+    def _recount_inert(self):
+        '''Count the inert agents of the system anew, as when the agents in
+        scope are replaced other than by book keeping
+
+        '''
+        self._inert_count.n_inert = 0
+        for agent in self.agents_in_scope.values():
+            self._attach_inert_count(agent)
+
+    def _new_agent_id(self, rng=None):
+        '''Return a new agent ID, drawn from the stream of the system if the
+        system has random streams
+
+        '''
+        if rng is None and not self.random_streams is None:
+            rng = self.random_streams.stream(None)
+
+        if rng is None:
+            return str(uuid4())
+
+        return str(UUID(bytes=rng.bytes(16), version=4))
 
     def situate(self, agent, node):
         '''Join an agent to a node and add it to the system book keeping
@@ -725,6 +977,7 @@ class AgentManagementSystem(object):
         self.bookkeep(agent)
         node.agent_content = agent
         self.node_from_agent_id_[agent.agent_id_system] = node
+        self.topology_log.record('content', node)
 
     def sample(self, phrase, generation=0):
         '''Sample the agent management system according to a named sampler
@@ -784,6 +1037,9 @@ class AgentManagementSystem(object):
             if not agent_2 is None:
                 self.node_from_agent_id_[agent_2.agent_id_system] = node_1
 
+            self.topology_log.record('content', node_1)
+            self.topology_log.record('content', node_2)
+
         if switch_aux:
             aux_1 = node_1.aux_content
             aux_2 = node_2.aux_content
@@ -833,14 +1089,109 @@ class AgentManagementSystem(object):
                 raise RuntimeError('Compulsion %s is not in law book ' %(phrase) + \
                                    'for agent with ID %s' %(agent.agent_id_system))
 
-        did_it_compel = the_compulsion(agent.agent_id_system)
-        if self.strict_engine and (not did_it_compel is True):
-            raise did_it_compel
+        #
+        # Draws of the compulsion and of the functions of its map are made
+        # from the random stream of the agent
+        #
+        previous = self._enter_agent(agent.agent_id_system)
+        try:
+            did_it_compel = the_compulsion(agent.agent_id_system)
+            if self.strict_engine and (not did_it_compel is True):
+                raise did_it_compel
+
+            agent.apply_map(the_compulsion.scaffold_map_output)
 
-        agent.apply_map(the_compulsion.scaffold_map_output)
+        finally:
+            self._exit_agent(previous)
 
         return did_it_compel
 
+    def compel_leap(self, phrase, n_steps=1, subset=None):
+        '''Verb for the agent management system to execute a tau-leap
+        compulsion for a population of agents over a number of steps
+
+        Notes
+        -----
+        The steps are executed in leaps, see `TauLeapCompulsion`. In each leap
+        the probabilities of all agents are evaluated, the numbers of events
+        of all agents are drawn at once, and the map of the compulsion is
+        applied to the agents to which any event occurred. The result is
+        equivalent to compelling each agent once per step, up to the
+        approximation of the leaps
+
+        Parameters
+        ----------
+        phrase : str
+            Name of the tau-leap compulsion to execute
+        n_steps : int, optional
+            The number of steps to execute
+        subset : Iterable, optional
+            The nodes of the agents to compel. If None, the agents of all
+            nodes owned by the system
+
+        Returns
+        -------
+        n_events : int
+            The total number of events of all agents and steps
+
+        Raises
+        ------
+        KeyError
+            If system contains no compulsion with the phrase
+        TypeError
+            If the compulsion is not a tau-leap compulsion
+
+        '''
+        if not phrase in self.compulsion:
+            raise KeyError('Agent System lacks compulsion for %s' %(phrase))
+
+        the_compulsion = self.compulsion[phrase]
+        if not isinstance(the_compulsion, TauLeapCompulsion):
+            raise TypeError('Compulsion %s is not a tau-leap compulsion' %(phrase))
+
+        agents = self._strip_node_agent(True, subset)
+        if len(agents) == 0:
+            return 0
+
+        #
+        # Probabilities that are the same for all agents are evaluated once,
+        # and otherwise for each agent in each leap
+        #
+        probs_common = None
+        if not callable(the_compulsion.event_prob):
+            probs_common = np.array(the_compulsion.probabilities(None), dtype=float)
+            probs = np.broadcast_to(probs_common, (len(agents), len(probs_common)))
+
+        n_events = 0
+        n_remain = n_steps
+        while n_remain > 0:
+            if probs_common is None:
+                probs = np.array([the_compulsion.probabilities(agent.agent_id_system) \
+                                  for agent in agents], dtype=float)
+                p_max = probs.max()
+            else:
+                p_max = probs_common.max()
+            n_leap = the_compulsion.leap_length(p_max, n_remain)
+
+            counts = the_compulsion.draw_counts(probs, n_leap)
+            for k_agent in np.flatnonzero(counts.sum(axis=1)):
+                agent = agents[k_agent]
+                try:
+                    out_values = the_compulsion.engine(*counts[k_agent].tolist(),
+                                                       **the_compulsion.kwargs)
+                except Exception as err:
+                    if self.strict_engine:
+                        raise err
+                    continue
+
+                the_compulsion.scaffold_map_output.set_values(out_values)
+                agent.apply_map(the_compulsion.scaffold_map_output)
+
+            n_events += int(counts.sum())
+            n_remain -= n_leap
+
+        return n_events
+
     def mutate(self, agent, phrase, validate_lawbook=False):
         '''Verb for the agent management system to execute a Mutation or
         MultiMutation 
@@ -885,14 +1236,46 @@ class AgentManagementSystem(object):
                 raise RuntimeError('Compulsion %s is not in law book ' %(phrase) + \
                                    'for agent with ID %s' %(agent.agent_id_system))
 
-        did_it_mutate = the_mutation(agent.agent_id_system)
-        if self.strict_engine and (not did_it_mutate is True):
-            raise did_it_mutate
+        #
+        # Draws of the mutation and of the functions of its map, such as a
+        # Wiener step, are made from the random stream of the agent
+        #
+        previous = self._enter_agent(agent.agent_id_system)
+        try:
+            did_it_mutate = the_mutation(agent.agent_id_system)
+            if self.strict_engine and (not did_it_mutate is True):
+                raise did_it_mutate
+
+            agent.apply_map(the_mutation.scaffold_map_output)
 
-        agent.apply_map(the_mutation.scaffold_map_output)
+        finally:
+            self._exit_agent(previous)
 
         return did_it_mutate
 
+    def _enter_agent(self, agent_id):
+        '''Make an agent the acting agent of the random draws, with the random
+        streams of the system active if the system has streams
+
+        Returns
+        -------
+        previous : tuple
+            The active streams and acting agent before the call, to restore
+            with `_exit_agent`
+
+        '''
+        previous_streams = get_random_streams()
+        if not self.random_streams is None:
+            set_random_streams(self.random_streams)
+
+        return previous_streams, set_acting_agent(agent_id)
+
+    def _exit_agent(self, previous):
+        '''Restore the active streams and acting agent of `_enter_agent`'''
+
+        set_random_streams(previous[0])
+        set_acting_agent(previous[1])
+
     def engage_all_verbs(self, agent, validate_lawbook=False):
         '''Convenience function to apply all verbs to the given agent
 
@@ -998,21 +1381,331 @@ class AgentManagementSystem(object):
 
         the_mover.move_by(self)
 
+    def begin_sync(self, resolver='accumulate'):
+        '''Begin the compute phase of a synchronous update of the system
+
+        Parameters
+        ----------
+        resolver : str or callable, optional
+            The conflict resolver of writes staged for the same element of
+            shared content, unless a resolver is given with the write. See
+            `fjarrsyn.core.sync.get_resolver` for the options
+
+        Raises
+        ------
+        RuntimeError
+            If a synchronous update has already begun
+
+        Notes
+        -----
+        In the compute phase, the maps created by the organs of the agents and
+        by the laws of the system are deferred, hence the imprints of all
+        agents remain as they were at the beginning of the update, and every
+        agent reads the same frozen state regardless of the order in which the
+        agents are updated. Writes to shared content, such as the auxiliary
+        content of nodes, that are made through `stage_write` are staged,
+        such that the content remains frozen as well. The updates are applied
+        in `commit_sync`.
+
+        Direct changes of imprints or auxiliary content, as well as changes of
+        the topology, such as the addition or removal of agents, are not
+        deferred. Agents added to the system in the compute phase apply maps
+        immediately.
+
+        '''
+        if not self._sync is None:
+            raise RuntimeError('Synchronous update of system %s ' %(self.name) + \
+                               'has already begun')
+
+        agents = list(self.agents_in_scope.values())
+        for agent in agents:
+            agent.defer_maps()
+
+        self._sync = {'agents' : agents,
+                      'writes' : OrderedDict(),
+                      'resolver' : get_resolver(resolver)}
+
+    def stage_write(self, container, key, value, resolver=None, node=None):
+        '''Write a value to an element of shared content, staged until commit
+        if a synchronous update is in progress
+
+        Parameters
+        ----------
+        container
+            Object with item assignment that holds the element, such as a
+            dictionary of the auxiliary content of a node
+        key
+            The key of the element in the container
+        value
+            The value to write
+        resolver : str or callable, optional
+            The conflict resolver of the element, if other than the resolver
+            of the synchronous update
+        node : Node, optional
+            The node the content belongs to, such as the node of auxiliary
+            content. If activity is tracked, the agents of the node and of its
+            neighbour nodes are marked active
+
+        Notes
+        -----
+        Outside of a synchronous update the value is written immediately,
+        hence engines that write shared content through this method run both
+        in sequential and synchronous updates. A value that is computed as an
+        increment of the current value should be written with the resolver
+        `accumulate`, such that the increments of all agents are kept.
+
+        '''
+        if not node is None:
+            self.mark_active(node=node, neighbours=True)
+
+        if self._sync is None:
+            container[key] = value
+            return
+
+        staged = self._sync['writes'].setdefault((id(container), key),
+                                                 [container, key, resolver, []])
+        staged[3].append(value)
+
+    def commit_sync(self):
+        '''Commit a synchronous update, which applies the deferred maps of the
+        agents and resolves and writes the staged writes to shared content
+
+        Returns
+        -------
+        n_maps : int
+            The number of maps applied to the agents
+        n_conflicts : int
+            The number of elements of shared content with conflicting writes
+
+        Raises
+        ------
+        RuntimeError
+            If no synchronous update has begun
+
+        Notes
+        -----
+        The maps of an agent are applied in the order they were created, with
+        the random draws of the maps, if any, made from the stream of the
+        agent. The staged writes are resolved after the maps, in the order the
+        elements were first written. A write to an element without conflict is
+        written as is.
+
+        '''
+        if self._sync is None:
+            raise RuntimeError('No synchronous update of system ' + \
+                               '%s to commit' %(self.name))
+
+        sync = self._sync
+        self._sync = None
+
+        n_maps = 0
+        for agent in sync['agents']:
+            if not agent.agent_id_system in self.agents_in_scope:
+                agent.pending_maps = None
+                continue
+
+            previous_agent = set_acting_agent(agent.agent_id_system)
+            try:
+                n_maps += agent.commit_maps()
+            finally:
+                set_acting_agent(previous_agent)
+
+        n_conflicts = 0
+        for container, key, resolver, values in sync['writes'].values():
+            if len(values) == 1:
+                container[key] = values[0]
+
+            else:
+                if resolver is None:
+                    resolver = sync['resolver']
+                else:
+                    resolver = get_resolver(resolver)
+                container[key] = resolver(container[key], values)
+                n_conflicts += 1
+
+        return n_maps, n_conflicts
+
+    def abort_sync(self):
+        '''Abort a synchronous update, which discards the deferred maps of the
+        agents and the staged writes to shared content
+
+        '''
+        if self._sync is None:
+            return
+
+        for agent in self._sync['agents']:
+            agent.pending_maps = None
+
+        self._sync = None
+
+    def checkpoint(self, path, step=None):
+        '''Write the state of the system to a binary checkpoint file, from
+        which it can be restored
+
+        Parameters
+        ----------
+        path : str
+            Path to the file. The extension `.npz` is appended if not present
+        step : int, optional
+            The step of the simulation at which the checkpoint is made, which
+            is returned on restore
+
+        Notes
+        -----
+        The checkpoint contains the names, IDs, ticks and imprints of the
+        agents, the topology of the system graph, the attributes and auxiliary
+        content of the nodes, the common environment, the law book, the
+        state of the random number generator and the seed of the random
+        streams. Imprint elements of a single
+        numeric type across agents are stored as arrays, other values are
+        pickled. The laws, movers, samplers and the organs of the agents are
+        not stored, since they are defined by the code that creates the system.
+
+        '''
+        write_checkpoint(self, path, step)
+
+    def restore(self, path, agent_factory=None):
+        '''Restore the state of the system from a binary checkpoint file
+
+        Parameters
+        ----------
+        path : str
+            Path to the checkpoint file
+        agent_factory : callable, optional
+            Function that receives the name and class path of an agent of the
+            checkpoint and returns a new Agent. It is used for agents that
+            cannot be matched to an agent of the system, see Notes
+
+        Returns
+        -------
+        step : int
+            The step given at checkpoint, or None
+
+        Notes
+        -----
+        The agents of the checkpoint are matched to the agents of the system
+        by ID. Agents without a match by ID are matched to the remaining
+        agents of the system of the same class, in order, such that a system
+        created anew by the code that created the checkpointed system is
+        restored by setting the state of existing agents. Agents of the
+        checkpoint that remain are created by the agent factory, or as a deep
+        copy of an agent of the same class in the system. Agents of the system
+        not matched are removed.
+
+        The changes of the restore are not recorded in the topology log,
+        hence a graph sampler in diff mode should be created anew after a
+        restore.
+
+        '''
+        return read_checkpoint(self, path, agent_factory)
+
+    def set_random_seed(self, seed, step=0, reassign_ids=True):
+        '''Seed counter-based random streams for the system, which are used
+        for the draws of the instructors and system iterators
+
+        Parameters
+        ----------
+        seed : int
+            The seed of the streams. If None, the streams of the system are
+            removed and draws are made from the global `numpy.random` state
+        step : int, optional
+            The step of the simulation the streams start at
+        reassign_ids : bool, optional
+            If True, the agents of the system are given new IDs drawn from
+            the streams, in the order of the system book keeping, see Notes
+
+        Notes
+        -----
+        With random streams, the draws on behalf of an agent, such as the
+        attempts of its mutations, are made from a stream keyed on the seed,
+        the agent ID and the step, hence they do not depend on the order in
+        which agents are updated. Draws of the system iterators are made from
+        the stream of the system. The step is advanced by the simulation
+        runners. The streams are active only while the system is propagated
+        by a runner, or one of its laws is executed, such that the draws of
+        other systems, with or without streams, are not affected. Agent IDs
+        are part of the key, and by default random, hence agent IDs are
+        reassigned from the streams on seeding, along with the law book and
+        the tracked activity keyed on them, and agents added to the system
+        later are given IDs from the stream of the system. IDs should not be
+        reassigned for a system restored from a checkpoint, since its agents
+        already have the IDs of the checkpointed system.
+
+        '''
+        if seed is None:
+            self.random_streams = None
+            return
+
+        self.random_streams = RandomStreams(seed, step)
+
+        if reassign_ids:
+            rng = self.random_streams.generator(None, channel='agent_id')
+            agents = list(self.agents_in_scope.values())
+            nodes = [self.node_from_agent_id_.get(agent.agent_id_system) \
+                     for agent in agents]
+
+            id_map = {}
+            lawbook = {}
+            self.agents_in_scope = OrderedDict()
+            self.node_from_agent_id_ = {}
+            for agent, node in zip(agents, nodes):
+                agent_id_old = agent.agent_id_system
+                agent.agent_id_system = self._new_agent_id(rng)
+                id_map[agent_id_old] = agent.agent_id_system
+
+                self.agents_in_scope[agent.agent_id_system] = agent
+                if not node is None:
+                    self.node_from_agent_id_[agent.agent_id_system] = node
+                if agent_id_old in self.lawbook:
+                    lawbook[agent.agent_id_system] = self.lawbook.pop(agent_id_old)
+
+            lawbook.update(self.lawbook)
+            self.lawbook = lawbook
+
+            if not self.activity is None:
+                self.activity.rename_agents(id_map)
+
     def get_n_nodes(self):
-        '''Return number of nodes in agent graph'''
+        '''Return number of nodes in agent graph, or of the owned nodes if
+        the system is a partition
+
+        '''
+        if not self.owned_nodes is None:
+            return len(self.owned_nodes)
 
         return nx.number_of_nodes(self.agents_graph)
 
     def get_n_edges(self):
-        '''Return number of edges in agent graph'''
+        '''Return number of edges in agent graph, or of the edges with the
+        first node owned if the system is a partition
+
+        '''
+        if not self.owned_nodes is None:
+            return len(self._strip_edge_agent(False, None))
 
         return nx.number_of_edges(self.agents_graph)
 
     def get_n_agents(self):
-        '''Return number of agents in the system'''
+        '''Return number of agents in the system, or of the agents of the
+        owned nodes if the system is a partition
+
+        '''
+        if not self.owned_nodes is None:
+            return len(self._strip_node_agent(True, None))
 
         return len(self.agents_in_scope)
 
+    def get_n_inert(self):
+        '''Return number of inert agents in the system, which is counted as
+        agents change inertness, hence without a scan of the agents. If the
+        system is a partition, the agents of the owned nodes are scanned
+
+        '''
+        if not self.owned_nodes is None:
+            return sum([agent.inert for agent in self.owned_agents()])
+
+        return self._inert_count.n_inert
+
     def __len__(self):
         '''Return number of agents in the system'''
 
@@ -1025,6 +1718,33 @@ class AgentManagementSystem(object):
         self.name = name
         self.strict_engine = strict_engine
 
+        #
+        # Counter-based random streams of the system, none until seeded, in
+        # which case draws are made from the global random state
+        #
+        self.random_streams = None
+
+        #
+        # State of a synchronous update, none outside of one
+        #
+        self._sync = None
+
+        #
+        # Nodes owned by the system if it is a partition of a larger system
+        #
+        self.owned_nodes = None
+        self._owned_set = None
+        self._visible_set = None
+
+        #
+        # Tracker of the active agents, none unless activity is tracked, and
+        # the cached positions of the nodes by which the active nodes are
+        # ordered
+        #
+        self.activity = None
+        self._node_position = {}
+        self._node_position_of = None
+
         #
         # The agent to agent network relation is defined, which is a complete
         # graph in case nothing specific is given.
@@ -1063,12 +1783,19 @@ class AgentManagementSystem(object):
 
         self.agents_graph.name = 'Agents Graph of System %s' %(self.name)
 
+        #
+        # Log of changes to topology and node content, which records events
+        # only once a reader, such as a graph sampler in diff mode, registers
+        #
+        self.topology_log = TopologyLog()
+
         self.common_env = common_env
 
         #
         # The agents are added to the system book keeping
         #
         self.agents_in_scope = OrderedDict()
+        self._inert_count = _InertCount()
         for agent in agents:
             self.bookkeep(agent)
 
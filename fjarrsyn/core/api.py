@@ -9,6 +9,7 @@ from fjarrsyn.core.instructor import (
     Interpreter,
     Cortex,
     Compulsion,
+    TauLeapCompulsion,
     Mutation,
     MultiMutation)
 
@@ -16,9 +17,13 @@ from fjarrsyn.core.agent import Agent, Socket
 
 from fjarrsyn.core.agent_ms import AgentManagementSystem
 
+from fjarrsyn.core.activity import ActivityTracker
+
 from fjarrsyn.core.graph import (
     Node,
-    node_maker)
+    node_maker,
+    graph_to_csr,
+    graph_from_csr)
 
 from fjarrsyn.core.message import (
     Buzz,
@@ -31,6 +36,11 @@ from fjarrsyn.core.message import (
 
 from fjarrsyn.core.mover import Mover
 
+from fjarrsyn.core.rng import (
+    RandomStreams,
+    BufferedRandom,
+    set_random_buffer)
+
 from fjarrsyn.core.policy import (
     Plan,
     Clause,
@@ -8,6 +8,46 @@ from collections import OrderedDict
 class EmptyFlashError(Exception):
     pass
 
+class _RevisionClock(object):
+    '''Global counter of writes to imprints. Every write that changes the value
+    of an imprint element advances the clock, and the element is stamped with
+    the new clock value. Comparison of the revision of an element to a clock
+    value recorded earlier therefore determines if the element has changed
+    since then
+
+    '''
+    def tick(self):
+        '''Advance the clock and return the new value'''
+
+        self.value += 1
+        return self.value
+
+    def __init__(self):
+
+        self.value = 0
+
+REVISION_CLOCK = _RevisionClock()
+
+def _differs(value_old, value_new):
+    '''Determine if a new value differs from an old value. Values for which
+    equality is not a boolean, such as arrays, are compared by identity. A NaN
+    does not differ from a NaN, such that an element that remains NaN is not
+    changed
+
+    '''
+    if value_old is value_new:
+        return False
+
+    try:
+        if bool(value_old == value_new):
+            return False
+
+        return not (bool(value_old != value_old) and \
+                    bool(value_new != value_new))
+
+    except (TypeError, ValueError):
+        return True
+
 class _Array(object):
     '''The parent class of all forms of data and information passing within and
     to and from the exterior of the agent. In applications the appropriate
@@ -135,7 +175,7 @@ class _Array(object):
             If a key is given that was not part of the initilization
 
         '''
-        if not key in self.keys():
+        if not key in self._items:
             raise TypeError('Array semantics is immutable, and new keys ' + \
                             'cannot be added: %s' %(key))
 
@@ -179,15 +219,77 @@ class _Imprint(_Array):
         '''
         return list(self._items.values())
 
+    def revision(self, key):
+        '''Return the revision of an element of the imprint, which is the value
+        of the global revision clock at the latest change of the element
+
+        Parameters
+        ----------
+        key
+            The key of the element
+
+        Returns
+        -------
+        revision : int
+            The revision of the element, zero if the element has not changed
+            since initialization
+
+        '''
+        return self._revisions.get(key, 0)
+
+    def set_values(self, value_container):
+        '''Set values of the imprint object, and advance the revision of the
+        elements that change value. See `_Array.set_values` for details
+
+        '''
+        values_old = list(self._items.values())
+        super().set_values(value_container)
+
+        for key, value_old in zip(self._items.keys(), values_old):
+            if _differs(value_old, self._items[key]):
+                self._revise(key)
+
     def __getitem__(self, key):
         '''Return the value of the array associated with a key.'''
 
         return self._items[key]
 
+    def __setitem__(self, key, value):
+        '''Set the value of the imprint associated with the key, and advance
+        the revision of the element if the value changes. See
+        `_Array.__setitem__` for details
+
+        '''
+        value_old = self._items.get(key)
+        super().__setitem__(key, value)
+
+        if _differs(value_old, value):
+            self._revise(key)
+
+    def _revise(self, key):
+        '''Advance the revision of an element that changed value, and add the
+        agent of the imprint to the changed agents of the activity tracker the
+        agent is attached to, if any
+
+        '''
+        self._revisions[key] = self.last_revision = REVISION_CLOCK.tick()
+
+        owner = self._owner
+        if not owner is None and not owner._changed_agents is None:
+            owner._changed_agents.add(owner.agent_id_system)
+
     def __init__(self, imprint_name, imprint_semantics):
 
         super().__init__(imprint_name, imprint_semantics)
 
+        self._revisions = {}
+        self.last_revision = 0
+
+        #
+        # The agent the imprint is set to, which is set by the agent
+        #
+        self._owner = None
+
 class _Flash(_Array):
     '''A child class for _Array which handles transient information that cannot
     be accessed non-destructively
@@ -0,0 +1,369 @@
+'''Binary checkpoint and restore of the state of an agent management system.
+The imprints of the agents are stored as columnar arrays, one per imprint
+element, and the topology of the system graph in compressed sparse row
+format. Objects without an array representation, such as the auxiliary
+content of nodes, are pickled into a single binary field of the checkpoint
+
+'''
+from collections import OrderedDict
+import functools
+import gc
+import json
+import pickle
+
+import numpy as np
+import numpy.random
+
+from fjarrsyn.core.constants import AGENT_IMPRINTS
+from fjarrsyn.core.graph import Node, graph_to_csr, graph_from_csr
+
+CHECKPOINT_VERSION = 1
+'''Version of the checkpoint layout, incremented on incompatible changes'''
+
+_NUMERIC_TYPES = OrderedDict([(bool, np.bool_), (int, np.int64),
+                              (float, np.float64)])
+
+def _class_path(obj):
+    '''Return the module and qualified name of the class of an object'''
+
+    return type(obj).__module__ + '.' + type(obj).__qualname__
+
+def _imprints_of(agent):
+    '''Iterate over the imprints of an agent as tuples of imprint type and
+    imprint object
+
+    '''
+    for imprint_type in sorted(AGENT_IMPRINTS):
+        imprint = getattr(agent, imprint_type)
+        if imprint is None:
+            continue
+
+        if imprint_type == 'belief':
+            for array_name in imprint:
+                yield imprint_type, imprint[array_name]
+
+        else:
+            yield imprint_type, imprint
+
+def _imprint_of(agent, imprint_type, array_name):
+    '''Return the imprint of an agent of a type and name
+
+    Raises
+    ------
+    KeyError
+        If the agent lacks the imprint
+
+    '''
+    imprint = getattr(agent, imprint_type)
+    if imprint_type == 'belief':
+        imprint = imprint.get(array_name)
+
+    elif not imprint is None and imprint.name != array_name:
+        imprint = None
+
+    if imprint is None:
+        raise KeyError('Agent %s lacks %s %s ' %(agent.name, imprint_type,
+                                                 array_name) + \
+                       'present in checkpoint')
+
+    return imprint
+
+def _column_array(values):
+    '''Convert the values of an imprint element to a numpy array, if all
+    values are of the same numeric type, otherwise return None
+
+    '''
+    value_types = set([type(value) for value in values])
+    if len(value_types) == 1:
+        dtype = _NUMERIC_TYPES.get(value_types.pop())
+        if not dtype is None:
+            return np.array(values, dtype=dtype)
+
+    return None
+
+def _without_gc(func):
+    '''Decorator that suspends the cyclic garbage collector while the function
+    executes. Creating or traversing the many objects of a large system
+    otherwise triggers repeated full collections, which take most of the time
+
+    '''
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if enabled:
+                gc.enable()
+
+    return wrapper
+
+def write_checkpoint(ams, path, step=None):
+    '''Write the state of an agent management system to a binary file
+
+    Parameters
+    ----------
+    ams : AgentManagementSystem
+        The agent management system to checkpoint
+    path : str
+        Path to the file. The extension `.npz` is appended if not present
+    step : int, optional
+        The step of the simulation at which the checkpoint is made, which is
+        returned on restore
+
+    '''
+    save_snapshot(snapshot(ams, step), path)
+
+def save_snapshot(arrays, path):
+    '''Write a snapshot of the state of an agent management system to a
+    binary file
+
+    Parameters
+    ----------
+    arrays : dict
+        The snapshot, as returned by `snapshot`
+    path : str or file
+        Path to the file, to which the extension `.npz` is appended if not
+        present, or a file object opened for binary writing
+
+    '''
+    np.savez(path, **arrays)
+
+@_without_gc
+def snapshot(ams, step=None):
+    '''Serialize the state of an agent management system in memory, as the
+    arrays of a checkpoint
+
+    Parameters
+    ----------
+    ams : AgentManagementSystem
+        The agent management system to serialize
+    step : int, optional
+        The step of the simulation at which the snapshot is made
+
+    Returns
+    -------
+    arrays : dict
+        The arrays of the checkpoint keyed on name. The arrays share no data
+        with the system, hence the system can change while the snapshot is
+        written to disk, for example on another thread
+
+    '''
+    agents = list(ams.agents_in_scope.values())
+    nodes, indptr, indices = graph_to_csr(ams.agents_graph)
+    row_of_node = dict([(node, k) for k, node in enumerate(nodes)])
+
+    #
+    # The imprints are collected as one column per imprint element, with the
+    # rows of the agents that hold the element
+    #
+    columns = OrderedDict()
+    for k_agent, agent in enumerate(agents):
+        for imprint_type, imprint in _imprints_of(agent):
+            for key in imprint.keys():
+                rows, values = columns.setdefault((imprint_type, imprint.name,
+                                                   key), ([], []))
+                rows.append(k_agent)
+                values.append(imprint[key])
+
+    arrays = {}
+    column_meta = []
+    column_objects = []
+    for k_column, ((imprint_type, array_name, key), (rows, values)) in \
+        enumerate(columns.items()):
+
+        values_array = _column_array(values)
+        if values_array is None:
+            column_objects.append(values)
+            values_array = np.array([len(column_objects) - 1])
+            packed = True
+        else:
+            packed = False
+
+        arrays['column_%s_rows' %(str(k_column))] = np.array(rows, dtype=np.int64)
+        arrays['column_%s_values' %(str(k_column))] = values_array
+        column_meta.append([imprint_type, array_name, key, packed])
+
+    node_content = []
+    for node in nodes:
+        attributes = dict([(key, value) for key, value in vars(node).items() \
+                           if key != 'agent_content'])
+        node_content.append(attributes)
+
+    objects = {'nodes' : node_content,
+               'agent_names' : [agent.name for agent in agents],
+               'column_objects' : column_objects,
+               'lawbook' : ams.lawbook,
+               'common_env' : ams.common_env,
+               'rng_state' : numpy.random.get_state(),
+               'random_streams_seed' : None if ams.random_streams is None \
+                                       else ams.random_streams.seed}
+
+    meta = {'version' : CHECKPOINT_VERSION,
+            'name' : ams.name,
+            'step' : step,
+            'directed' : ams.agents_graph.is_directed(),
+            'columns' : column_meta}
+
+    arrays.update(
+        meta=np.array(json.dumps(meta)),
+        objects=np.frombuffer(pickle.dumps(objects,
+                                           protocol=pickle.HIGHEST_PROTOCOL),
+                              dtype=np.uint8),
+        agent_ids=np.array([agent.agent_id_system for agent in agents],
+                           dtype=str),
+        agent_classes=np.array([_class_path(agent) for agent in agents],
+                               dtype=str),
+        agent_node=np.array([row_of_node[ams.node_from_agent_id_[agent.agent_id_system]] \
+                             for agent in agents], dtype=np.int64),
+        agent_ticks=np.array([agent.ticks for agent in agents], dtype=np.int64),
+        agent_inert=np.array([agent.inert for agent in agents], dtype=np.bool_),
+        indptr=indptr, indices=indices)
+
+    return arrays
+
+@_without_gc
+def read_checkpoint(ams, path, agent_factory=None):
+    '''Restore the state of an agent management system from a binary file
+
+    Parameters
+    ----------
+    ams : AgentManagementSystem
+        The agent management system to restore the state into
+    path : str
+        Path to the file as written by `write_checkpoint`
+    agent_factory : callable, optional
+        Function that receives the name and class path of an agent of the
+        checkpoint and returns a new Agent, used for agents of the checkpoint
+        that cannot be matched to an agent of the system. If not given, such
+        agents are created as deep copies of an agent of the same class in
+        the system
+
+    Returns
+    -------
+    step : int
+        The step given at checkpoint, or None
+
+    Raises
+    ------
+    ValueError
+        If the checkpoint is of an unknown version
+    RuntimeError
+        If an agent of the checkpoint cannot be matched or created
+
+    '''
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(data['meta'].item())
+        if meta['version'] != CHECKPOINT_VERSION:
+            raise ValueError('Checkpoint of unknown version %s' \
+                             %(str(meta['version'])))
+
+        objects = pickle.loads(data['objects'].tobytes())
+        agent_ids = data['agent_ids'].tolist()
+        agent_classes = data['agent_classes'].tolist()
+        agent_node = data['agent_node'].tolist()
+        agent_ticks = data['agent_ticks'].tolist()
+        agent_inert = data['agent_inert'].tolist()
+        indptr = data['indptr']
+        indices = data['indices']
+        columns = []
+        for k_column, (imprint_type, array_name, key, packed) in \
+            enumerate(meta['columns']):
+
+            rows = data['column_%s_rows' %(str(k_column))].tolist()
+            values = data['column_%s_values' %(str(k_column))].tolist()
+            if packed:
+                values = objects['column_objects'][values[0]]
+            columns.append((imprint_type, array_name, key, rows, values))
+
+    #
+    # Agents of the checkpoint are matched to agents of the system by ID, and
+    # otherwise to unmatched agents of the same class in the order of the
+    # system, such that a system rebuilt by the code that created it is
+    # restored without creating agents
+    #
+    agents_current = ams.agents_in_scope
+    unmatched = OrderedDict()
+    ids_stored = set(agent_ids)
+    for agent_id, agent in agents_current.items():
+        if not agent_id in ids_stored:
+            unmatched.setdefault(_class_path(agent), []).append(agent)
+    for class_agents in unmatched.values():
+        class_agents.reverse()
+    prototypes = {}
+
+    agents = []
+    for agent_id, agent_name, agent_class in zip(agent_ids,
+                                                 objects['agent_names'],
+                                                 agent_classes):
+        agent = agents_current.get(agent_id)
+        if agent is None:
+            if len(unmatched.get(agent_class, [])) > 0:
+                agent = unmatched[agent_class].pop()
+
+            elif not agent_factory is None:
+                agent = agent_factory(agent_name, agent_class)
+
+            else:
+                if len(prototypes) == 0:
+                    prototypes = dict([(_class_path(agent), agent) for agent \
+                                       in reversed(list(agents_current.values()))])
+                if not agent_class in prototypes:
+                    raise RuntimeError('No agent of class %s in ' %(agent_class) + \
+                                       'system to restore agent %s from' %(agent_name))
+
+                agent = prototypes[agent_class].deepcopy()
+
+        agent.name = agent_name
+        agent.agent_id_system = agent_id
+        agents.append(agent)
+
+    for class_agents in unmatched.values():
+        for agent in class_agents:
+            agent.agent_id_system = None
+            agent._inert_count = None
+            agent._changed_agents = None
+
+    for agent, ticks, inert in zip(agents, agent_ticks, agent_inert):
+        agent.ticks = ticks
+        agent.inert = inert
+
+    for imprint_type, array_name, key, rows, values in columns:
+        for k_agent, value in zip(rows, values):
+            _imprint_of(agents[k_agent], imprint_type, array_name)[key] = value
+
+    #
+    # The nodes are created anew, with the attributes they had at checkpoint
+    #
+    nodes = []
+    for attributes in objects['nodes']:
+        node = Node.__new__(Node)
+        node.__dict__.update(attributes)
+        node.agent_content = None
+        nodes.append(node)
+
+    for agent, k_node in zip(agents, agent_node):
+        nodes[k_node].agent_content = agent
+
+    ams.agents_graph = graph_from_csr(nodes, indptr, indices,
+                                      directed=meta['directed'])
+    ams.agents_graph.name = 'Agents Graph of System %s' %(ams.name)
+
+    ams.agents_in_scope = OrderedDict([(agent.agent_id_system, agent) \
+                                       for agent in agents])
+    ams._recount_inert()
+    for agent in agents:
+        ams._attach_activity(agent)
+    ams.node_from_agent_id_ = dict([(agent.agent_id_system, nodes[k_node]) \
+                                    for agent, k_node in zip(agents, agent_node)])
+    ams.lawbook = objects['lawbook']
+    ams.common_env = objects['common_env']
+    numpy.random.set_state(objects['rng_state'])
+    streams_seed = objects.get('random_streams_seed')
+    if streams_seed is None:
+        ams.set_random_seed(None)
+    else:
+        ams.set_random_seed(streams_seed, meta['step'] or 0, reassign_ids=False)
+
+    return meta['step']
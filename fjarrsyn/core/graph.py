@@ -3,6 +3,11 @@ graph. The object should be considered to be replaced with namedtuple at some
 point, once the default field has matured
 
 '''
+import itertools
+
+import numpy as np
+import networkx as nx
+
 class Node(object):
     '''Basic object to store agent and auxiliary content in the agent system.
 
@@ -44,6 +49,118 @@ class Node(object):
         for key, item in other_attributes:
             setattr(self, key, item)
 
+class TopologyLog(object):
+    '''Log of changes to the topology and node content of the graph of an
+    agent system. Events are only recorded while at least one reader is
+    registered, and events that all registered readers have read are
+    discarded
+
+    Notes
+    -----
+    The events are tuples of the form (<event>, <node 1>, <node 2>), where the
+    event is one of:
+
+    * `edge_add` : An edge between the two nodes was added
+    * `edge_remove` : The edge between the two nodes was removed
+    * `content` : The agent content of the first node changed, the second node
+                  is None
+
+    Only changes made through the methods of the agent management system are
+    recorded, not direct operations on the graph object.
+
+    '''
+    def record(self, event, node_1, node_2=None):
+        '''Record an event, if any reader is registered
+
+        Parameters
+        ----------
+        event : str
+            The type of event
+        node_1 : Node
+            The first node of the event
+        node_2 : Node, optional
+            The second node of the event, if any
+
+        '''
+        if len(self._cursors) > 0:
+            self._events.append((event, node_1, node_2))
+
+    def register(self):
+        '''Register a reader of the log, which reads events recorded after
+        the registration
+
+        Returns
+        -------
+        cursor : int
+            Identifier of the reader
+
+        '''
+        cursor = next(self._cursor_ids)
+        self._cursors[cursor] = self._offset + len(self._events)
+
+        return cursor
+
+    def unregister(self, cursor):
+        '''Remove a reader of the log
+
+        Parameters
+        ----------
+        cursor : int
+            Identifier of the reader
+
+        '''
+        del self._cursors[cursor]
+        self._trim()
+
+    def read(self, cursor):
+        '''Read the events recorded since the previous read of a reader
+
+        Parameters
+        ----------
+        cursor : int
+            Identifier of the reader
+
+        Returns
+        -------
+        events : list
+            The events in the order they were recorded
+
+        Raises
+        ------
+        KeyError
+            If the reader is not registered
+
+        '''
+        position = self._cursors[cursor]
+        events = self._events[position - self._offset:]
+        self._cursors[cursor] = self._offset + len(self._events)
+        self._trim()
+
+        return events
+
+    def _trim(self):
+        '''Discard the events all readers have read'''
+
+        if len(self._cursors) == 0:
+            position = self._offset + len(self._events)
+        else:
+            position = min(self._cursors.values())
+
+        del self._events[:position - self._offset]
+        self._offset = position
+
+    def __len__(self):
+        '''Return the number of events held by the log'''
+
+        return len(self._events)
+
+    def __init__(self):
+
+        self._events = []
+        self._offset = 0
+        self._cursors = {}
+        self._cursor_ids = itertools.count()
+
 def node_maker(agents, envs=None, node_names=None, node_attributes=None):
     '''Convenience function to place a collection of agents and environments in nodes
 
@@ -86,4 +203,89 @@ def node_maker(agents, envs=None, node_names=None, node_attributes=None):
     for agent, env, name, attributes in zip(agents, envs_iter, node_names_iter, node_attributes_iter):
         ret.append(Node(name, agent, env, attributes))
 
-    return ret
\ No newline at end of file
+    return ret
+
+
+def graph_to_csr(graph):
+    '''Represent the topology of a network in compressed sparse row format
+
+    Parameters
+    ----------
+    graph
+        The network, from `networkx` library
+
+    Returns
+    -------
+    nodes : list
+        The nodes of the network, in the order of the rows
+    indptr : numpy array
+        The row pointers, such that the neighbours of the node of row `k` are
+        at positions `indptr[k]` to `indptr[k + 1]` of `indices`
+    indices : numpy array
+        The row numbers of the neighbours of each node
+
+    Notes
+    -----
+    For an undirected network each edge is present in the rows of both of its
+    nodes, while for a directed network only in the row of its source node.
+    Edge attributes are not included.
+
+    '''
+    nodes = list(graph.nodes)
+    row_of_node = dict([(node, k) for k, node in enumerate(nodes)])
+
+    adjacency = graph.succ if graph.is_directed() else graph.adj
+    indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+    indices = []
+    for k_row, node in enumerate(nodes):
+        neighbours = adjacency[node]
+        indices.extend([row_of_node[neighbour] for neighbour in neighbours])
+        indptr[k_row + 1] = len(indices)
+
+    return nodes, indptr, np.array(indices, dtype=np.int64)
+
+def graph_from_csr(nodes, indptr, indices, directed=False):
+    '''Create a network from a topology in compressed sparse row format
+
+    Parameters
+    ----------
+    nodes : list
+        The nodes of the network, in the order of the rows. Can be any
+        hashable objects, such as labels or Node objects
+    indptr : numpy array
+        The row pointers, see `graph_to_csr`
+    indices : numpy array
+        The row numbers of the neighbours of each node, see `graph_to_csr`
+    directed : bool, optional
+        If True, a directed network is created
+
+    Returns
+    -------
+    graph
+        The network, from `networkx` library
+
+    Raises
+    ------
+    ValueError
+        If the number of nodes and row pointers are inconsistent
+
+    '''
+    nodes = list(nodes)
+    indptr = np.asarray(indptr)
+    indices = np.asarray(indices)
+    if len(indptr) != len(nodes) + 1:
+        raise ValueError('Row pointers of length %s ' %(str(len(indptr))) + \
+                         'inconsistent with %s nodes' %(str(len(nodes))))
+
+    rows = np.repeat(np.arange(len(nodes)), np.diff(indptr))
+    if not directed:
+        keep = rows <= indices
+        rows = rows[keep]
+        indices = indices[keep]
+
+    graph = nx.DiGraph() if directed else nx.Graph()
+    graph.add_nodes_from(nodes)
+    graph.add_edges_from([(nodes[k1], nodes[k2]) for k1, k2 in \
+                          zip(rows.tolist(), indices.tolist())])
+
+    return graph
@@ -13,6 +13,8 @@ from fjarrsyn.core.scaffold_map import ResourceMap, EssenceMap, \
 from fjarrsyn.core.message import Buzz, Direction, Feature, \
                          Belief, Resource, Essence, \
                          MessageOperator
+from fjarrsyn.core.rng import draw_uniform, draw_binomial, draw_poisson, \
+                              draw_integers
 
 class _Instructor(object):
     '''Base class for all instructors. Common attributes are defined and type
@@ -825,6 +827,212 @@ class Compulsion(_Instructor):
 
         self.agent_id_to_engine = agent_id_to_engine
 
+def _counts_as_values(*counts):
+    '''Return the numbers of events as the values of the map of a tau-leap
+    compulsion
+
+    '''
+    return counts
+
+class TauLeapCompulsion(Compulsion):
+    '''Compulsion of events that occur to each agent independently and with
+    a small probability per step, which for a population of agents can be
+    executed over many steps at once by tau-leaping
+
+    Parameters
+    ----------
+    compel_name : str
+        Name of compulsion
+    event_prob : float, Iterable or callable
+        The probability per step of the event, or an iterable of the
+        probabilities of several independent types of event, or a function
+        that receives the agent ID and returns either
+    resource_map : ResourceMap or MapCollection
+        Map with defined semantics to act on agent resources
+    event_func : callable, optional
+        Function that receives the number of events of each type that
+        occurred to an agent and returns the values of the resource map. If
+        not given, the numbers of events are the values of the map
+    epsilon : float, optional
+        Error control of the leaps. A leap spans at most as many steps as
+        keeps the expected number of events of an agent within the leap at or
+        below this value
+    distribution : str, optional
+        The distribution of the numbers of events of a leap, either
+        `binomial`, which is exact for probabilities that are constant within
+        the leap, or `poisson`, for which the events of a constant
+        probability are drawn in aggregate for the population and distributed
+        to the agents, at a cost proportional to the number of events rather
+        than the number of agents
+    max_leap : int, optional
+        The maximum number of steps of a leap
+
+    Raises
+    ------
+    TypeError
+        If the resource map is not an instance of ResourceMap or MapCollection
+    ValueError
+        If the distribution is unknown, a probability is not between 0.0 and
+        1.0, or the error control is not positive
+
+    Notes
+    -----
+    Called for an agent, see `AgentManagementSystem.compel`, the compulsion
+    executes one step, in which each type of event occurs with its
+    probability. Executed for a population of agents over a number of steps,
+    see `AgentManagementSystem.compel_leap`, the numbers of events of each
+    agent within a leap are drawn at once, and the map of an agent is applied
+    once per leap and only if any event occurred to the agent. The agents
+    without events are not touched, which for small probabilities are most
+    agents.
+
+    The approximation of a leap is that the probabilities, which may depend
+    on the state of the agent, are constant within the leap, and that the
+    effect of several events of the leap is the effect of the event function
+    for their number. Leaps that are short enough to make more than one event
+    per agent unlikely, as set by `epsilon`, keep the error small.
+
+    '''
+    def __call__(self, agent_id):
+        '''Execute one step of the events of an agent and populate the output
+
+        Parameters
+        ----------
+        agent_id : str
+            The agent ID for the agent that is compelled
+
+        Returns
+        -------
+        success
+            If execution of engine successful, return value is True. If
+            execution of engine created Exception, that Exception is returned
+
+        '''
+        counts = [int(draw_uniform(agent_id) < p) \
+                  for p in self.probabilities(agent_id)]
+
+        try:
+            out_values = self.engine(*counts, **self.kwargs)
+        except Exception as err:
+            return err
+
+        self.scaffold_map_output.set_values(out_values)
+
+        return True
+
+    def probabilities(self, agent_id):
+        '''Return the probabilities per step of the types of event of an
+        agent
+
+        Parameters
+        ----------
+        agent_id : str
+            The agent ID
+
+        Returns
+        -------
+        probs : tuple
+            The probability of each type of event
+
+        Raises
+        ------
+        ValueError
+            If a probability is not between 0.0 and 1.0
+
+        '''
+        probs = self.event_prob
+        if callable(probs):
+            probs = probs(agent_id)
+
+        if not isinstance(probs, Iterable):
+            probs = (probs,)
+
+        probs = tuple(probs)
+        if not all([0.0 <= p <= 1.0 for p in probs]):
+            raise ValueError('Event probabilities %s of compulsion ' %(str(probs)) + \
+                             '%s not between 0.0 and 1.0' %(self.name))
+
+        return probs
+
+    def leap_length(self, p_max, n_steps):
+        '''Return the number of steps of the next leap
+
+        Parameters
+        ----------
+        p_max : float
+            The largest probability of an event of any agent
+        n_steps : int
+            The number of steps that remain to be executed
+
+        Returns
+        -------
+        n_leap : int
+            The number of steps of the leap, at least one
+
+        '''
+        n_leap = n_steps
+        if p_max > 0.0:
+            n_leap = min(n_leap, max(1, int(self.epsilon / p_max)))
+        if not self.max_leap is None:
+            n_leap = min(n_leap, self.max_leap)
+
+        return n_leap
+
+    def draw_counts(self, probs, n_leap):
+        '''Draw the numbers of events of a population of agents in a leap
+
+        Parameters
+        ----------
+        probs : numpy array
+            The probabilities per step, with one row per agent and one column
+            per type of event
+        n_leap : int
+            The number of steps of the leap
+
+        Returns
+        -------
+        counts : numpy array
+            The numbers of events, of the same shape as the probabilities
+
+        '''
+        if self.distribution == 'binomial':
+            return draw_binomial(n_leap, probs)
+
+        if callable(self.event_prob):
+            return draw_poisson(n_leap * probs)
+
+        n_agents = probs.shape[0]
+        counts = np.zeros(probs.shape, dtype=np.int64)
+        for k_type in range(probs.shape[1]):
+            n_events = draw_poisson(n_agents * n_leap * probs[0, k_type])
+            if n_events > 0:
+                counts[:, k_type] = np.bincount(draw_integers(n_agents, n_events),
+                                                minlength=n_agents)
+
+        return counts
+
+    def __init__(self, compel_name, event_prob, resource_map, event_func=None,
+                 epsilon=0.03, distribution='binomial', max_leap=None):
+
+        if not distribution in ('binomial', 'poisson'):
+            raise ValueError('Unknown distribution of tau-leap: %s' %(str(distribution)))
+        if epsilon <= 0.0:
+            raise ValueError('The error control of tau-leap must be ' + \
+                             'positive, not %s' %(str(epsilon)))
+
+        if event_func is None:
+            event_func = _counts_as_values
+
+        super().__init__(compel_name, event_func, resource_map)
+
+        self.event_prob = event_prob
+        self.epsilon = epsilon
+        self.distribution = distribution
+        self.max_leap = max_leap
+
+        if not callable(event_prob):
+            self.probabilities(None)
+
 class Mutation(_Instructor):
     '''Mutation class, which defines how the Agent responds to being
     mutated to produce a tangible mapping
@@ -895,7 +1103,7 @@ class Mutation(_Instructor):
         independently on the essence arguments, use the MultiMutation class
 
         '''
-        if np.random.ranf() < self.mutation_prob:
+        if draw_uniform(agent_id) < self.mutation_prob:
 
             resource_values = tuple(self.resource_op_input())
             essence_values = tuple(self.essence_op_input())
@@ -1016,7 +1224,7 @@ class MultiMutation(Mutation):
 
         out_values = []
         for key in self.scaffold_map_output:
-            if np.random.ranf() < self.mutation_prob:
+            if draw_uniform(agent_id) < self.mutation_prob:
                 try:
                     out_values.extend(list(self.engine(*args, **self.kwargs)))
                 except Exception as err:
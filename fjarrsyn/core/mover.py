@@ -7,6 +7,20 @@ class Mover(object):
 
     Parameters
     ----------
+    name : str
+        Name of the mover
+    engine : callable
+        Function that receives the agent management system, and the named
+        arguments of the mover, and moves the system forward
+    kwargs : dict, optional
+        Named arguments to the engine
+    synchronous : bool, optional
+        If True, the engine is executed as the compute phase of a synchronous
+        update of the system, which is committed once the engine completes,
+        see `AgentManagementSystem.begin_sync`
+    resolver : str or callable, optional
+        The conflict resolver of writes to shared content staged in a
+        synchronous update
 
     '''
     def __call__(self, agent_ms):
@@ -21,9 +35,22 @@ class Mover(object):
         if not isinstance(agent_ms, AgentManagementSystem):
             raise TypeError('Invalid class encountered: %s' %(str(type(agent_ms))))
 
-        self.engine(agent_ms, **self.kwargs)
+        if not self.synchronous:
+            self.engine(agent_ms, **self.kwargs)
 
-    def __init__(self, name, engine, kwargs={}):
+        else:
+            agent_ms.begin_sync(self.resolver)
+            try:
+                self.engine(agent_ms, **self.kwargs)
+
+            except BaseException:
+                agent_ms.abort_sync()
+                raise
+
+            agent_ms.commit_sync()
+
+    def __init__(self, name, engine, kwargs={}, synchronous=False,
+                 resolver='accumulate'):
 
         self.name = name
 
@@ -32,6 +59,9 @@ class Mover(object):
         self.engine = engine
         self.kwargs = kwargs
 
+        self.synchronous = synchronous
+        self.resolver = resolver
+
 
 class StandardMoverFunc(object):
     '''Convenience class to create standard Mover functions
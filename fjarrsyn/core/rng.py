@@ -0,0 +1,454 @@
+'''Counter-based random number streams keyed on seed, agent and step. A stream
+is a function of its key alone, not of the order in which agents draw from
+it, hence a simulation that draws from streams is reproducible independent of
+the order, or parallel execution, of the agent updates
+
+Notes
+-----
+Instructors and the system iterators do not hold a reference to the agent
+management system, hence the streams of the system that is being propagated
+are activated for the module, see `set_random_streams`. Without active
+streams, the draws are made from an active buffered source, see
+`set_random_buffer`, and otherwise from the global `numpy.random` state, as
+before the streams were introduced, such that seeded simulations are
+unchanged.
+
+'''
+import hashlib
+
+import numpy as np
+import numpy.random
+
+_ACTIVE = {'streams' : None, 'agent_id' : None, 'buffer' : None}
+
+class RandomStreams(object):
+    '''Service of counter-based random number streams. Each stream is a
+    Philox generator with the key derived from the seed, the agent ID, the
+    step and a channel, and the counter starting at zero
+
+    Parameters
+    ----------
+    seed : int
+        The seed of the streams
+    step : int, optional
+        The step of the simulation to draw streams for, which is set by the
+        simulation runner as the system is propagated
+
+    Notes
+    -----
+    The stream of an agent in a step is created on its first use, and the
+    same stream is returned on subsequent uses in that step, such that the
+    draws of an agent within a step are consecutive numbers of its stream.
+    The streams of a step are discarded once the step changes. Draws without
+    an agent ID are made from the stream of the system, which is the stream
+    of the agent ID None.
+
+    '''
+    def key(self, agent_id=None, step=None, channel=''):
+        '''Return the 128-bit Philox key of a stream
+
+        Parameters
+        ----------
+        agent_id : str, optional
+            The agent ID of the stream, None for the stream of the system
+        step : int, optional
+            The step of the stream, if not given the current step
+        channel : str, optional
+            Label that separates streams of the same agent and step
+
+        Returns
+        -------
+        key : int
+            The key of the stream
+
+        '''
+        if step is None:
+            step = self.step
+
+        content = '%s:%s:%s:%s' %(str(self.seed), str(agent_id), str(step),
+                                  channel)
+        digest = hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+
+        return int.from_bytes(digest, 'little')
+
+    def generator(self, agent_id=None, step=None, channel=''):
+        '''Return a new generator at the start of a stream
+
+        Parameters
+        ----------
+        agent_id : str, optional
+            The agent ID of the stream, None for the stream of the system
+        step : int, optional
+            The step of the stream, if not given the current step
+        channel : str, optional
+            Label that separates streams of the same agent and step
+
+        Returns
+        -------
+        generator : Generator
+            Numpy generator of a Philox bit generator at counter zero
+
+        '''
+        return np.random.Generator(np.random.Philox(key=self.key(agent_id,
+                                                                 step, channel)))
+
+    def stream(self, agent_id=None):
+        '''Return the generator of the stream of an agent in the current step
+
+        Parameters
+        ----------
+        agent_id : str, optional
+            The agent ID of the stream, None for the stream of the system
+
+        Returns
+        -------
+        generator : Generator
+            Numpy generator of the stream, the same object for all calls of
+            the step
+
+        '''
+        if self._streams_step != self.step:
+            self._streams = {}
+            self._streams_step = self.step
+
+        generator = self._streams.get(agent_id)
+        if generator is None:
+            generator = self.generator(agent_id)
+            self._streams[agent_id] = generator
+
+        return generator
+
+    def block(self, agent_ids, size, step=None, channel='block',
+              distribution='random', **kwargs):
+        '''Draw a block of random numbers for a collection of agents at once
+
+        Parameters
+        ----------
+        agent_ids : Iterable
+            The agent IDs to draw for
+        size : int
+            Number of random numbers per agent
+        step : int, optional
+            The step of the streams, if not given the current step
+        channel : str, optional
+            Label of the streams, by default separate from the streams
+            returned by `stream`
+        distribution : str, optional
+            Name of the method of the numpy Generator to draw with, such as
+            `random`, `normal` or `integers`
+        kwargs : optional
+            Named arguments to the method of the distribution
+
+        Returns
+        -------
+        block : numpy.ndarray
+            Array with one row of `size` random numbers per agent, in the
+            order of the agent IDs
+
+        Notes
+        -----
+        The row of an agent is the start of its stream of the channel and
+        step, hence it does not depend on the other agents of the block, or
+        on any other draws. A block can therefore be drawn in one go before a
+        step, and its rows handed to agents that are updated in any order or
+        in parallel, with identical results.
+
+        '''
+        rows = [getattr(self.generator(agent_id, step, channel),
+                        distribution)(size=size, **kwargs) \
+                for agent_id in agent_ids]
+
+        if len(rows) == 0:
+            return np.empty((0, size))
+
+        return np.stack(rows)
+
+    def set_step(self, step):
+        '''Set the current step of the streams
+
+        Parameters
+        ----------
+        step : int
+            The step of the simulation
+
+        '''
+        self.step = step
+
+    def __init__(self, seed, step=0):
+
+        if not isinstance(seed, (int, np.integer)):
+            raise TypeError('The seed of the random streams must be an ' + \
+                            'integer, not %s' %(str(type(seed))))
+
+        self.seed = int(seed)
+        self.step = step
+
+        self._streams = {}
+        self._streams_step = step
+
+class BufferedRandom(object):
+    '''Random source that draws large blocks of numbers per distribution at
+    once and serves scalar draws from the blocks, which avoids the overhead
+    of a call into numpy per scalar draw
+
+    Parameters
+    ----------
+    block_size : int, optional
+        Number of random numbers drawn per block and distribution
+    generator : Generator, optional
+        The numpy Generator or RandomState to draw the blocks from. If not
+        given, the blocks are drawn from the global `numpy.random` state,
+        hence a seed of the global state makes the draws reproducible
+
+    Notes
+    -----
+    Integers and choices are derived from the uniform block, as the integer
+    part of a uniform number scaled by the number of options. The bias of this
+    method is of the order of the number of options over two to the power of
+    53, hence negligible for the sizes of agent systems. Since a block is
+    drawn before its numbers are served, the draws are not the same as the
+    draws of the unbuffered source of the same seed.
+
+    '''
+    def uniform(self):
+        '''Draw a random number uniformly from the half-open interval [0, 1)'''
+
+        try:
+            return next(self._uniform)
+
+        except StopIteration:
+            self._uniform = iter(self._source.random(self.block_size).tolist())
+            return next(self._uniform)
+
+    def normal(self, loc=0.0, scale=1.0):
+        '''Draw a random number from a normal distribution'''
+
+        try:
+            value = next(self._normal)
+
+        except StopIteration:
+            self._normal = iter(self._source.standard_normal(self.block_size).tolist())
+            value = next(self._normal)
+
+        return loc + scale * value
+
+    def integer(self, high):
+        '''Draw a random integer uniformly from zero to, not including, high'''
+
+        return int(self.uniform() * high)
+
+    def choice(self, a, size=None, replace=True):
+        '''Draw a random sample from an array, or from the range of an integer,
+        with the semantics of `numpy.random.choice`. Single draws are served
+        from the buffer, other draws are made directly from the source
+
+        '''
+        if not size is None or not replace:
+            return self._source.choice(a, size=size, replace=replace)
+
+        if isinstance(a, (int, np.integer)):
+            return self.integer(a)
+
+        return a[self.integer(len(a))]
+
+    def __init__(self, block_size=4096, generator=None):
+
+        if block_size < 1:
+            raise ValueError('The block size must be positive, not %s' \
+                             %(str(block_size)))
+
+        self.block_size = block_size
+        if generator is None:
+            self._source = numpy.random
+        else:
+            self._source = generator
+
+        self._uniform = iter(())
+        self._normal = iter(())
+
+def set_random_buffer(buffer):
+    '''Activate a buffered random source for draws made without active random
+    streams
+
+    Parameters
+    ----------
+    buffer : BufferedRandom
+        The buffered source to activate, or None to draw from the global
+        `numpy.random` state one number at a time
+
+    Returns
+    -------
+    previous : BufferedRandom
+        The buffered source active before the call, or None
+
+    '''
+    previous = _ACTIVE['buffer']
+    _ACTIVE['buffer'] = buffer
+
+    return previous
+
+def set_random_streams(streams):
+    '''Activate random streams for the draws of the instructors and system
+    iterators
+
+    Parameters
+    ----------
+    streams : RandomStreams
+        The streams to activate, or None to draw from the global
+        `numpy.random` state
+
+    Returns
+    -------
+    previous : RandomStreams
+        The streams active before the call, or None
+
+    '''
+    previous = _ACTIVE['streams']
+    _ACTIVE['streams'] = streams
+
+    return previous
+
+def get_random_streams():
+    '''Return the active random streams, or None if draws are made from the
+    global `numpy.random` state
+
+    '''
+    return _ACTIVE['streams']
+
+def set_acting_agent(agent_id):
+    '''Set the agent whose stream is used for draws without an explicit agent
+    ID, such as the draws of world engines executed on behalf of an agent
+
+    Parameters
+    ----------
+    agent_id : str
+        The agent ID, or None for the stream of the system
+
+    Returns
+    -------
+    previous : str
+        The agent ID acting before the call
+
+    '''
+    previous = _ACTIVE['agent_id']
+    _ACTIVE['agent_id'] = agent_id
+
+    return previous
+
+def random_stream(agent_id=None):
+    '''Return the generator of the active stream of an agent
+
+    Parameters
+    ----------
+    agent_id : str, optional
+        The agent ID of the stream. If not given, the acting agent
+
+    Returns
+    -------
+    generator : Generator
+        The numpy generator of the stream, or None if no streams are active
+
+    '''
+    streams = _ACTIVE['streams']
+    if streams is None:
+        return None
+
+    if agent_id is None:
+        agent_id = _ACTIVE['agent_id']
+
+    return streams.stream(agent_id)
+
+def draw_uniform(agent_id=None):
+    '''Draw a random number uniformly from the half-open interval [0, 1)'''
+
+    rng = random_stream(agent_id)
+    if rng is None:
+        buffer = _ACTIVE['buffer']
+        if buffer is None:
+            return numpy.random.ranf()
+
+        return buffer.uniform()
+
+    return rng.random()
+
+def draw_normal(loc=0.0, scale=1.0, agent_id=None):
+    '''Draw a random number from a normal distribution'''
+
+    rng = random_stream(agent_id)
+    if rng is None:
+        buffer = _ACTIVE['buffer']
+        if buffer is None:
+            return numpy.random.normal(loc, scale)
+
+        return buffer.normal(loc, scale)
+
+    return rng.normal(loc, scale)
+
+def draw_integer(high, agent_id=None):
+    '''Draw a random integer uniformly from zero to, not including, high'''
+
+    rng = random_stream(agent_id)
+    if rng is None:
+        buffer = _ACTIVE['buffer']
+        if buffer is None:
+            return numpy.random.randint(high)
+
+        return buffer.integer(high)
+
+    return int(rng.integers(high))
+
+def draw_choice(a, size=None, replace=True, agent_id=None):
+    '''Draw a random sample from an array, or from the range of an integer,
+    with the semantics of `numpy.random.choice`
+
+    '''
+    rng = random_stream(agent_id)
+    if rng is None:
+        buffer = _ACTIVE['buffer']
+        if buffer is None:
+            return numpy.random.choice(a, size=size, replace=replace)
+
+        return buffer.choice(a, size=size, replace=replace)
+
+    return rng.choice(a, size=size, replace=replace)
+
+def _bulk_source(agent_id=None):
+    '''Return the source of bulk draws, which is the active stream of an
+    agent, or the source of the active buffer, or the global `numpy.random`
+    state
+
+    '''
+    rng = random_stream(agent_id)
+    if rng is None:
+        buffer = _ACTIVE['buffer']
+        if buffer is None:
+            return numpy.random
+
+        return buffer._source
+
+    return rng
+
+def draw_binomial(n, p, size=None, agent_id=None):
+    '''Draw numbers of successes of binomial distributions, with the
+    semantics of `numpy.random.binomial`
+
+    '''
+    return _bulk_source(agent_id).binomial(n, p, size=size)
+
+def draw_poisson(lam, size=None, agent_id=None):
+    '''Draw numbers of events of Poisson distributions, with the semantics of
+    `numpy.random.poisson`
+
+    '''
+    return _bulk_source(agent_id).poisson(lam, size=size)
+
+def draw_integers(high, size, agent_id=None):
+    '''Draw an array of random integers uniformly from zero to, not
+    including, high
+
+    '''
+    source = _bulk_source(agent_id)
+    if hasattr(source, 'integers'):
+        return source.integers(high, size=size)
+
+    return source.randint(high, size=size)
@@ -9,6 +9,7 @@ import numpy.random
 
 from fjarrsyn.core.array import _Flash, _SupraArray, EmptyFlashError
 from fjarrsyn.core.message import Resource, Essence
+from fjarrsyn.core.rng import draw_normal, draw_integer, draw_choice
 
 class _Map(_Flash):
     '''Base class for all scaffold maps. 
@@ -123,6 +124,39 @@ class _Map(_Flash):
 
         scaffold[self.scaffold_key] = new_value
 
+    def detach(self):
+        '''Detach the values of the map, such that the map can be populated
+        again while the detached values are applied later
+
+        Returns
+        -------
+        detached : list
+            Tuples of map and its detached values, to be applied with
+            `apply_detached`
+
+        '''
+        items = self._items
+        self._items = self.void_array()
+
+        return [(self, items)]
+
+    def apply_detached(self, agent, items, empty_to_identity=True):
+        '''Apply detached values of the map to an agent
+
+        Parameters
+        ----------
+        agent : Agent
+            The agent to apply the map to
+        items
+            The values of the map as returned by `detach`
+        empty_to_identity : bool, optional
+            If True, an empty element of the values is interpreted as the
+            identity operator
+
+        '''
+        self._items = items
+        self.apply_to(agent, empty_to_identity)
+
     def __init__(self, name, map_func, scaffold_key, map_args_keys):
 
         super().__init__(name, map_args_keys)
@@ -324,6 +358,23 @@ class MapCollection(_SupraArray):
         for _map in self:
             _map.apply_to(agent, empty_to_identity)
 
+    def detach(self):
+        '''Detach the values of the maps of the collection, such that the maps
+        can be populated again while the detached values are applied later
+
+        Returns
+        -------
+        detached : list
+            Tuples of map and its detached values, to be applied with the
+            `apply_detached` method of the map
+
+        '''
+        ret = []
+        for _map in self:
+            ret.extend(_map.detach())
+
+        return ret
+
     def __getitem__(self, key):
         '''Retrieve an individual map from the collection
 
@@ -455,7 +506,7 @@ class _ForceFunctions(object):
             The new value after transformation
 
         '''
-        increment = np.random.normal(0.0, std)
+        increment = draw_normal(0.0, std)
         return old_value + float(increment)
 
     def force_func_wiener_bounded(self, old_value, std, lower_bound=-1.0*np.Infinity, 
@@ -536,11 +587,11 @@ class _ForceFunctions(object):
             The new value after transformation
 
         '''
-        index_flip = np.random.randint(len(old_value))
+        index_flip = draw_integer(len(old_value))
         other_chars = [x for x in alphabet if not x == old_value[index_flip]]
 
         if selector is None:
-            _selector = lambda options : np.random.choice(options)
+            _selector = lambda options : draw_choice(options)
 
         elif callable(selector):
             _selector = selector
@@ -0,0 +1,97 @@
+'''Resolution of conflicting writes to shared content, such as the auxiliary
+content of nodes, in the synchronous update of an agent management system.
+In the compute phase of a synchronous update the writes are staged, and in
+the commit phase the writes staged for the same element are resolved into
+the value to write
+
+'''
+def resolve_last(current, values):
+    '''The last staged value is written'''
+
+    return values[-1]
+
+def resolve_first(current, values):
+    '''The first staged value is written'''
+
+    return values[0]
+
+def resolve_accumulate(current, values):
+    '''The changes of all staged values relative the current value are added to
+    the current value, which combines increments computed independently from
+    the same frozen value
+
+    '''
+    return current + sum([value - current for value in values])
+
+def resolve_mean(current, values):
+    '''The mean of the staged values is written'''
+
+    return sum(values) / len(values)
+
+def resolve_max(current, values):
+    '''The greatest staged value is written'''
+
+    return max(values)
+
+def resolve_min(current, values):
+    '''The smallest staged value is written'''
+
+    return min(values)
+
+def resolve_error(current, values):
+    '''Conflicting writes are an error
+
+    Raises
+    ------
+    RuntimeError
+        Always, since the resolver is only called for conflicting writes
+
+    '''
+    raise RuntimeError('Conflicting writes of %s values ' %(str(len(values))) + \
+                       'staged for the same element')
+
+CONFLICT_RESOLVERS = {'last' : resolve_last,
+                      'first' : resolve_first,
+                      'accumulate' : resolve_accumulate,
+                      'mean' : resolve_mean,
+                      'max' : resolve_max,
+                      'min' : resolve_min,
+                      'error' : resolve_error}
+'''Library of conflict resolvers keyed on name'''
+
+def get_resolver(resolver):
+    '''Return the conflict resolver function of a name or callable
+
+    Parameters
+    ----------
+    resolver : str or callable
+        Name of a library resolver, see `CONFLICT_RESOLVERS`, or a function
+        that receives the current value and the list of staged values in the
+        order they were staged, and returns the value to write
+
+    Returns
+    -------
+    resolver : callable
+        The resolver function
+
+    Raises
+    ------
+    ValueError
+        If the name is not of a library resolver
+    TypeError
+        If the resolver is neither a string nor a callable
+
+    '''
+    if callable(resolver):
+        return resolver
+
+    elif isinstance(resolver, str):
+        if not resolver in CONFLICT_RESOLVERS:
+            raise ValueError('No library conflict resolver exist for label ' + \
+                             '%s' %(resolver))
+
+        return CONFLICT_RESOLVERS[resolver]
+
+    else:
+        raise TypeError('The conflict resolver should be a callable or a ' + \
+                        'library resolver string')
@@ -0,0 +1,333 @@
+'''Streaming accumulators of summary statistics. The accumulators consume
+values one at a time in a single pass, hold a fixed or bounded amount of
+memory, and can be merged, such that accumulators populated from separate
+parts of a system combine into the accumulator of the entire system
+
+'''
+import bisect
+
+class Moments(object):
+    '''Accumulator of count, mean, variance, minimum and maximum by the Welford
+    algorithm, which is numerically stable for long streams of values
+
+    '''
+    def add(self, value):
+        '''Add a value to the accumulator
+
+        Parameters
+        ----------
+        value : float
+            The value to add
+
+        '''
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        '''Merge another accumulator of moments into the present one
+
+        Parameters
+        ----------
+        other : Moments
+            The accumulator to merge
+
+        '''
+        if other.count == 0:
+            return
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def variance(self, ddof=1):
+        '''Return the variance of the values
+
+        Parameters
+        ----------
+        ddof : int, optional
+            Delta degrees of freedom, the divisor being the count less the
+            delta. Default gives the unbiased sample variance
+
+        Returns
+        -------
+        variance : float
+            The variance, or NaN if the count does not exceed the delta
+            degrees of freedom
+
+        '''
+        if self.count <= ddof:
+            return float('nan')
+
+        return self._m2 / (self.count - ddof)
+
+    def summary(self):
+        '''Return the statistics of the accumulator
+
+        Returns
+        -------
+        summary : dict
+            The count, mean, variance, minimum and maximum, keyed on `count`,
+            `mean`, `var`, `min` and `max`. Statistics undefined for no values
+            are NaN
+
+        '''
+        if self.count == 0:
+            nan = float('nan')
+            return {'count' : 0, 'mean' : nan, 'var' : nan,
+                    'min' : nan, 'max' : nan}
+
+        return {'count' : self.count, 'mean' : self.mean,
+                'var' : self.variance(), 'min' : self.min, 'max' : self.max}
+
+    def __init__(self):
+
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+class Histogram(object):
+    '''Accumulator of counts of values in fixed bins
+
+    Parameters
+    ----------
+    edges : iterable
+        The increasing edges of the bins. Bin `k` counts values from edge `k`,
+        inclusive, to edge `k + 1`, exclusive, except the last bin, which
+        includes its right edge
+
+    Raises
+    ------
+    ValueError
+        If fewer than two edges are given, or the edges are not increasing
+
+    '''
+    def add(self, value):
+        '''Add a value to the accumulator
+
+        Parameters
+        ----------
+        value : float
+            The value to add
+
+        '''
+        if value < self.edges[0]:
+            self.below += 1
+
+        elif value > self.edges[-1]:
+            self.above += 1
+
+        elif value == self.edges[-1]:
+            self.counts[-1] += 1
+
+        else:
+            self.counts[bisect.bisect_right(self.edges, value) - 1] += 1
+
+    def merge(self, other):
+        '''Merge another histogram of identical bins into the present one
+
+        Parameters
+        ----------
+        other : Histogram
+            The accumulator to merge
+
+        Raises
+        ------
+        ValueError
+            If the bins of the histograms differ
+
+        '''
+        if other.edges != self.edges:
+            raise ValueError('Histograms of different bins cannot be merged')
+
+        self.counts = [c1 + c2 for c1, c2 in zip(self.counts, other.counts)]
+        self.below += other.below
+        self.above += other.above
+
+    def summary(self):
+        '''Return the counts of the accumulator
+
+        Returns
+        -------
+        summary : dict
+            The count of bin `k` keyed on `bin_<k>`, and the counts of values
+            below and above the bins keyed on `below` and `above`
+
+        '''
+        ret = {'below' : self.below}
+        for k_bin, count in enumerate(self.counts):
+            ret['bin_%s' %(str(k_bin))] = count
+        ret['above'] = self.above
+
+        return ret
+
+    def __init__(self, edges):
+
+        edges = [float(x) for x in edges]
+        if len(edges) < 2:
+            raise ValueError('A histogram requires at least two bin edges')
+        if any([x2 <= x1 for x1, x2 in zip(edges[:-1], edges[1:])]):
+            raise ValueError('Histogram bin edges must be increasing')
+
+        self.edges = edges
+        self.counts = [0] * (len(edges) - 1)
+        self.below = 0
+        self.above = 0
+
+class QuantileSketch(object):
+    '''Accumulator of approximate quantiles in bounded memory, by a merging
+    sketch of weighted centroids in the manner of the t-digest
+
+    Parameters
+    ----------
+    compression : int, optional
+        Parameter that controls the number of centroids, and hence the
+        accuracy and memory of the sketch. The number of centroids is of the
+        order of the compression
+
+    Notes
+    -----
+    Values are collected in a buffer, which is merged into the centroids when
+    full. Centroids are merged as long as their weight stays below a limit
+    that is proportional to `q(1 - q)`, where `q` is the quantile at the
+    centroid, such that the tails of the distribution are resolved more
+    finely than the centre. The minimum and maximum are tracked exactly.
+
+    '''
+    def add(self, value, weight=1.0):
+        '''Add a value to the accumulator
+
+        Parameters
+        ----------
+        value : float
+            The value to add
+        weight : float, optional
+            The weight of the value
+
+        '''
+        self._buffer.append((value, weight))
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+        if len(self._buffer) >= self._buffer_size:
+            self._compress()
+
+    def merge(self, other):
+        '''Merge another sketch into the present one
+
+        Parameters
+        ----------
+        other : QuantileSketch
+            The accumulator to merge
+
+        '''
+        self._buffer.extend(other._centroids)
+        self._buffer.extend(other._buffer)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def _compress(self):
+        '''Merge the buffer into the centroids'''
+
+        if len(self._buffer) == 0:
+            return
+
+        items = sorted(self._centroids + self._buffer)
+        self._buffer = []
+
+        total = sum([weight for _, weight in items])
+        centroids = []
+        cumulative = 0.0
+        c_mean, c_weight = items[0]
+        for mean, weight in items[1:]:
+            q = (cumulative + (c_weight + weight) / 2.0) / total
+            limit = max(4.0 * total * q * (1.0 - q) / self.compression, 1.0)
+
+            if c_weight + weight <= limit:
+                c_weight += weight
+                c_mean += (mean - c_mean) * weight / c_weight
+
+            else:
+                centroids.append((c_mean, c_weight))
+                cumulative += c_weight
+                c_mean, c_weight = mean, weight
+
+        centroids.append((c_mean, c_weight))
+        self._centroids = centroids
+
+    def quantile(self, q):
+        '''Return the approximate quantile of the values
+
+        Parameters
+        ----------
+        q : float
+            The quantile, between zero and one
+
+        Returns
+        -------
+        value : float
+            The approximate quantile, or NaN if no values have been added
+
+        '''
+        self._compress()
+        if len(self._centroids) == 0:
+            return float('nan')
+
+        if len(self._centroids) == 1:
+            return self._centroids[0][0]
+
+        total = sum([weight for _, weight in self._centroids])
+        target = q * total
+
+        #
+        # Interpolate linearly between the centres of the centroids, and
+        # between the outermost centres and the exact extremes
+        #
+        x_prev, w_prev = self.min, 0.0
+        cumulative = 0.0
+        for mean, weight in self._centroids:
+            centre = cumulative + weight / 2.0
+            if target < centre:
+                if centre == w_prev:
+                    return mean
+                frac = (target - w_prev) / (centre - w_prev)
+                return x_prev + frac * (mean - x_prev)
+
+            x_prev, w_prev = mean, centre
+            cumulative += weight
+
+        if total == w_prev:
+            return self.max
+        frac = (target - w_prev) / (total - w_prev)
+
+        return x_prev + frac * (self.max - x_prev)
+
+    def __len__(self):
+        '''Return the number of centroids and buffered values'''
+
+        return len(self._centroids) + len(self._buffer)
+
+    def __init__(self, compression=100):
+
+        self.compression = compression
+        self._buffer_size = 5 * compression
+        self._buffer = []
+        self._centroids = []
+        self.min = float('inf')
+        self.max = float('-inf')
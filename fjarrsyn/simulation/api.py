@@ -5,7 +5,46 @@
 from fjarrsyn.simulation.sampler import (
     AgentSampler,
     EnvSampler,
+    AggregateSampler,
     GraphSampler,
-    SystemIO)
+    SystemIO,
+    reconstruct_agent_state,
+    reconstruct_graph)
 
-from fjarrsyn.simulation.simulator import FiniteSystemRunner
+from fjarrsyn.simulation.sink import (
+    SQLiteSink,
+    RingBufferSink,
+    ArrowSink,
+    CSRGraphSink,
+    write_csr_graph,
+    load_csr_graph)
+
+from fjarrsyn.simulation.simulator import (
+    FiniteSystemRunner,
+    ConditionalSystemRunner,
+    latest_checkpoint)
+
+from fjarrsyn.simulation.condition import (
+    StopCondition,
+    PopulationSize,
+    InertFraction,
+    MovingVariance)
+
+from fjarrsyn.simulation.ensemble import EnsembleRunner
+
+from fjarrsyn.simulation.sweep import ParameterSweep, config_key
+
+from fjarrsyn.simulation.partition import (
+    PartitionedSystemRunner,
+    partition_graph,
+    halo_nodes)
+
+from fjarrsyn.simulation.shared import (
+    SnapshotPublisher,
+    SnapshotReader,
+    WorldSnapshot)
+
+from fjarrsyn.simulation.scheduler import (
+    AgentEvent,
+    EventDrivenRunner,
+    IndexedHeap)
@@ -0,0 +1,286 @@
+'''Stop conditions of a simulation, see `ConditionalSystemRunner`. The
+conditions are evaluated against statistics of the system that are known, or
+maintained incrementally as the simulation runs, hence no condition requires a
+scan of all agents of the system
+
+'''
+from collections import deque
+
+class StopCondition(object):
+    '''Parent class to the stop conditions of a simulation
+
+    Parameters
+    ----------
+    name : str
+        Name of the condition
+
+    Notes
+    -----
+    The runner calls `update` after every step of the simulation, in which a
+    condition maintains its statistics, and `is_met` at the interval of steps
+    the conditions are checked. A child class implements `is_met`, and
+    `update` and `reset` if it maintains statistics.
+
+    '''
+    def update(self, system, step):
+        '''Update the statistics of the condition after a step
+
+        Parameters
+        ----------
+        system : AgentManagementSystem
+            The system that is simulated
+        step : int
+            The step that was executed
+
+        '''
+        pass
+
+    def is_met(self, system, step):
+        '''Return True if the condition to stop the simulation is met
+
+        Parameters
+        ----------
+        system : AgentManagementSystem
+            The system that is simulated
+        step : int
+            The step that was executed last
+
+        '''
+        raise NotImplementedError('Child class of StopCondition must implement is_met')
+
+    def reset(self):
+        '''Discard the statistics of the condition, as before a new simulation'''
+
+        pass
+
+    def __repr__(self):
+
+        return '%s(%s)' %(type(self).__name__, self.name)
+
+    def __init__(self, name):
+
+        self.name = name
+
+class PopulationSize(StopCondition):
+    '''Condition that the number of agents of the system is at or below a
+    minimum, such as zero for extinction, or at or above a maximum
+
+    Parameters
+    ----------
+    min_agents : int, optional
+        The number of agents at or below which the condition is met
+    max_agents : int, optional
+        The number of agents at or above which the condition is met
+    name : str, optional
+        Name of the condition
+
+    Raises
+    ------
+    ValueError
+        If neither bound is given
+
+    '''
+    def is_met(self, system, step):
+        '''Return True if the number of agents is at or beyond a bound'''
+
+        n_agents = system.get_n_agents()
+        if not self.min_agents is None and n_agents <= self.min_agents:
+            return True
+        if not self.max_agents is None and n_agents >= self.max_agents:
+            return True
+
+        return False
+
+    def __init__(self, min_agents=None, max_agents=None, name='population size'):
+
+        if min_agents is None and max_agents is None:
+            raise ValueError('Population size condition requires a bound')
+
+        super().__init__(name)
+
+        self.min_agents = min_agents
+        self.max_agents = max_agents
+
+class InertFraction(StopCondition):
+    '''Condition that the fraction of the agents of the system that are inert
+    is at or above a threshold
+
+    Parameters
+    ----------
+    threshold : float
+        The fraction of inert agents at or above which the condition is met
+    name : str, optional
+        Name of the condition
+
+    Raises
+    ------
+    ValueError
+        If the threshold is not between zero and one
+
+    Notes
+    -----
+    The number of inert agents is counted by the system as agents are
+    declared inert or revived, see `AgentManagementSystem.get_n_inert`. A
+    system without agents has no inert fraction and does not meet the
+    condition, see `PopulationSize` for extinction.
+
+    '''
+    def fraction(self, system):
+        '''Return the fraction of inert agents of the system, or None if the
+        system has no agents
+
+        '''
+        n_agents = system.get_n_agents()
+        if n_agents == 0:
+            return None
+
+        return system.get_n_inert() / n_agents
+
+    def is_met(self, system, step):
+        '''Return True if the fraction of inert agents is at or above the
+        threshold
+
+        '''
+        fraction = self.fraction(system)
+        if fraction is None:
+            return False
+
+        return fraction >= self.threshold
+
+    def __init__(self, threshold, name='inert fraction'):
+
+        if not 0.0 <= threshold <= 1.0:
+            raise ValueError('The inert fraction threshold must be between ' + \
+                             'zero and one, not %s' %(str(threshold)))
+
+        super().__init__(name)
+
+        self.threshold = threshold
+
+class MovingVariance(StopCondition):
+    '''Condition that the variance of a sampled quantity within a moving
+    window of samples is at or below a threshold, as when the system has
+    stabilised
+
+    Parameters
+    ----------
+    quantity : callable
+        Function that receives the system and returns the quantity as a
+        number. It should be cheap to evaluate, such as the number of agents,
+        a value of the environment, or a sum that the system maintains
+    window : int
+        The number of most recent samples of the window
+    threshold : float
+        The variance at or below which the condition is met
+    sample_every : int, optional
+        The number of steps between the samples of the quantity
+    relative : bool, optional
+        If True, the variance is relative to the square of the mean of the
+        window, that is the squared coefficient of variation, which is
+        independent of the scale of the quantity
+    name : str, optional
+        Name of the condition
+
+    Raises
+    ------
+    ValueError
+        If the window has fewer than two samples or the sampling interval is
+        less than one step
+
+    Notes
+    -----
+    The mean and the sum of squared deviations of the window are updated for
+    each sample that enters the window and each sample that leaves it, with
+    the update of Welford, such that the cost of a sample is independent of
+    the size of the window. The statistics are computed anew from the window
+    once per window of samples, which bounds the accumulation of rounding
+    errors at the same cost per sample. The condition is not met before the
+    window is full.
+
+    '''
+    def update(self, system, step):
+        '''Sample the quantity, if a sample is due, and update the moving
+        statistics
+
+        '''
+        self._n_updates += 1
+        if (self._n_updates - 1) % self.sample_every != 0:
+            return
+
+        x_new = float(self.quantity(system))
+        self._samples.append(x_new)
+
+        if len(self._samples) <= self.window:
+            n = len(self._samples)
+            delta = x_new - self._mean
+            self._mean += delta / n
+            self._m2 += delta * (x_new - self._mean)
+
+        else:
+            x_old = self._samples.popleft()
+            self._n_slides += 1
+            if self._n_slides % self.window == 0:
+                self._mean = sum(self._samples) / self.window
+                self._m2 = sum([(x - self._mean) ** 2 for x in self._samples])
+
+            else:
+                mean_old = self._mean
+                self._mean += (x_new - x_old) / self.window
+                self._m2 += (x_new - x_old) * (x_new - self._mean + x_old - mean_old)
+
+    def variance(self):
+        '''Return the sample variance of the window, relative if so set, or
+        None if the window has fewer than two samples
+
+        '''
+        n = len(self._samples)
+        if n < 2:
+            return None
+
+        variance = max(self._m2, 0.0) / (n - 1)
+        if self.relative:
+            if self._mean == 0.0:
+                return 0.0 if variance == 0.0 else float('inf')
+            variance = variance / self._mean ** 2
+
+        return variance
+
+    def is_met(self, system, step):
+        '''Return True if the window is full and its variance is at or below
+        the threshold
+
+        '''
+        if len(self._samples) < self.window:
+            return False
+
+        return self.variance() <= self.threshold
+
+    def reset(self):
+        '''Discard the samples of the window'''
+
+        self._samples = deque()
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._n_updates = 0
+        self._n_slides = 0
+
+    def __init__(self, quantity, window, threshold, sample_every=1,
+                 relative=False, name='moving variance'):
+
+        if not callable(quantity):
+            raise TypeError('The quantity of the moving variance must be callable')
+        if window < 2:
+            raise ValueError('The moving window must hold at least two ' + \
+                             'samples, not %s' %(str(window)))
+        if sample_every < 1:
+            raise ValueError('Samples must be at least one step apart')
+
+        super().__init__(name)
+
+        self.quantity = quantity
+        self.window = window
+        self.threshold = threshold
+        self.sample_every = sample_every
+        self.relative = relative
+
+        self.reset()
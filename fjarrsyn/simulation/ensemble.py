@@ -0,0 +1,200 @@
+'''Run replicate simulations of an agent system across a pool of processes
+
+'''
+import time
+
+import numpy as np
+import numpy.random
+
+from fjarrsyn.core.mover import Mover
+from fjarrsyn.simulation.simulator import FiniteSystemRunner
+from fjarrsyn.simulation.pool import run_on_pool
+
+def _replicate_spec(replicate, default_seed=None):
+    '''Split a replicate into its seed and the parameters of the system
+    factory. The default seed is the seed of a replicate without seed
+
+    '''
+    if isinstance(replicate, dict):
+        params = dict(replicate)
+        seed = params.pop('seed', None)
+
+    else:
+        params = {}
+        seed = replicate
+
+    if seed is None:
+        seed = default_seed
+
+    return seed, params
+
+def _run_replicate(k_replicate, seed, params, system_factory, mover, n_iter,
+                   io_factory, namespace, result_func):
+    '''Simulate one replicate. Executed in a process of the pool
+
+    Returns
+    -------
+    result
+        The result of the result function, or None
+
+    '''
+    numpy.random.seed(seed)
+
+    system = system_factory(**params)
+
+    system_io = None
+    if not io_factory is None:
+        system_io = io_factory()
+        system_io.namespace = namespace.format(k_replicate) + \
+                              system_io.namespace
+
+    runner = FiniteSystemRunner(n_iter, mover, system_io=system_io)
+    runner(system)
+    if not system_io is None:
+        system_io.close()
+
+    result = None
+    if not result_func is None:
+        result = result_func(system)
+
+    return result
+
+class EnsembleRunner(object):
+    '''Class to run replicate simulations of an agent system, each replicate a
+    finite number of steps, in parallel on a pool of processes
+
+    Parameters
+    ----------
+    system_factory : callable
+        Function that returns the agent system of a replicate. It receives
+        the parameters of the replicate as named arguments
+    mover : Mover
+        The Mover that propagates the systems
+    n_iter : int
+        Number of steps to simulate each replicate
+    replicates : list
+        The replicates to simulate. Each replicate is either an integer seed
+        of the random number generator, or a dictionary of the named
+        arguments to the system factory, with optional key `seed`. A
+        replicate without seed, or a seed of None, is given a seed derived
+        from the seed of the ensemble
+    io_factory : callable, optional
+        Function without arguments that returns the System IO of a replicate.
+        The output of each replicate is separated by a namespace
+    result_func : callable, optional
+        Function that receives the system at the end of a replicate and
+        returns a picklable result
+    max_workers : int, optional
+        The number of processes of the pool. If not given, the number of
+        processors
+    namespace : str, optional
+        Format string of the namespace of a replicate, with the index of the
+        replicate as argument. See the `namespace` parameter of `SystemIO`
+    progress_report : bool, optional
+        If True, a progress statement is printed to stdout as each replicate
+        completes
+    seed : int, optional
+        Seed from which the seeds of the replicates without seed are derived,
+        each replicate a distinct child of the seed sequence of the seed. If
+        not given, it is drawn from the random number generator of the parent
+        process
+
+    Notes
+    -----
+    The factories, the mover and the result function are sent to the
+    processes of the pool, hence they must be picklable, which for functions
+    means defined at the top level of a module. The systems and System IO
+    objects are created within the processes, hence need not be picklable.
+
+    A replicate that raises an exception does not affect the other
+    replicates. Its traceback is recorded in the summary, and its result is
+    None. The attribute `summary` is a dictionary set by `run` with entries:
+
+    * `n_replicates` : Number of replicates
+    * `n_completed` : Number of replicates that completed
+    * `n_failed` : Number of replicates that raised an exception
+    * `failures` : Dictionary of tracebacks keyed on replicate index
+    * `run_time` : Wall time in seconds of the ensemble
+    * `replicate_time` : Total time in seconds of the replicates, which over
+                         the wall time gives the parallel speed-up
+    * `seeds` : The seed of each replicate, by which it can be repeated
+
+    '''
+    def run(self):
+        '''Simulate all replicates
+
+        Returns
+        -------
+        results : list
+            The result of the result function for each replicate, in the
+            order of the replicates. None for replicates that failed, or if no
+            result function is given
+
+        '''
+        n_replicates = len(self.replicates)
+
+        base_seed = self.seed
+        if base_seed is None:
+            base_seed = numpy.random.randint(0, 2 ** 31)
+        derived_seeds = [int(child.generate_state(1)[0]) for child in \
+                         np.random.SeedSequence(base_seed).spawn(n_replicates)]
+        specs = [_replicate_spec(replicate, derived_seed) for replicate, derived_seed \
+                 in zip(self.replicates, derived_seeds)]
+
+        t_start = time.perf_counter()
+        tasks = [(k_replicate, seed, params, self.system_factory, self.mover,
+                  self.n_iter, self.io_factory, self.namespace, self.result_func) \
+                 for k_replicate, (seed, params) in enumerate(specs)]
+        print_progress = None
+        if self.progress_report:
+            print_progress = self.print_progress
+        outcomes = run_on_pool(_run_replicate, tasks,
+                               max_workers=self.max_workers,
+                               print_progress=print_progress)
+
+        results = [result for result, _, _ in outcomes]
+        failures = dict([(k_replicate, error) for k_replicate, (_, error, _) \
+                         in enumerate(outcomes) if not error is None])
+
+        self.summary = {'n_replicates' : n_replicates,
+                        'n_completed' : n_replicates - len(failures),
+                        'n_failed' : len(failures),
+                        'failures' : failures,
+                        'run_time' : time.perf_counter() - t_start,
+                        'replicate_time' : sum([run_time for _, _, run_time \
+                                                in outcomes]),
+                        'seeds' : [seed for seed, _ in specs]}
+
+        return results
+
+    def __call__(self):
+        '''Simulate all replicates, see `run`'''
+
+        return self.run()
+
+    def __init__(self, system_factory, mover, n_iter, replicates,
+                 io_factory=None, result_func=None, max_workers=None,
+                 namespace='replicate_{}_', progress_report=False, seed=None):
+
+        if not isinstance(mover, Mover):
+            raise TypeError('The system mover is of wrong type:%s' %(str(type(mover))))
+        if not callable(system_factory):
+            raise TypeError('The system factory is not callable')
+
+        self.system_factory = system_factory
+        self.mover = mover
+        self.n_iter = n_iter
+        self.replicates = list(replicates)
+        self.io_factory = io_factory
+        self.result_func = result_func
+        self.max_workers = max_workers
+        self.namespace = namespace
+        self.seed = seed
+
+        self.progress_report = progress_report
+        self.print_progress = lambda n_done, n_total, n_failed: '---> ' + \
+                              str(n_done) + ' replicates of total ' + \
+                              str(n_total) + ' have completed, ' + \
+                              str(n_failed) + ' failed'
+
+        self.summary = None
@@ -0,0 +1,478 @@
+'''Propagation of an agent system partitioned over worker processes. The graph
+of the system is split into partitions, each owned by a worker process that
+propagates the agents of its nodes. The state of the nodes at the boundary of
+a partition, the halo, is exchanged between the workers after every step
+
+'''
+from multiprocessing import Pipe
+import os
+import pickle
+import threading
+import traceback
+
+import numpy as np
+import numpy.random
+
+from fjarrsyn.core.checkpoint import _class_path, _imprints_of, _imprint_of
+from fjarrsyn.simulation.simulator import _Simulator
+
+_HALO_LOST = 'Halo exchange with a neighbouring partition was lost\n'
+
+def partition_graph(graph, n_parts, method='bfs', key=None):
+    '''Split the nodes of a graph into partitions of equal size
+
+    Parameters
+    ----------
+    graph : Graph
+        The graph to partition
+    n_parts : int
+        The number of partitions
+    method : str, optional
+        The method of partitioning. For `bfs`, the nodes are ordered by a
+        breadth-first traversal of each connected component, which is cut
+        into contiguous partitions. For `slab`, the nodes are ordered by the
+        key function and cut into slabs, which for a lattice with the
+        coordinate along one axis as key are slabs of the lattice
+    key : callable, optional
+        Function that receives a node and returns the value to order the
+        nodes by, required for the `slab` method
+
+    Returns
+    -------
+    parts : list
+        The partitions as lists of nodes
+
+    Raises
+    ------
+    ValueError
+        If the number of partitions is not between one and the number of
+        nodes, or if the method is unknown or lacks its key
+
+    '''
+    nodes = list(graph.nodes)
+    if n_parts < 1 or n_parts > len(nodes):
+        raise ValueError('Number of partitions %s not between one ' %(str(n_parts)) + \
+                         'and the number of nodes')
+
+    if method == 'bfs':
+        undirected = graph.to_undirected(as_view=True) if graph.is_directed() \
+                     else graph
+        order = []
+        visited = set()
+        for start in nodes:
+            if start in visited:
+                continue
+
+            visited.add(start)
+            order.append(start)
+            k_order = len(order) - 1
+            while k_order < len(order):
+                for neighbour in undirected[order[k_order]]:
+                    if not neighbour in visited:
+                        visited.add(neighbour)
+                        order.append(neighbour)
+                k_order += 1
+
+    elif method == 'slab':
+        if key is None:
+            raise ValueError('The slab partition requires a key function')
+        order = sorted(nodes, key=key)
+
+    else:
+        raise ValueError('Unknown partition method %s' %(method))
+
+    bounds = np.linspace(0, len(order), n_parts + 1).round().astype(int)
+
+    return [order[bounds[k]:bounds[k + 1]] for k in range(n_parts)]
+
+def halo_nodes(graph, owned, depth=1):
+    '''Return the nodes within a number of edges of a set of nodes, not
+    including the set itself. Edges are followed in both directions
+
+    Parameters
+    ----------
+    graph : Graph
+        The graph of the nodes
+    owned : Iterable
+        The set of nodes
+    depth : int, optional
+        The greatest number of edges from the set
+
+    Returns
+    -------
+    halo : list
+        The nodes of the halo, in the order of the graph
+
+    '''
+    undirected = graph.to_undirected(as_view=True) if graph.is_directed() \
+                 else graph
+    owned = set(owned)
+    halo = set()
+    frontier = owned
+    for _ in range(depth):
+        reached = set()
+        for node in frontier:
+            reached.update(undirected[node])
+        frontier = reached - owned - halo
+        halo.update(frontier)
+
+    return [node for node in graph.nodes if node in halo]
+
+def _node_state(node):
+    '''Return the state of a node as its auxiliary content and the name, ID,
+    class and imprints of its agent
+
+    '''
+    agent = node.agent_content
+    if agent is None:
+        return node.aux_content, None
+
+    imprints = [(imprint_type, imprint.name, list(imprint.values())) \
+                for imprint_type, imprint in _imprints_of(agent)]
+
+    return node.aux_content, (agent.agent_id_system, agent.name,
+                              _class_path(agent), agent.ticks, agent.inert,
+                              imprints)
+
+def _apply_node_state(ams, node, state, prototypes):
+    '''Set the state of a node of a system. An agent that differs by ID from
+    the agent of the state is replaced by a copy of the prototype agent of
+    the class of the state
+
+    '''
+    aux_content, agent_state = state
+    node.aux_content = aux_content
+
+    agent = node.agent_content
+    if agent_state is None:
+        if not agent is None:
+            ams.terminate_agent(agent.agent_id_system)
+        return
+
+    agent_id, name, class_path, ticks, inert, imprints = agent_state
+    if agent is None or agent.agent_id_system != agent_id:
+        if not agent is None:
+            ams.terminate_agent(agent.agent_id_system)
+        if agent_id in ams.agents_in_scope:
+            ams.terminate_agent(agent_id)
+
+        if not class_path in prototypes:
+            raise RuntimeError('No agent of class %s in ' %(class_path) + \
+                               'system to create agent %s from' %(name))
+        agent = prototypes[class_path].deepcopy()
+        agent.agent_id_system = agent_id
+        ams.situate(agent, node)
+
+    agent.name = name
+    agent.ticks = ticks
+    agent.inert = inert
+    for imprint_type, array_name, values in imprints:
+        _imprint_of(agent, imprint_type, array_name).set_values(values)
+
+def _send_all(payloads):
+    '''Send payloads on their connections, ignoring closed connections, which
+    are the result of a failure that is reported elsewhere
+
+    '''
+    for conn, payload in payloads:
+        try:
+            conn.send_bytes(payload)
+        except (BrokenPipeError, OSError):
+            pass
+
+class PartitionedSystemRunner(_Simulator):
+    '''Class to simulate an agent system for a finite number of steps, with
+    the system graph partitioned over worker processes
+
+    Parameters
+    ----------
+    n_iter : int
+        Number of steps to simulate
+    system_mover : Mover
+        The Mover of the system, which is applied to each partition
+    n_partitions : int
+        Number of partitions, and worker processes
+    system_io : SystemIO, optional
+        The System IO that samples the system and writes it to disk, applied
+        in the parent process to the state gathered from the workers
+    partitions : list, optional
+        The partitions as lists of nodes. If not given, the graph is
+        partitioned by `partition_graph`
+    partition_method : str, optional
+        The method of `partition_graph`
+    partition_key : callable, optional
+        The key function of `partition_graph`
+    halo_depth : int, optional
+        The number of edges from a partition within which the nodes of other
+        partitions are exchanged after every step
+    seed : int, optional
+        Seed from which the seeds of the random number generators of the
+        workers are derived. If not given, it is drawn from the random number
+        generator of the parent process
+    step_offset : int, optional
+        The step of the first step of the simulation
+
+    Notes
+    -----
+    The workers are forked from the parent process with a copy of the
+    system. The iterators, random selections and counts of nodes and agents
+    of the system in a worker are restricted to the nodes it owns, and the
+    neighbours to the owned nodes and the halo, see `set_owned_nodes` of the
+    agent management system, hence a mover that iterates over the system
+    through these methods propagates only the agents of the partition. After
+    every step each worker sends the state of its nodes in the halo of
+    another partition to the worker of that partition. The state of a node is
+    its auxiliary content and the imprints, name and ID of its agent.
+
+    Within a step an agent therefore reads the state of agents of other
+    partitions as it was at the end of the previous step, and the engines of
+    the agents should read no further than the halo depth from their node.
+    Changes a worker makes to nodes it does not own are overwritten by the
+    state of the owning worker, and changes to the common environment or the
+    graph topology are not exchanged. With the random streams of the system,
+    see `set_random_seed`, the draws of an agent do not depend on the
+    partitioning.
+
+    On the steps the System IO samples, and at the end of the simulation, the
+    workers send the state of their nodes to the parent process, which sets
+    the state of its system accordingly, hence the System IO and the system
+    after the simulation are as for an unpartitioned runner. The workers and
+    their pipes require the `fork` start method of Linux.
+
+    '''
+    def __call__(self, system):
+        '''Simulate the system with the partitions propagated in parallel
+
+        Parameters
+        ----------
+        system : AgentManagementSystem
+            The system to simulate
+
+        Raises
+        ------
+        RuntimeError
+            If a worker fails, with the traceback of the first failure
+
+        '''
+        nodes = list(system.agents_graph.nodes)
+        index_of = dict([(node, k) for k, node in enumerate(nodes)])
+        if self.partitions is None:
+            parts = partition_graph(system.agents_graph, self.n_partitions,
+                                    self.partition_method, self.partition_key)
+        else:
+            parts = [list(part) for part in self.partitions]
+
+        owner = {}
+        for k_part, part in enumerate(parts):
+            for node in part:
+                owner[node] = k_part
+
+        #
+        # The pipes of the halo exchange, one per ordered pair of partitions
+        # where the first owns nodes in the halo of the second
+        #
+        halo_pipes = {}
+        for k_to, part in enumerate(parts):
+            indices = {}
+            for node in halo_nodes(system.agents_graph, part, self.halo_depth):
+                indices.setdefault(owner[node], []).append(index_of[node])
+            for k_from in sorted(indices):
+                conn_recv, conn_send = Pipe(duplex=False)
+                halo_pipes[(k_from, k_to)] = (indices[k_from], conn_recv, conn_send)
+
+        prototypes = {}
+        for agent in system.agents_in_scope.values():
+            if not _class_path(agent) in prototypes:
+                prototypes[_class_path(agent)] = agent.deepcopy()
+
+        gather_steps = set()
+        if not self.io is None:
+            for step in range(self.step_count, self.step_count + self.n_iter):
+                if len(list(self.io._samplers_to_sample_at_(step))) > 0:
+                    gather_steps.add(step)
+
+        seed = self.seed
+        if seed is None:
+            seed = numpy.random.randint(0, 2 ** 31)
+        seeds = [int(child.generate_state(1)[0]) for child in \
+                 np.random.SeedSequence(seed).spawn(len(parts))]
+
+        result_conns = []
+        pids = []
+        for k_part, part in enumerate(parts):
+            conn_recv, conn_send = Pipe(duplex=False)
+            pid = os.fork()
+            if pid == 0:
+                conn_recv.close()
+                for conn in result_conns:
+                    conn.close()
+                self._run_partition(system, k_part, part, nodes, halo_pipes,
+                                    prototypes, gather_steps, seeds[k_part],
+                                    conn_send)
+
+            conn_send.close()
+            result_conns.append(conn_recv)
+            pids.append(pid)
+
+        for _, conn_recv, conn_send in halo_pipes.values():
+            conn_recv.close()
+            conn_send.close()
+
+        errors = {}
+        try:
+            for step in sorted(gather_steps) + [None]:
+                for k_part, conn in enumerate(result_conns):
+                    if k_part in errors:
+                        continue
+
+                    try:
+                        status, _, payload = pickle.loads(conn.recv_bytes())
+                    except (EOFError, OSError):
+                        status, payload = 'error', 'Worker of partition ' + \
+                                          '%s ended abnormally' %(str(k_part))
+
+                    if status == 'error':
+                        errors[k_part] = payload
+                        continue
+
+                    for k_node, state in payload:
+                        _apply_node_state(system, nodes[k_node], state,
+                                          prototypes)
+
+                if len(errors) > 0:
+                    self._drain_errors(result_conns, errors)
+                    break
+
+                if not step is None:
+                    self.io.try_stamp(system, step)
+
+        finally:
+            for conn in result_conns:
+                conn.close()
+            for pid in pids:
+                os.waitpid(pid, 0)
+
+        if len(errors) > 0:
+            #
+            # Workers that lost the halo of a failed neighbour report a
+            # secondary error, hence the first error that is not a loss of
+            # halo is the cause
+            #
+            primary = [k for k in sorted(errors) \
+                       if not errors[k].startswith(_HALO_LOST)]
+            k_part = (primary + sorted(errors))[0]
+            raise RuntimeError('Worker of partition %s failed, ' %(str(k_part)) + \
+                               'error:\n%s' %(errors[k_part]))
+
+        self.step_count += self.n_iter
+
+    def _run_partition(self, system, k_part, part, nodes, halo_pipes,
+                       prototypes, gather_steps, seed, conn_parent):
+        '''Propagate a partition in a worker process and send its state to the
+        parent process. The method does not return, it ends the process
+
+        '''
+        exit_status = 1
+        try:
+            try:
+                sends = []
+                recvs = []
+                for (k_from, k_to), (indices, conn_recv, conn_send) in \
+                    sorted(halo_pipes.items()):
+
+                    if k_from == k_part:
+                        sends.append((conn_send, [nodes[k] for k in indices]))
+                        conn_recv.close()
+                    elif k_to == k_part:
+                        recvs.append((conn_recv, [nodes[k] for k in indices]))
+                        conn_send.close()
+                    else:
+                        conn_recv.close()
+                        conn_send.close()
+
+                numpy.random.seed(seed)
+                system.set_owned_nodes(part, halo_nodes(system.agents_graph, part,
+                                                        self.halo_depth))
+                owned_indices = [k for k, node in enumerate(nodes) \
+                                 if node in system._owned_set]
+                self.io = None
+
+                for _ in range(self.n_iter):
+                    step = self.step_count
+                    self.step(system)
+                    self._exchange(system, sends, recvs, prototypes)
+
+                    if step in gather_steps:
+                        states = [(k, _node_state(nodes[k])) for k in owned_indices]
+                        conn_parent.send_bytes(pickle.dumps(('state', step, states),
+                                                            protocol=pickle.HIGHEST_PROTOCOL))
+
+                states = [(k, _node_state(nodes[k])) for k in owned_indices]
+                payload = pickle.dumps(('done', self.step_count, states),
+                                       protocol=pickle.HIGHEST_PROTOCOL)
+
+            except (EOFError, BrokenPipeError):
+                payload = pickle.dumps(('error', None, _HALO_LOST + \
+                                        traceback.format_exc()))
+
+            except BaseException:
+                payload = pickle.dumps(('error', None, traceback.format_exc()))
+
+            conn_parent.send_bytes(payload)
+            exit_status = 0
+
+        finally:
+            os._exit(exit_status)
+
+    def _drain_errors(self, result_conns, errors):
+        '''Read the remaining messages of the workers after a failure, such
+        that the errors of all workers are collected
+
+        '''
+        for k_part, conn in enumerate(result_conns):
+            while not k_part in errors:
+                try:
+                    status, _, payload = pickle.loads(conn.recv_bytes())
+                except (EOFError, OSError):
+                    break
+
+                if status == 'error':
+                    errors[k_part] = payload
+                elif status == 'done':
+                    break
+
+    def _exchange(self, system, sends, recvs, prototypes):
+        '''Send the state of the owned nodes in the halo of other partitions
+        and set the state of the halo nodes of the partition. The sending is
+        done on a thread, such that large states do not block on full pipes
+
+        '''
+        payloads = [(conn, pickle.dumps([_node_state(node) for node in halo],
+                                        protocol=pickle.HIGHEST_PROTOCOL)) \
+                    for conn, halo in sends]
+        sender = threading.Thread(target=_send_all, args=(payloads,))
+        sender.start()
+
+        try:
+            for conn, halo in recvs:
+                states = pickle.loads(conn.recv_bytes())
+                for node, state in zip(halo, states):
+                    _apply_node_state(system, node, state, prototypes)
+
+        finally:
+            sender.join()
+
+    def __init__(self, n_iter, system_mover, n_partitions, system_io=None,
+                 partitions=None, partition_method='bfs', partition_key=None,
+                 halo_depth=1, seed=None, step_offset=0):
+
+        super().__init__(system_mover, system_io, step_offset)
+
+        self.n_iter = n_iter
+        self.n_partitions = n_partitions if partitions is None \
+                            else len(partitions)
+        self.partitions = partitions
+        self.partition_method = partition_method
+        self.partition_key = partition_key
+        self.halo_depth = halo_depth
+        self.seed = seed
@@ -0,0 +1,86 @@
+'''Execution of independent simulation tasks on a pool of processes, shared by
+the ensemble and sweep runners
+
+'''
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import time
+import traceback
+
+def _timed_call(func, args):
+    '''Call a function and time it. Executed in a process of the pool
+
+    Returns
+    -------
+    result
+        The return value of the function, or None
+    error : str
+        The traceback of an exception raised by the function, or None
+    run_time : float
+        The time in seconds the call took
+
+    '''
+    t_start = time.perf_counter()
+    try:
+        return func(*args), None, time.perf_counter() - t_start
+
+    except Exception:
+        return None, traceback.format_exc(), time.perf_counter() - t_start
+
+def run_on_pool(func, tasks, max_workers=None, on_done=None,
+                print_progress=None):
+    '''Execute a function for each of a collection of arguments on a pool of
+    processes
+
+    Parameters
+    ----------
+    func : callable
+        The function to execute, which must be picklable
+    tasks : list
+        Tuples of the positional arguments of the function, one per task
+    max_workers : int, optional
+        The number of processes of the pool. If not given, the number of
+        processors
+    on_done : callable, optional
+        Function that receives the index of a task, its result and its error
+        as the task completes, in the order of completion
+    print_progress : callable, optional
+        Function that receives the number of completed tasks, the total number
+        of tasks and the number of failed tasks, and returns a progress
+        statement that is printed to stdout as each task completes
+
+    Returns
+    -------
+    outcomes : list
+        Tuples of result, error and run time of each task, in the order of
+        the tasks. The result is None and the error a traceback for a task
+        that raised an exception, or whose process terminated abnormally
+
+    '''
+    outcomes = [None] * len(tasks)
+    n_failed = 0
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = dict([(executor.submit(_timed_call, func, args), k_task) \
+                        for k_task, args in enumerate(tasks)])
+
+        for n_done, future in enumerate(as_completed(futures)):
+            k_task = futures[future]
+            try:
+                outcome = future.result()
+
+            except Exception:
+                #
+                # The process of the task terminated abnormally
+                #
+                outcome = (None, traceback.format_exc(), 0.0)
+
+            outcomes[k_task] = outcome
+            if not outcome[1] is None:
+                n_failed += 1
+
+            if not on_done is None:
+                on_done(k_task, outcome[0], outcome[1])
+
+            if not print_progress is None:
+                print (print_progress(n_done + 1, len(tasks), n_failed))
+
+    return outcomes
@@ -4,12 +4,20 @@ environment properties and system topological properties.
 
 '''
 from collections.abc import Iterable
+from collections import Counter
 import operator
+import os
+import time
 
+import numpy as np
 import networkx as nx
 from pandas import DataFrame, Series, Index
 
 from fjarrsyn.core.constants import AGENT_IMPRINTS
+from fjarrsyn.core.array import REVISION_CLOCK
+from fjarrsyn.simulation.writer import BackgroundWriter
+from fjarrsyn.simulation.sink import _Sink
+from fjarrsyn.simulation.accumulator import Moments, Histogram, QuantileSketch
 
 class AgentSampler(object):
     '''Given an Agent Management System, the state of the agents are sampled in
@@ -40,6 +48,31 @@ class AgentSampler(object):
     sample_steps : int, optional
         Integer that instructs a simulator or IO class at what multiples of
         simulated steps to execute the Agent Sampler.
+    delta : bool, optional
+        If True, sampling of an Agent Management System only includes the
+        agents and elements that changed since the previous sampling, as well
+        as a record of agents that were removed. Full samples, or keyframes,
+        are taken at the first sampling and periodically thereafter. See Notes
+        for details.
+    keyframe_every : int, optional
+        In delta mode, the number of samplings between keyframes. If not
+        given, only the first sampling is a keyframe.
+    subsample : int, optional
+        If provided, at most this number of the matching agents are sampled,
+        selected uniformly at random by reservoir sampling in the pass over the
+        system. If `stratify_by` is given, the number applies to each stratum.
+    stratify_by : str or callable, optional
+        If provided with `subsample`, the agents are partitioned into strata,
+        and the reservoir sampling is done per stratum. If `class`, the strata
+        are the agent classes, if `name`, the agent names. If a callable, it
+        takes an Agent as input and returns the stratum key.
+    follow_cohort : bool, optional
+        If True with `subsample`, the agents selected at the first sampling
+        form a cohort, which is sampled at every subsequent sampling. Agents
+        of the cohort that leave the system are not replaced.
+    random_state : int or RandomState, optional
+        Seed or random number generator of the reservoir sampling. If not
+        given, the global generator of numpy is used.
 
     Notes
     -----
@@ -47,6 +80,24 @@ class AgentSampler(object):
     wherein the data from the Agent Sampler is written to disk by the System IO
     instance. 
 
+    In delta mode the sampled data contains the additional column `frame`,
+    which is `full` for all data of a keyframe, `new` for all data of an agent
+    that was not present at the previous sampling, `delta` for the elements of
+    an agent that changed since the previous sampling and `removed` for an
+    agent that was present at the previous sampling, but no longer is. The
+    function `reconstruct_agent_state` recreates the full sample at any
+    sampled generation from the concatenated delta samples. Changes are
+    detected through the revisions of the imprints of the agents, which are
+    advanced by any write that alters a value. The sampler is therefore
+    stateful in delta mode, and the same instance should not be used to
+    sample different systems.
+
+    Subsampling bounds the data of a sampling independent of the number of
+    agents in the system. Delta mode with subsampling is best combined with
+    `follow_cohort`, since otherwise the selected agents vary between
+    samplings, and each change of selection is recorded as removed and new
+    agents.
+
     The format of the semantic elements of the containers for `resource_args`,
     `essence_args` and `belief_args` is a two-membered tuple with semantic
     content as follows:
@@ -63,9 +114,11 @@ class AgentSampler(object):
         other format than specified.
     TypeError
         If the matcher is not a callable
+    TypeError
+        If the `stratify_by` is not one of the allowed values
 
     '''
-    def sample_one(self, agent, generation=0):
+    def sample_one(self, agent, generation=0, since=None):
         '''Perform a sampling of specific agent
 
         Parameters
@@ -77,6 +130,10 @@ class AgentSampler(object):
             provide the current generation or iteration of the sampling, such
             that this value becomes included as meta data in the sampling
             output
+        since : int, optional
+            If provided, only elements with a revision greater than this value
+            of the global revision clock are sampled, that is elements that
+            changed after the clock had this value
 
         Returns
         -------
@@ -125,6 +182,10 @@ class AgentSampler(object):
                     # label and retrieve the corresponding value
                     #
                     if key == arg_name:
+                        if (not since is None) and \
+                           imprint.revision(key) <= since:
+                            continue
+
                         label = ':'.join([imprint_type, array_name, key])
                         d_out[label] = value
 
@@ -151,17 +212,253 @@ class AgentSampler(object):
             Agent, each Series contains data as specified in the sampler
             initialization, see ``sample_one`` for details.
 
+        Notes
+        -----
+        In delta mode the sampling is part of the sequence of delta samplings,
+        as for `__call__`. The Series of an agent then contains only the
+        elements that changed since the previous sampling, and the additional
+        entry `frame`. An agent that was removed since the previous sampling
+        has a Series with the entry `frame` equal to `removed` and no data.
+        With subsampling, only the selected agents are sampled, and a cohort
+        is formed and followed as for `__call__`.
+
         '''
-        rows = []
+        state = self._begin(ams, generation)
         for node in ams:
-            agent = node.agent_content
+            self._visit(state, node)
+
+        return self._conclude(state)
+
+    def _begin(self, ams, generation):
+        '''Initialize the state of a sampling pass over the nodes of a system.
+        Together with `_visit` and `_end` this defines the node traversal
+        protocol, which enables a System IO to fuse several samplers into a
+        single pass over the nodes
+
+        Parameters
+        ----------
+        ams : AgentManagementSystem
+            The agent management system to sample
+        generation : int
+            The current generation or iteration of the sampling
+
+        Returns
+        -------
+        state : dict
+            The mutable state of the sampling pass
+
+        '''
+        state = {'generation' : generation, 'rows' : []}
+
+        if not self.subsample is None:
+            state['reservoirs'] = {}
+            state['n_seen'] = {}
+            state['cohort_agents'] = []
+
+        if self.delta:
+            if self.keyframe_every is None:
+                keyframe = self._n_samplings == 0
+            else:
+                keyframe = self._n_samplings % self.keyframe_every == 0
+
+            state['keyframe'] = keyframe
+            state['revision'] = REVISION_CLOCK.value
+            state['present'] = {}
+
+        return state
+
+    def _visit(self, state, node):
+        '''Sample one node of the system as part of a sampling pass
+
+        Parameters
+        ----------
+        state : dict
+            The state of the sampling pass, as created by `_begin`
+        node : Node
+            The node to sample
+
+        '''
+        agent = node.agent_content
+        if not self.matcher(agent):
+            return
+
+        if self.subsample is None:
+            self._sample_agent(state, agent)
+
+        elif not self._cohort is None:
+            if agent.agent_id_system in self._cohort:
+                state['cohort_agents'].append(agent)
+
+        else:
+            self._reservoir_add(state, agent)
+
+    def _reservoir_add(self, state, agent):
+        '''Offer an agent to the reservoir of its stratum. The reservoir holds
+        a uniform random selection of the agents offered so far
+
+        Parameters
+        ----------
+        state : dict
+            The state of the sampling pass, as created by `_begin`
+        agent : Agent
+            The agent to offer
+
+        '''
+        if self.stratify_by is None:
+            stratum = None
+        else:
+            stratum = self._stratum_(agent)
+
+        reservoir = state['reservoirs'].setdefault(stratum, [])
+        n_seen = state['n_seen'].get(stratum, 0) + 1
+        state['n_seen'][stratum] = n_seen
+
+        if len(reservoir) < self.subsample:
+            reservoir.append(agent)
+
+        else:
+            k_slot = self._rng.randint(0, n_seen)
+            if k_slot < self.subsample:
+                reservoir[k_slot] = agent
+
+    def _sample_agent(self, state, agent):
+        '''Add the sampled data of an agent to the state of a sampling pass
+
+        Parameters
+        ----------
+        state : dict
+            The state of the sampling pass, as created by `_begin`
+        agent : Agent
+            The agent to sample
+
+        '''
+        if not self.delta:
+            state['rows'].append(self.sample_one(agent, state['generation']))
+            return
+
+        agent_id = agent.agent_id_system
+        if state['keyframe']:
+            since, frame = None, 'full'
+        elif not agent_id in self._present:
+            since, frame = None, 'new'
+        else:
+            since, frame = self._revision, 'delta'
+
+        row = self.sample_one(agent, state['generation'], since)
+        row['frame'] = frame
+        state['rows'].append(row)
+
+        state['present'][agent_id] = agent.name
+
+    def _conclude(self, state):
+        '''Conclude a sampling pass over the nodes of a system with the
+        sampling of the selected agents of a subsampling, and in delta mode
+        the record of the removed agents
+
+        Parameters
+        ----------
+        state : dict
+            The state of the sampling pass, as created by `_begin`
+
+        Returns
+        -------
+        rows : list
+            List of Pandas Series, one per sampled agent, see `sample_many`
+
+        '''
+        if not self.subsample is None:
+            if self._cohort is None:
+                selected = []
+                for reservoir in state['reservoirs'].values():
+                    selected.extend(reservoir)
+
+                if self.follow_cohort:
+                    self._cohort = set([agent.agent_id_system
+                                        for agent in selected])
+
+            else:
+                selected = state['cohort_agents']
+
+            for agent in selected:
+                self._sample_agent(state, agent)
+
+        if self.delta:
+            for agent_id, name in self._present.items():
+                if not agent_id in state['present']:
+                    state['rows'].append(Series({self.indexer[0] : state['generation'],
+                                                 self.indexer[1] : name,
+                                                 self.indexer[2] : agent_id,
+                                                 'frame' : 'removed'}))
+
+            self._present = state['present']
+            self._revision = state['revision']
+            self._n_samplings += 1
+
+        return state['rows']
+
+    def _end(self, state):
+        '''Conclude a sampling pass over the nodes of a system
+
+        Parameters
+        ----------
+        state : dict
+            The state of the sampling pass, as created by `_begin`
+
+        Returns
+        -------
+        df : Pandas DataFrame
+            A stacked pandas DataFrame of sampled agent data.
+
+        '''
+        rows = self._conclude(state)
+        if not self.delta:
+            return self._stack(rows)
+
+        records = []
+        for row in rows:
+            head = (state['generation'], row[self.indexer[1]], row[self.indexer[2]])
+            if row['frame'] == 'removed':
+                records.append(head + (None, None, 'removed'))
+                continue
+
+            for label, value in row.iloc[len(self.indexer):-1].items():
+                records.append(head + (label, value, row['frame']))
+
+        df = DataFrame(records, columns=self.indexer + ['variable', 'value', 'frame'])
+        df = df.set_index(self.indexer + ['variable'])
+        df = df.sort_values(self.indexer)
+
+        return df
+
+    def _stack(self, rows):
+        '''Create the stacked DataFrame from sampled rows
+
+        Parameters
+        ----------
+        rows : list
+            List of Pandas Series, one per sampled agent
 
-            if self.matcher(agent):
-                
-                df_row = self.sample_one(agent, generation)
-                rows.append(df_row)
+        Returns
+        -------
+        df : Pandas DataFrame
+            A stacked pandas DataFrame of sampled agent data.
+
+        '''
+        #
+        # 1. Create a DataFrame, pivotted, such that there is one row per agent
+        # 2. Stack the data columns, such that there is one row per data entry
+        # 3 & 4. Adjust labels and ordering of rows to be intuitive
+        #
+        if len(rows) == 0:
+            df = DataFrame([], columns=self.indexer + ['variable', 'value'])
+            return df.set_index(self.indexer + ['variable'])
+
+        df = DataFrame(rows)
+        df = df.melt(id_vars=self.indexer)
+        df = df.set_index(self.indexer + ['variable'])
+        df = df.sort_values(self.indexer)
 
-        return rows
+        return df
 
     def __call__(self, x_obj, generation=0):
         '''Dynamic sampling of object by the AgentSampler class. The object
@@ -191,31 +488,28 @@ class AgentSampler(object):
         desired. The sampled data is easily turned into a CSV file by invoking
         the method `.to_csv('output.csv')` to the DataFrame output.
 
+        The sampling of a single Agent is always a full sampling, also in
+        delta mode.
+
         '''
         #
         # Agent cannot be iterated over, AgentManagementSystem can
         #
         if not hasattr(x_obj, '__iter__'):
-            data = [self.sample_one(x_obj, generation)]
+            return self._stack([self.sample_one(x_obj, generation)])
 
-        else: 
-            data = self.sample_many(x_obj, generation)
+        state = self._begin(x_obj, generation)
+        for node in x_obj:
+            self._visit(state, node)
 
-        #
-        # 1. Create a DataFrame, pivotted, such that there is one row per agent
-        # 2. Stack the data columns, such that there is one row per data entry
-        # 3 & 4. Adjust labels and ordering of rows to be intuitive
-        #
-        df = DataFrame(data)
-        df = df.melt(id_vars=self.indexer)
-        df = df.set_index(self.indexer + ['variable'])
-        df = df.sort_values(self.indexer)
-
-        return df
+        return self._end(state)
 
     def __init__(self, name, 
                  resource_args=None, essence_args=None, belief_args=None,
-                 agent_matcher=None, sample_steps=1):
+                 agent_matcher=None, sample_steps=1,
+                 delta=False, keyframe_every=None,
+                 subsample=None, stratify_by=None, follow_cohort=False,
+                 random_state=None):
 
         self.name = name
         self.indexer = ['generation', 'name', 'agent_index']
@@ -246,6 +540,97 @@ class AgentSampler(object):
 
         self.sample_steps = sample_steps
 
+        self.delta = delta
+        if not keyframe_every is None:
+            if keyframe_every < 1:
+                raise ValueError('The `keyframe_every` must be a positive integer')
+        self.keyframe_every = keyframe_every
+        self._n_samplings = 0
+        self._revision = 0
+        self._present = {}
+
+        if not subsample is None:
+            if subsample < 1:
+                raise ValueError('The `subsample` must be a positive integer')
+        self.subsample = subsample
+
+        self.stratify_by = stratify_by
+        if stratify_by is None:
+            self._stratum_ = None
+        elif stratify_by == 'class':
+            self._stratum_ = lambda x: x.__class__.__name__
+        elif stratify_by == 'name':
+            self._stratum_ = lambda x: x.name
+        elif callable(stratify_by):
+            self._stratum_ = stratify_by
+        else:
+            raise TypeError('The `stratify_by` must be `class`, `name` or callable')
+
+        self.follow_cohort = follow_cohort
+        self._cohort = None
+
+        if random_state is None:
+            self._rng = np.random
+        elif isinstance(random_state, np.random.RandomState):
+            self._rng = random_state
+        else:
+            self._rng = np.random.RandomState(random_state)
+
+def reconstruct_agent_state(df, generation):
+    '''Reconstruct the full sample of agent data at a generation from the
+    samples of an Agent Sampler in delta mode
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        The concatenation of the delta samples, at least from the keyframe
+        preceding the generation up to the generation, in the format returned
+        by the Agent Sampler or as read from a file or sink
+    generation : int
+        The generation at which to reconstruct the sample
+
+    Returns
+    -------
+    df_full : Pandas DataFrame
+        The sample of agent data at the generation, in the format of an Agent
+        Sampler that is not in delta mode
+
+    Raises
+    ------
+    ValueError
+        If the data does not contain the `frame` column of delta samples
+
+    '''
+    df = df.reset_index()
+    if not 'frame' in df.columns:
+        raise ValueError('The data does not contain delta samples')
+
+    df = df[df['generation'] <= generation]
+
+    #
+    # Only the samples from the latest keyframe onwards matter
+    #
+    keyframes = df.loc[df['frame'] == 'full', 'generation']
+    if len(keyframes) > 0:
+        df = df[df['generation'] >= keyframes.max()]
+
+    removed = set(df.loc[df['frame'] == 'removed', 'agent_index'])
+    df = df[~df['agent_index'].isin(removed)]
+
+    #
+    # The latest value of each element is the current value
+    #
+    df = df.sort_values('generation', kind='mergesort')
+    df = df.groupby(['name', 'agent_index', 'variable'], sort=False).tail(1)
+    df = df.drop(columns=['generation', 'frame'])
+    df.insert(0, 'generation', generation)
+
+    indexer = ['generation', 'name', 'agent_index']
+    df = df.set_index(indexer + ['variable'])
+    df = df.sort_values(indexer)
+
+    return df
+
 class EnvSampler(object):
     '''Given an Agent Management System, the state of the environment is
     sampled in an easy to use data format.
@@ -364,23 +749,72 @@ class EnvSampler(object):
         # of the system.
         #
         else:
-            rows = []
+            state = self._begin(ams, generation)
             for node in ams:
-                agent = node.agent_content
-                aux = node.aux_content
+                self._visit(state, node)
 
-                if self.matcher(agent): 
-                    rows.append(self.sample_one(agent, aux, generation))
+            df = self._end(state)
 
-            #
-            # 1. Create a DataFrame, pivotted, such that there is one row per agent
-            # 2. Stack the data columns, such that there is one row per data entry
-            # 3 & 4. Adjust labels and ordering of rows to be intuitive
-            #
-            df = DataFrame(rows)
-            df = df.melt(id_vars=self.indexer)
-            df = df.set_index(self.indexer + ['variable'])
-            df = df.sort_values(self.indexer)
+        return df
+
+    def _begin(self, ams, generation):
+        '''Initialize the state of a sampling pass over the nodes of a system,
+        see `AgentSampler._begin` for details on the node traversal protocol
+
+        Parameters
+        ----------
+        ams : AgentManagementSystem
+            The agent management system to sample
+        generation : int
+            The current generation or iteration of the sampling
+
+        Returns
+        -------
+        state : dict
+            The mutable state of the sampling pass
+
+        '''
+        return {'generation' : generation, 'rows' : []}
+
+    def _visit(self, state, node):
+        '''Sample the local environment of one node as part of a sampling pass
+
+        Parameters
+        ----------
+        state : dict
+            The state of the sampling pass, as created by `_begin`
+        node : Node
+            The node to sample
+
+        '''
+        agent = node.agent_content
+        if self.matcher(agent): 
+            state['rows'].append(self.sample_one(agent, node.aux_content,
+                                                 state['generation']))
+
+    def _end(self, state):
+        '''Conclude a sampling pass over the nodes of a system
+
+        Parameters
+        ----------
+        state : dict
+            The state of the sampling pass, as created by `_begin`
+
+        Returns
+        -------
+        df : Pandas DataFrame
+            A stacked pandas DataFrame of sampled environment data. 
+
+        '''
+        #
+        # 1. Create a DataFrame, pivotted, such that there is one row per agent
+        # 2. Stack the data columns, such that there is one row per data entry
+        # 3 & 4. Adjust labels and ordering of rows to be intuitive
+        #
+        df = DataFrame(state['rows'])
+        df = df.melt(id_vars=self.indexer)
+        df = df.set_index(self.indexer + ['variable'])
+        df = df.sort_values(self.indexer)
 
         return df
 
@@ -404,105 +838,659 @@ class EnvSampler(object):
 
         self.sample_steps = sample_steps
 
-class GraphSampler(object):
-    '''Perform a sampling of the agent systems network
+class AggregateSampler(object):
+    '''Given an Agent Management System, summary statistics of imprint values
+    across the agents are computed in a single pass by streaming accumulators
 
     Parameters
     ----------
-    key_occ_node : callable, optional
-        If a callable, the function takes a Node object as input, the Node
-        object containing an agent object, and returns a string key. Typically
-        the agent name or agent ID is returned. If not set, the label
-        substitution defaults to the agent ID.
-    key_unocc_node : callable, optional
-        If a callable, the function takes a Node object as input, the Node
-        object being without an agent object, and returns a string key. 
-        Typically this is a constant string, or some node attribute. If not 
-        set, the label substitution defaults to string `unoccupied`.
-    report_empty_to_empty : bool, optional
-        If True, the entire graph is sampled, including edges between nodes
-        that contain no Agent. If False, only the part of the graph with edges
-        comprised of at least one node containing an Agent is sampled.
+    name : str
+        Name of the sampler
+    resource_args : list or tuple, optional
+        If provided, the container should include semantic elements, which
+        define one resource of the agent to aggregate. The format is as for
+        the `AgentSampler`.
+    essence_args : list or tuple, optional
+        If provided, the container should include semantic elements, which
+        define one essence of the agent to aggregate. The format is as for
+        the `AgentSampler`.
+    belief_args : list or tuple, optional
+        If provided, the container should include semantic elements, which
+        define one belief of the agent to aggregate. The format is as for
+        the `AgentSampler`.
+    agent_matcher : callable, optional
+        If provided, the callable takes one input, an Agent, and returns True
+        if the agent is to be included in the aggregate, False otherwise. If
+        not provided, all agents are included.
+    histogram_bins : iterable or dict, optional
+        If provided, the values are counted in fixed bins. Either an iterable
+        of bin edges applied to all aggregated values, or a dictionary with
+        the compact label of a value, such as `essence:Bacteria Essence:E1`,
+        as key and the bin edges of that value as value
+    quantiles : iterable, optional
+        If provided, the approximate quantiles to report, each between zero
+        and one
+    compression : int, optional
+        The compression of the quantile sketch, see `QuantileSketch`
     sample_steps : int, optional
         Integer that instructs a simulator or IO class at what multiples of
-        simulated steps to execute the Agent Sampler.
-        
+        simulated steps to execute the Aggregate Sampler.
+
     Notes
     -----
-    The graph sampling operates by replicating the network topology of the
-    agent system, and by substituting the agent objects with labels for easy
-    interpretation and cross-referencing. The mapping from agent object to
-    label is defined during initialization.
+    The sampling returns a pandas DataFrame with a single row, indexed on
+    generation, and one column per statistic and aggregated value. The column
+    names are the compact label of the value and the statistic joined by
+    colon, for example `essence:Bacteria Essence:E1:mean`. The statistics are
+    `count`, `mean`, `var`, `min` and `max`, the histogram counts `below`,
+    `bin_<k>` and `above`, and the quantiles `q<quantile>`.
+
+    Values that are None are not aggregated. The accumulators of the latest
+    sampling are available as the attribute `accumulators`, a dictionary
+    keyed on compact label, which enables merging with aggregates of other
+    systems.
 
-    '''
-    def _make_labels_only(self, network):
-        '''Create a new network of identical topology, but with the nodes
-        swapped for the agent label. This is needed to create a representation
-        that can be serialized as a string
+    Raises
+    ------
+    TypeError
+        If the resource, essence or belief argument semantics is defined in
+        other format than specified.
+    TypeError
+        If the matcher is not a callable
 
-        Parameters
-        ----------
-        network 
-            The reference network, from `networkx` library
+    '''
+    def _new_accumulators(self):
+        '''Create the empty accumulators of one sampling
 
         Returns
         -------
-        network_agent_labels
-            The new network with the label substitution, all else the same as
-            the input network
-
-        Raises
-        ------
-        RuntimeError
-            If the number of nodes changes after re-labelling. This is caused
-            by non-unique node labels. The method attempts to make labels
-            unique, but in some edge-cases that include labels that end on
-            `_<integer>`, this routine can conceivably fail.
+        accumulators : dict
+            For each compact label, a dictionary of the accumulators
 
         '''
-        mapping = {}
-        for node in network:
-
-            if not node.agent_content is None:
-                mapping[node] = self.key_occ_(node)
+        accumulators = {}
+        for _, _, _, label in self._targets:
+            acc = {'moments' : Moments()}
 
-            else:
-                mapping[node] = self.key_unocc_(node)
-
-        #
-        # In the event that node labels are identical, they are uniquified in a
-        # predictable manner.
-        #
-        if len(set(mapping.values())) < nx.number_of_nodes(network):
-
-            value_values = set(mapping.values())
-            v_map = {}
-            for v in value_values:
-                n_vals = list(mapping.values()).count(v)
-                if n_vals > 1:
-                    v_unique = [v + '_%s'%(str(k)) for k in range(n_vals)]
-                    v_map[v] = v_unique
-                else:
-                    v_map[v] = [v]
-
-            mapping_unique = {}
-            for key, value in mapping.items():
-                mapping_unique[key] = v_map[value].pop(0)
-            mapping = mapping_unique
+            if isinstance(self.histogram_bins, dict):
+                if label in self.histogram_bins:
+                    acc['histogram'] = Histogram(self.histogram_bins[label])
+            elif not self.histogram_bins is None:
+                acc['histogram'] = Histogram(self.histogram_bins)
 
-        #
-        # The relabelling
-        #
-        network_agent_labels = nx.relabel_nodes(network, mapping)
+            if not self.quantiles is None:
+                acc['sketch'] = QuantileSketch(self.compression)
 
-        if nx.number_of_nodes(network_agent_labels) != nx.number_of_nodes(network):
-            raise RuntimeError('After relabelling number of nodes changes. ' + \
-                               'Likely an edge-case in the key functions')
+            accumulators[label] = acc
 
-        return network_agent_labels
+        return accumulators
 
-    def __call__(self, ams, generation=0):
-        '''Perform a sampling of the system graph
+    def add_agent(self, accumulators, agent):
+        '''Add the values of an agent to the accumulators
+
+        Parameters
+        ----------
+        accumulators : dict
+            The accumulators as created for one sampling
+        agent : Agent
+            The agent to add
+
+        '''
+        if not self.matcher(agent):
+            return
+
+        for imprint_type, array_name, key, label in self._targets:
+            if imprint_type == 'belief':
+                value = agent.belief[array_name][key]
+            else:
+                value = getattr(agent, imprint_type)[key]
+
+            if value is None:
+                continue
+
+            for accumulator in accumulators[label].values():
+                accumulator.add(value)
+
+    def _summarize(self, accumulators, generation):
+        '''Create the per-generation row of statistics
+
+        Parameters
+        ----------
+        accumulators : dict
+            The populated accumulators
+        generation : int
+            The generation of the sampling
+
+        Returns
+        -------
+        df : Pandas DataFrame
+            The statistics of the sampling as a single row
+
+        '''
+        row = {}
+        for label, acc in accumulators.items():
+            for stat, value in acc['moments'].summary().items():
+                row[label + ':' + stat] = value
+
+            if 'histogram' in acc:
+                for stat, value in acc['histogram'].summary().items():
+                    row[label + ':' + stat] = value
+
+            if 'sketch' in acc:
+                for q in self.quantiles:
+                    row[label + ':q' + str(q)] = acc['sketch'].quantile(q)
+
+        df = DataFrame([row], index=Index([generation], name='generation'))
+
+        return df
+
+    def _begin(self, ams, generation):
+        '''Initialize the state of a sampling pass over the nodes of a system,
+        see `AgentSampler._begin` for details on the node traversal protocol
+
+        Parameters
+        ----------
+        ams : AgentManagementSystem
+            The agent management system to sample
+        generation : int
+            The current generation or iteration of the sampling
+
+        Returns
+        -------
+        state : dict
+            The mutable state of the sampling pass
+
+        '''
+        return {'generation' : generation,
+                'accumulators' : self._new_accumulators()}
+
+    def _visit(self, state, node):
+        '''Add the agent of one node to the accumulators as part of a sampling
+        pass
+
+        Parameters
+        ----------
+        state : dict
+            The state of the sampling pass, as created by `_begin`
+        node : Node
+            The node to sample
+
+        '''
+        self.add_agent(state['accumulators'], node.agent_content)
+
+    def _end(self, state):
+        '''Conclude a sampling pass over the nodes of a system
+
+        Parameters
+        ----------
+        state : dict
+            The state of the sampling pass, as created by `_begin`
+
+        Returns
+        -------
+        df : Pandas DataFrame
+            The statistics of the sampling as a single row
+
+        '''
+        self.accumulators = state['accumulators']
+
+        return self._summarize(state['accumulators'], state['generation'])
+
+    def __call__(self, ams, generation=0):
+        '''Compute the summary statistics of the agents of a system
+
+        Parameters
+        ----------
+        ams : AgentManagementSystem
+            An agent management system populated with Agents
+        generation : int, optional
+            If the sampling is part of a simulation, this parameter enables to
+            provide the current generation or iteration of the sampling, such
+            that this value becomes the index of the sampling output
+
+        Returns
+        -------
+        df : Pandas DataFrame
+            The statistics of the sampling as a single row, see class Notes
+
+        '''
+        state = self._begin(ams, generation)
+        for node in ams:
+            self._visit(state, node)
+
+        return self._end(state)
+
+    def __init__(self, name,
+                 resource_args=None, essence_args=None, belief_args=None,
+                 agent_matcher=None, histogram_bins=None, quantiles=None,
+                 compression=100, sample_steps=1):
+
+        self.name = name
+
+        self._targets = []
+        for imprint_type in AGENT_IMPRINTS:
+            args = locals()[imprint_type + '_args']
+            if args is None:
+                continue
+
+            args_ok = False
+            if isinstance(args, Iterable):
+                if all([len(x) == 2 for x in args]):
+                    args_ok = True
+
+            if not args_ok:
+                raise TypeError('Value to `%s_args` should be an ' %(imprint_type)+ \
+                                'iterable of two-membered tuples/lists ' + \
+                                'each element referring to one %s' %(imprint_type))
+
+            for array_name, key in args:
+                label = ':'.join([imprint_type, array_name, key])
+                self._targets.append((imprint_type, array_name, key, label))
+
+        if not agent_matcher is None:
+            if not callable(agent_matcher):
+                raise TypeError('The agent_matcher should be a callable')
+            self.matcher = agent_matcher
+        else:
+            self.matcher = lambda x: False if x is None else True 
+
+        self.histogram_bins = histogram_bins
+        self.quantiles = quantiles
+        self.compression = compression
+        self.sample_steps = sample_steps
+
+        self.accumulators = None
+
+class GraphSampler(object):
+    '''Perform a sampling of the agent systems network
+
+    Parameters
+    ----------
+    key_occ_node : callable, optional
+        If a callable, the function takes a Node object as input, the Node
+        object containing an agent object, and returns a string key. Typically
+        the agent name or agent ID is returned. If not set, the label
+        substitution defaults to the agent ID.
+    key_unocc_node : callable, optional
+        If a callable, the function takes a Node object as input, the Node
+        object being without an agent object, and returns a string key. 
+        Typically this is a constant string, or some node attribute. If not 
+        set, the label substitution defaults to string `unoccupied`.
+    report_empty_to_empty : bool, optional
+        If True, the entire graph is sampled, including edges between nodes
+        that contain no Agent. If False, only the part of the graph with edges
+        comprised of at least one node containing an Agent is sampled.
+    sample_steps : int, optional
+        Integer that instructs a simulator or IO class at what multiples of
+        simulated steps to execute the Agent Sampler.
+    cache_labels : bool, optional
+        If True, the label of a node is computed once and reused for as long
+        as the node holds the same agent, or remains unoccupied. This assumes
+        the key functions return the same label for a given node and agent.
+        If False, the labels are computed anew at every sampling.
+    diff : bool, optional
+        If True, the sampling returns the changes to the topology and node
+        labels since the previous sampling as a DataFrame, rather than the
+        complete network. Full samples, or keyframes, are taken at the first
+        sampling and periodically thereafter. See Notes for details.
+    keyframe_every : int, optional
+        In diff mode, the number of samplings between keyframes. If not given,
+        only the first sampling is a keyframe.
+
+    Raises
+    ------
+    ValueError
+        If diff mode is combined with `report_empty_to_empty` set to False
+        
+    Notes
+    -----
+    The graph sampling operates by replicating the network topology of the
+    agent system, and by substituting the agent objects with labels for easy
+    interpretation and cross-referencing. The mapping from agent object to
+    label is defined during initialization.
+
+    If only the edge list of the network is needed, the methods
+    `generate_edgelist` and `write_edgelist` stream the labelled edges
+    directly from the network of the agent system, without creating a
+    replicate network.
+
+    In diff mode the sampler reads the topology log of the agent system, and
+    each node is identified by an integer index that is stable for the
+    lifetime of the sampler, with the label as an attribute. The DataFrame is
+    indexed on generation, and has the columns `frame`, `event`, `node_1`,
+    `node_2` and `label`. The `frame` is `full` for the rows of a keyframe and
+    `delta` otherwise. The `event` is one of:
+
+    * `node` : A node with index `node_1` and label `label`
+    * `edge` : An edge between `node_1` and `node_2` in a keyframe
+    * `edge_add` : An edge between `node_1` and `node_2` was added
+    * `edge_remove` : The edge between `node_1` and `node_2` was removed
+    * `label` : The label of node `node_1` changed to `label`
+
+    The function `reconstruct_graph` recreates the network at any sampled
+    generation from the concatenated diff samples. Only changes made through
+    the methods of the agent management system are recorded in the topology
+    log, see `TopologyLog`. The sampler is stateful in diff mode, and the
+    same instance should not be used to sample different systems.
+
+    '''
+    def _node_label(self, node):
+        '''Compute the raw label of a node, prior to any uniquification
+
+        Parameters
+        ----------
+        node : Node
+            The node to label
+
+        Returns
+        -------
+        label : str
+            The label of the node as defined by the key functions
+
+        '''
+        if not node.agent_content is None:
+            return self.key_occ_(node)
+
+        else:
+            return self.key_unocc_(node)
+
+    def _cached_label(self, node, cache):
+        '''Retrieve the raw label of a node from the label cache, or compute it
+        if the node content has changed since the label was cached
+
+        Parameters
+        ----------
+        node : Node
+            The node to label
+        cache : dict
+            The label cache of the current sampling pass, to which the label
+            is added
+
+        Returns
+        -------
+        label : str
+            The label of the node as defined by the key functions
+
+        '''
+        agent = node.agent_content
+
+        if self.cache_labels:
+            entry = self._label_cache.get(node)
+            if (not entry is None) and entry[0] is agent:
+                cache[node] = entry
+                return entry[1]
+
+        label = self._node_label(node)
+        cache[node] = (agent, label)
+
+        return label
+
+    def _unique_labels(self, mapping):
+        '''Make the labels of the nodes unique. Identical labels are suffixed
+        with `_<integer>`, the integer counting the occurrences of the label
+        in the order of the mapping
+
+        Parameters
+        ----------
+        mapping : dict
+            Raw labels keyed on node
+
+        Returns
+        -------
+        mapping_unique : dict
+            Unique labels keyed on node
+
+        Raises
+        ------
+        RuntimeError
+            If the labels are not unique after the suffixes are added. This
+            can happen in edge-cases with raw labels that end on `_<integer>`.
+
+        '''
+        counts = Counter(mapping.values())
+        if len(counts) == len(mapping):
+            return mapping
+
+        n_seen = Counter()
+        mapping_unique = {}
+        for node, label in mapping.items():
+            if counts[label] > 1:
+                mapping_unique[node] = label + '_%s' %(str(n_seen[label]))
+                n_seen[label] += 1
+
+            else:
+                mapping_unique[node] = label
+
+        if len(set(mapping_unique.values())) < len(mapping_unique):
+            raise RuntimeError('After relabelling number of nodes changes. ' + \
+                               'Likely an edge-case in the key functions')
+
+        return mapping_unique
+
+    def _keep_edge(self, node_1, node_2):
+        '''Determine if an edge of the system network is part of the sample'''
+
+        if self.report_empty_to_empty:
+            return True
+
+        return not (node_1.agent_content is None and \
+                    node_2.agent_content is None)
+
+    def _labels_of_system(self, ams):
+        '''Compute the unique labels of all nodes of the system in a single
+        pass, using the label cache
+
+        '''
+        cache = {}
+        mapping = {}
+        for node in ams:
+            mapping[node] = self._cached_label(node, cache)
+        self._label_cache = cache
+
+        return self._unique_labels(mapping)
+
+    def generate_edgelist(self, ams, delimiter=' ', data=True):
+        '''Generate the lines of the edge list of the labelled system network
+        directly from the network of the system
+
+        Parameters
+        ----------
+        ams : AgentManagementSystem
+            An agent management system populated with Agents
+        delimiter : str, optional
+            The separator of the node labels on a line
+        data : bool, optional
+            If True, the edge attributes are included on each line
+
+        Yields
+        ------
+        line : str
+            A line of the edge list, in the format of the `networkx` library
+            function `generate_edgelist`
+
+        '''
+        labels = self._labels_of_system(ams)
+
+        for node_1, node_2, edge_data in ams.agents_graph.edges(data=True):
+            if not self._keep_edge(node_1, node_2):
+                continue
+
+            if data:
+                edge = (labels[node_1], labels[node_2], dict(edge_data))
+            else:
+                edge = (labels[node_1], labels[node_2])
+
+            yield delimiter.join(map(str, edge))
+
+    def write_edgelist(self, ams, path, delimiter=' ', data=True):
+        '''Write the edge list of the labelled system network to file, streamed
+        directly from the network of the system
+
+        Parameters
+        ----------
+        ams : AgentManagementSystem
+            An agent management system populated with Agents
+        path : str
+            Path to the file to write
+        delimiter : str, optional
+            The separator of the node labels on a line
+        data : bool, optional
+            If True, the edge attributes are included on each line
+
+        Notes
+        -----
+        The file is identical to the one written by the `networkx` library
+        function `write_edgelist` given the sampled network, though no
+        replicate network is created
+
+        '''
+        with open(path, 'w') as fout:
+            for line in self.generate_edgelist(ams, delimiter, data):
+                fout.write(line + '\n')
+
+    def _node_index(self, node, rows, generation, frame):
+        '''Return the stable integer index of a node. A node not previously
+        encountered is given a new index and a row that defines the node is
+        added to the diff sample
+
+        '''
+        index = self._node_indices.get(node)
+        if index is None:
+            index = len(self._node_indices)
+            self._node_indices[node] = index
+            rows.append((generation, frame, 'node', index, None,
+                         self._node_label(node)))
+
+        return index
+
+    def _sample_diff(self, ams, generation):
+        '''Sample the changes to the topology and node labels of the system
+        since the previous sampling
+
+        Parameters
+        ----------
+        ams : AgentManagementSystem
+            An agent management system populated with Agents
+        generation : int
+            The current generation or iteration of the sampling
+
+        Returns
+        -------
+        df : Pandas DataFrame
+            The changes to the network, see class Notes for format
+
+        '''
+        if self._log_cursor is None:
+            self._log_cursor = ams.topology_log.register()
+        events = ams.topology_log.read(self._log_cursor)
+
+        if self.keyframe_every is None:
+            keyframe = self._n_samplings == 0
+        else:
+            keyframe = self._n_samplings % self.keyframe_every == 0
+
+        rows = []
+        if keyframe:
+            frame = 'full'
+            for node in ams:
+                index = self._node_indices.setdefault(node,
+                                                      len(self._node_indices))
+                rows.append((generation, frame, 'node', index, None,
+                             self._node_label(node)))
+
+            for node_1, node_2 in ams.agents_graph.edges:
+                rows.append((generation, frame, 'edge',
+                             self._node_indices[node_1],
+                             self._node_indices[node_2], None))
+
+        else:
+            frame = 'delta'
+            relabelled = {}
+            for event, node_1, node_2 in events:
+                if event == 'content':
+                    relabelled[node_1] = True
+
+                else:
+                    rows.append((generation, frame, event,
+                                 self._node_index(node_1, rows, generation, frame),
+                                 self._node_index(node_2, rows, generation, frame),
+                                 None))
+
+            for node in relabelled:
+                index = self._node_index(node, rows, generation, frame)
+                rows.append((generation, frame, 'label', index, None,
+                             self._node_label(node)))
+
+        self._n_samplings += 1
+
+        df = DataFrame(rows, columns=['generation', 'frame', 'event',
+                                      'node_1', 'node_2', 'label'],
+                       dtype=object)
+        df = df.set_index('generation')
+
+        return df
+
+    def _make_labels_only(self, network, mapping=None):
+        '''Create a new network of identical topology, but with the nodes
+        swapped for the agent label. This is needed to create a representation
+        that can be serialized as a string
+
+        Parameters
+        ----------
+        network 
+            The reference network, from `networkx` library
+        mapping : dict, optional
+            Raw labels of the nodes of the network, keyed on node, as
+            computed by `_node_label`. If not given, the labels are computed
+
+        Returns
+        -------
+        network_agent_labels
+            The new network with the label substitution, all else the same as
+            the input network
+
+        Raises
+        ------
+        RuntimeError
+            If the number of nodes changes after re-labelling. This is caused
+            by non-unique node labels. The method attempts to make labels
+            unique, but in some edge-cases that include labels that end on
+            `_<integer>`, this routine can conceivably fail.
+
+        Notes
+        -----
+        Edges between unoccupied nodes are left out if the sampler does not
+        report empty to empty edges. The new network is built directly from
+        the reference network, hence the reference network is not copied.
+
+        '''
+        if mapping is None:
+            mapping = {}
+            for node in network:
+                mapping[node] = self._node_label(node)
+
+        #
+        # In the event that node labels are identical, they are uniquified in a
+        # predictable manner.
+        #
+        mapping = self._unique_labels(mapping)
+
+        #
+        # The relabelling
+        #
+        network_agent_labels = network.__class__()
+        network_agent_labels.graph.update(network.graph)
+        network_agent_labels.add_nodes_from((mapping[node], node_data.copy())
+                                for node, node_data in network.nodes(data=True))
+        network_agent_labels.add_edges_from(
+                                (mapping[node_1], mapping[node_2], edge_data.copy())
+                                for node_1, node_2, edge_data in network.edges(data=True)
+                                if self._keep_edge(node_1, node_2))
+
+        return network_agent_labels
+
+    def __call__(self, ams, generation=0):
+        '''Perform a sampling of the system graph
 
         Parameters
         ----------
@@ -529,28 +1517,84 @@ class GraphSampler(object):
         file by passing the return object to `networkx.readwrite.gexf.write_gexf` 
         for example.
 
+        In diff mode the sampling data is instead a pandas DataFrame of the
+        changes to the network, see class Notes.
+
         '''
-        if not self.report_empty_to_empty:
-            remove_set = []
-            for node_1, node_2 in ams.agents_graph.edges:
-                if node_1.agent_content is None and \
-                   node_2.agent_content is None:
-                    remove_set.append((node_1, node_2))
+        if self.diff:
+            return self._sample_diff(ams, generation)
+
+        state = self._begin(ams, generation)
+        for node in ams:
+            self._visit(state, node)
 
-            graph_transform = ams.agents_graph.copy()
-            graph_transform.remove_edges_from(remove_set)
+        return self._end(state)
 
-        else:
-            graph_transform = ams.agents_graph.copy()
+    def _begin(self, ams, generation):
+        '''Initialize the state of a sampling pass over the nodes of a system,
+        see `AgentSampler._begin` for details on the node traversal protocol
 
-        network_labels_only = self._make_labels_only(graph_transform)
+        Parameters
+        ----------
+        ams : AgentManagementSystem
+            The agent management system to sample
+        generation : int
+            The current generation or iteration of the sampling
+
+        Returns
+        -------
+        state : dict
+            The mutable state of the sampling pass
+
+        '''
+        return {'generation' : generation, 'ams' : ams, 'labels' : {},
+                'cache' : {}}
+
+    def _visit(self, state, node):
+        '''Compute the label of one node as part of a sampling pass
+
+        Parameters
+        ----------
+        state : dict
+            The state of the sampling pass, as created by `_begin`
+        node : Node
+            The node to label
+
+        '''
+        state['labels'][node] = self._cached_label(node, state['cache'])
+
+    def _end(self, state):
+        '''Conclude a sampling pass by relabelling the system graph with the
+        node labels collected during the pass
+
+        Parameters
+        ----------
+        state : dict
+            The state of the sampling pass, as created by `_begin`
+
+        Returns
+        -------
+        network_labels_only : networkx Graph
+            A Graph object from the networkx library where all nodes have been
+            substituted for unique string labels for easy writing
+
+        '''
+        #
+        # Only nodes visited in the current pass are kept in the label cache,
+        # such that nodes deleted from the system are not retained
+        #
+        self._label_cache = state['cache']
+
+        network_labels_only = self._make_labels_only(state['ams'].agents_graph,
+                                                     state['labels'])
 
         return network_labels_only
 
     def __init__(self, name,
                  key_occ_node=None,
                  key_unocc_node=None,
-                 report_empty_to_empty=True, sample_steps=1):
+                 report_empty_to_empty=True, sample_steps=1,
+                 cache_labels=True, diff=False, keyframe_every=None):
 
         self.name = name
 
@@ -575,6 +1619,82 @@ class GraphSampler(object):
         self.report_empty_to_empty = report_empty_to_empty
         self.sample_steps = sample_steps
 
+        self.cache_labels = cache_labels
+        self._label_cache = {}
+
+        self.diff = diff
+        if diff and not report_empty_to_empty:
+            raise ValueError('Graph sampler in diff mode must report ' + \
+                             'empty to empty edges')
+        if not keyframe_every is None:
+            if keyframe_every < 1:
+                raise ValueError('The `keyframe_every` must be a positive integer')
+        self.keyframe_every = keyframe_every
+        self._n_samplings = 0
+        self._node_indices = {}
+        self._log_cursor = None
+
+def reconstruct_graph(df, generation):
+    '''Reconstruct the network at a generation from the samples of a Graph
+    Sampler in diff mode
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        The concatenation of the diff samples, at least from the keyframe
+        preceding the generation up to the generation, in the format returned
+        by the Graph Sampler or as read from a file or sink
+    generation : int
+        The generation at which to reconstruct the network
+
+    Returns
+    -------
+    network : networkx Graph
+        The network at the generation, with the stable integer indices of the
+        sampler as nodes and the node labels as the node attribute `label`
+
+    Raises
+    ------
+    ValueError
+        If the data does not contain diff samples
+
+    Notes
+    -----
+    The network with the labels as nodes, as the Graph Sampler returns when
+    not in diff mode, is obtained with the `networkx` library function
+    `relabel_nodes`, provided the labels are unique.
+
+    '''
+    df = df.reset_index()
+    if not 'event' in df.columns:
+        raise ValueError('The data does not contain graph diff samples')
+
+    df = df[df['generation'] <= generation]
+
+    keyframes = df.loc[df['frame'] == 'full', 'generation']
+    if len(keyframes) > 0:
+        df = df[df['generation'] >= keyframes.max()]
+
+    #
+    # The events are replayed in order, which is preserved by a stable sort
+    #
+    df = df.sort_values('generation', kind='mergesort')
+
+    network = nx.Graph()
+    for event, node_1, node_2, label in zip(df['event'], df['node_1'],
+                                            df['node_2'], df['label']):
+        if event in ('node', 'label'):
+            network.add_node(int(node_1), label=label)
+
+        elif event in ('edge', 'edge_add'):
+            network.add_edge(int(node_1), int(node_2))
+
+        elif event == 'edge_remove':
+            if network.has_edge(int(node_1), int(node_2)):
+                network.remove_edge(int(node_1), int(node_2))
+
+    return network
+
 class SystemIO(object):
     '''Write sampled data of the Agent System to disk by some control logic
 
@@ -585,6 +1705,43 @@ class SystemIO(object):
         arguments to the class method `set_write_rule`. Therefore, the current
         input parameter is optional and is equivalent to a sequence of calls to
         said class method
+    fuse_samplers : bool, optional
+        If True, all samplers that are due at a given generation and which
+        sample the nodes of the system are executed in a single pass over the
+        nodes, such that each agent and local environment is visited once per
+        stamp. If False, each sampler traverses the system on its own.
+    async_write : bool, optional
+        If True, the data is sampled synchronously by `try_stamp`, while the
+        serialization and writing to disk is handed to a background thread,
+        such that the simulation is not stalled by disk operations. The
+        method `flush` must be called before the written files are read. If
+        False, the data is written to disk before `try_stamp` returns.
+    max_queue : int, optional
+        The maximum number of samples pending to be written by the background
+        thread. If the limit is reached, `try_stamp` blocks until the
+        background thread has written one sample. Only relevant if
+        `async_write` is True.
+    namespace : str, optional
+        Prefix added to the file names of the write rules, or to the names
+        under which data is appended to sinks. Separates the output of
+        several simulations that share write rules, such as the branches of
+        `FiniteSystemRunner.branch`. The prefix is applied to the file name,
+        not to its directory.
+
+    Notes
+    -----
+    The attribute `stamp_stats` is a dictionary of instrumentation counters
+    that are updated by `try_stamp`. The entries are:
+
+    * `n_stamps` : Number of generations at which data was sampled
+    * `n_passes` : Number of passes over the nodes of the system
+    * `node_visits` : Total number of node visits over all passes
+    * `node_visits_saved` : Number of node visits that fusion of samplers
+                            made redundant
+    * `traversal_time` : Time in seconds spent in the passes over the
+                         nodes, including the visits of the samplers
+    * `backpressure_time` : Time in seconds `try_stamp` was blocked because
+                            the queue of the background writer was full
 
     '''
     def stamp(self, system, generation, sampler, io_method, filename, io_method_kwargs={}):
@@ -598,16 +1755,16 @@ class SystemIO(object):
         generation : int
             The generation or iteration of a simulation, or an arbitrary index
             in other contexts
-        sampler : AgentSampler, EnvSampler or GraphSampler
+        sampler : AgentSampler, EnvSampler, AggregateSampler or GraphSampler
             A sampler class instance that retrieves the data to write, as well
             as defines the frequency at which to sample and write the data
-        method_key : str
+        method_key : str or sink
             The library method to convert a sampled piece of data into a file
             of desired format. For agent and environment sampling, the
             available methods are all IO methods of a Pandas library DataFrame.
             For graph sampling, the available methods are all IO methods of a 
-            networkx library Graph. See documentation for `set_write_rule` for
-            further details.
+            networkx library Graph. Alternatively a sink to append the data
+            to. See documentation for `set_write_rule` for further details.
         filename : str
             Full filename or path to write data to
         io_method_kwargs : dict, optional
@@ -619,17 +1776,137 @@ class SystemIO(object):
             If unknown sampler type provided
 
         '''
-        if isinstance(sampler, (AgentSampler, EnvSampler)):
-            df = sampler(system, generation)
-            getattr(df, io_method)(filename, **io_method_kwargs)
+        if io_method == 'stream_edgelist':
+            sample = list(sampler.generate_edgelist(system, **io_method_kwargs))
+        else:
+            sample = sampler(system, generation)
+
+        self._write(sample, generation, sampler, io_method, filename,
+                    io_method_kwargs)
+
+    def _write(self, sample, generation, sampler, io_method, filename,
+               io_method_kwargs):
+        '''Write a sample to disk
+
+        Parameters
+        ----------
+        sample : DataFrame or networkx Graph
+            The sampled data as returned by the sampler
+        generation : int
+            The generation at which the sample was taken
+        sampler : AgentSampler, EnvSampler, AggregateSampler or GraphSampler
+            The sampler that created the sample
+        io_method : str or sink
+            The library method to convert the sample into a file, or the sink
+            to append the sample to
+        filename : str
+            Full filename or path to write data to. If the sample is appended
+            to a sink, the name under which the sample is stored in the sink
+        io_method_kwargs : dict
+            Named arguments to the method implied by the `io_method`
+
+        Raises
+        ------
+        TypeError
+            If unknown sampler type provided
+
+        '''
+        if isinstance(io_method, _Sink):
+            io_method.append(filename, generation, sample)
+
+        elif io_method == 'stream_edgelist':
+            with open(filename, 'w') as fout:
+                for line in sample:
+                    fout.write(line + '\n')
+
+        elif isinstance(sampler, (AgentSampler, EnvSampler, AggregateSampler)) or \
+             (isinstance(sampler, GraphSampler) and sampler.diff):
+            getattr(sample, io_method)(filename, **io_method_kwargs)
 
         elif isinstance(sampler, GraphSampler):
-            network_strings_only = sampler(system, generation)
             io_func = operator.attrgetter(io_method)(nx.readwrite)
-            io_func(network_strings_only, filename, **io_method_kwargs)
+            io_func(sample, filename, **io_method_kwargs)
 
         else:
-            TypeError('Unknown sampler type %s' %(str(type(sampler))))
+            raise TypeError('Unknown sampler type %s' %(str(type(sampler))))
+
+    def _sample_fused(self, system, generation, samplers):
+        '''Sample the system with a collection of samplers, where all samplers
+        that traverse the nodes of the system are executed in a single pass
+
+        Parameters
+        ----------
+        system : AgentManagementSystem
+            Agent system under study
+        generation : int
+            The generation or iteration of the simulation
+        samplers : list
+            The samplers to execute. The same sampler can appear multiple
+            times, in which case it is executed only once
+
+        Returns
+        -------
+        samples : dict
+            The sampled data keyed on the identity of the sampler
+
+        '''
+        samples = {}
+        fused = []
+        seen = set([])
+        for sampler in samplers:
+            if id(sampler) in seen:
+                continue
+            seen.add(id(sampler))
+
+            if self.fuse_samplers and self._traverses_nodes(sampler):
+                fused.append(sampler)
+
+            else:
+                samples[id(sampler)] = sampler(system, generation)
+
+        if len(fused) > 0:
+            states = [sampler._begin(system, generation) for sampler in fused]
+
+            t_start = time.perf_counter()
+            nodes = list(system)
+            for node in nodes:
+                for sampler, state in zip(fused, states):
+                    sampler._visit(state, node)
+            t_traverse = time.perf_counter() - t_start
+
+            for sampler, state in zip(fused, states):
+                samples[id(sampler)] = sampler._end(state)
+
+            n_saved = len(fused) - 1
+            self.stamp_stats['n_passes'] += 1
+            self.stamp_stats['node_visits'] += len(nodes)
+            self.stamp_stats['node_visits_saved'] += n_saved * len(nodes)
+            self.stamp_stats['traversal_time'] += t_traverse
+
+        return samples
+
+    def _traverses_nodes(self, sampler):
+        '''Determine if a sampler samples the system by a pass over its nodes
+
+        Parameters
+        ----------
+        sampler : AgentSampler, EnvSampler, AggregateSampler or GraphSampler
+            The sampler to evaluate
+
+        Returns
+        -------
+        traverses : bool
+            True if the sampler implements the node traversal protocol for the
+            given configuration, False otherwise
+
+        '''
+        if isinstance(sampler, EnvSampler):
+            return not sampler.common_env
+
+        if isinstance(sampler, GraphSampler):
+            return not sampler.diff
+
+        return isinstance(sampler, (AgentSampler, AggregateSampler))
 
     def try_stamp(self, system, generation):
         '''Attempt to stamp data onto disk. This is the preferred public method
@@ -651,12 +1928,92 @@ class SystemIO(object):
             True if an output operation took place, False otherwise
 
         '''
-        stamped_one = False
-        for args in self._samplers_to_sample_at_(generation):
-            self.stamp(system, generation, *args)
-            stamped_one = True
+        rules_due = list(self._samplers_to_sample_at_(generation))
+        if len(rules_due) == 0:
+            return False
 
-        return stamped_one
+        #
+        # Edge lists that are streamed from the system network are generated
+        # separately, since they require no sampled network
+        #
+        samples = self._sample_fused(system, generation,
+                                     [args[0] for args in rules_due \
+                                      if args[1] != 'stream_edgelist'])
+        for sampler, io_method, filename, io_method_kwargs in rules_due:
+            if io_method == 'stream_edgelist':
+                sample = list(sampler.generate_edgelist(system,
+                                                        **io_method_kwargs))
+            else:
+                sample = samples[id(sampler)]
+
+            if self.async_write:
+                self.stamp_stats['backpressure_time'] += \
+                    self._writer.submit(self._write, sample, generation,
+                                        sampler, io_method, filename,
+                                        io_method_kwargs)
+
+            else:
+                self._write(sample, generation, sampler, io_method, filename,
+                            io_method_kwargs)
+
+        self.stamp_stats['n_stamps'] += 1
+
+        return True
+
+    def flush(self):
+        '''Block until all data handed to the background writer has been
+        written to disk, and persist any data buffered by sinks. If the System
+        IO writes synchronously to files, the method returns immediately
+
+        Raises
+        ------
+        RuntimeError
+            If the writing of some sample in the background failed
+
+        '''
+        if self.async_write:
+            self._writer.flush()
+
+        for sink in self._sinks():
+            sink.flush()
+
+    def close(self):
+        '''Write all pending data and stop the background writer thread, if
+        any. Sinks are flushed, though not closed, since they can be shared
+        between System IO objects and are read from after the simulation
+
+        Raises
+        ------
+        RuntimeError
+            If the writing of some sample in the background failed
+
+        '''
+        if self.async_write:
+            self._writer.close()
+
+        for sink in self._sinks():
+            sink.flush()
+
+    def _after_fork(self):
+        '''Prepare the System IO for use in a child process created by
+        forking. The System IO must be flushed before the fork
+
+        '''
+        if self.async_write:
+            self._writer._after_fork()
+
+        for sink in self._sinks():
+            sink._after_fork()
+
+    def _sinks(self):
+        '''Iterator over the distinct sinks of the write rules'''
+
+        seen = set([])
+        for rule in self.io_rules:
+            io_method = rule['io_method']
+            if isinstance(io_method, _Sink) and not id(io_method) in seen:
+                seen.add(id(io_method))
+                yield io_method
 
     def _samplers_to_sample_at_(self, generation):
         '''Iterator over write rules given a generation index. If the
@@ -671,14 +2028,15 @@ class SystemIO(object):
 
         Returns
         -------
-        sampler : AgentSampler, EnvSampler or GraphSampler
+        sampler : AgentSampler, EnvSampler, AggregateSampler or GraphSampler
             A sampler class instance to retrieve data sample,
-        io_method : str
+        io_method : str or sink
             The library method to convert a sampled piece of data into a file
-            of desired format. See documentation for `set_write_rule` for
-            further details.
+            of desired format, or the sink to append the data to. See
+            documentation for `set_write_rule` for further details.
         filename : str
-            Full filename or path to write data to
+            Full filename or path to write data to, or for a sink the name
+            under which the data is stored
         io_method_kwargs : dict, optional
             Named arguments to the method implied by the `method_key`
 
@@ -687,9 +2045,15 @@ class SystemIO(object):
             sampler = rule['sampler']
             if generation % sampler.sample_steps == 0:
                 injection_point = rule['injection_point']
-                filename = rule['filename'][:injection_point] + \
-                           str(generation) + \
-                           rule['filename'][injection_point:]
+                if injection_point is None:
+                    filename = self.namespace + rule['filename']
+                else:
+                    filename = rule['filename'][:injection_point] + \
+                               str(generation) + \
+                               rule['filename'][injection_point:]
+                    if self.namespace != '':
+                        head, tail = os.path.split(filename)
+                        filename = os.path.join(head, self.namespace + tail)
                 io_method = rule['io_method']
                 io_method_kwargs = rule['io_method_kwargs']
 
@@ -702,17 +2066,23 @@ class SystemIO(object):
         Parameters
         ----------
         name : str
-            The file name prefix to which data is written
-        sampler : AgentSampler, EnvSampler or GraphSampler
+            The file name prefix to which data is written. If the data is
+            appended to a sink, the name under which the data is stored in
+            the sink
+        sampler : AgentSampler, EnvSampler, AggregateSampler or GraphSampler
             A sampler class instance that retrieves the data to write, as well
             as defines the frequency at which to sample and write the data
-        method_key : str
+        method_key : str or sink
             The library method to convert a sampled piece of data into a file
             of desired format. For agent and environment sampling, the
             available methods are all IO methods of a Pandas library DataFrame.
             A partial list is provided in the Notes. For graph sampling, the
             available methods are all IO methods of a networkx library Graph. A
-            partial list is provided in the Notes.
+            partial list is provided in the Notes. For graph sampling in diff
+            mode, the methods are those of a Pandas library DataFrame.
+            Alternatively a sink, such as `SQLiteSink`, in which case the data
+            of all generations is appended to a single container rather than
+            written to one file per generation.
         method_kwargs : dict, optional
             Any named arguments to pass to the library IO method invoked.
 
@@ -722,6 +2092,9 @@ class SystemIO(object):
             If an unknown `method_key` is provided
         TypeError
             If an unknown sampler type is provided
+        ValueError
+            If the data of another sampler is appended to the same sink under
+            the same name
 
         Notes
         -----
@@ -737,11 +2110,33 @@ class SystemIO(object):
         `gexf.write_gexf` : From networkx, write in GEXF format
         `gml.write_gml` : From networkx, write in GML format
         `gpickle.write_gpickle` : From networkz, pickle the network
+        `stream_edgelist` : Write edge list as text file, streamed directly
+                            from the network of the system without creating
+                            a sampled network. The named arguments are passed
+                            to `GraphSampler.generate_edgelist`
 
         '''
         rule = {}
 
-        if isinstance(sampler, (AgentSampler, EnvSampler)):
+        if isinstance(method_key, _Sink):
+            if not isinstance(sampler, (AgentSampler, EnvSampler,
+                                        AggregateSampler, GraphSampler)):
+                raise TypeError('The sampler should be instance of one of ' + \
+                                'the library samplers')
+
+            for other in self.io_rules:
+                if other['io_method'] is method_key and \
+                   other['filename'] == name and \
+                   not other['sampler'] is sampler:
+                    raise ValueError('Sink already stores the data of ' + \
+                                     'another sampler under name %s' %(name))
+
+            rule['io_method'] = method_key
+            rule['filename'] = name
+            rule['injection_point'] = None
+
+        elif isinstance(sampler, (AgentSampler, EnvSampler, AggregateSampler)) or \
+             (isinstance(sampler, GraphSampler) and sampler.diff):
 
             try:
                 write_method = getattr(DataFrame, method_key)
@@ -752,6 +2147,13 @@ class SystemIO(object):
             rule['filename'] = name + method_key.replace('to_', '.')
             rule['injection_point'] = len(name)
 
+        elif isinstance(sampler, GraphSampler) and \
+             method_key == 'stream_edgelist':
+
+            rule['io_method'] = method_key
+            rule['filename'] = name + '.edgelist'
+            rule['injection_point'] = len(name)
+
         elif isinstance(sampler, GraphSampler):
             
             try:
@@ -773,9 +2175,25 @@ class SystemIO(object):
         
         self.io_rules.append(rule)
 
-    def __init__(self, io_objects=[]):
+    def __init__(self, io_objects=[], fuse_samplers=True,
+                 async_write=False, max_queue=8, namespace=''):
 
         self.io_rules = []
+        self.fuse_samplers = fuse_samplers
+        self.namespace = namespace
+
+        self.async_write = async_write
+        if async_write:
+            self._writer = BackgroundWriter(max_queue)
+        else:
+            self._writer = None
+
+        self.stamp_stats = {'n_stamps' : 0,
+                            'n_passes' : 0,
+                            'node_visits' : 0,
+                            'node_visits_saved' : 0,
+                            'traversal_time' : 0.0,
+                            'backpressure_time' : 0.0}
 
         for io_obj in io_objects:
             self.set_write_rule(*io_obj)
@@ -0,0 +1,529 @@
+'''Event-driven simulation of an agent system in continuous time, in which only
+the agent whose event occurs next is executed, rather than every agent being
+visited each step
+
+'''
+import itertools
+import math
+
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.rng import draw_uniform, set_random_streams, \
+                              get_random_streams
+
+class IndexedHeap(object):
+    '''Binary min-heap of keys ordered by priority, with an index of the
+    position of each key, such that the priority of any key in the heap can
+    be changed, or the key removed, in logarithmic time
+
+    Notes
+    -----
+    Priorities can be any comparable objects. Keys of equal priority are
+    ordered by the order in which their priority was set.
+
+    '''
+    def push(self, key, priority):
+        '''Add a key to the heap, or change its priority if it is in the heap
+
+        Parameters
+        ----------
+        key
+            Hashable key
+        priority
+            The priority of the key, the lowest priority is at the top
+
+        '''
+        entry = (priority, next(self._counter))
+        position = self._position.get(key)
+        if position is None:
+            self._keys.append(key)
+            self._entries.append(entry)
+            self._position[key] = len(self._keys) - 1
+            self._sift_up(len(self._keys) - 1)
+
+        else:
+            entry_old = self._entries[position]
+            self._entries[position] = entry
+            if entry < entry_old:
+                self._sift_up(position)
+            else:
+                self._sift_down(position)
+
+    def remove(self, key):
+        '''Remove a key from the heap
+
+        Raises
+        ------
+        KeyError
+            If the key is not in the heap
+
+        '''
+        position = self._position.pop(key)
+        last_key = self._keys.pop()
+        last_entry = self._entries.pop()
+        if position < len(self._keys):
+            self._keys[position] = last_key
+            self._entries[position] = last_entry
+            self._position[last_key] = position
+            self._sift_up(position)
+            self._sift_down(self._position[last_key])
+
+    def discard(self, key):
+        '''Remove a key from the heap if it is in the heap'''
+
+        if key in self._position:
+            self.remove(key)
+
+    def peek(self):
+        '''Return the key of lowest priority and its priority, without
+        removing it
+
+        Raises
+        ------
+        IndexError
+            If the heap is empty
+
+        '''
+        if len(self._keys) == 0:
+            raise IndexError('Peek into empty heap')
+
+        return self._keys[0], self._entries[0][0]
+
+    def pop(self):
+        '''Remove and return the key of lowest priority and its priority
+
+        Raises
+        ------
+        IndexError
+            If the heap is empty
+
+        '''
+        key, priority = self.peek()
+        self.remove(key)
+
+        return key, priority
+
+    def priority(self, key):
+        '''Return the priority of a key in the heap
+
+        Raises
+        ------
+        KeyError
+            If the key is not in the heap
+
+        '''
+        return self._entries[self._position[key]][0]
+
+    def _sift_up(self, position):
+        '''Move the entry at a position towards the top until ordered'''
+
+        keys, entries = self._keys, self._entries
+        key, entry = keys[position], entries[position]
+        while position > 0:
+            parent = (position - 1) >> 1
+            if not entry < entries[parent]:
+                break
+            keys[position] = keys[parent]
+            entries[position] = entries[parent]
+            self._position[keys[position]] = position
+            position = parent
+
+        keys[position] = key
+        entries[position] = entry
+        self._position[key] = position
+
+    def _sift_down(self, position):
+        '''Move the entry at a position towards the bottom until ordered'''
+
+        keys, entries = self._keys, self._entries
+        n_keys = len(keys)
+        key, entry = keys[position], entries[position]
+        while True:
+            child = 2 * position + 1
+            if child >= n_keys:
+                break
+            if child + 1 < n_keys and entries[child + 1] < entries[child]:
+                child += 1
+            if not entries[child] < entry:
+                break
+            keys[position] = keys[child]
+            entries[position] = entries[child]
+            self._position[keys[position]] = position
+            position = child
+
+        keys[position] = key
+        entries[position] = entry
+        self._position[key] = position
+
+    def __contains__(self, key):
+
+        return key in self._position
+
+    def __len__(self):
+
+        return len(self._keys)
+
+    def __init__(self):
+
+        self._keys = []
+        self._entries = []
+        self._position = {}
+        self._counter = itertools.count()
+
+class AgentEvent(object):
+    '''Event that occurs to the agents of a system, either at a rate, as a
+    Poisson process, or at times set by a function
+
+    Parameters
+    ----------
+    name : str
+        The name of the event
+    engine : callable or str
+        Function that receives the system and the agent the event occurs to,
+        and executes the event. If a string, the phrase of a compulsion or
+        mutation of the system that the agent is compelled or mutated by
+    rate : float or callable, optional
+        The rate at which the event occurs to an agent, or a function that
+        receives the system and the agent and returns the rate. A rate of
+        zero means the event does not occur to the agent
+    next_time : callable, optional
+        Function that receives the system, the agent and the current time and
+        returns the time of the next event of the agent, or None if no event
+        is to occur. Only one of `rate` and `next_time` can be given
+    dependents : str or callable, optional
+        The agents whose rates or event times are recomputed after the event
+        has occurred to an agent, in addition to the agent itself. Either
+        `neighbours`, for the agents of the neighbour nodes, `self`, for none,
+        `all`, for all agents of the system, or a function that receives the
+        system and the agent and returns the dependent agents
+
+    Raises
+    ------
+    ValueError
+        If both or none of a rate and a next time function are given, or if
+        the dependents are of an unknown kind
+
+    '''
+    def rate_of(self, system, agent):
+        '''Return the rate of the event of an agent'''
+
+        if callable(self.rate):
+            return self.rate(system, agent)
+
+        return self.rate
+
+    def execute(self, system, agent):
+        '''Execute the event for an agent'''
+
+        if isinstance(self.engine, str):
+            if self.engine in system.compulsion:
+                system.compel(agent, self.engine)
+            else:
+                system.mutate(agent, self.engine)
+
+        else:
+            self.engine(system, agent)
+
+    def __init__(self, name, engine, rate=None, next_time=None,
+                 dependents='neighbours'):
+
+        if (rate is None) == (next_time is None):
+            raise ValueError('Either a rate or a next time function must ' + \
+                             'be given for event %s' %(name))
+        if not callable(dependents) and \
+           not dependents in ('neighbours', 'self', 'all'):
+            raise ValueError('Unknown kind of dependents: %s' %(str(dependents)))
+        if not isinstance(engine, str) and not callable(engine):
+            raise TypeError('The engine of event %s is neither ' %(name) + \
+                            'callable nor a phrase')
+
+        self.name = name
+        self.engine = engine
+        self.rate = rate
+        self.next_time = next_time
+        self.dependents = dependents
+
+class EventDrivenRunner(object):
+    '''Class to run a simulation of an agent system in continuous time, with
+    the events of the agents executed one at a time in the order of their
+    occurrence
+
+    Parameters
+    ----------
+    t_end : float
+        The simulated time to which the system is propagated
+    events : list
+        The AgentEvent objects of the agents
+    system_io : SystemIO, optional
+        An instance of the SystemIO class that defines what system data to
+        sample and how to write it to disk. The generation of a sample is the
+        index of its sample time
+    sample_interval : float, optional
+        The simulated time between sample times
+    time_offset : float, optional
+        The simulated time at the start of the simulation
+    max_events : int, optional
+        If provided, the simulation stops after this number of events even if
+        the end time has not been reached
+
+    Notes
+    -----
+    The scheduler is the next reaction method of Gibson and Bruck. The next
+    event time of every agent and event is kept in an indexed heap, and the
+    event at the top of the heap is executed. Thereafter the rates of the
+    agent and of its dependents are recomputed, and the pending event times
+    whose rate changed are rescaled by the ratio of the old to the new rate,
+    which preserves the exact statistics of the Poisson processes without new
+    random numbers. The cost of an event is therefore logarithmic in the
+    number of agents, rather than linear as for a mover that visits all
+    agents each step.
+
+    Agents that are added, removed or moved through the methods of the agent
+    management system, and edges that are added or removed, are detected from
+    the topology log of the system, and the affected agents are rescheduled.
+
+    The state sampled at a sample time is the state after all events up to
+    and including that time. The random draws of the scheduler are made from
+    the random streams of the system if seeded, with the number of executed
+    events as the step of the streams.
+
+    '''
+    def __call__(self, system):
+        '''Propagate the system to the end time
+
+        Parameters
+        ----------
+        system : AgentManagementSystem
+            The system to simulate
+
+        Returns
+        -------
+        n_events : int
+            The number of events executed in the call
+
+        Raises
+        ------
+        TypeError
+            If the input object is not an agent management system
+
+        '''
+        if not isinstance(system, AgentManagementSystem):
+            raise TypeError('Simulation is done only of instance of ' + \
+                            'Agent Management System')
+
+        self._heap = IndexedHeap()
+        self._rates = {}
+        self._node_agent = {}
+        previous_streams = get_random_streams()
+        self._set_step(system)
+        cursor = system.topology_log.register()
+        try:
+            for node in system.agents_graph:
+                if not node.agent_content is None:
+                    self._schedule_agent(system, node)
+
+            n_events = 0
+            while len(self._heap) > 0:
+                if not self.max_events is None and n_events >= self.max_events:
+                    break
+
+                (agent_id, k_event), t_event = self._heap.peek()
+                if t_event > self.t_end:
+                    break
+
+                self._stamp_until(system, t_event)
+                self.time = t_event
+
+                agent = system.agents_in_scope[agent_id]
+                node = system.node_from_agent_id_[agent_id]
+                event = self.events[k_event]
+                self._heap.remove((agent_id, k_event))
+                self._rates.pop((agent_id, k_event), None)
+
+                event.execute(system, agent)
+                self.step_count += 1
+                n_events += 1
+                self._set_step(system)
+
+                self._refresh_after(system, node, agent_id, event,
+                                    system.topology_log.read(cursor))
+
+            if self.max_events is None or n_events < self.max_events:
+                self._stamp_until(system, self.t_end, inclusive=True)
+                self.time = max(self.time, self.t_end)
+
+        finally:
+            set_random_streams(previous_streams)
+            system.topology_log.unregister(cursor)
+            if not self.io is None:
+                self.io.flush()
+
+        return n_events
+
+    def _set_step(self, system):
+        '''Activate the random streams of the system at the step of the number
+        of executed events, or no streams if the system has none. The streams
+        active before the call of the runner are restored as it returns
+
+        '''
+        streams = getattr(system, 'random_streams', None)
+        if not streams is None:
+            streams.set_step(self.step_count)
+        set_random_streams(streams)
+
+    def _stamp_until(self, system, t_limit, inclusive=False):
+        '''Sample the system at the sample times before a time'''
+
+        while True:
+            t_sample = self.time_offset + self.sample_count * self.sample_interval
+            if t_sample > t_limit or (t_sample == t_limit and not inclusive):
+                break
+
+            if not self.io is None:
+                self.io.try_stamp(system, self.sample_count)
+            self.sample_count += 1
+
+    def _draw_time(self, agent_id, rate):
+        '''Draw the time of the next event of a Poisson process'''
+
+        return self.time - math.log(1.0 - draw_uniform(agent_id)) / rate
+
+    def _update(self, system, agent, agent_id, k_event):
+        '''Recompute the next event time of an event of an agent. An event
+        without a pending time, such as the event that just occurred, is
+        drawn a new time, while a pending time is rescaled to the new rate
+
+        '''
+        key = (agent_id, k_event)
+        event = self.events[k_event]
+
+        if not event.next_time is None:
+            t_next = event.next_time(system, agent, self.time)
+            if t_next is None:
+                self._heap.discard(key)
+            else:
+                self._heap.push(key, max(t_next, self.time))
+            return
+
+        rate = event.rate_of(system, agent)
+        if rate < 0.0:
+            raise ValueError('Negative rate %s of event %s' %(str(rate), event.name))
+
+        rate_old = self._rates.get(key, 0.0)
+        self._rates[key] = rate
+        if rate == rate_old and key in self._heap:
+            return
+
+        if rate == 0.0:
+            self._heap.discard(key)
+
+        elif rate_old == 0.0 or not key in self._heap:
+            self._heap.push(key, self._draw_time(agent_id, rate))
+
+        else:
+            t_old = self._heap.priority(key)
+            self._heap.push(key, self.time + (rate_old / rate) * (t_old - self.time))
+
+    def _update_agent(self, system, agent):
+        '''Recompute the next event times of all events of an agent'''
+
+        agent_id = agent.agent_id_system
+        for k_event in range(len(self.events)):
+            self._update(system, agent, agent_id, k_event)
+
+    def _schedule_agent(self, system, node):
+        '''Schedule the events of the agent of a node'''
+
+        agent = node.agent_content
+        self._node_agent[node] = agent.agent_id_system
+        self._update_agent(system, agent)
+
+    def _unschedule_node(self, node):
+        '''Remove the events of the agent previously scheduled at a node'''
+
+        agent_id = self._node_agent.pop(node, None)
+        if agent_id is None:
+            return
+
+        for k_event in range(len(self.events)):
+            self._heap.discard((agent_id, k_event))
+            self._rates.pop((agent_id, k_event), None)
+
+    def _refresh_after(self, system, node, agent_id, event, log_events):
+        '''Reschedule the agents affected by an event'''
+
+        #
+        # Nodes of changed content are unscheduled before any is scheduled,
+        # since an agent that moved between nodes is scheduled under its
+        # previous node as well
+        #
+        content_nodes = [node_1 for log_event, node_1, _ in log_events \
+                         if log_event == 'content']
+        for node_changed in content_nodes:
+            self._unschedule_node(node_changed)
+
+        refreshed = set()
+        for node_changed in content_nodes:
+            if not node_changed.agent_content is None and \
+               not node_changed in self._node_agent:
+                self._schedule_agent(system, node_changed)
+                refreshed.add(node_changed.agent_content.agent_id_system)
+
+        agent = system.agents_in_scope.get(agent_id)
+        if not agent is None and not agent_id in refreshed:
+            self._update_agent(system, agent)
+            refreshed.add(agent_id)
+
+        if event.dependents == 'self':
+            dependents = []
+
+        elif event.dependents == 'all':
+            dependents = list(system.agents_in_scope.values())
+
+        elif event.dependents == 'neighbours':
+            nodes = [node]
+            if not agent is None and \
+               not system.node_from_agent_id_[agent_id] is node:
+                nodes.append(system.node_from_agent_id_[agent_id])
+            dependents = [other.agent_content for node_event in nodes \
+                          for other in system.agents_graph[node_event] \
+                          if not other.agent_content is None]
+
+        else:
+            dependents = list(event.dependents(system, agent))
+
+        for log_event, node_1, node_2 in log_events:
+            if log_event in ('edge_add', 'edge_remove'):
+                dependents.extend([node_edge.agent_content \
+                                   for node_edge in (node_1, node_2) \
+                                   if not node_edge.agent_content is None])
+
+        for other in dependents:
+            if not other.agent_id_system in refreshed:
+                refreshed.add(other.agent_id_system)
+                self._update_agent(system, other)
+
+    def __init__(self, t_end, events, system_io=None, sample_interval=1.0,
+                 time_offset=0.0, max_events=None):
+
+        if isinstance(events, AgentEvent):
+            events = [events]
+        if not all([isinstance(event, AgentEvent) for event in events]):
+            raise TypeError('The events must be instances of AgentEvent')
+        if sample_interval <= 0.0:
+            raise ValueError('The sample interval must be positive, not %s' \
+                             %(str(sample_interval)))
+
+        self.t_end = t_end
+        self.events = list(events)
+        self.io = system_io
+        self.sample_interval = sample_interval
+        self.time_offset = time_offset
+        self.max_events = max_events
+
+        self.time = time_offset
+        self.step_count = 0
+        self.sample_count = 0
+
+        self._heap = IndexedHeap()
+        self._rates = {}
+        self._node_agent = {}
@@ -0,0 +1,607 @@
+'''Read-only snapshot of the state of an agent system in shared memory, which
+worker processes read to evaluate sensors and interpreters without the agents
+being pickled and sent to them
+
+Notes
+-----
+The snapshot is columnar. The numeric elements of the agent imprints are
+stored as one column per imprint element, the numeric values of the auxiliary
+content of the nodes as one column per value, and the topology of the system
+graph in compressed sparse row format, see `graph_to_csr`. Elements without a
+numeric representation, such as strings or objects, are not published.
+
+The snapshot is double buffered. The publisher writes a new snapshot into the
+buffer that readers are not directed to, and then swaps the buffers. A reader
+that copies a snapshot while the publisher writes the next one is therefore
+not disturbed, and a reader that is overtaken by two publications retries,
+such that a snapshot is never read partially written.
+
+'''
+import json
+from multiprocessing import shared_memory
+import time
+
+import numpy as np
+
+from fjarrsyn.core.checkpoint import _imprints_of, _column_array
+from fjarrsyn.core.graph import graph_to_csr
+
+_MAGIC = 0x666a7368
+_HEADER_INTS = 4
+_CONTROL_SIZE = 4096
+_NAME_OFFSET = 64
+_NAME_SIZE = 256
+_ALIGN = 64
+
+def _aligned(offset):
+    '''Round an offset up to the alignment of the arrays of a buffer'''
+
+    return -(-offset // _ALIGN) * _ALIGN
+
+def _attach(name):
+    '''Attach to an existing shared memory segment. The segment is not
+    tracked for removal at exit of the attaching process, where supported
+
+    '''
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+class WorldSnapshot(object):
+    '''Snapshot of the state of an agent system, as read from shared memory.
+    The arrays of the snapshot are copies, hence remain valid after further
+    publications
+
+    Parameters
+    ----------
+    step : int
+        The step of the simulation of the snapshot
+    arrays : dict
+        The arrays of the snapshot keyed on name
+    layout : dict
+        Description of the columns of the snapshot
+
+    '''
+    def agent_row(self, agent_id):
+        '''Return the row of an agent in the agent columns
+
+        Raises
+        ------
+        KeyError
+            If the agent is not in the snapshot
+
+        '''
+        return self._row_of_agent[agent_id]
+
+    def columns(self):
+        '''Return the agent columns of the snapshot
+
+        Returns
+        -------
+        columns : list
+            Tuples of imprint type, imprint name and element key
+
+        '''
+        return list(self._columns.keys())
+
+    def column(self, imprint_type, array_name, key, fill=np.nan):
+        '''Return the values of an imprint element of all agents
+
+        Parameters
+        ----------
+        imprint_type : str
+            The type of imprint, such as `resource` or `belief`
+        array_name : str
+            The name of the imprint
+        key : str
+            The key of the element of the imprint
+        fill : optional
+            The value of agents that lack the imprint element
+
+        Returns
+        -------
+        values : numpy array
+            The values in the order of the agent rows
+
+        Raises
+        ------
+        KeyError
+            If the imprint element is not in the snapshot
+
+        '''
+        rows, values = self._columns[(imprint_type, array_name, key)]
+
+        return self._dense(rows, values, len(self.agent_ids), fill)
+
+    def value(self, agent_id, imprint_type, array_name, key):
+        '''Return the value of an imprint element of an agent
+
+        Raises
+        ------
+        KeyError
+            If the agent or the imprint element of the agent is not in the
+            snapshot
+
+        '''
+        return self._lookup(self._columns[(imprint_type, array_name, key)],
+                            self.agent_row(agent_id))
+
+    def aux_column(self, key, fill=np.nan):
+        '''Return a value of the auxiliary content of all nodes
+
+        Parameters
+        ----------
+        key : str
+            The key of the value
+        fill : optional
+            The value of nodes that lack the value
+
+        Returns
+        -------
+        values : numpy array
+            The values in the order of the node rows
+
+        '''
+        rows, values = self._aux_columns[key]
+
+        return self._dense(rows, values, len(self.node_agent), fill)
+
+    def aux_value(self, agent_id, key):
+        '''Return a value of the auxiliary content of the node of an agent
+
+        Raises
+        ------
+        KeyError
+            If the agent or the value of its node is not in the snapshot
+
+        '''
+        return self._lookup(self._aux_columns[key],
+                            self.agent_node[self.agent_row(agent_id)])
+
+    def neighbours(self, agent_id, agents_only=True):
+        '''Return the neighbours of the node of an agent
+
+        Parameters
+        ----------
+        agent_id : str
+            The agent ID
+        agents_only : bool, optional
+            If True, the agent IDs of the neighbour nodes that hold an agent
+            are returned, otherwise the rows of all neighbour nodes
+
+        Returns
+        -------
+        neighbours : list
+            The agent IDs or node rows of the neighbours
+
+        '''
+        node_row = self.agent_node[self.agent_row(agent_id)]
+        node_rows = self.indices[self.indptr[node_row]:self.indptr[node_row + 1]]
+        if not agents_only:
+            return node_rows.tolist()
+
+        agent_rows = self.node_agent[node_rows]
+
+        return [self.agent_ids[k] for k in agent_rows[agent_rows >= 0].tolist()]
+
+    def _dense(self, rows, values, n_rows, fill):
+        '''Scatter the values of a column into an array of all rows'''
+
+        if len(rows) == n_rows:
+            return values
+
+        dense = np.full(n_rows, fill, dtype=np.result_type(values.dtype,
+                                                           np.asarray(fill).dtype))
+        dense[rows] = values
+
+        return dense
+
+    def _lookup(self, column, row):
+        '''Return the value of a column at a row'''
+
+        rows, values = column
+        k = np.searchsorted(rows, row)
+        if k == len(rows) or rows[k] != row:
+            raise KeyError('No value in snapshot column at row %s' %(str(row)))
+
+        return values[k].item()
+
+    def __init__(self, step, arrays, layout):
+
+        self.step = step
+        self.agent_ids = arrays['agent_ids'].tolist()
+        self.agent_node = arrays['agent_node']
+        self.node_agent = arrays['node_agent']
+        self.indptr = arrays['indptr']
+        self.indices = arrays['indices']
+
+        self._columns = dict([((imprint_type, array_name, key),
+                               (arrays[rows_name], arrays[values_name])) \
+                              for imprint_type, array_name, key, rows_name, values_name \
+                              in layout['columns']])
+        self._aux_columns = dict([(key, (arrays[rows_name], arrays[values_name])) \
+                                  for key, rows_name, values_name \
+                                  in layout['aux_columns']])
+        self._row_of_agent = dict([(agent_id, k) \
+                                   for k, agent_id in enumerate(self.agent_ids)])
+
+class SnapshotPublisher(object):
+    '''Publisher of snapshots of the state of an agent system to shared
+    memory, which readers in other processes access by the name of the
+    publisher, see `SnapshotReader`
+
+    Parameters
+    ----------
+    name : str, optional
+        The name of the shared memory segment of the publisher. If not given,
+        a unique name is generated
+    aux_func : callable, optional
+        Function that receives the auxiliary content of a node and returns a
+        dictionary of the values to publish, keyed on name. If not given, no
+        values of the auxiliary content are published
+    imprint_types : Iterable, optional
+        The types of agent imprints to publish, such as `resource`. If not
+        given, all imprints are published
+    capacity : int, optional
+        The initial size in bytes of each of the two buffers. If not given,
+        the buffers are sized after the first snapshot with room to grow
+
+    Notes
+    -----
+    The publisher creates and owns the shared memory, which is removed by
+    `close`. A buffer that is too small for a snapshot, for example after
+    agents have been added to the system, is replaced by a larger one, which
+    readers attach to on their next read.
+
+    Readers should be processes forked or started by the publishing process,
+    such that they share its tracker of shared memory. Readers in unrelated
+    processes on Python versions before 3.13 may otherwise remove the shared
+    memory as they exit.
+
+    '''
+    def publish(self, ams, step=None):
+        '''Publish a snapshot of the state of an agent management system
+
+        Parameters
+        ----------
+        ams : AgentManagementSystem
+            The agent management system
+        step : int, optional
+            The step of the simulation of the snapshot
+
+        Returns
+        -------
+        n_bytes : int
+            The number of bytes of the snapshot
+
+        Raises
+        ------
+        RuntimeError
+            If the publisher has been closed
+
+        '''
+        if self._control is None:
+            raise RuntimeError('The snapshot publisher has been closed')
+
+        arrays, layout = self._collect(ams)
+
+        entries = []
+        offset = 0
+        for array_name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            arrays[array_name] = array
+            entries.append([array_name, array.dtype.str, list(array.shape), offset])
+            offset = _aligned(offset + array.nbytes)
+        layout['arrays'] = entries
+        layout_bytes = json.dumps(layout).encode('utf-8')
+
+        data_offset = _aligned(8 * _HEADER_INTS + len(layout_bytes))
+        n_bytes = data_offset + offset
+
+        header = self._header()
+        k_target = 1 - int(header[2])
+        if self._buffers[k_target] is None or self._buffers[k_target].size < n_bytes:
+            self._replace_buffer(k_target, n_bytes)
+
+        buf = self._buffers[k_target].buf
+        header[1] += 1
+
+        buffer_header = np.ndarray((_HEADER_INTS,), dtype=np.int64, buffer=buf)
+        buffer_header[0] = len(layout_bytes)
+        buffer_header[1] = -1 if step is None else step
+        buffer_header[2] = data_offset
+        buf[8 * _HEADER_INTS:8 * _HEADER_INTS + len(layout_bytes)] = layout_bytes
+        for array_name, dtype, shape, array_offset in entries:
+            target = np.ndarray(shape, dtype=dtype, buffer=buf,
+                                offset=data_offset + array_offset)
+            target[...] = arrays[array_name]
+            del target
+        del buffer_header
+
+        header[2] = k_target
+        header[1] += 1
+        header[3] += 1
+        del header
+
+        return n_bytes
+
+    def close(self):
+        '''Remove the shared memory of the publisher. Readers that are
+        attached keep their access to the memory until they close
+
+        '''
+        for segment in self._buffers + [self._control]:
+            if not segment is None:
+                segment.close()
+                segment.unlink()
+
+        self._buffers = [None, None]
+        self._control = None
+
+    def _collect(self, ams):
+        '''Collect the arrays and layout of a snapshot of the system'''
+
+        agents = list(ams.agents_in_scope.values())
+        nodes, indptr, indices = graph_to_csr(ams.agents_graph)
+        row_of_node = dict([(node, k) for k, node in enumerate(nodes)])
+
+        node_agent = np.full(len(nodes), -1, dtype=np.int64)
+        agent_node = np.empty(len(agents), dtype=np.int64)
+        for k_agent, agent in enumerate(agents):
+            k_node = row_of_node[ams.node_from_agent_id_[agent.agent_id_system]]
+            agent_node[k_agent] = k_node
+            node_agent[k_node] = k_agent
+
+        arrays = {'agent_ids' : np.array([agent.agent_id_system for agent in agents],
+                                         dtype=str),
+                  'agent_node' : agent_node,
+                  'node_agent' : node_agent,
+                  'indptr' : indptr,
+                  'indices' : indices}
+        layout = {'columns' : [], 'aux_columns' : []}
+
+        columns = {}
+        for k_agent, agent in enumerate(agents):
+            for imprint_type, imprint in _imprints_of(agent):
+                if not self.imprint_types is None and \
+                   not imprint_type in self.imprint_types:
+                    continue
+
+                for key in imprint.keys():
+                    rows, values = columns.setdefault((imprint_type,
+                                                       imprint.name, key),
+                                                      ([], []))
+                    rows.append(k_agent)
+                    values.append(imprint[key])
+
+        for k_column, ((imprint_type, array_name, key), (rows, values)) in \
+            enumerate(columns.items()):
+            values_array = _column_array(values)
+            if values_array is None:
+                continue
+
+            rows_name = 'column_%s_rows' %(str(k_column))
+            values_name = 'column_%s_values' %(str(k_column))
+            arrays[rows_name] = np.array(rows, dtype=np.int64)
+            arrays[values_name] = values_array
+            layout['columns'].append([imprint_type, array_name, key,
+                                      rows_name, values_name])
+
+        if not self.aux_func is None:
+            aux_columns = {}
+            for k_node, node in enumerate(nodes):
+                if node.aux_content is None:
+                    continue
+
+                for key, value in self.aux_func(node.aux_content).items():
+                    rows, values = aux_columns.setdefault(key, ([], []))
+                    rows.append(k_node)
+                    values.append(value)
+
+            for k_column, (key, (rows, values)) in enumerate(aux_columns.items()):
+                values_array = _column_array(values)
+                if values_array is None:
+                    continue
+
+                rows_name = 'aux_%s_rows' %(str(k_column))
+                values_name = 'aux_%s_values' %(str(k_column))
+                arrays[rows_name] = np.array(rows, dtype=np.int64)
+                arrays[values_name] = values_array
+                layout['aux_columns'].append([key, rows_name, values_name])
+
+        return arrays, layout
+
+    def _header(self):
+        '''Return the header of the control segment, which holds the magic
+        number, the sequence counter, the active buffer and the number of
+        publications
+
+        '''
+        return np.ndarray((_HEADER_INTS,), dtype=np.int64, buffer=self._control.buf)
+
+    def _replace_buffer(self, k_buffer, n_bytes):
+        '''Create a buffer large enough for a snapshot in place of a buffer
+        that is missing or too small
+
+        '''
+        size = max(n_bytes, self.capacity or 0)
+        if not self._buffers[k_buffer] is None:
+            size = max(size, 2 * self._buffers[k_buffer].size)
+            self._buffers[k_buffer].close()
+            self._buffers[k_buffer].unlink()
+        elif self.capacity is None:
+            size = 2 * n_bytes
+
+        self._n_created += 1
+        name = '%s_%s_%s' %(self.name, str(k_buffer), str(self._n_created))
+        self._buffers[k_buffer] = shared_memory.SharedMemory(name=name,
+                                                             create=True,
+                                                             size=size)
+
+        name_bytes = name.encode('utf-8')
+        start = _NAME_OFFSET + k_buffer * _NAME_SIZE
+        self._control.buf[start:start + _NAME_SIZE] = \
+            name_bytes + bytes(_NAME_SIZE - len(name_bytes))
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.close()
+
+    def __init__(self, name=None, aux_func=None, imprint_types=None,
+                 capacity=None):
+
+        if not aux_func is None and not callable(aux_func):
+            raise TypeError('The auxiliary content function is not callable')
+        if not capacity is None and capacity < 1:
+            raise ValueError('The capacity must be positive, not %s' \
+                             %(str(capacity)))
+
+        self.aux_func = aux_func
+        self.imprint_types = None if imprint_types is None else set(imprint_types)
+        self.capacity = capacity
+
+        self._control = shared_memory.SharedMemory(name=name, create=True,
+                                                   size=_CONTROL_SIZE)
+        self.name = self._control.name
+        self._control.buf[:_CONTROL_SIZE] = bytes(_CONTROL_SIZE)
+        header = self._header()
+        header[0] = _MAGIC
+        header[2] = 1
+        del header
+
+        self._buffers = [None, None]
+        self._n_created = 0
+
+class SnapshotReader(object):
+    '''Reader of the snapshots of a publisher in shared memory
+
+    Parameters
+    ----------
+    name : str
+        The name of the publisher
+    max_retries : int, optional
+        The number of times a read is retried if the publisher overtakes it
+
+    Raises
+    ------
+    FileNotFoundError
+        If there is no publisher of the name
+    ValueError
+        If the shared memory of the name is not of a publisher
+
+    '''
+    def read(self):
+        '''Read the latest snapshot
+
+        Returns
+        -------
+        snapshot : WorldSnapshot
+            The snapshot, or None if no snapshot has been published
+
+        Raises
+        ------
+        RuntimeError
+            If the publisher overtakes the read more than the number of
+            retries
+
+        '''
+        header = np.ndarray((_HEADER_INTS,), dtype=np.int64,
+                            buffer=self._control.buf)
+        try:
+            for _ in range(self.max_retries + 1):
+                seq_start = int(header[1])
+                k_buffer = int(header[2])
+                if int(header[3]) == 0:
+                    return None
+
+                snapshot = None
+                try:
+                    snapshot = WorldSnapshot(*self._copy(k_buffer))
+
+                except (FileNotFoundError, ValueError, KeyError,
+                        UnicodeDecodeError):
+                    pass
+
+                #
+                # The active buffer is only written to after two swaps, or
+                # one if the publisher was writing as the read started
+                #
+                if not snapshot is None and \
+                   int(header[1]) <= 2 * (seq_start // 2) + 2:
+                    return snapshot
+
+                time.sleep(0)
+
+        finally:
+            del header
+
+        raise RuntimeError('Snapshot was overtaken by the publisher in ' + \
+                           '%s consecutive reads' %(str(self.max_retries + 1)))
+
+    @property
+    def n_published(self):
+        '''The number of snapshots published so far'''
+
+        return int(np.ndarray((_HEADER_INTS,), dtype=np.int64,
+                              buffer=self._control.buf)[3])
+
+    def close(self):
+        '''Detach from the shared memory of the publisher'''
+
+        for segment in list(self._segments.values()) + [self._control]:
+            segment.close()
+        self._segments = {}
+
+    def _copy(self, k_buffer):
+        '''Copy the arrays of the snapshot in a buffer'''
+
+        start = _NAME_OFFSET + k_buffer * _NAME_SIZE
+        name = bytes(self._control.buf[start:start + _NAME_SIZE]).rstrip(b'\x00').decode('utf-8')
+
+        segment = self._segments.get(k_buffer)
+        if segment is None or segment.name.lstrip('/') != name:
+            if not segment is None:
+                segment.close()
+            segment = _attach(name)
+            self._segments[k_buffer] = segment
+
+        buf = segment.buf
+        buffer_header = np.ndarray((_HEADER_INTS,), dtype=np.int64, buffer=buf)
+        n_layout, step, data_offset = [int(x) for x in buffer_header[:3]]
+        del buffer_header
+
+        layout = json.loads(bytes(buf[8 * _HEADER_INTS:8 * _HEADER_INTS + n_layout]))
+        arrays = {}
+        for array_name, dtype, shape, array_offset in layout['arrays']:
+            arrays[array_name] = np.ndarray(shape, dtype=dtype, buffer=buf,
+                                            offset=data_offset + array_offset).copy()
+
+        return None if step < 0 else step, arrays, layout
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.close()
+
+    def __init__(self, name, max_retries=100):
+
+        self.name = name
+        self.max_retries = max_retries
+
+        self._control = _attach(name)
+        if self._control.size < _CONTROL_SIZE or \
+           int(np.frombuffer(self._control.buf, dtype=np.int64, count=1)[0]) != _MAGIC:
+            self._control.close()
+            raise ValueError('Shared memory %s is not of a snapshot publisher' \
+                             %(str(name)))
+
+        self._segments = {}
@@ -2,8 +2,75 @@
 the system. 
 
 '''
+import os
+import pickle
+import re
+import sys
+import traceback
+
+import numpy as np
+import numpy.random
+
 from fjarrsyn.core.agent_ms import AgentManagementSystem
 from fjarrsyn.core.mover import Mover
+from fjarrsyn.core.checkpoint import snapshot, save_snapshot
+from fjarrsyn.core.rng import set_random_streams
+from fjarrsyn.simulation.writer import BackgroundWriter
+from fjarrsyn.simulation.condition import StopCondition
+
+CHECKPOINT_PREFIX = 'checkpoint_'
+'''Prefix of the names of the checkpoint files of a runner, which is followed
+by the step and the extension `.npz`
+
+'''
+
+def list_checkpoints(directory):
+    '''Return the checkpoint files of a runner in a directory
+
+    Parameters
+    ----------
+    directory : str
+        Path to the directory of the checkpoints
+
+    Returns
+    -------
+    checkpoints : list
+        Tuples of step and path of the checkpoint files, sorted by step. Empty
+        if the directory does not exist
+
+    '''
+    if not os.path.isdir(directory):
+        return []
+
+    pattern = re.compile('^' + re.escape(CHECKPOINT_PREFIX) + '([0-9]+)\\.npz$')
+    ret = []
+    for file_name in os.listdir(directory):
+        match = pattern.match(file_name)
+        if not match is None:
+            ret.append((int(match.group(1)), os.path.join(directory, file_name)))
+
+    return sorted(ret)
+
+def latest_checkpoint(directory):
+    '''Return the path to the latest checkpoint file of a runner in a
+    directory
+
+    Parameters
+    ----------
+    directory : str
+        Path to the directory of the checkpoints
+
+    Returns
+    -------
+    path : str
+        Path to the checkpoint of the greatest step, or None if there is none
+
+    '''
+    checkpoints = list_checkpoints(directory)
+    if len(checkpoints) == 0:
+        return None
+
+    return checkpoints[-1][1]
 
 class _Simulator(object):
     '''Parent class to simulators
@@ -27,9 +94,24 @@ class _Simulator(object):
             The system to simulate
 
         '''
-        self.move_(system)
-        if not self.io is None:
-            self.io.try_stamp(system, self.step_count)
+        #
+        # The random streams of the system, or none if the system has none,
+        # are active for the duration of the step only, such that the streams
+        # of a system do not leak into the draws of other systems
+        #
+        streams = getattr(system, 'random_streams', None)
+        if not streams is None:
+            streams.set_step(self.step_count)
+        previous_streams = set_random_streams(streams)
+        try:
+            self.move_(system)
+            if not self.io is None:
+                self.io.try_stamp(system, self.step_count)
+            if not self.publisher is None:
+                self.publisher.publish(system, self.step_count)
+
+        finally:
+            set_random_streams(previous_streams)
 
         self.step_count += 1
 
@@ -40,6 +122,7 @@ class _Simulator(object):
 
         self.move_ = system_mover
         self.io = system_io
+        self.publisher = None
 
         self.step_count = step_offset
 
@@ -67,6 +150,30 @@ class FiniteSystemRunner(_Simulator):
         useful information of progress of lengthy simulations
     system_propagator_kwargs : dict, optional
         Named argument dictionary to the `system_propagator`
+    checkpoint_every : int, optional
+        If provided, the state of the system is checkpointed every time this
+        number of steps has been executed
+    checkpoint_dir : str, optional
+        Directory of the checkpoint files, created if it does not exist
+    checkpoint_keep : int, optional
+        Number of the most recent checkpoint files kept, older ones are
+        deleted
+    resume : bool, optional
+        If True, and the checkpoint directory holds a checkpoint, the system
+        is restored from the latest checkpoint when the runner is called, and
+        the simulation continues from the step of the checkpoint
+    snapshot_publisher : SnapshotPublisher, optional
+        If provided, a snapshot of the system is published to shared memory
+        after every step, for worker processes to read
+
+    Notes
+    -----
+    A checkpoint is made by serializing the system to arrays in memory, see
+    `AgentManagementSystem.checkpoint`, and the arrays are written to disk on
+    a background thread while the simulation continues. At most one
+    checkpoint is pending at a time. A checkpoint file is written under a
+    temporary name and renamed once complete, such that a crash during
+    writing does not corrupt the latest checkpoint.
 
     '''
     def __call__(self, system):
@@ -88,28 +195,378 @@ class FiniteSystemRunner(_Simulator):
             raise TypeError('Simulation is done only of instance of ' + \
                             'Agent Management System')
 
-        for k_iter in range(self.n_iter):
-            self.step(system)
+        k_start = 0
+        if self.resume:
+            path = latest_checkpoint(self.checkpoint_dir)
+            if not path is None:
+                self.step_count = system.restore(path)
+                k_start = self.step_count - self.n_iter_init_offset
+
+        try:
+            for k_iter in range(k_start, self.n_iter):
+                self.step(system)
+
+                if not self.progress_report_step is None:
+                    if k_iter % self.progress_report_step == 0:
+                        print (self.print_progress(k_iter))
+
+                if not self.checkpoint_every is None:
+                    if (k_iter + 1) % self.checkpoint_every == 0:
+                        self.checkpoint(system)
+
+        finally:
+            #
+            # Ensure all sampled data and checkpoints are on disk once the
+            # simulation returns, which matters if they are written in the
+            # background
+            #
+            if not self.io is None:
+                self.io.flush()
+            self._checkpoint_writer.flush()
+
+    def checkpoint(self, system):
+        '''Checkpoint the system at the current step. The state is serialized
+        in memory and written to the checkpoint directory in the background
+
+        Parameters
+        ----------
+        system : AgentManagementSystem
+            The system to checkpoint
+
+        Returns
+        -------
+        wait_time : float
+            Time in seconds the simulation was blocked because the previous
+            checkpoint was still being written
+
+        '''
+        arrays = snapshot(system, self.step_count)
+
+        return self._checkpoint_writer.submit(self._write_checkpoint, arrays,
+                                              self.step_count)
+
+    def branch(self, system, n_branches, variant_func=None, result_func=None,
+               seed=None, max_parallel=None, namespace='branch_{}_'):
+        '''Continue the simulation of the system in several branches, each a
+        child process that starts from the current state of the system
+
+        Parameters
+        ----------
+        system : AgentManagementSystem
+            The system to simulate
+        n_branches : int
+            The number of branches
+        variant_func : callable, optional
+            Function that receives the system and the index of the branch, and
+            alters the system or its parameters before the branch is simulated
+        result_func : callable, optional
+            Function that receives the system at the end of a branch and
+            returns a picklable result that is passed to the parent process
+        seed : int, optional
+            Seed from which the seeds of the random number generators of the
+            branches are derived. If not given, it is drawn from the random
+            number generator of the parent process. The random streams of the
+            system, if any, are seeded with the seed of the branch
+        max_parallel : int, optional
+            The maximum number of branches simulated at the same time. If not
+            given, the number of processors
+        namespace : str, optional
+            Format string of the namespace of a branch, with the index of the
+            branch as argument. The namespace is prefixed to the file names and
+            sink names of the System IO, and is the name of the directory of
+            the checkpoints of the branch within the checkpoint directory
+
+        Returns
+        -------
+        results : list
+            The results of `result_func` for each branch, or None for each
+            branch if no function is given
+
+        Raises
+        ------
+        RuntimeError
+            If the platform does not support forking of processes, or if any
+            branch fails, in which case the traceback of the first failed
+            branch is included
+
+        Notes
+        -----
+        The branches are created by `os.fork`, hence each branch starts from a
+        copy-on-write copy of the memory of the parent process, with no need
+        to serialize the system. Each branch runs the number of steps of the
+        runner, continuing from the current step. The system of the parent
+        process is not changed.
+
+        The output of the branches is written through the System IO of the
+        runner. Files and sinks of the file system, such as `SQLiteSink`, are
+        written by all branches under their namespace. Samples appended to an
+        in-memory sink in a branch are not seen by the parent process, and
+        should instead be returned by `result_func`.
+
+        '''
+        if not hasattr(os, 'fork'):
+            raise RuntimeError('Branching requires os.fork, which is not ' + \
+                               'available on this platform')
+
+        if seed is None:
+            seed = numpy.random.randint(0, 2 ** 31)
+        seeds = [int(child.generate_state(1)[0]) for child in \
+                 np.random.SeedSequence(seed).spawn(n_branches)]
+
+        if max_parallel is None:
+            max_parallel = os.cpu_count() or 1
+
+        #
+        # Pending output is completed before forking, since the threads of
+        # the background writers do not exist in the child processes
+        #
+        if not self.io is None:
+            self.io.flush()
+        self._checkpoint_writer.flush()
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        results = [None] * n_branches
+        errors = []
+        for k_first in range(0, n_branches, max_parallel):
+            children = []
+            for k_branch in range(k_first, min(k_first + max_parallel, n_branches)):
+                fd_read, fd_write = os.pipe()
+                pid = os.fork()
+                if pid == 0:
+                    os.close(fd_read)
+                    self._run_branch(system, k_branch, seeds[k_branch],
+                                     variant_func, result_func,
+                                     namespace.format(k_branch), fd_write)
+
+                os.close(fd_write)
+                children.append((k_branch, pid, fd_read))
 
-            if not self.progress_report_step is None:
-                if k_iter % self.progress_report_step == 0:
-                    print (self.print_progress(k_iter))
+            for k_branch, pid, fd_read in children:
+                with os.fdopen(fd_read, 'rb') as f_in:
+                    payload = f_in.read()
+                os.waitpid(pid, 0)
+
+                if len(payload) == 0:
+                    errors.append((k_branch, 'Branch process ended without result'))
+                    continue
+
+                status, value = pickle.loads(payload)
+                if status == 'ok':
+                    results[k_branch] = value
+                else:
+                    errors.append((k_branch, value))
+
+        if len(errors) > 0:
+            raise RuntimeError('Branches %s failed, ' %(str([k for k, _ in errors])) + \
+                               'first error:\n%s' %(errors[0][1]))
+
+        return results
+
+    def _run_branch(self, system, k_branch, seed, variant_func, result_func,
+                    namespace, fd_write):
+        '''Simulate a branch in a child process and send the result to the
+        parent process. The method does not return, it ends the process
+
+        '''
+        exit_status = 1
+        try:
+            try:
+                numpy.random.seed(seed)
+                if not getattr(system, 'random_streams', None) is None:
+                    system.set_random_seed(seed, self.step_count,
+                                           reassign_ids=False)
+
+                if not self.io is None:
+                    self.io._after_fork()
+                    self.io.namespace = namespace + self.io.namespace
+                self._checkpoint_writer._after_fork()
+                self.checkpoint_dir = os.path.join(self.checkpoint_dir, namespace)
+                self.resume = False
+
+                if not variant_func is None:
+                    variant_func(system, k_branch)
+
+                self(system)
+                if not self.io is None:
+                    self.io.close()
+
+                result = None
+                if not result_func is None:
+                    result = result_func(system)
+                payload = pickle.dumps(('ok', result))
+
+            except BaseException:
+                payload = pickle.dumps(('error', traceback.format_exc()))
+
+            with os.fdopen(fd_write, 'wb') as f_out:
+                f_out.write(payload)
+            exit_status = 0
+
+        finally:
+            os._exit(exit_status)
+
+    def _write_checkpoint(self, arrays, step):
+        '''Write a checkpoint and delete the checkpoints beyond the number to
+        keep. Executed on the background thread
+
+        '''
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        path = os.path.join(self.checkpoint_dir,
+                            CHECKPOINT_PREFIX + str(step) + '.npz')
+        path_tmp = path + '.tmp'
+        with open(path_tmp, 'wb') as f_out:
+            save_snapshot(arrays, f_out)
+        os.replace(path_tmp, path)
+
+        for _, path_old in list_checkpoints(self.checkpoint_dir)[:-self.checkpoint_keep]:
+            os.remove(path_old)
 
     def __init__(self, n_iter, system_mover,
                  n_iter_init_offset=0,
-                 system_io=None, progress_report_step=None):
+                 system_io=None, progress_report_step=None,
+                 checkpoint_every=None, checkpoint_dir='checkpoints',
+                 checkpoint_keep=2, resume=False, snapshot_publisher=None):
 
         self.n_iter = n_iter
+        self.n_iter_init_offset = n_iter_init_offset
+
+        if not checkpoint_every is None and checkpoint_every < 1:
+            raise ValueError('Checkpoints must be at least one step apart')
+        if checkpoint_keep < 1:
+            raise ValueError('At least one checkpoint must be kept')
+
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_keep = checkpoint_keep
+        self.resume = resume
+        self._checkpoint_writer = BackgroundWriter(max_queue=1)
 
         self.progress_report_step = progress_report_step
         self.print_progress = lambda x: '---> ' + str(x) + 'steps of total ' + \
                               str(self.n_iter) + ' have been executed'
 
         super().__init__(system_mover, system_io, n_iter_init_offset)
+        self.publisher = snapshot_publisher
 
 class ConditionalSystemRunner(_Simulator):
     '''A simulator of an Agent Management System where the termination criteria
     is some condition rather than a set number of step
 
+    Parameters
+    ----------
+    system_mover : Mover
+        The callable Mover of the AMS that implements the system dynamics
+    conditions : StopCondition or Iterable
+        The stop condition, or conditions, of the simulation, see the module
+        `condition`
+    max_iter : int, optional
+        The maximum number of iterations to simulate, at which the simulation
+        stops whether or not the conditions are met. If not given, the
+        simulation runs until the conditions are met
+    check_every : int, optional
+        The number of steps between the checks of the conditions
+    require : str, optional
+        If `any`, the simulation stops once any of the conditions is met, if
+        `all`, once all conditions are met in the same check
+    system_io : SystemIO, optional
+        An instance of the SystemIO class that defines what system data to
+        sample and how to write it to disk
+    step_offset : int, optional
+        The step at which the simulation starts
+    snapshot_publisher : SnapshotPublisher, optional
+        If provided, a snapshot of the system is published to shared memory
+        after every step, for worker processes to read
+
+    Raises
+    ------
+    TypeError
+        If a condition is not an instance of StopCondition
+    ValueError
+        If the check interval is less than one step, or the requirement is
+        unknown
+
+    Notes
+    -----
+    The conditions update their statistics after every step, which is cheap
+    by design of the conditions, and are checked at the interval of steps.
+    The conditions are reset as the runner is called, hence a runner can be
+    called for several simulations.
+
     '''
-    pass
+    def __call__(self, system):
+        '''The outer loop for a conditional simulation of a system, each step
+        a system mover is applied
+
+        Parameters
+        ----------
+        system : AgentManagementSystem
+            The system to simulate
+
+        Returns
+        -------
+        met : list
+            The conditions that were met as the simulation stopped, empty if
+            the simulation reached the maximum number of iterations
+
+        Raises
+        ------
+        TypeError
+            If the input object is not an agent management system
+
+        '''
+        if not isinstance(system, AgentManagementSystem):
+            raise TypeError('Simulation is done only of instance of ' + \
+                            'Agent Management System')
+
+        for condition in self.conditions:
+            condition.reset()
+
+        self.n_steps = 0
+        self.conditions_met = []
+        try:
+            while self.max_iter is None or self.n_steps < self.max_iter:
+                self.step(system)
+                self.n_steps += 1
+
+                for condition in self.conditions:
+                    condition.update(system, self.step_count - 1)
+
+                if self.n_steps % self.check_every == 0:
+                    met = [condition for condition in self.conditions \
+                           if condition.is_met(system, self.step_count - 1)]
+                    if len(met) > 0 and (self.require == 'any' or \
+                                         len(met) == len(self.conditions)):
+                        self.conditions_met = met
+                        break
+
+        finally:
+            if not self.io is None:
+                self.io.flush()
+
+        return self.conditions_met
+
+    def __init__(self, system_mover, conditions, max_iter=None, check_every=1,
+                 require='any', system_io=None, step_offset=0,
+                 snapshot_publisher=None):
+
+        if isinstance(conditions, StopCondition):
+            conditions = [conditions]
+        conditions = list(conditions)
+        if not all([isinstance(condition, StopCondition) for condition in conditions]):
+            raise TypeError('Conditions of the runner must be instances of StopCondition')
+        if check_every < 1:
+            raise ValueError('Conditions must be checked at least one step apart')
+        if not require in ('any', 'all'):
+            raise ValueError('Unknown requirement of conditions: %s' %(str(require)))
+
+        self.conditions = conditions
+        self.max_iter = max_iter
+        self.check_every = check_every
+        self.require = require
+
+        self.n_steps = 0
+        self.conditions_met = []
+
+        super().__init__(system_mover, system_io, step_offset)
+        self.publisher = snapshot_publisher
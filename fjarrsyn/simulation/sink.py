@@ -0,0 +1,1147 @@
+'''Sinks that append the sampled data of all generations to a single container,
+as an alternative to writing one file per generation and sampler. The
+container is either a file or a buffer in memory
+
+'''
+import json
+import numbers
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+from fjarrsyn.core.graph import graph_to_csr, graph_from_csr
+
+class _Sink(object):
+    '''Parent class for sinks of sampled data. A sink is passed to the
+    `set_write_rule` method of `SystemIO` in place of the name of an IO
+    method, in which case all generations of the sampled data are appended
+    to the sink under the name of the write rule
+
+    '''
+    def append(self, name, generation, sample):
+        '''Append a sample to the sink. Must be implemented by child class
+
+        '''
+        raise NotImplementedError('Child class of _Sink must implement append')
+
+    def flush(self):
+        '''Ensure that all appended data is persisted. Child classes that
+        buffer data should overwrite this method
+
+        '''
+        pass
+
+    def close(self):
+        '''Persist all appended data and release resources held by the sink.
+        Child classes that hold resources should overwrite this method
+
+        '''
+        self.flush()
+
+    def _after_fork(self):
+        '''Prepare the sink for use in a child process created by forking.
+        Child classes that hold resources that cannot be shared between
+        processes should overwrite this method
+
+        '''
+        pass
+
+class SQLiteSink(_Sink):
+    '''Append-mode sink that stores all samples in a single SQLite database
+    file, with one table per write rule, indexed on generation
+
+    Parameters
+    ----------
+    path : str
+        Path to the database file. If the file exists, samples are appended to
+        the tables it contains
+    commit_every : int, optional
+        The number of samples appended between transaction commits. Greater
+        values reduce the number of disk synchronizations, at the cost of
+        more data lost in case the process terminates abruptly
+    timeout : float, optional
+        Time in seconds to wait for a lock on the database held by another
+        process, such as another branch of a simulation
+
+    Notes
+    -----
+    Samples from the agent and environment samplers are stored in the long
+    format of the samplers, that is one row per generation, agent name, agent
+    index and variable, along with any additional columns of the sample.
+    Samples from the graph sampler are stored as one row per node, with empty
+    target, and one row per edge. Reading a single
+    generation uses the index of the table, hence it does not scan the data
+    of other generations.
+
+    The sink can be used by a `SystemIO` with background writing, since
+    access to the database is serialized by a lock.
+
+    The kind, index and columns of the samples of each table are recorded in
+    the table `sink_tables`, and a sample that differs from them is rejected
+    rather than mixed into the table.
+
+    '''
+    def append(self, name, generation, sample):
+        '''Append a sample to the table of the given name
+
+        Parameters
+        ----------
+        name : str
+            Name of the table to append the sample to
+        generation : int
+            The generation at which the sample was taken
+        sample : DataFrame or networkx Graph
+            The sample as returned by an agent, environment or graph sampler
+
+        Raises
+        ------
+        TypeError
+            If the sample is of a type other than the ones the samplers return,
+            or if the sample type, index or columns differ from the ones
+            previously appended to the table
+
+        '''
+        if isinstance(sample, pd.DataFrame):
+            kind = 'frame'
+            index_names = list(sample.index.names)
+            if None in index_names:
+                index_names = []
+                df = sample.reset_index(drop=True)
+            else:
+                df = sample.reset_index()
+            columns = list(df.columns)
+            rows = list(zip(*[df[col].tolist() for col in columns]))
+
+        elif isinstance(sample, nx.Graph):
+            kind = 'graph'
+            index_names = []
+            columns = ['generation', 'source', 'target']
+            rows = [(generation, node, None) for node in sample.nodes] + \
+                   [(generation, n1, n2) for n1, n2 in sample.edges]
+
+        else:
+            raise TypeError('Sink cannot store sample of type %s' \
+                            %(str(type(sample))))
+
+        with self._lock:
+            self._create_table(name, kind, columns, index_names)
+            self._con.executemany('INSERT INTO %s (%s) VALUES (%s)' \
+                                  %(self._quote(name),
+                                    ', '.join([self._quote(c) for c in columns]),
+                                    ', '.join(['?'] * len(columns))), rows)
+
+            self._n_pending += 1
+            if self._n_pending >= self.commit_every:
+                self._con.commit()
+                self._n_pending = 0
+
+    def read(self, name, generation=None):
+        '''Read samples from the table of the given name
+
+        Parameters
+        ----------
+        name : str
+            Name of the table to read
+        generation : int, optional
+            The generation to read. If not given, all generations are read,
+            which is only possible for tables of agent and environment samples
+
+        Returns
+        -------
+        sample : DataFrame or networkx Graph
+            The sample in the format the sampler that created it returns
+
+        Raises
+        ------
+        KeyError
+            If no table of the given name exists in the sink
+        ValueError
+            If all generations of a table of graph samples are requested
+
+        '''
+        with self._lock:
+            if not name in self._tables:
+                self._read_tables()
+            if not name in self._tables:
+                raise KeyError('No samples of name %s in sink' %(name))
+            kind, index_names, _ = self._tables[name]
+
+            if kind == 'frame':
+                query = 'SELECT * FROM %s' %(self._quote(name))
+            else:
+                query = 'SELECT source, target FROM %s' %(self._quote(name))
+            params = ()
+            if not generation is None:
+                query += ' WHERE generation = ?'
+                params = (generation,)
+
+            elif kind == 'graph':
+                raise ValueError('Graph samples must be read one ' + \
+                                 'generation at a time')
+
+            cursor = self._con.execute(query, params)
+            columns = [desc[0] for desc in cursor.description]
+            rows = cursor.fetchall()
+
+        if kind == 'frame':
+            df = pd.DataFrame(rows, columns=columns)
+            if len(index_names) > 0:
+                df = df.set_index(index_names).sort_index(kind='mergesort')
+
+            return df
+
+        else:
+            graph = nx.Graph()
+            for source, target in rows:
+                if target is None:
+                    graph.add_node(source)
+                else:
+                    graph.add_edge(source, target)
+
+            return graph
+
+    def generations(self, name):
+        '''Return the generations stored in the table of the given name
+
+        Parameters
+        ----------
+        name : str
+            Name of the table
+
+        Returns
+        -------
+        generations : list
+            Sorted list of the generations in the table
+
+        Raises
+        ------
+        KeyError
+            If no table of the given name exists in the sink
+
+        '''
+        with self._lock:
+            if not name in self._tables:
+                self._read_tables()
+            if not name in self._tables:
+                raise KeyError('No samples of name %s in sink' %(name))
+
+            rows = self._con.execute('SELECT DISTINCT generation FROM %s ' \
+                                     %(self._quote(name)) + \
+                                     'ORDER BY generation').fetchall()
+
+        return [row[0] for row in rows]
+
+    def names(self):
+        '''Return the names of the tables in the sink'''
+
+        with self._lock:
+            self._read_tables()
+
+        return sorted(self._tables.keys())
+
+    def flush(self):
+        '''Commit any appended samples not yet committed'''
+
+        with self._lock:
+            self._con.commit()
+            self._n_pending = 0
+
+    def close(self):
+        '''Commit any appended samples and close the database'''
+
+        with self._lock:
+            self._con.commit()
+            self._con.close()
+
+    def _after_fork(self):
+        '''Open a connection of the child process to the database, since a
+        connection cannot be shared between processes. The connection of the
+        parent is kept unused rather than closed
+
+        '''
+        self._con_parent = self._con
+        self._lock = threading.Lock()
+        self._n_pending = 0
+        self._connect()
+
+    def _connect(self):
+        '''Connect to the database and read the tables it holds'''
+
+        self._con = sqlite3.connect(self.path, check_same_thread=False,
+                                    timeout=self.timeout)
+        self._con.execute('CREATE TABLE IF NOT EXISTS sink_tables ' + \
+                          '(name TEXT PRIMARY KEY, kind TEXT, ' + \
+                          'index_names TEXT, columns TEXT)')
+        self._con.commit()
+        self._tables = {}
+        self._read_tables()
+
+    def _read_tables(self):
+        '''Read the tables of the database, which includes tables that other
+        processes, such as branches of a simulation, have created
+
+        '''
+        for name, kind, index_names, columns in \
+            self._con.execute('SELECT name, kind, index_names, columns ' + \
+                              'FROM sink_tables'):
+            self._tables[name] = (kind, json.loads(index_names),
+                                  json.loads(columns))
+
+    def _create_table(self, name, kind, columns, index_names):
+        '''Create the table for samples of the given kind and columns, if it
+        does not exist already. The names of the index and the columns of the
+        samples are recorded, such that samples read from the table are
+        indexed alike, and samples of another sampler are not appended to the
+        table
+
+        Raises
+        ------
+        TypeError
+            If the table exists and holds samples of another kind, index or
+            columns
+
+        '''
+        if name in self._tables:
+            kind_current, index_current, columns_current = self._tables[name]
+            if kind_current != kind:
+                raise TypeError('Table %s holds samples of kind %s, not %s' \
+                                %(name, kind_current, kind))
+            if index_current != index_names or \
+               set(columns_current) != set(['generation'] + columns):
+                raise TypeError('Table %s holds samples of index %s and ' \
+                                %(name, str(index_current)) + \
+                                'columns %s, not of index %s and columns %s' \
+                                %(str(columns_current), str(index_names),
+                                  str(columns)))
+            return
+
+        table = self._quote(name)
+        col_defs = ['generation INTEGER'] + \
+                   [self._quote(c) for c in columns if c != 'generation']
+        self._con.execute('CREATE TABLE %s (%s)' %(table, ', '.join(col_defs)))
+
+        self._con.execute('CREATE INDEX %s ON %s (generation)' \
+                          %(self._quote(name + '_generation'), table))
+        columns_table = ['generation'] + [c for c in columns if c != 'generation']
+        self._con.execute('INSERT INTO sink_tables (name, kind, index_names, ' + \
+                          'columns) VALUES (?, ?, ?, ?)',
+                          (name, kind, json.dumps(index_names),
+                           json.dumps(columns_table)))
+        self._tables[name] = (kind, index_names, columns_table)
+
+    def _quote(self, name):
+        '''Quote a table name for use in SQL statements'''
+
+        return '"' + name.replace('"', '""') + '"'
+
+    def __init__(self, path, commit_every=16, timeout=60.0):
+
+        self.path = path
+        self.commit_every = commit_every
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._n_pending = 0
+        self._connect()
+
+class RingBufferSink(_Sink):
+    '''In-memory sink that keeps the samples of the latest generations in a
+    preallocated ring buffer, for analysis within the process that runs the
+    simulation
+
+    Parameters
+    ----------
+    n_generations : int
+        The number of generations kept per name. Once the buffer is full, the
+        sample of the oldest generation is overwritten by the newest
+
+    Notes
+    -----
+    Samples from the agent and environment samplers, and other samplers that
+    return a DataFrame, are stored column by column in numpy arrays, one set
+    of arrays per slot of the ring. The arrays are allocated at the first
+    sample, grown if a later sample has more rows, and otherwise reused, such
+    that steady state appending does not allocate buffer memory. Samples from
+    the graph sampler are kept as the network objects.
+
+    The method `read` returns read-only views of the buffer arrays, which
+    involves no copying. The views remain valid until the slot is
+    overwritten, that is until `n_generations` further samples of the same
+    name have been appended. The method `frame` returns a DataFrame copy.
+
+    '''
+    def append(self, name, generation, sample):
+        '''Append a sample to the ring buffer of the given name
+
+        Parameters
+        ----------
+        name : str
+            Name of the ring buffer to append the sample to
+        generation : int
+            The generation at which the sample was taken
+        sample : DataFrame or networkx Graph
+            The sample as returned by a sampler
+
+        Raises
+        ------
+        TypeError
+            If the sample is of a type other than the ones the samplers return
+
+        '''
+        if not isinstance(sample, (pd.DataFrame, nx.Graph)):
+            raise TypeError('Sink cannot store sample of type %s' \
+                            %(str(type(sample))))
+
+        with self._lock:
+            ring = self._rings.get(name)
+            if ring is None:
+                ring = {'slots' : [{} for _ in range(self.n_generations)],
+                        'generations' : [None] * self.n_generations,
+                        'head' : 0}
+                self._rings[name] = ring
+
+            k_slot = ring['head']
+            ring['head'] = (k_slot + 1) % self.n_generations
+            slot = ring['slots'][k_slot]
+            ring['generations'][k_slot] = generation
+
+            if isinstance(sample, nx.Graph):
+                slot['graph'] = sample
+                slot['length'] = None
+                return
+
+            index_names = list(sample.index.names)
+            if None in index_names:
+                index_names = []
+                df = sample.reset_index(drop=True)
+            else:
+                df = sample.reset_index()
+
+            arrays = slot.setdefault('arrays', {})
+            n_rows = len(df)
+            for column in df.columns:
+                values = df[column].to_numpy()
+                buffer = arrays.get(column)
+
+                if buffer is None or len(buffer) < n_rows or \
+                   not np.can_cast(values.dtype, buffer.dtype):
+                    if buffer is None:
+                        dtype = values.dtype
+                        size = n_rows
+                    else:
+                        dtype = np.result_type(values.dtype, buffer.dtype)
+                        size = max(n_rows, 2 * len(buffer))
+                    buffer = np.empty(size, dtype=dtype)
+                    arrays[column] = buffer
+
+                buffer[:n_rows] = values
+
+            slot['columns'] = list(df.columns)
+            slot['index_names'] = index_names
+            slot['length'] = n_rows
+            slot['graph'] = None
+
+    def _slot(self, name, generation):
+        '''Return the slot of a name and generation, the latest generation if
+        none is given
+
+        '''
+        ring = self._rings.get(name)
+        if ring is None:
+            raise KeyError('No samples of name %s in sink' %(name))
+
+        if generation is None:
+            k_slot = (ring['head'] - 1) % self.n_generations
+
+        else:
+            try:
+                k_slot = ring['generations'].index(generation)
+            except ValueError:
+                raise KeyError('Generation %s of name %s ' %(str(generation), name) + \
+                               'not in sink')
+
+        return ring['slots'][k_slot]
+
+    def read(self, name, generation=None):
+        '''Read a sample from the ring buffer without copying
+
+        Parameters
+        ----------
+        name : str
+            Name of the ring buffer
+        generation : int, optional
+            The generation to read. If not given, the latest is read
+
+        Returns
+        -------
+        sample : dict or networkx Graph
+            For tabular samples, a dictionary of read-only numpy array views
+            keyed on column name, the index levels of the sample included as
+            columns. For graph samples, the network
+
+        Raises
+        ------
+        KeyError
+            If the name or generation is not in the sink
+
+        '''
+        with self._lock:
+            slot = self._slot(name, generation)
+            if slot['length'] is None:
+                return slot['graph']
+
+            ret = {}
+            for column in slot['columns']:
+                view = slot['arrays'][column][:slot['length']]
+                view.flags.writeable = False
+                ret[column] = view
+
+        return ret
+
+    def frame(self, name, generation=None):
+        '''Read a tabular sample from the ring buffer as a DataFrame copy
+
+        Parameters
+        ----------
+        name : str
+            Name of the ring buffer
+        generation : int, optional
+            The generation to read. If not given, the latest is read
+
+        Returns
+        -------
+        df : Pandas DataFrame
+            The sample in the format the sampler that created it returns
+
+        Raises
+        ------
+        KeyError
+            If the name or generation is not in the sink
+        TypeError
+            If the sample is a network
+
+        '''
+        with self._lock:
+            slot = self._slot(name, generation)
+            if slot['length'] is None:
+                raise TypeError('Sample of name %s is not tabular' %(name))
+
+            df = pd.DataFrame(dict([(column, slot['arrays'][column][:slot['length']].copy())
+                                    for column in slot['columns']]),
+                              columns=slot['columns'])
+            index_names = slot['index_names']
+
+        if len(index_names) > 0:
+            df = df.set_index(index_names)
+
+        return df
+
+    def generations(self, name):
+        '''Return the generations held in the ring buffer of a name
+
+        Parameters
+        ----------
+        name : str
+            Name of the ring buffer
+
+        Returns
+        -------
+        generations : list
+            The generations from oldest to newest
+
+        Raises
+        ------
+        KeyError
+            If no samples of the name are in the sink
+
+        '''
+        with self._lock:
+            ring = self._rings.get(name)
+            if ring is None:
+                raise KeyError('No samples of name %s in sink' %(name))
+
+            head = ring['head']
+            ordered = ring['generations'][head:] + ring['generations'][:head]
+
+        return [generation for generation in ordered if not generation is None]
+
+    def names(self):
+        '''Return the names of the ring buffers in the sink'''
+
+        return sorted(self._rings.keys())
+
+    def _after_fork(self):
+        '''Replace the lock, which a thread of the parent process may hold at
+        the fork. Samples appended in the child process are not seen by the
+        parent
+
+        '''
+        self._lock = threading.Lock()
+
+    def __init__(self, n_generations):
+
+        if n_generations < 1:
+            raise ValueError('The ring buffer must hold at least one generation')
+
+        self.n_generations = n_generations
+        self._rings = {}
+        self._lock = threading.Lock()
+
+def _split_values(df):
+    '''Split the column `value` of a sample into the column `value` of the
+    numeric values as floats and the column `value_str` of the string values,
+    such that the column types do not depend on the types of the values. The
+    sample is changed in place
+
+    Raises
+    ------
+    TypeError
+        If a value is neither a number, a string nor None
+
+    '''
+    if not 'value' in df.columns:
+        return df
+
+    values = df['value']
+    texts = [None] * len(values)
+    if values.dtype.kind in 'biuf':
+        floats = values.to_numpy(dtype=np.float64)
+
+    else:
+        floats = np.full(len(values), np.nan)
+        for k, value in enumerate(values):
+            if value is None:
+                continue
+
+            elif isinstance(value, str):
+                texts[k] = value
+
+            elif isinstance(value, (numbers.Real, np.bool_)):
+                floats[k] = float(value)
+
+            else:
+                raise TypeError('Arrow sink cannot store value of type %s' \
+                                %(str(type(value))))
+
+    df['value'] = floats
+    df.insert(df.columns.get_loc('value') + 1, 'value_str',
+              pd.Series(texts, index=df.index, dtype=object))
+
+    return df
+
+def _join_values(df):
+    '''Join the columns `value` and `value_str` of samples read from an
+    Arrow sink into the column `value`, see `_split_values`
+
+    '''
+    if not 'value_str' in df.columns:
+        return df
+
+    texts = df['value_str']
+    if texts.notna().any():
+        df['value'] = df['value'].astype(object).where(texts.isna(), texts)
+
+    return df.drop(columns='value_str')
+
+def _import_pyarrow():
+    '''Import the optional pyarrow package
+
+    Raises
+    ------
+    ImportError
+        If pyarrow is not installed
+
+    '''
+    try:
+        import pyarrow
+        import pyarrow.ipc
+
+    except ImportError:
+        raise ImportError('The Arrow sink requires the pyarrow package, ' + \
+                          'install it with `pip install pyarrow`')
+
+    return pyarrow
+
+class ArrowSink(_Sink):
+    '''Append-mode sink that stores the samples of each write rule as an Arrow
+    IPC stream file in a directory, one record batch per generation
+
+    Parameters
+    ----------
+    directory : str
+        Path to the directory of the stream files, created if it does not
+        exist. The samples of a write rule are stored in the file of the rule
+        name and extension `.arrows`
+    dictionary_columns : iterable, optional
+        Names of the columns that are dictionary-encoded, that is stored as
+        integer codes into a table of distinct values. By default the agent
+        name, agent index and variable columns of the agent and environment
+        samplers
+
+    Raises
+    ------
+    ImportError
+        If the optional pyarrow package is not installed
+
+    Notes
+    -----
+    Only samples in the form of a DataFrame can be stored, such as the
+    samples of the agent, environment and aggregate samplers. The column
+    types are set by the first sample of a write rule, and later samples are
+    converted to them. Since the values of the agents and the environment
+    can be of mixed types, and change type between generations, the column
+    `value` of the samples is stored as the column `value` of the numeric
+    values as floats and the column `value_str` of the string values. The
+    columns are joined by `read`, and returned as stored by `read_table`.
+    Samples cannot be appended to a stream file that
+    exists before the sink is created, but the samples in it can be read.
+
+    Reading memory-maps the stream file, such that the numeric columns and the
+    codes of dictionary-encoded columns of the returned Arrow table are views
+    of the file rather than copies. Many generations can therefore be loaded
+    at the cost of reading the data from disk, without parsing.
+
+    '''
+    EXTENSION = '.arrows'
+
+    def append(self, name, generation, sample):
+        '''Append a sample to the stream file of the given name
+
+        Parameters
+        ----------
+        name : str
+            Name of the stream file to append the sample to
+        generation : int
+            The generation at which the sample was taken
+        sample : DataFrame
+            The sample as returned by a sampler
+
+        Raises
+        ------
+        TypeError
+            If the sample is not a DataFrame, or a value of the sample is
+            neither a number, a string nor None
+        FileExistsError
+            If the first sample of a name is appended and the stream file of
+            the name exists already
+
+        '''
+        if not isinstance(sample, pd.DataFrame):
+            raise TypeError('Arrow sink cannot store sample of type %s' \
+                            %(str(type(sample))))
+
+        index_names = list(sample.index.names)
+        if None in index_names:
+            index_names = []
+            df = sample.reset_index(drop=True)
+        else:
+            df = sample.reset_index()
+
+        if not 'generation' in df.columns:
+            df.insert(0, 'generation', generation)
+        df = _split_values(df)
+
+        with self._lock:
+            if not name in self._writers:
+                self._open_writer(name, df, index_names)
+            file_out, writer, schema = self._writers[name]
+
+            batch = self._pa.RecordBatch.from_pandas(df, schema=schema,
+                                                     preserve_index=False)
+            writer.write_batch(batch)
+
+    def read_table(self, name, generation=None):
+        '''Read samples from the stream file of the given name as an Arrow
+        table, memory-mapped rather than copied
+
+        Parameters
+        ----------
+        name : str
+            Name of the stream file to read
+        generation : int or iterable, optional
+            The generation or generations to read. If not given, all
+            generations are read
+
+        Returns
+        -------
+        table : pyarrow Table
+            The samples, with the index levels of the samples as columns
+
+        Raises
+        ------
+        KeyError
+            If no stream file of the given name exists
+
+        '''
+        if not generation is None:
+            if isinstance(generation, int):
+                generation = [generation]
+            generation = set(generation)
+
+        with self._lock:
+            if name in self._writers:
+                self._writers[name][0].flush()
+
+            reader = self._open_reader(name)
+            k_generation = reader.schema.get_field_index('generation')
+            batches = []
+            for batch in reader:
+                if batch.num_rows == 0:
+                    continue
+
+                if not generation is None:
+                    if not batch.column(k_generation)[0].as_py() in generation:
+                        continue
+
+                batches.append(batch)
+
+        return self._pa.Table.from_batches(batches, schema=reader.schema)
+
+    def read(self, name, generation=None):
+        '''Read samples from the stream file of the given name as a DataFrame
+
+        Parameters
+        ----------
+        name : str
+            Name of the stream file to read
+        generation : int or iterable, optional
+            The generation or generations to read. If not given, all
+            generations are read
+
+        Returns
+        -------
+        df : Pandas DataFrame
+            The samples in the format of the sampler that created them, with
+            dictionary-encoded columns as categoricals
+
+        Raises
+        ------
+        KeyError
+            If no stream file of the given name exists
+
+        '''
+        table = self.read_table(name, generation)
+        metadata = table.schema.metadata or {}
+        index_names = json.loads(metadata.get(b'fjarrsyn_index', b'[]'))
+
+        df = _join_values(table.to_pandas())
+        if len(index_names) > 0:
+            df = df.set_index(index_names).sort_index(kind='mergesort')
+
+        return df
+
+    def generations(self, name):
+        '''Return the generations stored in the stream file of the given name
+
+        Parameters
+        ----------
+        name : str
+            Name of the stream file
+
+        Returns
+        -------
+        generations : list
+            Sorted list of the generations in the file
+
+        Raises
+        ------
+        KeyError
+            If no stream file of the given name exists
+
+        '''
+        table = self.read_table(name)
+        if table.num_rows == 0:
+            return []
+
+        values = table.column('generation').unique().to_pylist()
+
+        return sorted(values)
+
+    def names(self):
+        '''Return the names of the stream files in the directory of the sink'''
+
+        names = set(self._writers.keys())
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith(self.EXTENSION):
+                names.add(file_name[:-len(self.EXTENSION)])
+
+        return sorted(names)
+
+    def flush(self):
+        '''Flush the appended samples to the stream files'''
+
+        with self._lock:
+            for file_out, _, _ in self._writers.values():
+                file_out.flush()
+
+    def close(self):
+        '''Write the end of the streams and close the stream files'''
+
+        with self._lock:
+            for file_out, writer, _ in self._writers.values():
+                writer.close()
+                file_out.close()
+            self._writers = {}
+
+    def _after_fork(self):
+        '''Drop the stream files the parent process has open, without closing
+        them, since they are not written by the child process
+
+        '''
+        self._writers_parent = self._writers
+        self._writers = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        '''Return the path to the stream file of a name'''
+
+        return os.path.join(self.directory, name + self.EXTENSION)
+
+    def _open_writer(self, name, df, index_names):
+        '''Create the stream file of a name with the column types of a sample
+
+        '''
+        path = self._path(name)
+        if os.path.exists(path):
+            raise FileExistsError('Stream file %s exists, ' %(path) + \
+                                  'samples cannot be appended to it')
+
+        schema = self._pa.Schema.from_pandas(df, preserve_index=False)
+        for column, column_type in [('value', self._pa.float64()),
+                                    ('value_str', self._pa.string())]:
+            k_field = schema.get_field_index(column)
+            if k_field >= 0:
+                schema = schema.set(k_field,
+                                    schema.field(k_field).with_type(column_type))
+
+        for column in self.dictionary_columns:
+            k_field = schema.get_field_index(column)
+            if k_field < 0:
+                continue
+
+            field = schema.field(k_field)
+            if self._pa.types.is_dictionary(field.type):
+                continue
+
+            schema = schema.set(k_field,
+                                field.with_type(self._pa.dictionary(self._pa.int32(),
+                                                                    field.type)))
+
+        schema = schema.with_metadata({'fjarrsyn_index' : json.dumps(index_names)})
+
+        #
+        # Dictionary deltas let later generations extend the dictionaries of
+        # earlier ones, for example by the names of new agents
+        #
+        options = self._pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+        file_out = self._pa.OSFile(path, 'wb')
+        writer = self._pa.ipc.new_stream(file_out, schema, options=options)
+        self._writers[name] = (file_out, writer, schema)
+
+    def _open_reader(self, name):
+        '''Open the stream file of a name memory-mapped'''
+
+        path = self._path(name)
+        if not os.path.exists(path):
+            raise KeyError('No samples of name %s in sink' %(name))
+
+        return self._pa.ipc.open_stream(self._pa.memory_map(path, 'r'))
+
+    def __init__(self, directory, dictionary_columns=('name', 'agent_index',
+                                                      'variable')):
+
+        self._pa = _import_pyarrow()
+
+        self.directory = directory
+        self.dictionary_columns = list(dictionary_columns)
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._writers = {}
+
+class CSRGraphSink(_Sink):
+    '''Sink that stores each graph sample as a binary file of the node labels
+    and the topology in compressed sparse row format
+
+    Parameters
+    ----------
+    directory : str
+        Path to the directory of the files, created if it does not exist. The
+        sample of a write rule and generation is stored in the file of the
+        rule name and the generation joined by a period, with extension
+        `.npz`
+    compressed : bool, optional
+        If True, the arrays are compressed, which makes the files smaller but
+        slower to write and read
+
+    Notes
+    -----
+    A file holds the arrays `labels`, `indptr` and `indices`, as returned by
+    `graph_to_csr` for the sampled network, along with a flag `directed`. The
+    labels are stored as a numpy array, hence labels of mixed types are
+    converted to strings. Edge attributes are not stored.
+
+    The files are read with `load_csr_graph`, either as a network of labels,
+    or as a network of Node objects from which an agent system topology can
+    be rebuilt.
+
+    '''
+    EXTENSION = '.npz'
+    SEPARATOR = '.'
+
+    def append(self, name, generation, sample):
+        '''Write a graph sample to the file of the given name and generation
+
+        Parameters
+        ----------
+        name : str
+            Name of the write rule
+        generation : int
+            The generation at which the sample was taken
+        sample : networkx Graph
+            The sample as returned by a graph sampler
+
+        Raises
+        ------
+        TypeError
+            If the sample is not a network
+
+        '''
+        if not isinstance(sample, nx.Graph):
+            raise TypeError('CSR graph sink cannot store sample of type %s' \
+                            %(str(type(sample))))
+
+        write_csr_graph(sample, self._path(name, generation),
+                        compressed=self.compressed)
+
+    def read(self, name, generation, node_of_label=None):
+        '''Read a graph sample
+
+        Parameters
+        ----------
+        name : str
+            Name of the write rule
+        generation : int
+            The generation to read
+        node_of_label : dict or callable, optional
+            See `load_csr_graph`
+
+        Returns
+        -------
+        graph
+            The network, from `networkx` library
+
+        Raises
+        ------
+        KeyError
+            If no sample of the name and generation exists
+
+        '''
+        path = self._path(name, generation)
+        if not os.path.exists(path):
+            raise KeyError('No sample of name %s and ' %(name) + \
+                           'generation %s in sink' %(str(generation)))
+
+        return load_csr_graph(path, node_of_label)
+
+    def generations(self, name):
+        '''Return the generations stored for the given name
+
+        Parameters
+        ----------
+        name : str
+            Name of the write rule
+
+        Returns
+        -------
+        generations : list
+            Sorted list of the generations
+
+        '''
+        prefix = name + self.SEPARATOR
+        ret = []
+        for file_name in os.listdir(self.directory):
+            if file_name.startswith(prefix) and file_name.endswith(self.EXTENSION):
+                generation = file_name[len(prefix):-len(self.EXTENSION)]
+                if generation.isdigit():
+                    ret.append(int(generation))
+
+        return sorted(ret)
+
+    def _path(self, name, generation):
+        '''Return the path to the file of a name and generation'''
+
+        return os.path.join(self.directory,
+                            name + self.SEPARATOR + str(generation) + \
+                            self.EXTENSION)
+
+    def __init__(self, directory, compressed=False):
+
+        self.directory = directory
+        self.compressed = compressed
+
+        os.makedirs(directory, exist_ok=True)
+
+def write_csr_graph(graph, path, compressed=False):
+    '''Write the node labels and topology of a network to a binary file in
+    compressed sparse row format
+
+    Parameters
+    ----------
+    graph
+        The network, from `networkx` library, with nodes that are labels
+    path : str
+        Path to the file. The extension `.npz` is appended if not present
+    compressed : bool, optional
+        If True, the arrays are compressed
+
+    '''
+    labels, indptr, indices = graph_to_csr(graph)
+
+    #
+    # Use the smallest integer type for the neighbour indices, which halves
+    # the file for networks of fewer than two billion nodes
+    #
+    if len(labels) < np.iinfo(np.int32).max:
+        indices = indices.astype(np.int32)
+
+    save = np.savez_compressed if compressed else np.savez
+    save(path, labels=np.array(labels), indptr=indptr, indices=indices,
+         directed=np.array(graph.is_directed()))
+
+def load_csr_graph(path, node_of_label=None):
+    '''Load a network from a binary file in compressed sparse row format
+
+    Parameters
+    ----------
+    path : str
+        Path to the file, as written by `write_csr_graph` or `CSRGraphSink`
+    node_of_label : dict or callable, optional
+        Mapping from the labels to the objects that are the nodes of the
+        loaded network, for example Node objects of an agent system to
+        restart. If not given, the labels are the nodes
+
+    Returns
+    -------
+    graph
+        The network, from `networkx` library
+
+    '''
+    with np.load(path, allow_pickle=False) as data:
+        labels = data['labels'].tolist()
+        indptr = data['indptr']
+        indices = data['indices']
+        directed = bool(data['directed'])
+
+    if node_of_label is None:
+        nodes = labels
+    elif callable(node_of_label):
+        nodes = [node_of_label(label) for label in labels]
+    else:
+        nodes = [node_of_label[label] for label in labels]
+
+    return graph_from_csr(nodes, indptr, indices, directed=directed)
@@ -0,0 +1,266 @@
+'''Sweep of the parameters of a simulation over a grid, with the results of
+each configuration cached on disk, such that a sweep that is run again only
+simulates the configurations not yet in the cache
+
+'''
+import hashlib
+import itertools
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import numpy.random
+
+from fjarrsyn.simulation.pool import run_on_pool
+
+def _json_value(obj):
+    '''Convert numpy scalars and arrays to values of JSON, and reject other
+    objects that JSON cannot represent, since a key derived from their
+    representation would not identify their value across runs
+
+    '''
+    if isinstance(obj, (np.generic, np.ndarray)):
+        return obj.tolist()
+
+    raise TypeError('Parameter value of type %s cannot be part ' %(str(type(obj))) + \
+                    'of a cache key, only values serializable to JSON can')
+
+def config_key(params, seed=None, tag=''):
+    '''Compute the cache key of a configuration of parameters and seed
+
+    Parameters
+    ----------
+    params : dict
+        The parameters of the configuration, keyed on name
+    seed : int, optional
+        The seed of the random number generator
+    tag : str, optional
+        Label of the version of the simulation code, such that results of
+        other versions are not taken from the cache
+
+    Returns
+    -------
+    key : str
+        Hexadecimal SHA-256 digest of the configuration, independent of the
+        order of the parameters
+
+    Raises
+    ------
+    TypeError
+        If a parameter value is not serializable to JSON. Numpy scalars and
+        arrays are serialized as their values
+
+    '''
+    content = json.dumps({'params' : params, 'seed' : seed, 'tag' : tag},
+                         sort_keys=True, default=_json_value)
+
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def _run_point(run_func, params, seed):
+    '''Simulate one configuration. Executed in a process of the pool
+
+    Returns
+    -------
+    result
+        The result of the run function
+
+    '''
+    if not seed is None:
+        numpy.random.seed(seed)
+
+    return run_func(seed=seed, **params)
+
+class ParameterSweep(object):
+    '''Class to run a simulation for all configurations of a parameter grid
+    and seeds, on a pool of processes, with results cached on disk
+
+    Parameters
+    ----------
+    run_func : callable
+        Function that simulates one configuration and returns a picklable
+        result. It receives the seed as named argument `seed`, and the
+        parameters of the configuration as named arguments. The random number
+        generator is seeded before the call, unless the seed is None
+    grid : dict or list
+        Either a dictionary of parameter values keyed on parameter name, in
+        which case all combinations of values are configurations, or a list
+        of dictionaries, each a configuration
+    seeds : iterable, optional
+        The seeds to simulate each configuration for
+    cache_dir : str, optional
+        Directory of the result cache, created if it does not exist
+    tag : str, optional
+        Label of the version of the simulation code, which is part of the
+        cache key. Changing the tag after a change of the simulation code
+        prevents the use of results of the previous code
+    max_workers : int, optional
+        The number of processes of the pool. If not given, the number of
+        processors
+    progress_report : bool, optional
+        If True, a progress statement is printed to stdout as each
+        configuration completes
+
+    Notes
+    -----
+    The run function is sent to the processes of the pool, hence it must be
+    picklable, which means defined at the top level of a module. Parameters
+    must be serializable to JSON, or be numpy scalars or arrays, since the
+    cache key is computed from the JSON form. Other objects, such as
+    functions, are rejected, since their representation may differ between
+    runs, which would miss the cache.
+
+    The result of a configuration is written to the cache as soon as it
+    completes, hence a sweep that is interrupted keeps the results computed
+    so far. Configurations that raise an exception are not cached. The
+    attribute `summary` is a dictionary set by `run` with entries:
+
+    * `n_points` : Number of configurations and seeds of the sweep
+    * `n_cached` : Number of results taken from the cache
+    * `n_run` : Number of configurations simulated
+    * `n_failed` : Number of configurations that raised an exception
+    * `failures` : Dictionary of tracebacks keyed on configuration index
+    * `run_time` : Wall time in seconds of the sweep
+
+    '''
+    def points(self):
+        '''Return the configurations of the sweep
+
+        Returns
+        -------
+        points : list
+            Tuples of parameter dictionary, seed and cache key, with the
+            seeds of a configuration consecutive
+
+        '''
+        if isinstance(self.grid, dict):
+            names = sorted(self.grid.keys())
+            configs = [dict(zip(names, values)) for values in \
+                       itertools.product(*[self.grid[name] for name in names])]
+        else:
+            configs = [dict(config) for config in self.grid]
+
+        return [(params, seed, config_key(params, seed, self.tag)) \
+                for params in configs for seed in self.seeds]
+
+    def pending(self):
+        '''Return the configurations of the sweep without result in the cache
+
+        Returns
+        -------
+        points : list
+            Tuples of parameter dictionary, seed and cache key
+
+        '''
+        return [point for point in self.points() \
+                if not os.path.isfile(self._path(point[2]))]
+
+    def run(self):
+        '''Simulate all configurations of the sweep not in the cache
+
+        Returns
+        -------
+        records : list
+            Dictionaries of the parameters, seed, result and whether the
+            result was taken from the cache, keyed on `params`, `seed`,
+            `result` and `cached`, in the order of the configurations. The
+            result is None for configurations that failed
+
+        '''
+        os.makedirs(self.cache_dir, exist_ok=True)
+        points = self.points()
+        records = []
+        to_run = []
+        for k_point, (params, seed, key) in enumerate(points):
+            record = {'params' : params, 'seed' : seed, 'result' : None,
+                      'cached' : False}
+            path = self._path(key)
+            if os.path.isfile(path):
+                with open(path, 'rb') as f_in:
+                    record['result'] = pickle.load(f_in)['result']
+                record['cached'] = True
+            else:
+                to_run.append(k_point)
+            records.append(record)
+
+        failures = {}
+
+        def _completed(k_task, result, error):
+            k_point = to_run[k_task]
+            if error is None:
+                records[k_point]['result'] = result
+                self._store(points[k_point], result)
+            else:
+                failures[k_point] = error
+
+        t_start = time.perf_counter()
+        if len(to_run) > 0:
+            print_progress = None
+            if self.progress_report:
+                print_progress = self.print_progress
+            run_on_pool(_run_point,
+                        [(self.run_func, points[k_point][0], points[k_point][1]) \
+                         for k_point in to_run],
+                        max_workers=self.max_workers, on_done=_completed,
+                        print_progress=print_progress)
+
+        self.summary = {'n_points' : len(points),
+                        'n_cached' : len(points) - len(to_run),
+                        'n_run' : len(to_run),
+                        'n_failed' : len(failures),
+                        'failures' : failures,
+                        'run_time' : time.perf_counter() - t_start}
+
+        return records
+
+    def __call__(self):
+        '''Simulate all configurations of the sweep not in the cache, see
+        `run`
+
+        '''
+        return self.run()
+
+    def _path(self, key):
+        '''Return the path to the cache file of a key'''
+
+        return os.path.join(self.cache_dir, key + '.pkl')
+
+    def _store(self, point, result):
+        '''Write the result of a configuration to the cache. The file is
+        written under a temporary name and renamed once complete, such that
+        an interruption does not leave a partial result in the cache
+
+        '''
+        params, seed, key = point
+        path = self._path(key)
+        path_tmp = path + '.tmp'
+        with open(path_tmp, 'wb') as f_out:
+            pickle.dump({'params' : params, 'seed' : seed, 'tag' : self.tag,
+                         'result' : result}, f_out,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path_tmp, path)
+
+    def __init__(self, run_func, grid, seeds=(None,), cache_dir='sweep_cache',
+                 tag='', max_workers=None, progress_report=False):
+
+        if not callable(run_func):
+            raise TypeError('The run function is not callable')
+        if not isinstance(grid, (dict, list, tuple)):
+            raise TypeError('The parameter grid must be a dictionary or ' + \
+                            'a list of dictionaries')
+
+        self.run_func = run_func
+        self.grid = grid
+        self.seeds = list(seeds)
+        self.cache_dir = cache_dir
+        self.tag = tag
+        self.max_workers = max_workers
+
+        self.progress_report = progress_report
+        self.print_progress = lambda n_done, n_total, n_failed: '---> ' + \
+                              str(n_done) + ' configurations of total ' + \
+                              str(n_total) + ' have completed, ' + \
+                              str(n_failed) + ' failed'
+
+        self.summary = None
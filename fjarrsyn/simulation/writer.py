@@ -0,0 +1,148 @@
+'''Background writer that moves the serialization and writing of sampled data
+to disk off the thread that executes the simulation
+
+'''
+import queue
+import threading
+import time
+
+class BackgroundWriter(object):
+    '''Bounded queue of write operations executed in order by a background
+    thread
+
+    Parameters
+    ----------
+    max_queue : int, optional
+        Maximum number of write operations that can be pending. If the queue
+        is full, submission of another operation blocks until the background
+        thread has completed a pending operation, which creates back-pressure
+        on the simulation in case it produces data faster than it can be
+        written
+
+    Notes
+    -----
+    The objects passed to the writer are not copied, therefore the caller
+    must ensure that they are not altered after submission. The samplers of
+    the library create new objects on each sampling, which fulfills this
+    requirement.
+
+    Any exception raised by a write operation is stored and raised on the
+    thread of the caller at the next submission or flush. Operations that
+    are pending at the time of the exception are discarded.
+
+    '''
+    _STOP = object()
+
+    def submit(self, func, *args, **kwargs):
+        '''Submit a write operation to the queue
+
+        Parameters
+        ----------
+        func : callable
+            The function that executes the write operation
+        args
+            Positional arguments to the function
+        kwargs
+            Named arguments to the function
+
+        Returns
+        -------
+        wait_time : float
+            Time in seconds the submission was blocked because the queue was
+            full
+
+        Raises
+        ------
+        RuntimeError
+            If a previously submitted write operation failed
+
+        '''
+        self._raise_error()
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True,
+                                            name='fjarrsyn-writer')
+            self._thread.start()
+
+        t_start = time.perf_counter()
+        self._queue.put((func, args, kwargs))
+
+        return time.perf_counter() - t_start
+
+    def flush(self):
+        '''Block until all submitted write operations have been completed
+
+        Raises
+        ------
+        RuntimeError
+            If a submitted write operation failed
+
+        '''
+        if not self._thread is None:
+            self._queue.join()
+
+        self._raise_error()
+
+    def close(self):
+        '''Complete all pending write operations and stop the background
+        thread. The writer can be used again after closing, in which case a
+        new background thread is started
+
+        Raises
+        ------
+        RuntimeError
+            If a submitted write operation failed
+
+        '''
+        if not self._thread is None:
+            self._queue.put(self._STOP)
+            self._thread.join()
+            self._thread = None
+
+        self._raise_error()
+
+    def _raise_error(self):
+        '''Raise a stored exception from the background thread, if any'''
+
+        if not self._error is None:
+            err = self._error
+            self._error = None
+            raise RuntimeError('Background write operation failed') from err
+
+    def _after_fork(self):
+        '''Reset the writer in a child process created by forking, in which
+        the background thread of the parent does not run. The writer must be
+        flushed before the fork
+
+        '''
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._thread = None
+        self._error = None
+
+    def _run(self):
+        '''The loop of the background thread'''
+
+        while True:
+            item = self._queue.get()
+            try:
+                if item is self._STOP:
+                    break
+
+                if self._error is None:
+                    func, args, kwargs = item
+                    func(*args, **kwargs)
+
+            except Exception as err:
+                self._error = err
+
+            finally:
+                self._queue.task_done()
+
+    def __init__(self, max_queue=8):
+
+        if max_queue < 1:
+            raise ValueError('The writer queue must hold at least one operation')
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._error = None
@@ -0,0 +1,112 @@
+'''Test of branching a simulation into child processes that continue from a
+shared state
+
+'''
+import pytest
+
+import os
+
+import numpy as np
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.message import Essence, Resource
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.mover import Mover
+from fjarrsyn.simulation.sampler import AgentSampler, SystemIO
+from fjarrsyn.simulation.sink import SQLiteSink
+from fjarrsyn.simulation.simulator import FiniteSystemRunner
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'),
+                                reason='Branching requires os.fork')
+
+class Bacteria(Agent):
+
+    def __init__(self, name, e1, r1):
+
+        super().__init__(name, strict_engine=True)
+
+        essence = Essence('Bacteria Essence', ['E1'])
+        essence.set_values([e1])
+
+        resource = Resource('Bacteria Resource', ['R1'])
+        resource.set_values([r1])
+
+        self.set_scaffolds(essence, resource)
+
+def _grow(ams):
+    for agent in ams.agents_in_scope.values():
+        agent.resource['R1'] += agent.essence['E1'] * np.random.random()
+
+def _set_rate(ams, k_branch):
+    for agent in ams.agents_in_scope.values():
+        agent.essence['E1'] = float(k_branch)
+
+def _resources(ams):
+    return [agent.resource['R1'] for agent in ams.agents_in_scope.values()]
+
+def _failing_variant(ams, k_branch):
+    if k_branch == 1:
+        raise ValueError('bad variant')
+
+def test_main():
+
+    rng_state = np.random.get_state()
+    np.random.seed(5)
+
+    agents = [Bacteria('bacteria {}'.format(k), 1.0, 0.0) for k in range(3)]
+    mess = AgentManagementSystem('3 bacteria', agents)
+
+    a_sampler = AgentSampler('state',
+                             resource_args=[('Bacteria Resource', 'R1')],
+                             sample_steps=2)
+    sink = SQLiteSink('branch_test.sqlite')
+    io = SystemIO([('agent', a_sampler, sink),
+                   ('agent', a_sampler, 'to_csv')], async_write=True)
+
+    runner = FiniteSystemRunner(4, Mover('grow', _grow), system_io=io)
+    runner(mess)
+    burn_in = _resources(mess)
+
+    results = runner.branch(mess, 3, variant_func=_set_rate,
+                            result_func=_resources, seed=17, max_parallel=2)
+    results_again = runner.branch(mess, 3, variant_func=_set_rate,
+                                  result_func=_resources, seed=17,
+                                  namespace='again_{}_')
+
+    #
+    # The parent system is unchanged, branch 0 has zero growth rate, and the
+    # branches are reproducible from the seed
+    #
+    assert (_resources(mess) == burn_in)
+    assert (runner.step_count == 4)
+    assert (results[0] == burn_in)
+    assert (all([r1 > r0 for r1, r0 in zip(results[2], burn_in)]))
+    assert (results == results_again)
+
+    assert (sink.names() == ['again_0_agent', 'again_1_agent',
+                             'again_2_agent', 'agent', 'branch_0_agent',
+                             'branch_1_agent', 'branch_2_agent'])
+    assert (sink.read('again_1_agent').equals(sink.read('branch_1_agent')))
+    assert (sink.generations('branch_1_agent') == [4, 6])
+    df = sink.read('branch_2_agent', 6)
+    assert (len(df) == 3)
+    assert (all([value < max(results[2]) for value in df['value']]))
+    for k_branch in range(3):
+        for generation in [4, 6]:
+            os.remove('branch_{}_agent{}.csv'.format(k_branch, generation))
+            os.remove('again_{}_agent{}.csv'.format(k_branch, generation))
+
+    with pytest.raises(RuntimeError, match='bad variant'):
+        runner.branch(mess, 2, variant_func=_failing_variant)
+
+    io.close()
+    sink.close()
+    for generation in [0, 2]:
+        os.remove('agent{}.csv'.format(generation))
+    os.remove('branch_test.sqlite')
+    for k_branch in range(2):
+        for generation in [4, 6]:
+            if os.path.isfile('branch_{}_agent{}.csv'.format(k_branch, generation)):
+                os.remove('branch_{}_agent{}.csv'.format(k_branch, generation))
+
+    np.random.set_state(rng_state)
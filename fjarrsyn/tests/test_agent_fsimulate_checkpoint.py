@@ -0,0 +1,100 @@
+'''Test of periodic checkpoints during a finite simulation, and of resuming
+a simulation from the latest checkpoint
+
+'''
+import pytest
+
+import os
+import shutil
+
+import numpy as np
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.message import Essence, Resource
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.mover import Mover
+from fjarrsyn.simulation.simulator import FiniteSystemRunner, latest_checkpoint
+
+class Bacteria(Agent):
+
+    def __init__(self, name, e1, r1):
+
+        super().__init__(name, strict_engine=True)
+
+        essence = Essence('Bacteria Essence', ['E1'])
+        essence.set_values([e1])
+
+        resource = Resource('Bacteria Resource', ['R1'])
+        resource.set_values([r1])
+
+        self.set_scaffolds(essence, resource)
+
+class Crash(Exception):
+    pass
+
+def _grow(ams):
+    for agent in ams.agents_in_scope.values():
+        agent.resource['R1'] += np.random.random()
+
+def _make_system():
+    agents = [Bacteria('bacteria {}'.format(k), 1.0 * k, 2.0 * k)
+              for k in range(4)]
+    return AgentManagementSystem('4 bacteria', agents)
+
+def _state(ams):
+    return [(agent.name, agent.resource['R1']) \
+            for agent in ams.agents_in_scope.values()]
+
+def test_main():
+
+    rng_state = np.random.get_state()
+
+    np.random.seed(3)
+    mess_ref = _make_system()
+    runner = FiniteSystemRunner(10, Mover('grow', _grow))
+    runner(mess_ref)
+
+    #
+    # A simulation that crashes after eight steps
+    #
+    n_calls = [0]
+    def _grow_and_crash(ams):
+        n_calls[0] += 1
+        if n_calls[0] == 8:
+            raise Crash()
+        _grow(ams)
+
+    np.random.seed(3)
+    mess = _make_system()
+    runner = FiniteSystemRunner(10, Mover('grow', _grow_and_crash),
+                                checkpoint_every=3,
+                                checkpoint_dir='checkpoint_runner_test',
+                                checkpoint_keep=1)
+    with pytest.raises(Crash):
+        runner(mess)
+
+    assert (os.listdir('checkpoint_runner_test') == ['checkpoint_6.npz'])
+    assert (latest_checkpoint('checkpoint_runner_test') == \
+            os.path.join('checkpoint_runner_test', 'checkpoint_6.npz'))
+
+    #
+    # Resume in a system created anew
+    #
+    np.random.seed(100)
+    mess = _make_system()
+    runner = FiniteSystemRunner(10, Mover('grow', _grow),
+                                checkpoint_every=3,
+                                checkpoint_dir='checkpoint_runner_test',
+                                checkpoint_keep=2, resume=True)
+    runner(mess)
+    assert (runner.step_count == 10)
+    assert (_state(mess) == _state(mess_ref))
+    assert (sorted(os.listdir('checkpoint_runner_test')) == \
+            ['checkpoint_6.npz', 'checkpoint_9.npz'])
+
+    assert (latest_checkpoint('no_such_directory') is None)
+    with pytest.raises(ValueError):
+        FiniteSystemRunner(10, Mover('grow', _grow), checkpoint_every=0)
+
+    shutil.rmtree('checkpoint_runner_test')
+    np.random.set_state(rng_state)
@@ -0,0 +1,182 @@
+'''Test of the simulation of a system until stop conditions are met
+
+'''
+import pytest
+
+import os
+
+import numpy as np
+import networkx as nx
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.message import Resource
+from fjarrsyn.core.graph import Node
+from fjarrsyn.core.mover import Mover
+from fjarrsyn.simulation.simulator import ConditionalSystemRunner
+from fjarrsyn.simulation.condition import StopCondition, PopulationSize, \
+                                          InertFraction, MovingVariance
+
+N_AGENTS = 200
+
+class Cell(Agent):
+
+    def __init__(self, name):
+
+        super().__init__(name, strict_engine=True)
+
+        resource = Resource('Content', ['amount'])
+        resource.set_values([1.0])
+        self.set_scaffold(resource)
+
+def _make_system():
+
+    agents = [Cell('cell %s' %(str(k))) for k in range(N_AGENTS)]
+    graph = nx.Graph()
+    graph.add_nodes_from([Node('node %s' %(str(k)), agent) \
+                          for k, agent in enumerate(agents)])
+
+    return AgentManagementSystem('cells', agents, graph, strict_engine=True)
+
+def _scan_inert(system):
+    return sum([agent.inert for agent in system.agents_in_scope.values()])
+
+def _fall_asleep(system, history):
+    for agent in system.agents_in_scope.values():
+        if np.random.ranf() < 0.05:
+            agent.inert = True
+    history.append(_scan_inert(system) / system.get_n_agents())
+
+def _die(system):
+    for agent_id in list(system.agents_in_scope):
+        if np.random.ranf() < 0.1:
+            system.terminate_agent(agent_id)
+
+def test_main():
+
+    state = np.random.get_state()
+    np.random.seed(5)
+    path = 'tmp_conditional.npz'
+
+    try:
+        #
+        # The count of inert agents follows the agents without a scan
+        system = _make_system()
+        agents = list(system.agents_in_scope.values())
+        agents[0].inert = True
+        agents[1].inert = True
+        agents[1].inert = True
+        assert system.get_n_inert() == 2
+        agents[0].revive()
+        assert system.get_n_inert() == 1
+        system.terminate_agent(agents[1].agent_id_system)
+        assert system.get_n_inert() == 0
+        agents[1].inert = False
+        assert system.get_n_inert() == 0
+        copy_agent = agents[2].deepcopy()
+        copy_agent.inert = True
+        assert system.get_n_inert() == 0
+
+        agents[3].inert = True
+        system.checkpoint(path)
+        agents[4].inert = True
+        assert system.get_n_inert() == 2
+        system.restore(path)
+        assert system.get_n_inert() == _scan_inert(system) == 1
+
+        #
+        # The simulation stops at the first step the inert fraction is met
+        system = _make_system()
+        history = []
+        runner = ConditionalSystemRunner(Mover('sleep', _fall_asleep,
+                                               {'history' : history}),
+                                         InertFraction(0.5))
+        met = runner(system)
+        assert [condition.name for condition in met] == ['inert fraction']
+        assert runner.n_steps == len(history)
+        assert history[-1] >= 0.5
+        assert all([fraction < 0.5 for fraction in history[:-1]])
+        assert system.get_n_inert() == _scan_inert(system)
+
+        #
+        # Conditions are checked at the interval, and extinction stops
+        system = _make_system()
+        runner = ConditionalSystemRunner(Mover('die', _die),
+                                         PopulationSize(min_agents=0),
+                                         check_every=4)
+        met = runner(system)
+        assert len(met) == 1
+        assert system.get_n_agents() == 0
+        assert runner.n_steps % 4 == 0
+
+        #
+        # The maximum number of iterations ends a simulation without a met
+        # condition, and all conditions must be met if so required
+        system = _make_system()
+        runner = ConditionalSystemRunner(Mover('die', _die),
+                                         [PopulationSize(min_agents=0),
+                                          PopulationSize(max_agents=10 * N_AGENTS)],
+                                         max_iter=50, require='all')
+        assert runner(system) == []
+        assert runner.n_steps == 50
+        assert runner.step_count == 50
+
+        #
+        # The moving variance agrees with the variance of the window
+        values = np.random.normal(3.0, 2.0, size=60)
+        steps = []
+        moving = MovingVariance(lambda system: values[len(steps) - 1], 7, 0.0)
+        relative = MovingVariance(lambda system: values[len(steps) - 1], 7, 0.0,
+                                  relative=True)
+        sparse = MovingVariance(lambda system: values[len(steps) - 1], 4, 0.0,
+                                sample_every=3)
+        for k in range(len(values)):
+            steps.append(k)
+            for condition in (moving, relative, sparse):
+                condition.update(None, k)
+            if k >= 1:
+                window = values[max(0, k - 6) : k + 1]
+                assert moving.variance() == pytest.approx(np.var(window, ddof=1))
+                assert relative.variance() == \
+                       pytest.approx(np.var(window, ddof=1) / np.mean(window) ** 2)
+            assert moving.is_met(None, k) is False
+            if k >= 9:
+                window = values[k - k % 3 - 9 : k - k % 3 + 1 : 3]
+                assert sparse.variance() == pytest.approx(np.var(window, ddof=1))
+
+        #
+        # A stabilised quantity stops the simulation once the window is full
+        system = _make_system()
+        runner = ConditionalSystemRunner(Mover('die', _die),
+                                         MovingVariance(lambda system: system.get_n_agents(),
+                                                        5, 0.0),
+                                         max_iter=1000)
+        met = runner(system)
+        assert len(met) == 1
+        assert met[0].variance() == 0.0
+        assert system.get_n_agents() < N_AGENTS
+        assert runner.n_steps >= 5
+
+        #
+        # Errors
+        with pytest.raises(TypeError):
+            ConditionalSystemRunner(Mover('die', _die), [lambda system: True])
+        with pytest.raises(ValueError):
+            ConditionalSystemRunner(Mover('die', _die), InertFraction(0.5),
+                                    check_every=0)
+        with pytest.raises(ValueError):
+            ConditionalSystemRunner(Mover('die', _die), InertFraction(0.5),
+                                    require='most')
+        with pytest.raises(ValueError):
+            InertFraction(1.5)
+        with pytest.raises(ValueError):
+            PopulationSize()
+        with pytest.raises(ValueError):
+            MovingVariance(lambda system: 0.0, 1, 0.0)
+        with pytest.raises(NotImplementedError):
+            StopCondition('abstract').is_met(system, 0)
+
+    finally:
+        np.random.set_state(state)
+        if os.path.isfile(path):
+            os.remove(path)
@@ -0,0 +1,94 @@
+'''Test of replicate simulations on a pool of processes
+
+'''
+import pytest
+
+import os
+
+import numpy as np
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.message import Essence, Resource
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.mover import Mover
+from fjarrsyn.simulation.sampler import AgentSampler, SystemIO
+from fjarrsyn.simulation.ensemble import EnsembleRunner
+
+class Bacteria(Agent):
+
+    def __init__(self, name, e1, r1):
+
+        super().__init__(name, strict_engine=True)
+
+        essence = Essence('Bacteria Essence', ['E1'])
+        essence.set_values([e1])
+
+        resource = Resource('Bacteria Resource', ['R1'])
+        resource.set_values([r1])
+
+        self.set_scaffolds(essence, resource)
+
+def _grow(ams):
+    for agent in ams.agents_in_scope.values():
+        agent.resource['R1'] += agent.essence['E1'] * np.random.random()
+
+def _make_system(rate=1.0, fail=False):
+    if fail:
+        raise ValueError('bad parameters')
+    agents = [Bacteria('bacteria {}'.format(k), rate, 0.0) for k in range(3)]
+    return AgentManagementSystem('3 bacteria', agents)
+
+def _make_io():
+    a_sampler = AgentSampler('state',
+                             resource_args=[('Bacteria Resource', 'R1')],
+                             sample_steps=5)
+    return SystemIO([('ensemble_agent', a_sampler, 'to_csv')])
+
+def _resources(ams):
+    return [agent.resource['R1'] for agent in ams.agents_in_scope.values()]
+
+def test_main():
+
+    mover = Mover('grow', _grow)
+    replicates = [1, 2, {'seed' : 1, 'rate' : 0.0}, {'seed' : 1, 'fail' : True}, 1]
+    ensemble = EnsembleRunner(_make_system, mover, 6, replicates,
+                              io_factory=_make_io, result_func=_resources,
+                              max_workers=2)
+    results = ensemble.run()
+
+    assert (ensemble.summary['n_replicates'] == 5)
+    assert (ensemble.summary['n_completed'] == 4)
+    assert (ensemble.summary['n_failed'] == 1)
+    assert ('bad parameters' in ensemble.summary['failures'][3])
+
+    assert (results[0] == results[4])
+    assert (results[0] != results[1])
+    assert (results[2] == [0.0, 0.0, 0.0])
+    assert (results[3] is None)
+
+    for k_replicate in [0, 1, 2, 4]:
+        for generation in [0, 5]:
+            file_name = 'replicate_{}_ensemble_agent{}.csv'.format(k_replicate,
+                                                                 generation)
+            assert (os.path.isfile(file_name))
+            os.remove(file_name)
+
+    #
+    # Replicates without seed are given distinct seeds, derived from the seed
+    # of the ensemble
+    #
+    unseeded = [{'rate' : 1.0}] * 4
+    ensemble = EnsembleRunner(_make_system, mover, 6, unseeded,
+                              result_func=_resources, max_workers=2, seed=11)
+    results = ensemble.run()
+    assert (len(set([tuple(result) for result in results])) == 4)
+    assert (len(set(ensemble.summary['seeds'])) == 4)
+
+    ensemble_repeat = EnsembleRunner(_make_system, mover, 6, unseeded,
+                                     result_func=_resources, max_workers=2,
+                                     seed=11)
+    assert (ensemble_repeat.run() == results)
+    assert (ensemble_repeat.summary['seeds'] == ensemble.summary['seeds'])
+
+    with pytest.raises(TypeError):
+        EnsembleRunner(_make_system, _grow, 6, replicates)
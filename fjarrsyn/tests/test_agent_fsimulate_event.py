@@ -0,0 +1,163 @@
+'''Test of the event-driven simulation of a system in continuous time
+
+'''
+import pytest
+
+import os
+
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.message import Resource
+from fjarrsyn.core.graph import Node
+from fjarrsyn.simulation.sampler import AgentSampler, SystemIO
+from fjarrsyn.simulation.scheduler import IndexedHeap, AgentEvent, \
+                                          EventDrivenRunner
+
+class Host(Agent):
+
+    def __init__(self, name, infected=0):
+
+        super().__init__(name, strict_engine=True)
+
+        resource = Resource('Health', ['infected', 'ticks'])
+        resource.set_values([infected, 0])
+        self.set_scaffold(resource)
+
+def _path_system(n_hosts):
+    hosts = [Host('host %s' %(str(k)), int(k == 0)) for k in range(n_hosts)]
+    nodes = [Node('node %s' %(str(k)), host) for k, host in enumerate(hosts)]
+    graph = nx.relabel_nodes(nx.path_graph(n_hosts), dict(enumerate(nodes)))
+
+    return AgentManagementSystem('path', hosts, graph, strict_engine=True)
+
+def _infection_rate(system, agent):
+    if agent.resource['infected'] == 1:
+        return 0.0
+    return 2.0 * sum([other.resource['infected'] \
+                      for other in system.neighbours_to(agent.agent_id_system)])
+
+def _infect(system, agent):
+    agent.resource['infected'] = 1
+
+def _die(system, agent):
+    system.terminate_agent(agent.agent_id_system)
+
+def _tick(system, agent):
+    agent.resource['ticks'] += 1
+
+def _every_half(system, agent, time):
+    return time + 0.5
+
+def _infected(system):
+    nodes = sorted(system.agents_graph.nodes, key=lambda node: int(node.name.split()[1]))
+    return [node.agent_content.resource['infected'] for node in nodes]
+
+def test_main():
+
+    rng_state = np.random.get_state()
+    np.random.seed(31)
+
+    #
+    # The heap agrees with sorting under pushes, updates and removals
+    #
+    heap = IndexedHeap()
+    reference = {}
+    for k in range(500):
+        key = int(np.random.randint(60))
+        if np.random.ranf() < 0.2 and key in reference:
+            heap.remove(key)
+            del reference[key]
+        else:
+            priority = float(np.random.ranf())
+            heap.push(key, priority)
+            reference[key] = priority
+        assert (len(heap) == len(reference))
+        assert (heap.peek()[1] == min(reference.values()))
+    popped = [heap.pop()[1] for _ in range(len(heap))]
+    assert (popped == sorted(reference.values()))
+    with pytest.raises(IndexError):
+        heap.pop()
+
+    #
+    # Infection spreads only to neighbours, as the rates of the neighbours
+    # of an infected host are updated
+    #
+    system = _path_system(30)
+    infection = AgentEvent('infect', _infect, rate=_infection_rate)
+    sampler = AgentSampler('health', resource_args=[('Health', 'infected')],
+                           sample_steps=1)
+    io = SystemIO([('path', sampler, 'to_csv')], namespace='event_')
+    runner = EventDrivenRunner(4.0, infection, system_io=io, sample_interval=2.0)
+    n_events = runner(system)
+    infected = _infected(system)
+    assert (n_events == sum(infected) - 1)
+    assert (infected == sorted(infected, reverse=True))
+    assert (runner.time == 4.0)
+    assert (runner.sample_count == 3)
+    n_sampled = []
+    for generation in range(3):
+        df = pd.read_csv('event_path%s.csv' %(str(generation)))
+        n_sampled.append(int(df['value'].sum()))
+        os.remove('event_path%s.csv' %(str(generation)))
+    assert (n_sampled[0] == 1)
+    assert (n_sampled == sorted(n_sampled))
+    assert (n_sampled[-1] == sum(infected))
+
+    runner.t_end = 1000.0
+    runner.io = None
+    runner(system)
+    assert (all(_infected(system)))
+    assert (runner.step_count == 29)
+
+    #
+    # Deaths remove agents from the schedule, at the expected rate
+    #
+    hosts = [Host('host %s' %(str(k))) for k in range(2000)]
+    system_death = AgentManagementSystem('deaths', hosts, nx.empty_graph(
+                                         [Node('node %s' %(str(k)), host) \
+                                          for k, host in enumerate(hosts)]),
+                                         strict_engine=True)
+    death = AgentEvent('die', _die, rate=0.5, dependents='self')
+    EventDrivenRunner(1.0, death)(system_death)
+    assert (len(system_death) == pytest.approx(2000 * np.exp(-0.5), rel=0.05))
+
+    #
+    # Events at set times, and events limited in number
+    #
+    system_tick = _path_system(3)
+    runner_tick = EventDrivenRunner(2.0, [AgentEvent('tick', _tick,
+                                                     next_time=_every_half,
+                                                     dependents='self')])
+    assert (runner_tick(system_tick) == 12)
+    assert ([agent.resource['ticks'] for agent in system_tick.agents_in_scope.values()] == [4, 4, 4])
+    runner_tick = EventDrivenRunner(2.0, AgentEvent('tick', _tick,
+                                                    next_time=_every_half),
+                                    max_events=5)
+    assert (runner_tick(system_tick) == 5)
+
+    #
+    # Runs of a seeded system are reproducible
+    #
+    results = []
+    for _ in range(2):
+        system_seeded = _path_system(30)
+        system_seeded.set_random_seed(5)
+        runner_seeded = EventDrivenRunner(3.0, infection)
+        runner_seeded(system_seeded)
+        results.append((runner_seeded.step_count, _infected(system_seeded)))
+    assert (results[0] == results[1])
+
+    with pytest.raises(ValueError):
+        AgentEvent('bad', _tick)
+    with pytest.raises(ValueError):
+        AgentEvent('bad', _tick, rate=1.0, next_time=_every_half)
+    with pytest.raises(ValueError):
+        AgentEvent('bad', _tick, rate=1.0, dependents='others')
+    with pytest.raises(ValueError):
+        EventDrivenRunner(1.0, AgentEvent('bad', _tick, rate=-1.0))(_path_system(3))
+
+    np.random.set_state(rng_state)
@@ -0,0 +1,182 @@
+'''Test of the simulation of a system partitioned over worker processes
+
+'''
+import pytest
+
+import os
+
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.message import Resource
+from fjarrsyn.core.scaffold_map import ResourceMap
+from fjarrsyn.core.instructor import Compulsion
+from fjarrsyn.core.graph import Node
+from fjarrsyn.core.mover import Mover
+from fjarrsyn.simulation.sampler import AgentSampler, SystemIO
+from fjarrsyn.simulation.simulator import FiniteSystemRunner
+from fjarrsyn.simulation.partition import PartitionedSystemRunner, \
+                                          partition_graph, halo_nodes
+
+SIDE = 6
+
+class Cell(Agent):
+
+    def __init__(self, name, amount):
+
+        super().__init__(name, strict_engine=True)
+
+        resource = Resource('Content', ['amount', 'count'])
+        resource.set_values([amount, 0.0])
+        self.set_scaffold(resource)
+
+class Lattice(AgentManagementSystem):
+
+    def _diffuse(self, agent_id):
+        agent = self[agent_id]
+        neighbours = self.neighbours_to(agent_id)
+        if agent.resource['amount'] < 0.0:
+            raise ValueError('negative amount')
+        return 0.5 * agent.resource['amount'] + \
+               0.5 * np.mean([other.resource['amount'] for other in neighbours])
+
+    def __init__(self):
+
+        grid = nx.grid_2d_graph(SIDE, SIDE)
+        mapping = {}
+        agents = []
+        for k, coord in enumerate(sorted(grid.nodes)):
+            agent = Cell('cell %s %s' %(str(coord[0]), str(coord[1])),
+                         float(k % 7))
+            agents.append(agent)
+            mapping[coord] = Node('node %s %s' %(str(coord[0]), str(coord[1])),
+                                  agent)
+        graph = nx.relabel_nodes(grid, mapping)
+
+        super().__init__('lattice', agents, graph, strict_engine=True)
+
+        self.set_law(Compulsion('diffuse', self._diffuse,
+                                ResourceMap('reset amount', 'reset', 'amount',
+                                            ('value',)),
+                                agent_id_to_engine=True))
+        self.set_law(Compulsion('count', lambda: 1.0,
+                                ResourceMap('count up', 'delta', 'count',
+                                            ('value',))))
+
+def _step(ams):
+    for agent in ams.shuffle_nodes(True, ams.get_n_nodes(), False):
+        ams.compel(agent, 'diffuse')
+
+def _count_step(ams):
+    for agent in ams.shuffle_nodes(True, ams.get_n_nodes(), False):
+        ams.compel(agent, 'count')
+
+def _amounts(ams):
+    return dict([(agent.name, agent.resource['amount']) \
+                 for agent in ams.agents_in_scope.values()])
+
+def _io(namespace):
+    sampler = AgentSampler('amounts', resource_args=[('Content', 'amount')],
+                           sample_steps=2)
+    return SystemIO([('lattice', sampler, 'to_csv')], namespace=namespace)
+
+def test_main():
+
+    rng_state = np.random.get_state()
+
+    lattice = Lattice()
+    parts = partition_graph(lattice.agents_graph, 3)
+    assert (sorted([len(part) for part in parts]) == [12, 12, 12])
+    assert (set().union(*parts) == set(lattice.agents_graph.nodes))
+    slabs = partition_graph(lattice.agents_graph, 2, 'slab',
+                            key=lambda node: int(node.name.split()[1]))
+    assert (set([node.name.split()[1] for node in slabs[0]]) == set(['0', '1', '2']))
+    assert (len(halo_nodes(lattice.agents_graph, slabs[0])) == SIDE)
+    assert (len(halo_nodes(lattice.agents_graph, slabs[0], depth=2)) == 2 * SIDE)
+    with pytest.raises(ValueError):
+        partition_graph(lattice.agents_graph, 2, 'slab')
+    with pytest.raises(ValueError):
+        partition_graph(lattice.agents_graph, 0)
+
+    #
+    # The system iterators are restricted to a subset, and by default to the
+    # owned nodes of the system
+    #
+    subset = list(slabs[1])[:4]
+    visited = list(lattice.shuffle_nodes(True, 4, False, subset=subset))
+    assert (set(visited) == set([node.agent_content for node in subset]))
+    lattice.set_owned_nodes(slabs[0])
+    owned = set([node.agent_content for node in slabs[0]])
+    assert (set(lattice.shuffle_nodes(True, len(owned), False)) == owned)
+    assert (lattice.get_n_nodes() == lattice.get_n_agents() == len(owned))
+    assert (set(lattice.owned_agents()) == owned)
+    assert (len(list(lattice)) == len(owned))
+    edge_agent = [node.agent_content for node in slabs[0] \
+                  if node.name == 'node 2 2'][0]
+    assert (len(lattice.neighbours_to(edge_agent.agent_id_system)) == 4)
+    halo_agent = [agent for agent in \
+                  lattice.neighbours_to(edge_agent.agent_id_system) \
+                  if not agent in owned][0]
+    assert (sorted([agent.name for agent in \
+                    lattice.neighbours_to(halo_agent.agent_id_system)]) == \
+            ['cell 2 2', 'cell 3 1', 'cell 3 3'])
+    lattice.set_owned_nodes(None)
+    assert (lattice.get_n_nodes() == lattice.get_n_agents() == SIDE * SIDE)
+
+    #
+    # A synchronous mover reads the state of the previous step, as the halo
+    # of a partition does, hence the partitioned simulation equals the
+    # unpartitioned simulation
+    #
+    mover = Mover('diffuse', _step, synchronous=True)
+    FiniteSystemRunner(5, mover, system_io=_io('seq_'))(lattice)
+    ref = _amounts(lattice)
+
+    for n_partitions, method in [(3, 'bfs'), (2, 'slab')]:
+        lattice_part = Lattice()
+        runner = PartitionedSystemRunner(5, mover, n_partitions,
+                                         system_io=_io('part_'),
+                                         partition_method=method,
+                                         partition_key=lambda node: node.name,
+                                         seed=1)
+        runner(lattice_part)
+        assert (runner.step_count == 5)
+
+        amounts = _amounts(lattice_part)
+        assert (sorted(amounts.keys()) == sorted(ref.keys()))
+        for name in ref:
+            assert (amounts[name] == pytest.approx(ref[name]))
+
+        for generation in [0, 2, 4]:
+            df_seq = pd.read_csv('seq_lattice%s.csv' %(str(generation)))
+            df_part = pd.read_csv('part_lattice%s.csv' %(str(generation)))
+            assert (sorted(df_seq['value'].tolist()) == \
+                    pytest.approx(sorted(df_part['value'].tolist())))
+            os.remove('part_lattice%s.csv' %(str(generation)))
+
+    for generation in [0, 2, 4]:
+        os.remove('seq_lattice%s.csv' %(str(generation)))
+
+    #
+    # A mover over the nodes of the system visits each agent once per step
+    # in a worker as in the parent process
+    #
+    lattice_count = Lattice()
+    PartitionedSystemRunner(5, Mover('count', _count_step), 3,
+                            seed=1)(lattice_count)
+    assert (set([agent.resource['count'] for agent in \
+                 lattice_count.agents_in_scope.values()]) == set([5.0]))
+
+    #
+    # A failure in a worker is raised in the parent process
+    #
+    lattice_fail = Lattice()
+    agent = list(lattice_fail.agents_in_scope.values())[-1]
+    agent.resource['amount'] = -1.0
+    with pytest.raises(RuntimeError, match='negative amount'):
+        PartitionedSystemRunner(3, mover, 3, seed=1)(lattice_fail)
+
+    np.random.set_state(rng_state)
@@ -0,0 +1,99 @@
+'''Test of a parameter sweep with cached results
+
+'''
+import pytest
+
+import os
+import shutil
+
+import numpy as np
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.message import Essence, Resource
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.mover import Mover
+from fjarrsyn.simulation.simulator import FiniteSystemRunner
+from fjarrsyn.simulation.sweep import ParameterSweep, config_key
+
+class Bacteria(Agent):
+
+    def __init__(self, name, e1, r1):
+
+        super().__init__(name, strict_engine=True)
+
+        essence = Essence('Bacteria Essence', ['E1'])
+        essence.set_values([e1])
+
+        resource = Resource('Bacteria Resource', ['R1'])
+        resource.set_values([r1])
+
+        self.set_scaffolds(essence, resource)
+
+def _grow(ams, jump_prob):
+    for agent in ams.agents_in_scope.values():
+        if np.random.random() < jump_prob:
+            agent.resource['R1'] += agent.essence['E1']
+
+def _simulate(seed, rate, jump_prob):
+    if rate < 0.0:
+        raise ValueError('negative rate')
+
+    agents = [Bacteria('bacteria {}'.format(k), rate, 0.0) for k in range(3)]
+    mess = AgentManagementSystem('3 bacteria', agents)
+    runner = FiniteSystemRunner(10, Mover('grow', _grow,
+                                          kwargs={'jump_prob' : jump_prob}))
+    runner(mess)
+
+    return sum([agent.resource['R1'] for agent in agents])
+
+def test_main():
+
+    grid = {'rate' : [1.0, 2.0], 'jump_prob' : [0.0, 0.5]}
+    sweep = ParameterSweep(_simulate, grid, seeds=[1, 2],
+                           cache_dir='sweep_test_cache', max_workers=2)
+    assert (len(sweep.pending()) == 8)
+
+    records = sweep.run()
+    assert (sweep.summary['n_points'] == 8)
+    assert (sweep.summary['n_run'] == 8)
+    assert (sweep.summary['n_cached'] == 0)
+    assert (len(os.listdir('sweep_test_cache')) == 8)
+
+    assert (records[0]['params'] == {'jump_prob' : 0.0, 'rate' : 1.0})
+    assert (records[0]['seed'] == 1)
+    assert (records[0]['result'] == 0.0)
+    assert (records[4]['result'] > 0.0)
+    assert (records[6]['result'] == 2.0 * records[4]['result'])
+
+    #
+    # Extending the grid only simulates the new configurations
+    #
+    grid['rate'].append(-1.0)
+    sweep = ParameterSweep(_simulate, grid, seeds=[1, 2],
+                           cache_dir='sweep_test_cache', max_workers=2)
+    assert (len(sweep.pending()) == 4)
+    records_extended = sweep.run()
+    assert (sweep.summary['n_cached'] == 8)
+    assert (sweep.summary['n_run'] == 4)
+    assert (sweep.summary['n_failed'] == 4)
+    assert ('negative rate' in list(sweep.summary['failures'].values())[0])
+    results = dict([((r['params']['rate'], r['params']['jump_prob'], r['seed']),
+                     (r['result'], r['cached'])) for r in records_extended])
+    for r in records:
+        assert (results[(r['params']['rate'], r['params']['jump_prob'],
+                         r['seed'])] == (r['result'], True))
+    assert (results[(-1.0, 0.5, 1)] == (None, False))
+    assert (len(sweep.pending()) == 4)
+
+    assert (config_key({'a' : 1, 'b' : 2}, 3) == config_key({'b' : 2, 'a' : 1}, 3))
+    assert (config_key({'a' : 1}, 3) != config_key({'a' : 1}, 4))
+    assert (config_key({'a' : 1}, 3) != config_key({'a' : 1}, 3, tag='v2'))
+    assert (config_key({'a' : np.int64(1), 'b' : np.array([0.5])}) == \
+            config_key({'a' : 1, 'b' : [0.5]}))
+    with pytest.raises(TypeError):
+        config_key({'a' : _grow})
+    with pytest.raises(TypeError):
+        ParameterSweep(_simulate, {'rate' : [object()]},
+                       cache_dir='sweep_test_cache').points()
+
+    shutil.rmtree('sweep_test_cache')
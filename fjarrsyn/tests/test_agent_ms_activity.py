@@ -0,0 +1,179 @@
+'''Test of the restriction of the iteration of a system to its active agents
+
+'''
+import pytest
+
+import numpy as np
+import networkx as nx
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.activity import ActivityTracker
+from fjarrsyn.core.message import Resource
+from fjarrsyn.core.scaffold_map import ResourceMap
+from fjarrsyn.core.instructor import Compulsion
+from fjarrsyn.core.graph import Node
+from fjarrsyn.core.mover import Mover
+from fjarrsyn.simulation.simulator import FiniteSystemRunner
+
+SIDE = 15
+
+class Cell(Agent):
+
+    def __init__(self, name, amount):
+
+        super().__init__(name, strict_engine=True)
+
+        resource = Resource('Content', ['amount'])
+        resource.set_values([amount])
+        self.set_scaffold(resource)
+
+class Lattice(AgentManagementSystem):
+
+    def _spread(self, agent_id):
+        return max([self[agent_id].resource['amount']] + \
+                   [other.resource['amount'] for other in self.neighbours_to(agent_id)])
+
+    def __init__(self):
+
+        grid = nx.grid_2d_graph(SIDE, SIDE)
+        agents = []
+        mapping = {}
+        for coord in sorted(grid.nodes):
+            agent = Cell('cell %s %s' %(str(coord[0]), str(coord[1])),
+                         1.0 if coord == (0, 0) else 0.0)
+            agents.append(agent)
+            mapping[coord] = Node('node %s %s' %(str(coord[0]), str(coord[1])),
+                                  agent, {'level' : 0.0})
+        graph = nx.relabel_nodes(grid, mapping)
+
+        super().__init__('lattice', agents, graph, strict_engine=True)
+
+        self.set_law(Compulsion('spread', self._spread,
+                                ResourceMap('reset amount', 'reset', 'amount',
+                                            ('value',)),
+                                agent_id_to_engine=True))
+
+def _step_all(ams):
+    for agent in ams.shuffle_nodes(True, len(ams), False):
+        ams.compel(agent, 'spread')
+
+def _step_active(ams):
+    active = ams.active_nodes()
+    ams.n_visited.append(len(active))
+    for agent in ams.shuffle_nodes(True, len(active), False, subset=active):
+        ams.compel(agent, 'spread')
+
+def _amounts(ams):
+    return dict([(agent.name, agent.resource['amount']) \
+                 for agent in ams.agents_in_scope.values()])
+
+def test_main():
+
+    rng_state = np.random.get_state()
+    np.random.seed(3)
+
+    #
+    # A front that spreads from a corner only involves the agents at the
+    # front, and the result equals the iteration over all agents
+    #
+    lattice_all = Lattice()
+    FiniteSystemRunner(10, Mover('spread', _step_all, synchronous=True))(lattice_all)
+
+    lattice = Lattice()
+    lattice.n_visited = []
+    lattice.set_activity_tracker(ActivityTracker())
+    FiniteSystemRunner(10, Mover('spread', _step_active, synchronous=True))(lattice)
+
+    assert (_amounts(lattice) == _amounts(lattice_all))
+    assert (lattice.n_visited[0] == SIDE * SIDE)
+    assert (lattice.n_visited[1] == 2 + 4)
+    assert (max(lattice.n_visited[1:]) < 4 * SIDE)
+
+    #
+    # Without change, no agent is active, other than agents refreshed
+    #
+    for _ in range(SIDE * 2):
+        _step_active(lattice)
+    assert (all([value == 1.0 for value in _amounts(lattice).values()]))
+    assert (lattice.active_nodes() == [])
+
+    lattice.set_activity_tracker(ActivityTracker(refresh_fraction=0.2))
+    lattice.active_nodes()
+    n_refreshed = [len(lattice.active_nodes()) for _ in range(20)]
+    assert (np.mean(n_refreshed) == pytest.approx(0.2 * SIDE * SIDE, rel=0.2))
+    assert (lattice.activity.n_refreshed == n_refreshed[-1])
+
+    #
+    # Writes to the auxiliary content of a node activate its agent and the
+    # agents of its neighbours, and agents linger as set
+    #
+    lattice.set_activity_tracker(ActivityTracker(linger=2))
+    lattice.active_nodes()
+    lattice.active_nodes()
+    agent = list(lattice.agents_in_scope.values())[SIDE + 1]
+    node = lattice.get(agent.agent_id_system, get_node=True)
+    lattice.stage_write(node.aux_content, 'level', 1.0, node=node)
+    assert (node.aux_content['level'] == 1.0)
+    active = lattice.active_nodes()
+    assert (set(active) == set([node] + list(lattice.agents_graph[node])))
+    assert (lattice.active_nodes(advance=False) == active)
+    assert (lattice.active_nodes() == active)
+    assert (lattice.active_nodes() == [])
+
+    lattice.mark_active(agent.agent_id_system)
+    assert (lattice.active_nodes() == [node])
+
+    #
+    # New agents are active
+    #
+    lattice.terminate_agent(agent.agent_id_system)
+    assert (lattice.active_nodes() == [])
+    lattice.situate(Cell('new', 0.0), node)
+    assert (lattice.active_nodes() == [node])
+
+    #
+    # Writes to imprints report the agent as changed, and the tracker only
+    # holds the changed, marked and lingering agents
+    #
+    lattice.set_activity_tracker(ActivityTracker())
+    assert (len(lattice.active_nodes()) == SIDE * SIDE)
+    assert (lattice.active_nodes() == [])
+    assert (len(lattice.activity._last_activity) == 0)
+
+    other = list(lattice.agents_in_scope.values())[3]
+    other.resource['amount'] = 2.0
+    copy_agent = other.deepcopy()
+    copy_agent.resource['amount'] = 3.0
+    other_node = lattice.get(other.agent_id_system, get_node=True)
+    assert (set(lattice.active_nodes()) == \
+            set([other_node] + list(lattice.agents_graph[other_node])))
+    assert (len(lattice.activity._last_activity) == 4)
+
+    other.resource.set_values([2.0])
+    assert (lattice.active_nodes() == [])
+
+    #
+    # The active nodes are the owned nodes of the active agents, in the
+    # order of the owned nodes
+    #
+    owned = list(reversed(list(lattice.agents_graph.nodes)[:SIDE]))
+    lattice.set_owned_nodes(owned)
+    for node_mark in owned[::2] + list(lattice.agents_graph.nodes)[-3:]:
+        lattice.mark_active(node=node_mark)
+    assert (lattice.active_nodes() == owned[::2])
+    lattice.set_owned_nodes(None)
+    lattice.terminate_agent(other.agent_id_system)
+    other.resource['amount'] = 4.0
+    assert (lattice.active_nodes() == [])
+
+    lattice.set_activity_tracker(None)
+    with pytest.raises(RuntimeError):
+        lattice.active_nodes()
+    lattice.mark_active(node=node)
+    with pytest.raises(ValueError):
+        ActivityTracker(refresh_fraction=1.5)
+    with pytest.raises(ValueError):
+        ActivityTracker(linger=0)
+
+    np.random.set_state(rng_state)
@@ -0,0 +1,128 @@
+'''Test of binary checkpoint and restore of an agent management system
+
+'''
+import pytest
+
+import os
+
+import numpy as np
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.message import Belief, Essence, Resource
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.graph import Node
+
+import networkx as nx
+
+class Env(object):
+
+    def __init__(self, name, env_1):
+
+        self.name = name
+        self.env_1 = env_1
+
+class Bacteria(Agent):
+
+    def __init__(self, name, e1, r1, b1):
+
+        super().__init__(name, strict_engine=True)
+
+        essence = Essence('Bacteria Essence', ['E1', 'E2'])
+        essence.set_values([e1, 'wild type'])
+
+        resource = Resource('Bacteria Resource', ['R1', 'R2'])
+        resource.set_values([r1, 3])
+
+        belief = Belief('Bacteria Belief', ['B1'])
+        belief.set_values([b1])
+
+        self.set_scaffolds(essence, resource)
+        self.set_message(belief)
+
+def _make_system():
+
+    agents = [Bacteria('bacteria %s' %(str(k)), 1.0 * k, 10.0 + k, [k]) \
+              for k in range(4)]
+    nodes = [Node('node %s' %(str(k)), agent, Env('env %s' %(str(k)), 0.1 * k)) \
+             for k, agent in enumerate(agents)]
+    nodes.append(Node('empty', None, Env('env empty', -1.0)))
+
+    a_graph = nx.Graph()
+    a_graph.add_edges_from([(nodes[0], nodes[1]), (nodes[1], nodes[2]),
+                            (nodes[2], nodes[3]), (nodes[3], nodes[4])])
+
+    return AgentManagementSystem('checkpoint', agents, a_graph,
+                                 common_env=Env('common', 42.0))
+
+def _state(ams):
+
+    ret = {}
+    for node in ams:
+        if node.agent_content is None:
+            agent_state = None
+        else:
+            agent = node.agent_content
+            agent_state = (agent.name, agent.agent_id_system, agent.ticks,
+                           agent.resource.values(), agent.essence.values(),
+                           agent.belief['Bacteria Belief'].values())
+        neighbours = sorted([n.name for n in ams.agents_graph[node]])
+        ret[node.name] = (node.aux_content.env_1, agent_state, neighbours)
+
+    return ret
+
+def test_main():
+
+    mess = _make_system()
+    agents = list(mess.agents_in_scope.values())
+    agents[0].resource['R1'] = 99.5
+    agents[1].essence['E2'] = 'mutant'
+    agents[2].ticks = 7
+    mess.terminate_agent(agents[3].agent_id_system)
+    newborn = agents[1].deepcopy()
+    newborn.name = 'newborn'
+    mess.situate(newborn, [n for n in mess if n.name == 'empty'][0])
+    mess.edge_edit(agents[0].agent_id_system, agents[2].agent_id_system, add=True)
+    mess.make_lawbook_entry(['grow'], agent_name_selector=lambda x: x != 'newborn')
+
+    rng_state = np.random.get_state()
+    np.random.seed(11)
+    mess.checkpoint('checkpoint_test', step=13)
+    state = _state(mess)
+    draw = np.random.random()
+
+    #
+    # Restore into the same system after further changes
+    #
+    agents[0].resource['R1'] = -1.0
+    mess.edge_edit(agents[0].agent_id_system, agents[1].agent_id_system, delete=True)
+    step = mess.restore('checkpoint_test.npz')
+    assert (step == 13)
+    assert (_state(mess) == state)
+    assert (np.random.random() == draw)
+
+    #
+    # Restore into a system created anew, with other agent IDs
+    #
+    mess_new = _make_system()
+    step = mess_new.restore('checkpoint_test.npz')
+    assert (step == 13)
+    assert (_state(mess_new) == state)
+    assert (mess_new.get_n_agents() == 4)
+    assert (mess_new.common_env.env_1 == 42.0)
+    assert (mess_new.lawbook[agents[0].agent_id_system] == ['grow'])
+    assert (mess_new.lawbook[newborn.agent_id_system] is None)
+    assert (mess_new.edge_property(agents[0].agent_id_system,
+                                   agents[2].agent_id_system)[0])
+
+    #
+    # Restore into a system with fewer agents, such that agents are created
+    #
+    mess_small = AgentManagementSystem('small', [Bacteria('seed', 0.0, 0.0, [])])
+    mess_small.restore('checkpoint_test.npz')
+    assert (_state(mess_small) == state)
+
+    with pytest.raises(RuntimeError):
+        AgentManagementSystem('void', [Agent('plain')]).restore('checkpoint_test.npz')
+
+    os.remove('checkpoint_test.npz')
+    np.random.set_state(rng_state)
@@ -0,0 +1,178 @@
+'''Test of counter-based random streams keyed on seed, agent and step
+
+'''
+import pytest
+
+import os
+
+import numpy as np
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.message import Essence, Resource
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.instructor import MultiMutation, Compulsion
+from fjarrsyn.core.scaffold_map import EssenceMap, ResourceMap, MapCollection
+from fjarrsyn.core.mover import Mover
+from fjarrsyn.core.activity import ActivityTracker
+from fjarrsyn.core.rng import RandomStreams, get_random_streams, \
+                              set_random_streams, draw_uniform
+from fjarrsyn.simulation.simulator import FiniteSystemRunner
+
+class Bacteria(Agent):
+
+    def __init__(self, name):
+
+        super().__init__(name, strict_engine=True)
+
+        essence = Essence('Bacteria Essence', ['E1', 'E2'])
+        essence.set_values([0.0, 0.0])
+
+        resource = Resource('Bacteria Resource', ['R1'])
+        resource.set_values([0.0])
+
+        self.set_scaffolds(essence, resource)
+
+def _make_system(seed):
+
+    agents = [Bacteria('bacteria %s' %(str(k))) for k in range(6)]
+    ams = AgentManagementSystem('drift', agents, strict_engine=True)
+
+    mapper_1 = EssenceMap('tweak', 'wiener', 'E1', ('range_step',))
+    mapper_2 = EssenceMap('tweak', 'wiener', 'E2', ('range_step',))
+    ams.set_law(MultiMutation('drift', lambda : 1.0,
+                              MapCollection([mapper_1, mapper_2]),
+                              mutation_prob=0.5))
+    ams.set_random_seed(seed)
+
+    return ams
+
+def _forward(ams):
+    for agent in list(ams.agents_in_scope.values()):
+        ams.mutate(agent, 'drift')
+
+def _backward(ams):
+    for agent in reversed(list(ams.agents_in_scope.values())):
+        ams.mutate(agent, 'drift')
+
+def _shuffled(ams):
+    for agent in ams.shuffle_nodes(True, len(ams), False):
+        ams.mutate(agent, 'drift')
+
+def _compel_forward(ams):
+    for agent in list(ams.agents_in_scope.values()):
+        ams.compel(agent, 'kick', validate_lawbook=True)
+
+def _compel_backward(ams):
+    for agent in reversed(list(ams.agents_in_scope.values())):
+        ams.compel(agent, 'kick', validate_lawbook=True)
+
+def _make_kicked_system(seed):
+
+    ams = _make_system(None)
+    ams.set_law(Compulsion('kick', lambda : draw_uniform(),
+                           ResourceMap('kick', 'delta', 'R1', ('kick',))))
+    ams.make_lawbook_entry(['kick'], agent_name_selector=lambda name: True)
+    ams.set_activity_tracker(ActivityTracker())
+    ams.mark_active(list(ams.agents_in_scope)[0])
+    if not seed is None:
+        ams.set_random_seed(seed)
+
+    return ams
+
+def _state(ams):
+    return dict([(agent.name, (agent.agent_id_system, agent.essence.values())) \
+                 for agent in ams.agents_in_scope.values()])
+
+def test_main():
+
+    rng_state = np.random.get_state()
+
+    states = []
+    for engine in [_forward, _backward, _shuffled]:
+        ams = _make_system(7)
+        runner = FiniteSystemRunner(5, Mover('drift', engine))
+        runner(ams)
+        states.append(_state(ams))
+
+    assert (states[0] == states[1])
+    assert (states[0] == states[2])
+    assert (any([values != [0.0, 0.0] for _, values in states[0].values()]))
+
+    ams_other = _make_system(8)
+    FiniteSystemRunner(5, Mover('drift', _forward))(ams_other)
+    assert (_state(ams_other) != states[0])
+
+    #
+    # The streams are active only while a system is propagated, hence a
+    # later system without streams draws from the seeded global state
+    #
+    assert (get_random_streams() is None)
+    unseeded = []
+    for k in range(2):
+        np.random.seed(3)
+        ams_unseeded = _make_system(None)
+        FiniteSystemRunner(5, Mover('drift', _forward))(ams_unseeded)
+        unseeded.append([agent.essence.values() for agent in \
+                         ams_unseeded.agents_in_scope.values()])
+        FiniteSystemRunner(5, Mover('drift', _forward))(_make_system(7))
+        assert (get_random_streams() is None)
+    assert (unseeded[0] == unseeded[1])
+
+    #
+    # Compulsions draw from the stream of the agent, and the law book and the
+    # tracked activity follow the agents as they are given new IDs
+    #
+    kicked = []
+    for engine in [_compel_forward, _compel_backward]:
+        ams_kicked = _make_kicked_system(5)
+        FiniteSystemRunner(3, Mover('kick', engine))(ams_kicked)
+        kicked.append(dict([(agent.name, agent.resource['R1']) \
+                            for agent in ams_kicked.agents_in_scope.values()]))
+    assert (kicked[0] == kicked[1])
+    assert (set(ams_kicked.lawbook.keys()) == set(ams_kicked.agents_in_scope.keys()))
+    assert (ams_kicked.active_nodes()[0].agent_content.name == 'bacteria 0')
+
+    #
+    # The seed of the streams is restored from a checkpoint
+    #
+    ams.checkpoint('rng_checkpoint.npz', step=5)
+    ams_restore = _make_system(3)
+    ams_restore.restore('rng_checkpoint.npz')
+    os.remove('rng_checkpoint.npz')
+    assert (ams_restore.random_streams.seed == 7)
+    assert (ams_restore.random_streams.step == 5)
+    assert (_state(ams_restore) == _state(ams))
+
+    #
+    # Rows of a block are independent of the other agents of the block, and
+    # of draws from the streams
+    #
+    streams = RandomStreams(11, step=2)
+    ids = ['a', 'b', 'c', 'd']
+    block = streams.block(ids, 3)
+    assert (block.shape == (4, 3))
+    streams.stream('a').random(10)
+    assert (np.array_equal(streams.block(ids[::-1], 3)[::-1], block))
+    assert (np.array_equal(streams.block(ids[:2], 3), block[:2]))
+    assert (not np.array_equal(streams.block(ids, 3, step=3), block))
+    assert (streams.block(ids, 2, distribution='integers', low=0,
+                          high=10).dtype.kind == 'i')
+
+    first = streams.stream('a')
+    assert (streams.stream('a') is first)
+    streams.set_step(3)
+    assert (not streams.stream('a') is first)
+    assert (streams.stream('a').random() == streams.generator('a', 3).random())
+
+    with pytest.raises(TypeError):
+        RandomStreams(1.5)
+
+    #
+    # Without streams, draws are made from the global random state
+    #
+    ams.set_random_seed(None)
+    assert (ams.random_streams is None)
+    set_random_streams(None)
+    assert (get_random_streams() is None)
+
+    np.random.set_state(rng_state)
@@ -0,0 +1,82 @@
+'''Test of the buffered random source that serves scalar draws from blocks
+
+'''
+import pytest
+
+import numpy as np
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.message import Essence
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.instructor import MultiMutation
+from fjarrsyn.core.scaffold_map import EssenceMap, MapCollection
+from fjarrsyn.core.rng import BufferedRandom, set_random_buffer, \
+                              draw_uniform, draw_normal, draw_integer, \
+                              draw_choice
+
+def _drift(seed):
+
+    agent = Agent('thin agent', strict_engine=True)
+    essence = Essence('inclinations', ['t_1', 't_2'])
+    essence.set_values([0.0, 0.0])
+    agent.set_scaffold(essence)
+
+    ams = AgentManagementSystem('exterior laws', [agent])
+    mapper = MapCollection([EssenceMap('tweak', 'wiener', 't_1', ('range_step',)),
+                            EssenceMap('tweak', 'wiener', 't_2', ('range_step',))])
+    ams.set_law(MultiMutation('jumps', lambda : 1.0, mapper, mutation_prob=0.5))
+
+    previous = set_random_buffer(BufferedRandom(7, np.random.default_rng(seed)))
+    try:
+        for _ in range(20):
+            ams.mutate(agent, 'jumps')
+    finally:
+        set_random_buffer(previous)
+
+    return agent.essence.values()
+
+def test_main():
+
+    rng_state = np.random.get_state()
+
+    buffer = BufferedRandom(5, np.random.default_rng(3))
+    ref = np.random.default_rng(3).random(10)
+    values = [buffer.uniform() for _ in range(10)]
+    assert (values == pytest.approx(ref.tolist()))
+    assert (all([isinstance(value, float) for value in values]))
+
+    ref_normal = np.random.default_rng(3).standard_normal(5)
+    buffer = BufferedRandom(5, np.random.default_rng(3))
+    assert (buffer.normal(1.0, 2.0) == pytest.approx(1.0 + 2.0 * ref_normal[0]))
+
+    integers = [buffer.integer(4) for _ in range(200)]
+    assert (set(integers) == set([0, 1, 2, 3]))
+    assert (buffer.choice(['a', 'b', 'c']) in ['a', 'b', 'c'])
+    assert (0 <= buffer.choice(3) < 3)
+    assert (sorted(buffer.choice(5, size=5, replace=False).tolist()) == \
+            [0, 1, 2, 3, 4])
+
+    with pytest.raises(ValueError):
+        BufferedRandom(0)
+
+    #
+    # The draw helpers serve from the active buffer, and from the global
+    # random state once the buffer is removed
+    #
+    previous = set_random_buffer(BufferedRandom(4, np.random.default_rng(9)))
+    ref = np.random.default_rng(9).random(4)
+    assert (draw_uniform() == pytest.approx(ref[0]))
+    assert (draw_integer(10) == int(ref[1] * 10))
+    assert (draw_choice(['x', 'y']) == ['x', 'y'][int(ref[2] * 2)])
+    assert (isinstance(draw_normal(), float))
+    set_random_buffer(previous)
+
+    np.random.seed(11)
+    ref = np.random.ranf()
+    np.random.seed(11)
+    assert (draw_uniform() == ref)
+
+    assert (_drift(5) == _drift(5))
+    assert (_drift(5) != _drift(6))
+
+    np.random.set_state(rng_state)
@@ -0,0 +1,201 @@
+'''Test of the publication of snapshots of the system to shared memory
+
+'''
+import pytest
+
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+import networkx as nx
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.message import Resource, Belief
+from fjarrsyn.core.graph import Node
+from fjarrsyn.core.mover import Mover
+from fjarrsyn.simulation.simulator import FiniteSystemRunner
+from fjarrsyn.simulation.shared import SnapshotPublisher, SnapshotReader
+
+class Env(object):
+
+    def __init__(self, level):
+
+        self.container = {'level' : level, 'label' : 'env'}
+
+class Cell(Agent):
+
+    def __init__(self, name, amount, with_belief):
+
+        super().__init__(name, strict_engine=True)
+
+        resource = Resource('Content', ['amount', 'tag'])
+        resource.set_values([amount, 'cell'])
+        self.set_scaffold(resource)
+
+        if with_belief:
+            belief = Belief('Mood', ['happy'])
+            belief.set_values([True])
+            self.set_message(belief)
+
+def _make_system(side):
+
+    grid = nx.grid_2d_graph(side, side)
+    agents = []
+    mapping = {}
+    for k, coord in enumerate(sorted(grid.nodes)):
+        agent = Cell('cell %s' %(str(k)), float(k), k % 2 == 0)
+        agents.append(agent)
+        mapping[coord] = Node('node %s' %(str(k)), agent, Env(0.5 * k))
+    graph = nx.relabel_nodes(grid, mapping)
+
+    return AgentManagementSystem('cells', agents, graph, strict_engine=True)
+
+def _aux_func(env):
+    return env.container
+
+def _neighbour_means(reader_name, agent_ids, queue):
+    with SnapshotReader(reader_name) as reader:
+        snapshot = reader.read()
+        amounts = snapshot.column('resource', 'Content', 'amount')
+        queue.put((snapshot.step,
+                   [float(np.mean(amounts[[snapshot.agent_row(other) \
+                                           for other in snapshot.neighbours(agent_id)]])) \
+                    for agent_id in agent_ids]))
+
+def _read_consistent(reader_name, n_reads, queue):
+    n_consistent = 0
+    with SnapshotReader(reader_name) as reader:
+        for _ in range(n_reads):
+            snapshot = reader.read()
+            if snapshot is None:
+                continue
+            amounts = snapshot.column('resource', 'Content', 'amount')
+            if np.all(amounts == amounts[0]) and \
+               amounts[0] == float(snapshot.step) and \
+               len(amounts) == len(snapshot.agent_ids):
+                n_consistent += 1
+            else:
+                queue.put(False)
+                return
+    queue.put(n_consistent)
+
+def _set_all(ams, value):
+    for agent in ams.agents_in_scope.values():
+        agent.resource['amount'] = float(value)
+
+def test_main():
+
+    ams = _make_system(4)
+    agent_ids = list(ams.agents_in_scope.keys())
+
+    with SnapshotPublisher(aux_func=_aux_func) as publisher:
+        reader = SnapshotReader(publisher.name)
+        assert (reader.read() is None)
+
+        n_bytes = publisher.publish(ams, step=3)
+        assert (n_bytes > 0)
+        snapshot = reader.read()
+        assert (snapshot.step == 3)
+        assert (reader.n_published == 1)
+        assert (snapshot.agent_ids == agent_ids)
+
+        #
+        # Numeric imprint elements and auxiliary values are published, others
+        # are not
+        #
+        assert (sorted(snapshot.columns()) == [('belief', 'Mood', 'happy'),
+                                               ('resource', 'Content', 'amount')])
+        amounts = snapshot.column('resource', 'Content', 'amount')
+        assert (amounts.tolist() == [float(k) for k in range(16)])
+        moods = snapshot.column('belief', 'Mood', 'happy')
+        assert (moods[0] == 1.0)
+        assert (np.isnan(moods[1]))
+        assert (snapshot.column('belief', 'Mood', 'happy', fill=False).dtype == np.bool_)
+        assert (snapshot.value(agent_ids[4], 'belief', 'Mood', 'happy') is True)
+        with pytest.raises(KeyError):
+            snapshot.value(agent_ids[5], 'belief', 'Mood', 'happy')
+        assert (snapshot.aux_value(agent_ids[5], 'level') == 2.5)
+        assert (snapshot.aux_column('level').tolist() == [0.5 * k for k in range(16)])
+        with pytest.raises(KeyError):
+            snapshot.aux_column('label')
+
+        neighbours = snapshot.neighbours(agent_ids[0])
+        expected = [agent.agent_id_system for agent in ams.neighbours_to(agent_ids[0])]
+        assert (sorted(neighbours) == sorted(expected))
+        assert (len(snapshot.neighbours(agent_ids[5], agents_only=False)) == 4)
+
+        #
+        # Workers evaluate on the snapshot without the agents being sent
+        #
+        ctx = multiprocessing.get_context('fork')
+        queue = ctx.Queue()
+        worker = ctx.Process(target=_neighbour_means,
+                             args=(publisher.name, agent_ids, queue))
+        worker.start()
+        step, means = queue.get(timeout=30)
+        worker.join()
+        assert (step == 3)
+        for agent_id, mean in zip(agent_ids, means):
+            assert (mean == pytest.approx(np.mean([other.resource['amount'] \
+                                           for other in ams.neighbours_to(agent_id)])))
+
+        #
+        # The runner publishes after every step, and the buffers are replaced
+        # as the system grows
+        #
+        def _grow(system):
+            empty = [node for node in system.agents_graph \
+                     if node.agent_content is None]
+            for node in empty[:2]:
+                system.situate(Cell('new', 0.0, False), node)
+
+        agents = [Cell('cell %s' %(str(k)), 1.0, False) for k in range(2)]
+        nodes = [Node('node %s' %(str(k)), agents[k] if k < 2 else None) \
+                 for k in range(8)]
+        ams_small = AgentManagementSystem('cells', agents,
+                                          nx.relabel_nodes(nx.path_graph(8),
+                                                           dict(enumerate(nodes))),
+                                          strict_engine=True)
+        with SnapshotPublisher(capacity=1) as publisher_small:
+            runner = FiniteSystemRunner(3, Mover('grow', _grow),
+                                        snapshot_publisher=publisher_small)
+            runner(ams_small)
+            with SnapshotReader(publisher_small.name) as reader_small:
+                snapshot_small = reader_small.read()
+                assert (snapshot_small.step == 2)
+                assert (len(snapshot_small.agent_ids) == 8)
+                assert (snapshot_small.node_agent.tolist() == list(range(8)))
+                assert (reader_small.n_published == 3)
+
+        #
+        # Readers never see a snapshot partially written
+        #
+        _set_all(ams, 0)
+        publisher.publish(ams, 0)
+        queue = ctx.Queue()
+        worker = ctx.Process(target=_read_consistent,
+                             args=(publisher.name, 2000, queue))
+        worker.start()
+        for step in range(1, 400):
+            _set_all(ams, step)
+            publisher.publish(ams, step)
+        worker.join(timeout=60)
+        n_consistent = queue.get(timeout=30)
+        assert (not n_consistent is False)
+        assert (n_consistent > 0)
+
+        reader.close()
+
+    with pytest.raises(RuntimeError):
+        publisher.publish(ams)
+    with pytest.raises(FileNotFoundError):
+        SnapshotReader(publisher.name)
+
+    other = shared_memory.SharedMemory(create=True, size=4096)
+    try:
+        with pytest.raises(ValueError):
+            SnapshotReader(other.name)
+    finally:
+        other.close()
+        other.unlink()
@@ -0,0 +1,149 @@
+'''Test of the synchronous two-phase update of an agent management system
+
+'''
+import pytest
+
+import numpy as np
+import networkx as nx
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.message import Resource
+from fjarrsyn.core.scaffold_map import ResourceMap
+from fjarrsyn.core.instructor import Compulsion
+from fjarrsyn.core.graph import Node
+from fjarrsyn.core.mover import Mover
+
+N_AGENTS = 6
+
+class Pool(object):
+
+    def __init__(self):
+
+        self.container = {'level' : 0.0}
+
+class Cell(Agent):
+
+    def __init__(self, name, amount):
+
+        super().__init__(name, strict_engine=True)
+
+        resource = Resource('Content', ['amount'])
+        resource.set_values([amount])
+        self.set_scaffold(resource)
+
+class Ring(AgentManagementSystem):
+
+    def _neighbour_mean(self, agent_id):
+        neighbours = self.neighbours_to(agent_id)
+        return np.mean([agent.resource['amount'] for agent in neighbours])
+
+    def _leak(self, agent_id):
+        amount = self.agents_in_scope[agent_id].resource['amount']
+        pool = self.get(agent_id, get_aux=True)
+        self.stage_write(pool.container, 'level',
+                         pool.container['level'] + 0.1 * amount)
+        return (0.9,)
+
+    def __init__(self):
+
+        agents = [Cell('cell %s' %(str(k)), float(k)) for k in range(N_AGENTS)]
+        pool = Pool()
+        nodes = [Node('node %s' %(str(k)), agent, pool) \
+                 for k, agent in enumerate(agents)]
+        graph = nx.cycle_graph(N_AGENTS)
+        graph = nx.relabel_nodes(graph, dict(enumerate(nodes)))
+
+        super().__init__('ring', agents, graph, strict_engine=True)
+
+        self.set_law(Compulsion('average', self._neighbour_mean,
+                                ResourceMap('reset amount', 'reset', 'amount',
+                                            ('value',)),
+                                agent_id_to_engine=True))
+        self.set_law(Compulsion('leak', self._leak,
+                                ResourceMap('scale amount', 'scale', 'amount',
+                                            ('factor',)),
+                                agent_id_to_engine=True))
+
+def _amounts(ams):
+    return [agent.resource['amount'] for agent in ams.agents_in_scope.values()]
+
+def _forward(ams, phrase):
+    for agent in list(ams.agents_in_scope.values()):
+        ams.compel(agent, phrase)
+
+def _backward(ams, phrase):
+    for agent in reversed(list(ams.agents_in_scope.values())):
+        ams.compel(agent, phrase)
+
+def test_main():
+
+    ref = [np.mean([(k - 1) % N_AGENTS, (k + 1) % N_AGENTS]) \
+           for k in range(N_AGENTS)]
+
+    #
+    # Sequential update depends on the order of the agents, synchronous does
+    # not, and equals the update from the frozen state
+    #
+    results = {}
+    for synchronous in [False, True]:
+        for engine in [_forward, _backward]:
+            ring = Ring()
+            mover = Mover('average', engine, {'phrase' : 'average'},
+                          synchronous=synchronous)
+            mover(ring)
+            results[(synchronous, engine.__name__)] = _amounts(ring)
+
+    assert (results[(False, '_forward')] != results[(False, '_backward')])
+    assert (results[(True, '_forward')] == pytest.approx(ref))
+    assert (results[(True, '_backward')] == pytest.approx(ref))
+
+    #
+    # Imprints are frozen in the compute phase and updated on commit
+    #
+    ring = Ring()
+    ring.begin_sync()
+    _forward(ring, 'average')
+    assert (_amounts(ring) == [float(k) for k in range(N_AGENTS)])
+    with pytest.raises(RuntimeError):
+        ring.begin_sync()
+    n_maps, n_conflicts = ring.commit_sync()
+    assert (n_maps == N_AGENTS)
+    assert (n_conflicts == 0)
+    assert (_amounts(ring) == pytest.approx(ref))
+    with pytest.raises(RuntimeError):
+        ring.commit_sync()
+
+    #
+    # Writes to the shared pool are resolved on commit
+    #
+    pool = ring.get(list(ring.agents_in_scope.keys())[0], get_aux=True)
+    total = sum(_amounts(ring))
+    Mover('leak', _forward, {'phrase' : 'leak'}, synchronous=True)(ring)
+    assert (pool.container['level'] == pytest.approx(0.1 * total))
+
+    pool.container['level'] = 0.0
+    Mover('leak', _forward, {'phrase' : 'leak'}, synchronous=True,
+          resolver='last')(ring)
+    assert (pool.container['level'] == pytest.approx(0.1 * _amounts(ring)[-1] / 0.9))
+
+    with pytest.raises(RuntimeError):
+        Mover('leak', _forward, {'phrase' : 'leak'}, synchronous=True,
+              resolver='error')(ring)
+
+    with pytest.raises(ValueError):
+        Mover('leak', _forward, {'phrase' : 'leak'}, synchronous=True,
+              resolver='no such resolver')(ring)
+
+    #
+    # A failed compute phase is discarded
+    #
+    before = _amounts(ring)
+    def _fail(ams):
+        _forward(ams, 'average')
+        raise ValueError('failed compute phase')
+    with pytest.raises(ValueError):
+        Mover('fail', _fail, synchronous=True)(ring)
+    assert (_amounts(ring) == before)
+    assert (all([agent.pending_maps is None \
+                 for agent in ring.agents_in_scope.values()]))
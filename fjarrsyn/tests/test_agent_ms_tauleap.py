@@ -0,0 +1,150 @@
+'''Test of the tau-leap compulsion of population-level stochastic events
+
+'''
+import pytest
+
+import numpy as np
+import networkx as nx
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.message import Resource
+from fjarrsyn.core.scaffold_map import ResourceMap, MapCollection
+from fjarrsyn.core.instructor import Compulsion, TauLeapCompulsion
+from fjarrsyn.core.graph import Node
+
+N_AGENTS = 2000
+
+class Cell(Agent):
+
+    def __init__(self, name):
+
+        super().__init__(name, strict_engine=True)
+
+        resource = Resource('Content', ['births', 'deaths'])
+        resource.set_values([0, 0])
+        self.set_scaffold(resource)
+
+def _make_system(law):
+
+    agents = [Cell('cell %s' %(str(k))) for k in range(N_AGENTS)]
+    graph = nx.Graph()
+    graph.add_nodes_from([Node('node %s' %(str(k)), agent) \
+                          for k, agent in enumerate(agents)])
+    ams = AgentManagementSystem('cells', agents, graph, strict_engine=True)
+    ams.set_law(law)
+
+    return ams
+
+def _counters():
+
+    return MapCollection([ResourceMap('births up', 'delta', 'births', ('n_b',)),
+                          ResourceMap('deaths up', 'delta', 'deaths', ('n_d',))])
+
+def _totals(ams):
+
+    births = sum([agent.resource['births'] for agent in ams.agents_in_scope.values()])
+    deaths = sum([agent.resource['deaths'] for agent in ams.agents_in_scope.values()])
+
+    return births, deaths
+
+def test_main():
+
+    state = np.random.get_state()
+    np.random.seed(17)
+
+    try:
+        #
+        # Binomial and Poisson leaps reproduce the expected number of events
+        for distribution in ('binomial', 'poisson'):
+            law = TauLeapCompulsion('events', (0.002, 0.004), _counters(),
+                                    distribution=distribution)
+            ams = _make_system(law)
+            n_events = ams.compel_leap('events', n_steps=100)
+
+            births, deaths = _totals(ams)
+            assert births + deaths == n_events
+            assert abs(births - 400.0) < 5.0 * np.sqrt(400.0)
+            assert abs(deaths - 800.0) < 5.0 * np.sqrt(800.0)
+
+        #
+        # Probabilities that are the same for all agents are evaluated once
+        # rather than per agent and leap
+        law = TauLeapCompulsion('events', (0.002, 0.004), _counters(),
+                                max_leap=10)
+        ams = _make_system(law)
+        agent_ids = []
+        probabilities = law.probabilities
+        law.probabilities = lambda agent_id: agent_ids.append(agent_id) or \
+                                             probabilities(agent_id)
+        ams.compel_leap('events', n_steps=100)
+        assert agent_ids == [None]
+
+        #
+        # The leaps are bounded by the error control
+        law = TauLeapCompulsion('events', (0.002, 0.004), _counters(),
+                                epsilon=0.02)
+        assert law.leap_length(0.004, 100) == 5
+        assert law.leap_length(0.0, 100) == 100
+        assert law.leap_length(0.5, 100) == 1
+        law.max_leap = 3
+        assert law.leap_length(0.004, 100) == 3
+
+        #
+        # A single step of an agent is executed by the ordinary compel
+        law = TauLeapCompulsion('events', (1.0, 0.0), _counters())
+        ams = _make_system(law)
+        agent = ams.agents_in_scope[list(ams.agents_in_scope)[0]]
+        assert ams.compel(agent, 'events') is True
+        assert agent.resource['births'] == 1
+        assert agent.resource['deaths'] == 0
+
+        #
+        # State-dependent probabilities and event function
+        def _prob(agent_id):
+            if ams[agent_id].resource['births'] > 0:
+                return (0.0, 0.0)
+            return (0.02, 0.0)
+
+        def _once(n_b, n_d):
+            return min(n_b, 1), n_d
+
+        law = TauLeapCompulsion('first birth', _prob, _counters(),
+                                event_func=_once, epsilon=0.1)
+        ams = _make_system(law)
+        ams.compel_leap('first birth', n_steps=400)
+        births, deaths = _totals(ams)
+        assert deaths == 0
+        assert births > 0.99 * N_AGENTS
+        assert all([agent.resource['births'] <= 1 \
+                    for agent in ams.agents_in_scope.values()])
+
+        #
+        # Seeded leaps are reproducible
+        totals = []
+        for k in range(2):
+            np.random.seed(3)
+            ams = _make_system(TauLeapCompulsion('events', (0.002, 0.004),
+                                                 _counters()))
+            ams.compel_leap('events', n_steps=50)
+            totals.append([(agent.resource['births'], agent.resource['deaths']) \
+                           for agent in ams.agents_in_scope.values()])
+        assert totals[0] == totals[1]
+
+        #
+        # Errors
+        with pytest.raises(ValueError):
+            TauLeapCompulsion('events', 0.1, _counters(), distribution='normal')
+        with pytest.raises(ValueError):
+            TauLeapCompulsion('events', 0.1, _counters(), epsilon=0.0)
+        with pytest.raises(ValueError):
+            TauLeapCompulsion('events', (0.1, 1.5), _counters())
+
+        ams = _make_system(Compulsion('plain', lambda: (1, 1), _counters()))
+        with pytest.raises(TypeError):
+            ams.compel_leap('plain')
+        with pytest.raises(KeyError):
+            ams.compel_leap('missing')
+
+    finally:
+        np.random.set_state(state)
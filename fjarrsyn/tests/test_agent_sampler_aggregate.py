@@ -0,0 +1,113 @@
+'''Test of streaming aggregate sampling of agent imprints
+
+'''
+import pytest
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.message import Essence, Resource
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.simulation.sampler import AgentSampler, AggregateSampler, SystemIO
+from fjarrsyn.simulation.accumulator import Moments, Histogram, QuantileSketch
+
+class Bacteria(Agent):
+
+    def __init__(self, name, e1, r1):
+
+        super().__init__(name, strict_engine=True)
+
+        essence = Essence('Bacteria Essence', ['E1'])
+        essence.set_values([e1])
+
+        resource = Resource('Bacteria Resource', ['R1'])
+        resource.set_values([r1])
+
+        self.set_scaffolds(essence, resource)
+
+def test_main():
+
+    rng = np.random.RandomState(42)
+    e_values = rng.normal(2.0, 0.5, 400)
+    r_values = rng.uniform(0.0, 10.0, 400)
+    agents = [Bacteria('bacteria', e1, r1) for e1, r1 in zip(e_values, r_values)]
+    agents.append(Bacteria('virus', 100.0, 100.0))
+    mess = AgentManagementSystem('cells', agents)
+
+    edges = [0.0, 2.5, 5.0, 7.5, 10.0]
+    agg_sampler = AggregateSampler('stats',
+                                   resource_args=[('Bacteria Resource', 'R1')],
+                                   essence_args=[('Bacteria Essence', 'E1')],
+                                   agent_matcher=lambda x: (not x is None) and \
+                                                           x.name == 'bacteria',
+                                   histogram_bins={'resource:Bacteria Resource:R1' : edges},
+                                   quantiles=[0.1, 0.5, 0.9])
+    df = agg_sampler(mess, 7)
+
+    assert (list(df.index) == [7])
+    assert (df.index.name == 'generation')
+    e_label = 'essence:Bacteria Essence:E1'
+    r_label = 'resource:Bacteria Resource:R1'
+    assert (df.loc[7, e_label + ':count'] == 400)
+    assert (df.loc[7, e_label + ':mean'] == pytest.approx(np.mean(e_values)))
+    assert (df.loc[7, e_label + ':var'] == pytest.approx(np.var(e_values, ddof=1)))
+    assert (df.loc[7, r_label + ':max'] == pytest.approx(np.max(r_values)))
+    assert (not e_label + ':bin_0' in df.columns)
+
+    counts, _ = np.histogram(r_values, bins=edges)
+    for k_bin, count in enumerate(counts):
+        assert (df.loc[7, r_label + ':bin_%s' %(str(k_bin))] == count)
+
+    for q in [0.1, 0.5, 0.9]:
+        assert (df.loc[7, e_label + ':q' + str(q)] == \
+                pytest.approx(np.quantile(e_values, q), abs=0.05))
+
+    #
+    # Sampling is part of a fused pass with other samplers
+    #
+    a_sampler = AgentSampler('state', essence_args=[('Bacteria Essence', 'E1')])
+    io = SystemIO([('aggregate', agg_sampler, 'to_csv'),
+                   ('state', a_sampler, 'to_csv')])
+    assert (io.try_stamp(mess, 0))
+    assert (io.stamp_stats['node_visits_saved'] == len(agents))
+    df_file = pd.read_csv('aggregate0.csv', index_col=0)
+    assert (df_file.loc[0, e_label + ':count'] == 400)
+    os.remove('aggregate0.csv')
+    os.remove('state0.csv')
+
+def test_merge():
+
+    values = np.random.RandomState(3).exponential(1.0, 5000)
+    half = len(values) // 2
+
+    parts = []
+    for chunk in [values[:half], values[half:]]:
+        moments = Moments()
+        histogram = Histogram([0.0, 1.0, 2.0, 4.0])
+        sketch = QuantileSketch(50)
+        for value in chunk:
+            moments.add(value)
+            histogram.add(value)
+            sketch.add(value)
+        parts.append((moments, histogram, sketch))
+
+    moments, histogram, sketch = parts[0]
+    moments.merge(parts[1][0])
+    histogram.merge(parts[1][1])
+    sketch.merge(parts[1][2])
+
+    assert (moments.count == len(values))
+    assert (moments.mean == pytest.approx(np.mean(values)))
+    assert (moments.variance(ddof=0) == pytest.approx(np.var(values)))
+    assert (histogram.summary()['above'] == np.sum(values > 4.0))
+    assert (sum(histogram.counts) + histogram.above == len(values))
+    assert (len(sketch) < 500)
+    for q in [0.01, 0.5, 0.99]:
+        assert (sketch.quantile(q) == \
+                pytest.approx(np.quantile(values, q), rel=0.05, abs=0.01))
+
+    with pytest.raises(ValueError):
+        histogram.merge(Histogram([0.0, 1.0]))
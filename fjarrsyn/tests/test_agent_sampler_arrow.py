@@ -0,0 +1,176 @@
+'''Test of appending samples of all generations to Arrow IPC stream files
+
+'''
+import pytest
+
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.message import Belief, Essence, Resource
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.graph import Node
+from fjarrsyn.simulation.sampler import AgentSampler, EnvSampler, SystemIO
+
+import networkx as nx
+
+from fjarrsyn.simulation.sink import ArrowSink, _split_values, _join_values
+
+def _get_data(aux_env):
+    return {'env_data_1' : aux_env.env_1}
+
+class Env(object):
+
+    def __init__(self, name, env_1):
+
+        self.name = name
+        self.env_1 = env_1
+
+class Bacteria(Agent):
+
+    def __init__(self, name, e1, r1):
+
+        super().__init__(name, strict_engine=True)
+
+        essence = Essence('Bacteria Essence', ['E1'])
+        essence.set_values([e1])
+
+        resource = Resource('Bacteria Resource', ['R1'])
+        resource.set_values([r1])
+
+        self.set_scaffolds(essence, resource)
+
+class Counter(Agent):
+
+    def __init__(self, name, count, mood):
+
+        super().__init__(name, strict_engine=True)
+
+        resource = Resource('Counter Resource', ['count'])
+        resource.set_values([count])
+
+        belief = Belief('Counter Belief', ['mood'])
+        belief.set_values([mood])
+
+        self.set_scaffold(resource)
+        self.set_message(belief)
+
+def test_main():
+
+    #
+    # Values of mixed types are split into numeric and string columns, and
+    # joined as they are read
+    #
+    df = pd.DataFrame({'variable' : ['a', 'b', 'c', 'd'],
+                       'value' : [1, 'calm', None, 2.5]})
+    df_split = _split_values(df.copy())
+    assert (list(df_split.columns) == ['variable', 'value', 'value_str'])
+    assert (df_split['value'].dtype == np.float64)
+    assert (df_split['value_str'].tolist() == [None, 'calm', None, None])
+    df_join = _join_values(df_split)
+    assert (df_join['value'].tolist()[:2] == [1.0, 'calm'])
+    assert (np.isnan(df_join['value'].tolist()[2]))
+    assert (_split_values(pd.DataFrame({'value' : [1, 2]}))['value'].dtype == \
+            np.float64)
+    with pytest.raises(TypeError):
+        _split_values(pd.DataFrame({'value' : [1.0, [1, 2]]}))
+
+    pa = pytest.importorskip('pyarrow')
+
+    a1 = Bacteria('bacteria 1', 1.0, 10.0)
+    a2 = Bacteria('bacteria 2', 0.5, 5.0)
+    n1 = Node('first', a1, Env('environment 1', 0.1))
+    n2 = Node('second', a2, Env('environment 2', 0.2))
+    n3 = Node('third', None, Env('environment 3', 0.3))
+
+    a_graph = nx.Graph()
+    a_graph.add_edge(n1, n2)
+    a_graph.add_edge(n2, n3)
+
+    mess = AgentManagementSystem('2 bacteria', [a1, a2], a_graph)
+
+    a_sampler = AgentSampler('state',
+                             resource_args=[('Bacteria Resource', 'R1')],
+                             essence_args=[('Bacteria Essence', 'E1')])
+    e_sampler = EnvSampler('env', _get_data, sample_steps=2)
+
+    sink = ArrowSink('arrow_test')
+    io = SystemIO([('agent', a_sampler, sink),
+                   ('env', e_sampler, sink)])
+
+    for generation in range(3):
+        io.try_stamp(mess, generation)
+        a1.resource['R1'] += 1.0
+
+    a3 = Bacteria('bacteria 3', 0.1, 1.0)
+    mess.situate(a3, n3)
+    io.try_stamp(mess, 3)
+    io.flush()
+
+    assert (sink.names() == ['agent', 'env'])
+    assert (sink.generations('agent') == [0, 1, 2, 3])
+    assert (sink.generations('env') == [0, 2])
+
+    table = sink.read_table('agent', [1, 3])
+    assert (table.num_rows == 10)
+    assert (pa.types.is_dictionary(table.schema.field('name').type))
+    assert (pa.types.is_dictionary(table.schema.field('agent_index').type))
+    assert (pa.types.is_floating(table.schema.field('value').type))
+
+    df_agent = sink.read('agent', 3)
+    assert (df_agent.index.names == ['generation', 'name', 'agent_index', 'variable'])
+    assert (len(df_agent) == 6)
+    assert (df_agent.loc[(3, 'bacteria 1', a1.agent_id_system,
+                          'resource:Bacteria Resource:R1'), 'value'] == 13.0)
+    assert (df_agent.loc[(3, 'bacteria 3', a3.agent_id_system,
+                          'essence:Bacteria Essence:E1'), 'value'] == 0.1)
+
+    assert (len(sink.read('agent')) == 18)
+    assert (list(sink.read('env', 0)['value']) == [0.1, 0.2])
+
+    with pytest.raises(TypeError):
+        sink.append('graph', 0, nx.Graph())
+    with pytest.raises(KeyError):
+        sink.read('nothing')
+
+    sink.close()
+
+    sink = ArrowSink('arrow_test')
+    assert (sink.generations('agent') == [0, 1, 2, 3])
+    with pytest.raises(FileExistsError):
+        sink.append('agent', 4, a_sampler(mess))
+
+    #
+    # A string belief next to a resource that changes from int to float
+    #
+    c1 = Counter('counter 1', 10, 'calm')
+    c2 = Counter('counter 2', 3, 'eager')
+    counters = AgentManagementSystem('counters', [c1, c2])
+    c_sampler = AgentSampler('counts',
+                             resource_args=[('Counter Resource', 'count')],
+                             belief_args=[('Counter Belief', 'mood')])
+    n_sampler = AgentSampler('numbers',
+                             resource_args=[('Counter Resource', 'count')])
+    io = SystemIO([('counts', c_sampler, sink), ('numbers', n_sampler, sink)])
+    io.try_stamp(counters, 0)
+    c1.resource['count'] = 10.5
+    c2.belief['Counter Belief']['mood'] = 'calm'
+    io.try_stamp(counters, 1)
+    io.flush()
+
+    table = sink.read_table('counts')
+    assert (pa.types.is_floating(table.schema.field('value').type))
+    assert (pa.types.is_string(table.schema.field('value_str').type))
+
+    df_counts = sink.read('counts', 1)
+    assert (df_counts.loc[(1, 'counter 1', c1.agent_id_system,
+                           'resource:Counter Resource:count'), 'value'] == 10.5)
+    assert (df_counts.loc[(1, 'counter 2', c2.agent_id_system,
+                           'belief:Counter Belief:mood'), 'value'] == 'calm')
+    assert (not 'value_str' in df_counts.columns)
+    assert (sorted(sink.read('numbers', 1)['value'].tolist()) == [3.0, 10.5])
+    sink.close()
+
+    shutil.rmtree('arrow_test')
@@ -0,0 +1,95 @@
+'''Test of writing of sampled data in a background thread
+
+'''
+import pytest
+
+import os
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.message import Essence, Resource
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.mover import Mover
+from fjarrsyn.simulation.sampler import AgentSampler, GraphSampler, SystemIO
+from fjarrsyn.simulation.simulator import FiniteSystemRunner
+
+class Bacteria(Agent):
+
+    def __init__(self, name, e1, r1):
+
+        super().__init__(name, strict_engine=True)
+
+        essence = Essence('Bacteria Essence', ['E1'])
+        essence.set_values([e1])
+
+        resource = Resource('Bacteria Resource', ['R1'])
+        resource.set_values([r1])
+
+        self.set_scaffolds(essence, resource)
+
+def _do_nothing(ams):
+    pass
+
+def _make_io(prefix, async_write):
+
+    a_sampler = AgentSampler('state',
+                             resource_args=[('Bacteria Resource', 'R1')],
+                             essence_args=[('Bacteria Essence', 'E1')],
+                             sample_steps=2)
+    g_sampler = GraphSampler('connections', sample_steps=3)
+
+    io = SystemIO([(prefix + '_agent', a_sampler, 'to_csv'),
+                   (prefix + '_graph', g_sampler, 'edgelist.write_edgelist')],
+                  async_write=async_write, max_queue=1)
+
+    return io
+
+def test_main():
+
+    agents = [Bacteria('bacteria {}'.format(k), 1.0 * k, 2.0 * k)
+              for k in range(4)]
+    mess = AgentManagementSystem('4 bacteria', agents)
+    mover = Mover('nothing', _do_nothing)
+
+    io_async = _make_io('async', True)
+    io_sync = _make_io('sync', False)
+
+    runner = FiniteSystemRunner(6, mover, system_io=io_async)
+    runner(mess)
+    runner = FiniteSystemRunner(6, mover, system_io=io_sync)
+    runner(mess)
+
+    assert (io_async.stamp_stats['n_stamps'] == 4)
+    assert (not os.path.isfile('async_agent6.csv'))
+    assert (io_async.stamp_stats['backpressure_time'] >= 0.0)
+    assert (io_sync.stamp_stats['backpressure_time'] == 0.0)
+
+    for file_end in ['_agent0.csv', '_agent2.csv', '_agent4.csv',
+                     '_graph0.edgelist', '_graph3.edgelist']:
+        assert (os.path.isfile('async' + file_end))
+        assert (os.path.isfile('sync' + file_end))
+        data_async = open('async' + file_end).read()
+        data_sync = open('sync' + file_end).read()
+        assert (data_async == data_sync)
+        os.remove('async' + file_end)
+        os.remove('sync' + file_end)
+
+    io_async.close()
+
+def _fail_write(*args, **kwargs):
+    raise IOError('Disk is full')
+
+def test_error():
+
+    agents = [Bacteria('bacteria {}'.format(k), 1.0 * k, 2.0 * k)
+              for k in range(2)]
+    mess = AgentManagementSystem('2 bacteria', agents)
+
+    io_async = _make_io('async_fail', True)
+    io_async._write = _fail_write
+    assert (io_async.try_stamp(mess, 2))
+
+    with pytest.raises(RuntimeError):
+        io_async.flush()
+
+    io_async.close()
+    assert (not os.path.isfile('async_fail_agent2.csv'))
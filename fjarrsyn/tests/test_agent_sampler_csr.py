@@ -0,0 +1,96 @@
+'''Test of binary graph samples in compressed sparse row format, and of the
+restart of a system topology from them
+
+'''
+import pytest
+
+import shutil
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.graph import Node, graph_to_csr, graph_from_csr
+from fjarrsyn.simulation.sampler import GraphSampler, SystemIO
+from fjarrsyn.simulation.sink import CSRGraphSink, write_csr_graph, load_csr_graph
+
+import networkx as nx
+
+def test_main():
+
+    agents = [Agent('agent %s' %(str(k))) for k in range(6)]
+    nodes = [Node('node %s' %(str(k)), agent) for k, agent in enumerate(agents)]
+    nodes.append(Node('empty', None))
+
+    a_graph = nx.Graph()
+    a_graph.add_edges_from([(nodes[0], nodes[1]), (nodes[1], nodes[2]),
+                            (nodes[2], nodes[3]), (nodes[3], nodes[0]),
+                            (nodes[4], nodes[5]), (nodes[5], nodes[6]),
+                            (nodes[6], nodes[6])])
+
+    mess = AgentManagementSystem('ring', agents, a_graph)
+
+    g_sampler = GraphSampler('connections', sample_steps=2)
+    sink = CSRGraphSink('csr_test')
+    io = SystemIO([('graph', g_sampler, sink)])
+
+    for generation in range(4):
+        io.try_stamp(mess, generation)
+    mess.edge_edit(agents[0].agent_id_system, agents[2].agent_id_system, add=True)
+    io.try_stamp(mess, 4)
+
+    assert (sink.generations('graph') == [0, 2, 4])
+
+    graph = sink.read('graph', 4)
+    graph_ref = g_sampler(mess)
+    assert (set(graph.nodes) == set(graph_ref.nodes))
+    assert (set([frozenset(e) for e in graph.edges]) == \
+            set([frozenset(e) for e in graph_ref.edges]))
+    assert (graph.number_of_edges() == 8)
+    assert (sink.read('graph', 2).number_of_edges() == 7)
+
+    with pytest.raises(KeyError):
+        sink.read('graph', 1)
+
+    #
+    # Names that are prefixes of other names are told apart
+    #
+    sink.append('g', 12, graph)
+    sink.append('g1', 2, graph)
+    assert (sink.generations('g') == [12])
+    assert (sink.generations('g1') == [2])
+    with pytest.raises(TypeError):
+        sink.append('graph', 5, 'not a graph')
+
+    #
+    # Restart the topology of a system with new nodes holding the agents
+    #
+    new_nodes = dict([(agent.agent_id_system, Node('restart', agent)) \
+                      for agent in agents])
+    new_nodes['unoccupied'] = Node('restart empty', None)
+    graph_nodes = sink.read('graph', 4, node_of_label=new_nodes)
+    mess_restart = AgentManagementSystem('ring restart', agents, graph_nodes)
+    assert (mess_restart.get_n_nodes() == 7)
+    assert (mess_restart.get_n_edges() == 8)
+    assert (mess_restart.edge_property(agents[0].agent_id_system,
+                                       agents[2].agent_id_system)[0])
+    assert (not mess_restart.edge_property(agents[0].agent_id_system,
+                                           agents[4].agent_id_system)[0])
+
+    shutil.rmtree('csr_test')
+
+def test_directed():
+
+    graph = nx.gnp_random_graph(200, 0.05, seed=1, directed=True)
+    write_csr_graph(graph, 'csr_directed', compressed=True)
+    graph_load = load_csr_graph('csr_directed.npz')
+
+    assert (graph_load.is_directed())
+    assert (list(graph_load.nodes) == list(graph.nodes))
+    assert (set(graph_load.edges) == set(graph.edges))
+
+    nodes, indptr, indices = graph_to_csr(graph)
+    assert (indptr[-1] == graph.number_of_edges())
+    with pytest.raises(ValueError):
+        graph_from_csr(nodes[:-1], indptr, indices)
+
+    import os
+    os.remove('csr_directed.npz')
@@ -0,0 +1,120 @@
+'''Test of delta sampling of agents that changed between samplings
+
+'''
+import pytest
+
+import pandas as pd
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.message import Belief, Essence, Resource
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.simulation.sampler import AgentSampler, reconstruct_agent_state
+
+class Bacteria(Agent):
+
+    def __init__(self, name, e1, r1, r2, b1):
+
+        super().__init__(name, strict_engine=True)
+
+        essence = Essence('Bacteria Essence', ['E1'])
+        essence.set_values([e1])
+
+        resource = Resource('Bacteria Resource', ['R1', 'R2'])
+        resource.set_values([r1, r2])
+
+        belief = Belief('Bacteria Belief', ['B1'])
+        belief.set_values([b1])
+
+        self.set_scaffolds(essence, resource)
+        self.set_message(belief)
+
+def _make_sampler(delta):
+
+    return AgentSampler('state',
+                        resource_args=[('Bacteria Resource', 'R1'),
+                                       ('Bacteria Resource', 'R2')],
+                        essence_args=[('Bacteria Essence', 'E1')],
+                        belief_args=[('Bacteria Belief', 'B1')],
+                        delta=delta, keyframe_every=4)
+
+def test_main():
+
+    agents = [Bacteria('bacteria {}'.format(k), 1.0, 10.0 * k, 5.0, 0.5)
+              for k in range(3)]
+    mess = AgentManagementSystem('3 bacteria', agents)
+
+    d_sampler = _make_sampler(True)
+    f_sampler = _make_sampler(False)
+
+    deltas = []
+    fulls = []
+
+    deltas.append(d_sampler(mess, 0))
+    fulls.append(f_sampler(mess, 0))
+    assert (len(deltas[0]) == 12)
+    assert (set(deltas[0]['frame']) == set(['full']))
+
+    #
+    # Nothing changes, identical writes are not changes either
+    #
+    agents[0].resource['R1'] = 0.0
+    deltas.append(d_sampler(mess, 1))
+    fulls.append(f_sampler(mess, 1))
+    assert (len(deltas[1]) == 0)
+
+    agents[1].resource['R2'] = 7.0
+    agents[2].belief['Bacteria Belief'].set_values([0.9])
+    agents[2].essence['E1'] = 1.0
+    deltas.append(d_sampler(mess, 2))
+    fulls.append(f_sampler(mess, 2))
+    assert (len(deltas[2]) == 2)
+    assert (set(deltas[2]['frame']) == set(['delta']))
+    assert (set(deltas[2].index.get_level_values('variable')) == \
+            set(['resource:Bacteria Resource:R2', 'belief:Bacteria Belief:B1']))
+
+    node = mess.node_from_agent_id_[agents[0].agent_id_system]
+    mess.terminate_agent(agents[0].agent_id_system)
+    newbie = Bacteria('bacteria new', 2.0, 1.0, 1.0, 0.1)
+    mess.situate(newbie, node)
+    deltas.append(d_sampler(mess, 3))
+    fulls.append(f_sampler(mess, 3))
+    frames = deltas[3]['frame']
+    assert (list(frames).count('removed') == 1)
+    assert (list(frames).count('new') == 4)
+
+    deltas.append(d_sampler(mess, 4))
+    fulls.append(f_sampler(mess, 4))
+    assert (set(deltas[4]['frame']) == set(['full']))
+    assert (len(deltas[4]) == 12)
+
+    df_deltas = pd.concat(deltas)
+    for generation in range(5):
+        df_rec = reconstruct_agent_state(df_deltas, generation)
+        df_full = fulls[generation].sort_index()
+        assert (df_rec.sort_index().equals(df_full))
+
+    with pytest.raises(ValueError):
+        reconstruct_agent_state(fulls[0], 0)
+
+    #
+    # The rows of a delta sampling are part of the sequence of deltas, and
+    # an element that remains NaN is not a change
+    #
+    agents[1].resource['R1'] = float('nan')
+    assert (d_sampler(mess, 5)['frame'].tolist() == ['delta'])
+    agents[1].resource['R1'] = float('nan')
+    assert (len(d_sampler(mess, 6)) == 0)
+
+    agents[2].resource['R2'] = 8.0
+    rows = d_sampler.sample_many(mess, 7)
+    assert (len(rows) == 3)
+    changed = [row for row in rows if len(row) > 4]
+    assert (len(changed) == 1)
+    assert (changed[0]['resource:Bacteria Resource:R2'] == 8.0)
+    assert (changed[0]['frame'] == 'delta')
+    assert (set(d_sampler(mess, 8)['frame']) == set(['full']))
+
+    mess.terminate_agent(agents[2].agent_id_system)
+    rows = d_sampler.sample_many(mess, 9)
+    assert ([row['frame'] for row in rows if row['frame'] == 'removed'] == \
+            ['removed'])
@@ -0,0 +1,119 @@
+'''Test of fused sampling of several samplers in one pass over the system
+
+'''
+import pytest
+
+import os
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.message import Belief, Essence, Resource
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.graph import Node
+from fjarrsyn.simulation.sampler import AgentSampler, EnvSampler, GraphSampler, SystemIO
+
+import networkx as nx
+
+def _get_data(aux_env):
+    return {'env_data_1' : aux_env.env_1,
+            'env_data_2' : aux_env.env_2}
+
+class Env(object):
+
+    def __init__(self, name, env_1, env_2):
+
+        self.name = name
+        self.env_1 = env_1
+        self.env_2 = env_2
+
+class Bacteria(Agent):
+
+    def __init__(self, name, e1, e2, r1, r2, b1, b2):
+
+        super().__init__(name, strict_engine=True)
+
+        essence = Essence('Bacteria Essence', ['E1', 'E2'])
+        essence.set_values([e1, e2])
+
+        resource = Resource('Bacteria Resource', ['R1', 'R2'])
+        resource.set_values([r1, r2])
+
+        belief = Belief('Bacteria Belief', ['B1', 'B2'])
+        belief.set_values([b1, b2])
+
+        self.set_scaffolds(essence, resource)
+        self.set_message(belief)
+
+def _make_io(prefix, fuse):
+
+    a_sampler = AgentSampler('full_state',
+                             resource_args=[('Bacteria Resource', 'R1'),
+                                            ('Bacteria Resource', 'R2')],
+                             essence_args=[('Bacteria Essence', 'E1')],
+                             belief_args=[('Bacteria Belief', 'B2')],
+                             sample_steps=2)
+    e_sampler = EnvSampler('feel_the_env', _get_data, sample_steps=2)
+    g_sampler = GraphSampler('connections', sample_steps=4)
+
+    io = SystemIO([(prefix + '_agent', a_sampler, 'to_csv'),
+                   (prefix + '_agent', a_sampler, 'to_json'),
+                   (prefix + '_env', e_sampler, 'to_csv'),
+                   (prefix + '_graph', g_sampler, 'edgelist.write_edgelist')],
+                  fuse_samplers=fuse)
+
+    return io
+
+def test_main():
+
+    a1 = Bacteria('bacteria 1', 1.0, 1.0, 10.0, 10.0, 0.5, 0.5)
+    a2 = Bacteria('bacteria 2', 1.0, 0.5, 5.0, 6.0, 0.5, 0.5)
+    a3 = Bacteria('bacteria 3', 1.1, 0.3, 10.0, 2.0, 0.9, 0.1)
+    e1 = Env('environment 1', 0.1, 0.1)
+    e2 = Env('environment 2', 0.2, 0.2)
+    e3 = Env('environment 3', 0.3, 0.3)
+    n1 = Node('first', a1, e1)
+    n2 = Node('second', a2, e2)
+    n3 = Node('third', a3, e3)
+    n4 = Node('fourth', None, Env('environment 4', 0.4, 0.4))
+
+    a_graph = nx.Graph()
+    a_graph.add_edge(n1, n2)
+    a_graph.add_edge(n2, n3)
+    a_graph.add_edge(n3, n4)
+
+    mess = AgentManagementSystem('3 bacteria', [a1, a2, a3], a_graph)
+
+    io_fused = _make_io('fused', True)
+    io_plain = _make_io('plain', False)
+
+    assert (not io_fused.try_stamp(mess, 1))
+    assert (io_fused.stamp_stats['n_stamps'] == 0)
+
+    assert (io_fused.try_stamp(mess, 2))
+    assert (io_plain.try_stamp(mess, 2))
+    assert (io_fused.stamp_stats['n_stamps'] == 1)
+    assert (io_fused.stamp_stats['n_passes'] == 1)
+    assert (io_fused.stamp_stats['node_visits'] == 4)
+    assert (io_fused.stamp_stats['node_visits_saved'] == 4)
+    assert (io_plain.stamp_stats['n_passes'] == 0)
+
+    assert (io_fused.try_stamp(mess, 4))
+    assert (io_plain.try_stamp(mess, 4))
+    assert (io_fused.stamp_stats['n_stamps'] == 2)
+    assert (io_fused.stamp_stats['n_passes'] == 2)
+    assert (io_fused.stamp_stats['node_visits'] == 8)
+    assert (io_fused.stamp_stats['node_visits_saved'] == 12)
+    assert (io_fused.stamp_stats['traversal_time'] > 0.0)
+    assert (not 'traversal_time_saved' in io_fused.stamp_stats)
+
+    for file_end in ['_agent2.csv', '_agent2.json', '_env2.csv',
+                     '_agent4.csv', '_agent4.json', '_env4.csv',
+                     '_graph4.edgelist']:
+        assert (os.path.isfile('fused' + file_end))
+        assert (os.path.isfile('plain' + file_end))
+        data_fused = open('fused' + file_end).read()
+        data_plain = open('plain' + file_end).read()
+        assert (data_fused == data_plain)
+        os.remove('fused' + file_end)
+        os.remove('plain' + file_end)
+
+    assert (not os.path.isfile('fused_graph2.edgelist'))
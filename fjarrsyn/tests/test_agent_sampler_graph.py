@@ -0,0 +1,69 @@
+'''Test of graph sampling with cached labels and streamed edge lists
+
+'''
+import pytest
+
+import os
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.graph import Node
+from fjarrsyn.simulation.sampler import GraphSampler, SystemIO
+
+import networkx as nx
+
+N_CALLS = []
+
+def _agent_name(node):
+    N_CALLS.append(node)
+    return node.agent_content.name
+
+def test_main():
+
+    agents = [Agent('bacteria'), Agent('bacteria'), Agent('virus'), Agent('bacteria')]
+    nodes = [Node('node %s' %(str(k)), agent) for k, agent in enumerate(agents)]
+    nodes.append(Node('empty 1', None))
+    nodes.append(Node('empty 2', None))
+
+    a_graph = nx.Graph()
+    a_graph.add_edge(nodes[0], nodes[1])
+    a_graph.add_edge(nodes[1], nodes[2])
+    a_graph.add_edge(nodes[2], nodes[3])
+    a_graph.add_edge(nodes[3], nodes[4])
+    a_graph.add_edge(nodes[4], nodes[5])
+
+    mess = AgentManagementSystem('cells', agents, a_graph)
+
+    g_sampler = GraphSampler('connections', key_occ_node=_agent_name,
+                             report_empty_to_empty=False)
+    graph = g_sampler(mess)
+    assert (sorted(graph.nodes) == ['bacteria_0', 'bacteria_1', 'bacteria_2',
+                                    'unoccupied_0', 'unoccupied_1', 'virus'])
+    assert (graph.number_of_edges() == 4)
+    assert (not graph.has_edge('unoccupied_0', 'unoccupied_1'))
+    assert (len(N_CALLS) == 4)
+
+    #
+    # Labels are reused until the agent of a node changes
+    #
+    g_sampler(mess)
+    assert (len(N_CALLS) == 4)
+    mess.terminate_agent(agents[2].agent_id_system)
+    mess.situate(Agent('phage'), nodes[2])
+    graph = g_sampler(mess)
+    assert (len(N_CALLS) == 5)
+    assert ('phage' in graph.nodes)
+
+    nx.write_edgelist(graph, 'graph_ref.edgelist')
+    g_sampler.write_edgelist(mess, 'graph_stream.edgelist')
+    assert (open('graph_ref.edgelist').read() == \
+            open('graph_stream.edgelist').read())
+
+    io = SystemIO([('graph_io', g_sampler, 'stream_edgelist')])
+    assert (io.try_stamp(mess, 3))
+    assert (open('graph_ref.edgelist').read() == \
+            open('graph_io3.edgelist').read())
+
+    for filename in ['graph_ref.edgelist', 'graph_stream.edgelist',
+                     'graph_io3.edgelist']:
+        os.remove(filename)
@@ -0,0 +1,98 @@
+'''Test of graph sampling in diff mode from the topology log of the system
+
+'''
+import pytest
+
+import os
+
+import pandas as pd
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.graph import Node
+from fjarrsyn.simulation.sampler import GraphSampler, SystemIO, reconstruct_graph
+from fjarrsyn.simulation.sink import SQLiteSink
+
+import networkx as nx
+
+def _snapshot(mess, g_sampler):
+
+    index = g_sampler._node_indices
+    edges = set([frozenset((index[n1], index[n2]))
+                 for n1, n2 in mess.agents_graph.edges])
+    labels = dict([(index[node], g_sampler._node_label(node))
+                   for node in mess.agents_graph])
+
+    return edges, labels
+
+def test_main():
+
+    agents = [Agent('agent %s' %(str(k))) for k in range(5)]
+    nodes = [Node('node %s' %(str(k)), agent) for k, agent in enumerate(agents)]
+    nodes.append(Node('empty', None))
+    a_graph = nx.path_graph(nodes)
+
+    mess = AgentManagementSystem('path', agents, a_graph)
+    ids = [agent.agent_id_system for agent in agents]
+
+    g_sampler = GraphSampler('topology', diff=True, keyframe_every=3)
+    sink = SQLiteSink('diff_test.sqlite')
+    io = SystemIO([('topology', g_sampler, sink),
+                   ('topology', g_sampler, 'to_csv')])
+
+    assert (len(mess.topology_log) == 0)
+    mess.edge_edit(ids[0], ids[1], delete=True)
+    assert (len(mess.topology_log) == 0)
+
+    expected = []
+    io.try_stamp(mess, 0)
+    expected.append(_snapshot(mess, g_sampler))
+    df_0 = pd.read_csv('topology0.csv')
+    assert (set(df_0['frame']) == set(['full']))
+    assert (list(df_0['event']).count('node') == 6)
+    assert (list(df_0['event']).count('edge') == 4)
+
+    mess.edge_edit(ids[0], ids[4], add=True)
+    mess.edge_edit(ids[2], ids[3], delete=True)
+    io.try_stamp(mess, 1)
+    expected.append(_snapshot(mess, g_sampler))
+    df_1 = pd.read_csv('topology1.csv')
+    assert (list(df_1['event']) == ['edge_add', 'edge_remove'])
+    assert (len(mess.topology_log) == 0)
+
+    mess.switch_node_content(nodes[0], nodes[5])
+    mess.terminate_agent(ids[3])
+    mess.situate(Agent('newcomer'), nodes[3])
+    mess.edge_edit(ids[1], ids[2], delete=True)
+    mess.edge_edit(ids[1], ids[2], add=True)
+    io.try_stamp(mess, 2)
+    expected.append(_snapshot(mess, g_sampler))
+    df_2 = pd.read_csv('topology2.csv')
+    assert (list(df_2['event']).count('label') == 3)
+    assert (set(df_2['frame']) == set(['delta']))
+
+    mess.edge_edit(ids[4], ids[2], add=True)
+    io.try_stamp(mess, 3)
+    expected.append(_snapshot(mess, g_sampler))
+    df_3 = pd.read_csv('topology3.csv')
+    assert (set(df_3['frame']) == set(['full']))
+
+    io.flush()
+    df_all = sink.read('topology')
+    assert (df_all.index.names == ['generation'])
+    for generation, (edges, labels) in enumerate(expected):
+        graph = reconstruct_graph(df_all, generation)
+        assert (set([frozenset(e) for e in graph.edges]) == edges)
+        assert (nx.get_node_attributes(graph, 'label') == labels)
+
+        graph_csv = reconstruct_graph(pd.concat([df_0, df_1, df_2, df_3]),
+                                      generation)
+        assert (set([frozenset(e) for e in graph_csv.edges]) == edges)
+
+    with pytest.raises(ValueError):
+        GraphSampler('topology', diff=True, report_empty_to_empty=False)
+
+    sink.close()
+    for generation in range(4):
+        os.remove('topology%s.csv' %(str(generation)))
+    os.remove('diff_test.sqlite')
@@ -0,0 +1,115 @@
+'''Test of keeping the samples of the latest generations in an in-memory ring
+buffer sink
+
+'''
+import pytest
+
+import numpy as np
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.message import Essence, Resource
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.graph import Node
+from fjarrsyn.simulation.sampler import AgentSampler, AggregateSampler, GraphSampler, SystemIO
+from fjarrsyn.simulation.sink import RingBufferSink
+
+import networkx as nx
+
+class Bacteria(Agent):
+
+    def __init__(self, name, e1, r1):
+
+        super().__init__(name, strict_engine=True)
+
+        essence = Essence('Bacteria Essence', ['E1'])
+        essence.set_values([e1])
+
+        resource = Resource('Bacteria Resource', ['R1'])
+        resource.set_values([r1])
+
+        self.set_scaffolds(essence, resource)
+
+def test_main():
+
+    a1 = Bacteria('bacteria 1', 1.0, 10.0)
+    a2 = Bacteria('bacteria 2', 0.5, 5.0)
+    n1 = Node('first', a1)
+    n2 = Node('second', a2)
+    n3 = Node('third', None)
+
+    a_graph = nx.Graph()
+    a_graph.add_edge(n1, n2)
+    a_graph.add_edge(n2, n3)
+
+    mess = AgentManagementSystem('2 bacteria', [a1, a2], a_graph)
+
+    a_sampler = AgentSampler('state',
+                             resource_args=[('Bacteria Resource', 'R1')],
+                             essence_args=[('Bacteria Essence', 'E1')])
+    s_sampler = AggregateSampler('summary',
+                                 resource_args=[('Bacteria Resource', 'R1')])
+    g_sampler = GraphSampler('connections', sample_steps=2)
+
+    sink = RingBufferSink(3)
+    io = SystemIO([('agent', a_sampler, sink),
+                   ('summary', s_sampler, sink),
+                   ('graph', g_sampler, sink)])
+
+    io.try_stamp(mess, 0)
+    buffer_agent = sink.read('agent')['value'].base
+    for generation in range(1, 5):
+        a1.resource['R1'] += 1.0
+        io.try_stamp(mess, generation)
+    io.flush()
+
+    assert (sink.names() == ['agent', 'graph', 'summary'])
+    assert (sink.generations('agent') == [2, 3, 4])
+    assert (sink.generations('graph') == [0, 2, 4])
+
+    columns = sink.read('agent', 3)
+    assert (list(columns.keys()) == ['generation', 'name', 'agent_index',
+                                     'variable', 'value'])
+    assert (list(columns['generation']) == [3, 3, 3, 3])
+    assert (sorted(columns['value']) == [0.5, 1.0, 5.0, 13.0])
+    assert (not columns['value'].flags.writeable)
+    with pytest.raises(ValueError):
+        columns['value'][0] = 0.0
+
+    #
+    # The slot of generation 3 is the one of generation 0, whose buffer is
+    # reused rather than reallocated
+    #
+    assert (columns['value'].base is buffer_agent)
+
+    df_agent = sink.frame('agent')
+    assert (df_agent.index.names == ['generation', 'name', 'agent_index', 'variable'])
+    assert (df_agent.loc[(4, 'bacteria 1', a1.agent_id_system,
+                          'resource:Bacteria Resource:R1'), 'value'] == 14.0)
+
+    summary = sink.read('summary')
+    assert (summary['resource:Bacteria Resource:R1:max'][0] == 14.0)
+    assert (sink.frame('summary', 2).index.names == ['generation'])
+
+    graph = sink.read('graph')
+    assert (graph.number_of_edges() == 2)
+    with pytest.raises(TypeError):
+        sink.frame('graph')
+
+    with pytest.raises(KeyError):
+        sink.read('agent', 0)
+    with pytest.raises(KeyError):
+        sink.read('nothing')
+
+    #
+    # A sample with more rows than the buffer of the slot grows the buffer
+    #
+    a3 = Bacteria('bacteria 3', 0.1, 1.0)
+    mess.situate(a3, n3)
+    io.try_stamp(mess, 5)
+    io.flush()
+    assert (len(sink.read('agent', 5)['value']) == 6)
+    assert (np.isclose(sink.frame('summary', 5)['resource:Bacteria Resource:R1:mean'].iloc[0],
+                       20.0 / 3.0))
+
+    with pytest.raises(ValueError):
+        RingBufferSink(0)
@@ -0,0 +1,117 @@
+'''Test of appending samples of all generations to a single SQLite sink
+
+'''
+import pytest
+
+import os
+
+import pandas as pd
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.message import Essence, Resource
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.graph import Node
+from fjarrsyn.simulation.sampler import AgentSampler, EnvSampler, GraphSampler, SystemIO
+from fjarrsyn.simulation.sink import SQLiteSink
+
+import networkx as nx
+
+def _get_data(aux_env):
+    return {'env_data_1' : aux_env.env_1}
+
+class Env(object):
+
+    def __init__(self, name, env_1):
+
+        self.name = name
+        self.env_1 = env_1
+
+class Bacteria(Agent):
+
+    def __init__(self, name, e1, r1):
+
+        super().__init__(name, strict_engine=True)
+
+        essence = Essence('Bacteria Essence', ['E1'])
+        essence.set_values([e1])
+
+        resource = Resource('Bacteria Resource', ['R1'])
+        resource.set_values([r1])
+
+        self.set_scaffolds(essence, resource)
+
+def test_main():
+
+    a1 = Bacteria('bacteria 1', 1.0, 10.0)
+    a2 = Bacteria('bacteria 2', 0.5, 5.0)
+    n1 = Node('first', a1, Env('environment 1', 0.1))
+    n2 = Node('second', a2, Env('environment 2', 0.2))
+    n3 = Node('third', None, Env('environment 3', 0.3))
+
+    a_graph = nx.Graph()
+    a_graph.add_edge(n1, n2)
+    a_graph.add_edge(n2, n3)
+
+    mess = AgentManagementSystem('2 bacteria', [a1, a2], a_graph)
+
+    a_sampler = AgentSampler('state',
+                             resource_args=[('Bacteria Resource', 'R1')],
+                             essence_args=[('Bacteria Essence', 'E1')],
+                             sample_steps=1)
+    e_sampler = EnvSampler('env', _get_data, sample_steps=2)
+    g_sampler = GraphSampler('connections', sample_steps=2)
+
+    sink = SQLiteSink('sink_test.sqlite', commit_every=2)
+    io = SystemIO([('agent', a_sampler, sink),
+                   ('env', e_sampler, sink),
+                   ('graph', g_sampler, sink),
+                   ('agent', a_sampler, 'to_csv')])
+
+    for generation in range(4):
+        io.try_stamp(mess, generation)
+        a1.resource['R1'] += 1.0
+    io.flush()
+
+    assert (not os.path.isfile('agent0'))
+    assert (sink.names() == ['agent', 'env', 'graph'])
+    assert (sink.generations('agent') == [0, 1, 2, 3])
+    assert (sink.generations('env') == [0, 2])
+
+    df_agent = sink.read('agent', 2)
+    assert (df_agent.index.names == ['generation', 'name', 'agent_index', 'variable'])
+    assert (len(df_agent) == 4)
+    assert (df_agent.loc[(2, 'bacteria 1', a1.agent_id_system,
+                          'resource:Bacteria Resource:R1'), 'value'] == 12.0)
+
+    assert (len(sink.read('agent')) == 16)
+
+    df_env = sink.read('env', 0)
+    assert (list(df_env['value']) == [0.1, 0.2])
+
+    graph = sink.read('graph', 2)
+    assert (graph.number_of_nodes() == 3)
+    assert (graph.number_of_edges() == 2)
+    assert (graph.has_edge(a1.agent_id_system, a2.agent_id_system))
+
+    sink.close()
+
+    sink = SQLiteSink('sink_test.sqlite')
+    assert (sink.generations('agent') == [0, 1, 2, 3])
+    with pytest.raises(KeyError):
+        sink.read('nothing', 0)
+
+    #
+    # The samples of another sampler are not mixed into a table
+    #
+    with pytest.raises(TypeError):
+        sink.append('agent', 4, pd.DataFrame({'other' : [1.0]}))
+    with pytest.raises(ValueError):
+        SystemIO([('agent', a_sampler, sink),
+                  ('agent', AgentSampler('other',
+                                         resource_args=[('Bacteria Resource', 'R1')]),
+                   sink)])
+    sink.close()
+
+    for generation in range(4):
+        os.remove('agent%s.csv' %(str(generation)))
+    os.remove('sink_test.sqlite')
@@ -0,0 +1,77 @@
+'''Test of reservoir and stratified subsampling of agents
+
+'''
+import pytest
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.message import Essence
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.simulation.sampler import AgentSampler
+
+class Bacteria(Agent):
+
+    def __init__(self, name, e1):
+
+        super().__init__(name, strict_engine=True)
+
+        essence = Essence('Cell Essence', ['E1'])
+        essence.set_values([e1])
+        self.set_scaffolds(essence)
+
+class Virus(Bacteria):
+    pass
+
+def _ids(df):
+    return set(df.index.get_level_values('agent_index'))
+
+def test_main():
+
+    agents = [Bacteria('bacteria', float(k)) for k in range(50)] + \
+             [Virus('virus', float(k)) for k in range(10)]
+    mess = AgentManagementSystem('cells', agents)
+
+    sampler = AgentSampler('state', essence_args=[('Cell Essence', 'E1')],
+                           subsample=8, random_state=1)
+    df_1 = sampler(mess, 0)
+    df_2 = sampler(mess, 1)
+    assert (len(_ids(df_1)) == 8)
+    assert (len(_ids(df_2)) == 8)
+    assert (_ids(df_1) != _ids(df_2))
+
+    sampler = AgentSampler('state', essence_args=[('Cell Essence', 'E1')],
+                           subsample=4, stratify_by='class', random_state=1)
+    df = sampler(mess, 0)
+    names = df.reset_index()['name']
+    assert (list(names).count('bacteria') == 4)
+    assert (list(names).count('virus') == 4)
+
+    sampler = AgentSampler('state', essence_args=[('Cell Essence', 'E1')],
+                           subsample=20, stratify_by=lambda x: x.name,
+                           random_state=1)
+    df = sampler(mess, 0)
+    names = df.reset_index()['name']
+    assert (list(names).count('bacteria') == 20)
+    assert (list(names).count('virus') == 10)
+
+    rows = sampler.sample_many(mess, 0)
+    assert ([row['name'] for row in rows].count('bacteria') == 20)
+    assert ([row['name'] for row in rows].count('virus') == 10)
+
+    sampler = AgentSampler('state', essence_args=[('Cell Essence', 'E1')],
+                           subsample=5, follow_cohort=True, random_state=2)
+    cohort = _ids(sampler(mess, 0))
+    assert (len(cohort) == 5)
+    assert (_ids(sampler(mess, 1)) == cohort)
+    assert (set([row['agent_index'] for row in sampler.sample_many(mess, 1)]) == \
+            cohort)
+
+    gone = sorted(cohort)[0]
+    mess.terminate_agent(gone)
+    assert (_ids(sampler(mess, 2)) == cohort - set([gone]))
+
+    for agent_id in cohort - set([gone]):
+        mess.terminate_agent(agent_id)
+    assert (len(sampler(mess, 3)) == 0)
+
+    with pytest.raises(TypeError):
+        AgentSampler('state', subsample=5, stratify_by='colour')
@@ -0,0 +1,119 @@
+'''Benchmark of scalar random draws, one call into numpy per draw compared to
+draws served from pre-drawn blocks, both for the bare draws and for the
+mutation of agents in a system
+
+'''
+import sys
+import argparse
+import time
+
+import numpy.random
+
+from fjarrsyn.core.agent import Agent
+from fjarrsyn.core.agent_ms import AgentManagementSystem
+from fjarrsyn.core.message import Essence
+from fjarrsyn.core.instructor import MultiMutation
+from fjarrsyn.core.scaffold_map import EssenceMap, MapCollection
+from fjarrsyn.core.rng import BufferedRandom, set_random_buffer, \
+                              draw_uniform, draw_normal, draw_integer
+
+def parse_(argv):
+
+    parser = argparse.ArgumentParser(description='Script to benchmark the ' + \
+        'time per scalar random draw with and without a buffered random ' + \
+        'source')
+    parser.add_argument('--n-draws', dest='n_draws', type=int, default=1000000,
+                        help='Number of scalar draws per distribution')
+    parser.add_argument('--n-agents', dest='n_agents', type=int, default=1000,
+                        help='Number of agents of the mutation benchmark')
+    parser.add_argument('--n-steps', dest='n_steps', type=int, default=20,
+                        help='Number of mutation sweeps over the agents')
+    parser.add_argument('--block-size', dest='block_size', type=int,
+                        default=4096, help='Size of the pre-drawn blocks')
+    parser.add_argument('--seed', dest='seed', type=int, default=42,
+                        help='Seed of the random number generator')
+
+    args = parser.parse_args(argv)
+
+    return args.n_draws, args.n_agents, args.n_steps, args.block_size, \
+           args.seed
+
+def time_draws(func, n_draws):
+    '''Return the time in seconds per call of a function'''
+
+    t_start = time.perf_counter()
+    for _ in range(n_draws):
+        func()
+
+    return (time.perf_counter() - t_start) / n_draws
+
+def make_system(n_agents):
+    '''Create a system of agents with an essence that drifts by mutation'''
+
+    agents = []
+    for k in range(n_agents):
+        agent = Agent('agent %s' %(str(k)))
+        essence = Essence('Drift', ['x', 'y'])
+        essence.set_values([0.0, 0.0])
+        agent.set_scaffold(essence)
+        agents.append(agent)
+
+    ams = AgentManagementSystem('drift', agents)
+    mapper = MapCollection([EssenceMap('tweak', 'wiener', 'x', ('range_step',)),
+                            EssenceMap('tweak', 'wiener', 'y', ('range_step',))])
+    ams.set_law(MultiMutation('drift', lambda : 1.0, mapper, mutation_prob=0.5))
+
+    return ams
+
+def time_mutations(ams, n_steps):
+    '''Return the time in seconds per mutation of an agent'''
+
+    agents = list(ams.agents_in_scope.values())
+    t_start = time.perf_counter()
+    for _ in range(n_steps):
+        for agent in agents:
+            ams.mutate(agent, 'drift')
+
+    return (time.perf_counter() - t_start) / (n_steps * len(agents))
+
+def main(args):
+
+    n_draws, n_agents, n_steps, block_size, seed = parse_(args)
+
+    benchmarks = [('numpy.random.ranf', lambda : numpy.random.ranf()),
+                  ('numpy.random.normal', lambda : numpy.random.normal(0.0, 1.0)),
+                  ('numpy.random.randint', lambda : numpy.random.randint(100)),
+                  ('draw_uniform', draw_uniform),
+                  ('draw_normal', draw_normal),
+                  ('draw_integer', lambda : draw_integer(100))]
+
+    ams = make_system(n_agents)
+
+    numpy.random.seed(seed)
+    results = {}
+    for label, buffer in [('unbuffered', None),
+                          ('buffered', BufferedRandom(block_size))]:
+        previous = set_random_buffer(buffer)
+        try:
+            for name, func in benchmarks:
+                if buffer is None or name.startswith('draw_'):
+                    results[(label, name)] = time_draws(func, n_draws)
+            results[(label, 'mutate')] = time_mutations(ams, n_steps)
+
+        finally:
+            set_random_buffer(previous)
+
+    print ('%-24s %14s %14s %9s' %('draw', 'unbuffered ns', 'buffered ns',
+                                   'speed-up'))
+    for name in ['draw_uniform', 'draw_normal', 'draw_integer', 'mutate']:
+        t_plain = results[('unbuffered', name)]
+        t_buffer = results[('buffered', name)]
+        print ('%-24s %14.1f %14.1f %9.2f' %(name, 1e9 * t_plain, 1e9 * t_buffer,
+                                             t_plain / t_buffer))
+
+    for name in ['numpy.random.ranf', 'numpy.random.normal',
+                 'numpy.random.randint']:
+        print ('%-24s %14.1f' %(name, 1e9 * results[('unbuffered', name)]))
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))